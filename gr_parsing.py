@@ -0,0 +1,91 @@
+"""
+Parsing file Master GR/PO di proses terpisah (FIX V1.48).
+
+Dipanggil lewat ProcessPoolExecutor oleh receiving_app.py pada upload banyak
+file. Modul ini sengaja tidak meng-import streamlit/supabase: proses worker
+(spawn) hanya perlu pandas + openpyxl, dan fungsi di sini harus bisa di-pickle.
+"""
+import io
+import os
+import re
+import time
+
+import pandas as pd
+
+REQUIRED_COLUMNS = ['SKU', 'Nama Barang', 'Qty PO', 'Tipe Barang']
+HEADER_SCAN_ROWS = 20 # Baris teratas yang dicari untuk header & sel Nomor GR
+
+# Sel label "Nomor GR: <nilai>" / "No. PO" di atas header (nilai di sel kanannya atau setelah ':')
+_GR_LABEL_RE = re.compile(r"^\s*(no\.?|nomor|number)?\s*(gr/po|gr|po)\s*(no\.?|number)?\s*:?\s*(.*)$", re.IGNORECASE)
+# Nama file: GR-2025-11-001.xlsx / GR_2025_11_001.xlsx -> GR/2025/11/001
+_GR_FILENAME_RE = re.compile(r"^(GR|PO)[-_ ]?(\d{4})[-_ ](\d{1,2})[-_ ](\w+)$", re.IGNORECASE)
+
+
+def gr_number_from_filename(filename):
+    """Tebakan Nomor GR dari nama file (pola GR-YYYY-MM-NNN dijadikan GR/YYYY/MM/NNN, selain itu nama file apa adanya)"""
+    stem = os.path.splitext(os.path.basename(filename))[0].strip()
+    match = _GR_FILENAME_RE.match(stem)
+    if match:
+        return "/".join([match.group(1).upper(), *match.groups()[1:]])
+    return stem
+
+
+def _gr_number_from_cells(rows):
+    """Cari sel label Nomor GR di baris-baris sebelum header"""
+    for row in rows:
+        for i, cell in enumerate(row):
+            if not isinstance(cell, str):
+                continue
+            match = _GR_LABEL_RE.match(cell)
+            if not match or not (match.group(1) or match.group(3) or cell.rstrip().endswith(":")):
+                continue
+            inline = match.group(4).strip()
+            if inline:
+                return inline
+            following = next((c for c in row[i + 1:] if c not in (None, "")), None)
+            if following is not None:
+                return str(following).strip()
+    return None
+
+
+def parse_gr_workbook(filename, content):
+    """
+    Parse satu workbook (bytes). Header boleh tidak di baris pertama; sel "Nomor GR" di atas header dipakai
+    sebagai Nomor GR. Return dict yang bisa di-pickle: filename, gr_from_cell, gr_from_filename, df, error, elapsed_s.
+    """
+    start = time.perf_counter()
+    result = {
+        "filename": filename, "gr_from_cell": None, "gr_from_filename": gr_number_from_filename(filename),
+        "df": None, "error": None, "elapsed_s": 0.0,
+    }
+    try:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        try:
+            rows = [list(r) for r in workbook.worksheets[0].iter_rows(values_only=True)]
+        finally:
+            workbook.close()
+
+        header_idx = next((
+            i for i, row in enumerate(rows[:HEADER_SCAN_ROWS])
+            if all(col in [str(c).strip() if c is not None else None for c in row] for col in REQUIRED_COLUMNS)
+        ), None)
+        if header_idx is None:
+            result["error"] = f"Kolom wajib tidak ditemukan: {', '.join(REQUIRED_COLUMNS)}"
+            return result
+
+        result["gr_from_cell"] = _gr_number_from_cells(rows[:header_idx])
+        header = [str(c).strip() if c is not None else f"_kolom_{i}" for i, c in enumerate(rows[header_idx])]
+        body = [r for r in rows[header_idx + 1:] if any(c not in (None, "") for c in r)]
+        df = pd.DataFrame(body, columns=header)
+        # Kolom opsional template: dibuat kosong agar process_and_insert tidak gagal
+        for col in ['Tujuan (Stok/Display)', 'Keterangan Awal']:
+            if col not in df.columns:
+                df[col] = None
+        result["df"] = df
+    except Exception as e:
+        result["error"] = f"Gagal membaca file: {e}"
+    finally:
+        result["elapsed_s"] = time.perf_counter() - start
+    return result
@@ -0,0 +1,320 @@
+"""
+Load test checker paralel terhadap backend lokal (FIX V1.43).
+
+Menjalankan N sesi headless (streamlit.testing AppTest) di satu proses, sama
+seperti satu replika Streamlit: semua sesi berbagi st.cache_resource, change
+feed, dan GIL. Alur per sesi: pilih operator -> pilih GR -> scan batch SN
+(mode kontinu) / simpan qty Non-SN, plus sesi admin yang konfirmasi inbound.
+
+Contoh:
+    python load_test.py --sessions 1,5,10,20 --duration 60 --latency-ms 25 --replica-mem-mb 512,1024,2048
+
+Output: throughput aksi/detik, p50/p95 latency rerun, conflict rate, memori
+per sesi, dan kapasitas (jumlah checker) per ukuran replika.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import local_backend
+
+APP_FILE = str(Path(__file__).with_name("receiving_app.py"))
+RECEIVING_TABLE = "receiving_validation"
+OPERATORS_TABLE = "store_operators"
+CONFLICT_MARKERS = ("KONFLIK", "Gagal simpan", "Muat ulang data")
+
+
+def rss_mb():
+    """RSS proses saat ini (MB). /proc di Linux, fallback ke puncak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def seed_database(db, n_grs, lines_per_gr, n_operators, sn_ratio):
+    """Isi backend lokal dengan operator dan GR aktif (campuran SN / Non-SN)"""
+    db.tables.clear()
+    db.seed(OPERATORS_TABLE, [
+        {"operator_name": f"CHECKER-{i:02d}", "is_active": True} for i in range(n_operators)
+    ] + [{"operator_name": "ADMIN-LT", "is_active": True}])
+
+    rows = []
+    for g in range(n_grs):
+        for i in range(lines_per_gr):
+            is_sn = random.random() < sn_ratio
+            rows.append({
+                "gr_number": f"GR-LT-{g:03d}", "sku": f"LT{g:03d}-{i:04d}", "nama_barang": f"BRAND{i % 7} Item {i}",
+                "kategori_barang": "SN" if is_sn else "NON-SN", "qty_po": random.randint(1, 30),
+                "qty_fisik": 0, "updated_by": "-", "is_active": True, "jenis": "Stok",
+                "sn_list": "[]" if is_sn else None, "keterangan": None, "is_inbound": False, "updated_at": None,
+            })
+    db.seed(RECEIVING_TABLE, rows)
+    return sorted({r["gr_number"] for r in rows})
+
+
+class SessionStats:
+    def __init__(self):
+        self.latencies_ms = []
+        self.actions = 0
+        self.writes = 0
+        self.conflicts = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def merge(self, other):
+        with self.lock:
+            self.latencies_ms.extend(other.latencies_ms)
+            self.actions += other.actions
+            self.writes += other.writes
+            self.conflicts += other.conflicts
+            self.errors += other.errors
+
+
+class SimulatedSession:
+    """Satu browser tab. Setiap interaksi = satu rerun yang diukur."""
+
+    def __init__(self, url, stats, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+        self.at.secrets["SUPABASE_URL"] = url
+        self.at.secrets["SUPABASE_KEY"] = "local"
+        self.at.secrets["CHANGE_FEED_BACKEND"] = "local"
+        self.at.secrets["SINGLE_REPLICA"] = True # Satu proses = satu replika
+        self.stats = stats
+
+    def rerun(self, action=None):
+        start = time.perf_counter()
+        (action or self.at).run()
+        self.stats.latencies_ms.append((time.perf_counter() - start) * 1000)
+        if self.at.exception:
+            self.stats.errors += 1
+        return self.at
+
+    def _messages(self):
+        return [str(e.value) for e in list(self.at.error) + list(self.at.warning)]
+
+    def _count_conflicts(self):
+        if any(marker in msg for msg in self._messages() for marker in CONFLICT_MARKERS):
+            self.stats.conflicts += 1
+
+    def _widget(self, kind, key=None, prefix=None, label_prefix=None):
+        for widget in getattr(self.at, kind):
+            if key is not None and widget.key == key:
+                return widget
+            if prefix is not None and (widget.key or "").startswith(prefix):
+                return widget
+            if label_prefix is not None and str(widget.label).startswith(label_prefix):
+                return widget
+        return None
+
+    def start_checker(self, operator, gr_number):
+        self.rerun()
+        self.rerun(self.at.selectbox(key="checker_select").set_value(operator))
+        self.rerun(self.at.selectbox(key="gr_session_selector").set_value(gr_number))
+
+    def _current_lines(self, kategori):
+        df = self.at.session_state["current_df"] if "current_df" in self.at.session_state else None
+        if df is None or df.empty:
+            return []
+        return df[df["kategori_barang"] == kategori].to_dict("records")
+
+    def scan_sn_batch(self, batch_size):
+        lines = self._current_lines("SN")
+        if not lines:
+            return
+        self.rerun(self.at.radio(key="checker_section").set_value("⚡ Pindai SN Cepat"))
+        self.rerun(self.at.toggle(key="continuous_scan_mode").set_value(True))
+        line = random.choice(lines)
+        self.rerun(self.at.text_input(key="continuous_scan_input").set_value(line["sku"]))
+        for _ in range(batch_size):
+            self.rerun(self.at.text_input(key="continuous_scan_input").set_value(f"SN{random.getrandbits(40):010X}"))
+            self.stats.actions += 1
+        flush = self._widget("button", key="flush_scan_btn")
+        if flush is not None and not flush.disabled:
+            self.rerun(flush.click())
+        self.stats.writes += 1
+        self._count_conflicts()
+
+    def save_non_sn(self):
+        lines = self._current_lines("NON-SN")
+        if not lines:
+            return
+        self.rerun(self.at.radio(key="checker_section").set_value("📦 Input Qty Non-SN"))
+        line = random.choice(lines)
+        qty_input = self._widget("number_input", key=f"qty_non_{line['id']}")
+        if qty_input is None:
+            return
+        qty_input.set_value(random.randint(0, int(line["qty_po"]) + 2))
+        self.rerun(self.at.button(key=f"btn_non_{line['id']}").click())
+        self.stats.actions += 1
+        self.stats.writes += 1
+        self._count_conflicts()
+
+    def start_admin(self, admin_name):
+        self.at.session_state["current_checker_name_receiving"] = admin_name
+        self.rerun()
+        self.rerun(self.at.sidebar.radio[0].set_value("Admin Panel"))
+        self.rerun(self.at.radio(key="admin_section").set_value("📦 Inbound Control"))
+
+    def confirm_inbound(self):
+        # Pilihan = item di halaman tabel inbound yang sedang tampil (opsi 0 = placeholder)
+        selector = self._widget("selectbox", label_prefix="Pilih Item Selesai Inbound")
+        if selector is None or len(selector.options) < 2:
+            self.rerun()
+            return
+        self.rerun(selector.select_index(random.randrange(1, len(selector.options))))
+        button = self._widget("button", label_prefix="✅ KONFIRMASI INBOUND")
+        if button is not None:
+            self.rerun(button.click())
+            self.stats.actions += 1
+            self.stats.writes += 1
+            self._count_conflicts()
+
+
+def run_checker(url, operator, gr_number, deadline, args, totals):
+    stats = SessionStats()
+    try:
+        session = SimulatedSession(url, stats, args.timeout)
+        session.start_checker(operator, gr_number)
+        while time.monotonic() < deadline:
+            if random.random() < args.sn_ratio:
+                session.scan_sn_batch(args.scan_batch)
+            else:
+                session.save_non_sn()
+            time.sleep(random.uniform(0, args.think_ms / 1000))
+    except Exception as e:
+        stats.errors += 1
+        print(f"[{operator}] sesi berhenti: {e}", file=sys.stderr)
+    totals.merge(stats)
+
+
+def run_admin(url, deadline, args, totals):
+    stats = SessionStats()
+    try:
+        session = SimulatedSession(url, stats, args.timeout)
+        session.start_admin("ADMIN-LT")
+        while time.monotonic() < deadline:
+            session.confirm_inbound()
+            time.sleep(args.think_ms / 1000)
+    except Exception as e:
+        stats.errors += 1
+        print(f"[ADMIN] sesi berhenti: {e}", file=sys.stderr)
+    totals.merge(stats)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def run_level(n_sessions, args):
+    import streamlit as st
+    url = f"local://loadtest-{n_sessions}" + ("?rpc=0" if args.no_rpc else "")
+    db = local_backend.get_local_database(url, args.latency_ms, args.jitter_ms)
+    grs = seed_database(db, args.grs, args.lines, max(n_sessions, 1), args.sn_ratio)
+    # Snapshot/change feed/cache level sebelumnya tidak boleh terbawa
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+    gc.collect()
+    rss_before = rss_mb()
+    totals = SessionStats()
+    deadline = time.monotonic() + args.duration
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=n_sessions + args.admins) as pool:
+        for i in range(n_sessions):
+            # Beberapa checker sengaja di GR yang sama agar konflik realistis
+            pool.submit(run_checker, url, f"CHECKER-{i:02d}", grs[i % len(grs)], deadline, args, totals)
+        for _ in range(args.admins):
+            pool.submit(run_admin, url, deadline, args, totals)
+        time.sleep(min(args.duration, 5))
+        rss_peak = rss_mb()
+    elapsed = time.monotonic() - start
+    rss_peak = max(rss_peak, rss_mb())
+
+    sessions = n_sessions + args.admins
+    return {
+        "sessions": n_sessions,
+        "admins": args.admins,
+        "throughput_actions_s": round(totals.actions / elapsed, 2),
+        "reruns": len(totals.latencies_ms),
+        "p50_ms": round(percentile(totals.latencies_ms, 50), 1),
+        "p95_ms": round(percentile(totals.latencies_ms, 95), 1),
+        "conflict_rate": round(totals.conflicts / totals.writes, 4) if totals.writes else 0.0,
+        "error_rate": round(totals.errors / max(len(totals.latencies_ms), 1), 4),
+        "rss_mb": round(rss_peak, 1),
+        "mem_per_session_mb": round(max(rss_peak - rss_before, 0) / sessions, 2),
+        "db_queries": db.stats["queries"],
+    }
+
+
+def capacity_report(results, args):
+    """Kapasitas per replika = min(batas latency p95, batas memori)"""
+    baseline = min(r["rss_mb"] - r["mem_per_session_mb"] * (r["sessions"] + r["admins"]) for r in results)
+    per_session = max(r["mem_per_session_mb"] for r in results) or 1.0
+    ok_levels = [r["sessions"] for r in results if r["p95_ms"] <= args.p95_target_ms and r["error_rate"] < 0.01]
+    latency_cap = max(ok_levels) if ok_levels else 0
+
+    report = []
+    for mem in args.replica_mem_mb:
+        memory_cap = int(max(mem * 0.8 - baseline, 0) / per_session) # sisakan 20% headroom
+        report.append({"replica_mem_mb": mem, "memory_cap": memory_cap, "latency_cap": latency_cap,
+                       "checkers_per_replica": min(memory_cap, latency_cap)})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test checker receiving terhadap backend lokal")
+    parser.add_argument("--sessions", default="1,5,10,20", help="Daftar jumlah checker paralel, dipisah koma")
+    parser.add_argument("--admins", type=int, default=1, help="Sesi admin konfirmasi inbound")
+    parser.add_argument("--duration", type=float, default=30, help="Durasi per level (detik)")
+    parser.add_argument("--grs", type=int, default=3)
+    parser.add_argument("--lines", type=int, default=150, help="Baris per GR")
+    parser.add_argument("--sn-ratio", type=float, default=0.5, help="Porsi baris/aksi SN")
+    parser.add_argument("--scan-batch", type=int, default=10, help="SN per batch scan")
+    parser.add_argument("--think-ms", type=float, default=500, help="Jeda maksimum antar aksi")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency simulasi per query DB")
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--no-rpc", action="store_true", help="Matikan RPC lokal (uji jalur fallback)")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout satu rerun AppTest")
+    parser.add_argument("--p95-target-ms", type=float, default=1500)
+    parser.add_argument("--replica-mem-mb", default="512,1024,2048")
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+    args.replica_mem_mb = [int(x) for x in args.replica_mem_mb.split(",")]
+
+    results = []
+    for n in [int(x) for x in args.sessions.split(",")]:
+        print(f"▶ {n} checker + {args.admins} admin selama {args.duration:.0f}s ...", flush=True)
+        results.append(run_level(n, args))
+        print("  " + json.dumps(results[-1]), flush=True)
+
+    capacity = capacity_report(results, args)
+    print("\nSesi | aksi/s | p50 ms | p95 ms | konflik | error | MB/sesi")
+    for r in results:
+        print(f"{r['sessions']:>4} | {r['throughput_actions_s']:>6} | {r['p50_ms']:>6} | {r['p95_ms']:>6} | "
+              f"{r['conflict_rate']:>7.2%} | {r['error_rate']:>5.2%} | {r['mem_per_session_mb']:>7}")
+    print(f"\nKapasitas (p95 <= {args.p95_target_ms:.0f} ms, headroom memori 20%):")
+    for c in capacity:
+        print(f"  Replika {c['replica_mem_mb']} MB: {c['checkers_per_replica']} checker "
+              f"(memori {c['memory_cap']}, latency {c['latency_cap']})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results, "capacity": capacity, "args": vars(args)}, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
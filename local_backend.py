@@ -0,0 +1,367 @@
+"""
+Backend lokal in-memory pengganti Supabase/PostgREST (FIX V1.43).
+
+Dipakai oleh load_test.py: set secret SUPABASE_URL = "local://<nama>" dan
+receiving_app.py akan memakai client ini. Hanya subset query builder yang
+dipakai aplikasi yang didukung (select/insert/update/delete, filter eq/neq/
+gt/gte/lt/lte/in_/is_/ilike/or_, order, limit, range).
+
+RPC: receiving_add_qty (V1.32), receiving_bulk_update_non_sn (V1.33) dan
+receiving_recorded_serials (V1.54) punya implementasi lokal dengan semantik
+yang sama dengan SQL-nya (jalur simpan qty utama di load test). RPC lain dijawab PGRST202 sehingga aplikasi memakai jalur
+fallback. LocalDatabase(rpc=False) atau URL "local://<nama>?rpc=0" mematikan
+semua RPC lokal untuk menguji fallback.
+"""
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from postgrest.exceptions import APIError
+
+_DATABASES = {}
+_DATABASES_LOCK = threading.Lock()
+
+RECEIVING_TABLE = "receiving_validation"
+QTY_DELTAS_TABLE = "receiving_qty_deltas"
+
+_ISO_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+
+
+def _as_comparable(value):
+    """Timestamp ISO dibandingkan sebagai datetime UTC (naive dianggap UTC), lainnya apa adanya"""
+    if isinstance(value, str) and _ISO_RE.match(value):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+        except ValueError:
+            return value
+    return value
+
+
+def _parse_literal(value):
+    """Nilai dari string filter or_ ("true", "null", angka) ke tipe Python"""
+    if value == "null":
+        return None
+    if value in ("true", "false"):
+        return value == "true"
+    if re.fullmatch(r"-?\d+", value):
+        return int(value)
+    return value
+
+
+def _compare(op, left, right):
+    if op == "is":
+        return left is None if right in (None, "null") else left is right
+    if op == "in":
+        return left in right
+    if op == "ilike":
+        # PostgREST menerima * (URL) maupun % sebagai wildcard
+        pattern = "^" + re.escape(str(right)).replace(r"\*", ".*").replace("%", ".*").replace("_", ".") + "$"
+        return left is not None and re.match(pattern, str(left), re.IGNORECASE) is not None
+    if left is None:
+        return op == "neq" and right is not None
+    left, right = _as_comparable(left), _as_comparable(right)
+    try:
+        return {
+            "eq": left == right, "neq": left != right, "gt": left > right,
+            "gte": left >= right, "lt": left < right, "lte": left <= right,
+        }[op]
+    except TypeError:
+        # Tipe berbeda (mis. datetime vs string): bandingkan sebagai string
+        return _compare(op, str(left), str(right))
+
+
+class LocalResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class LocalDatabase:
+    """Tabel = dict id -> row. Satu lock global (cukup untuk simulasi satu replika)."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, rpc=True):
+        self.tables = {}
+        self.rpc = rpc
+        self.lock = threading.RLock()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stats = {"queries": 0, "writes": 0}
+
+    def simulate_latency(self):
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms), 0) / 1000)
+
+    def table_rows(self, name):
+        return self.tables.setdefault(name, {})
+
+    def seed(self, table, rows):
+        """Isi tabel langsung (tanpa latency), id & created_at dibuat jika kosong"""
+        with self.lock:
+            target = self.table_rows(table)
+            for row in rows:
+                row = dict(row)
+                row.setdefault("id", str(uuid.uuid4()))
+                row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                target[row["id"]] = row
+
+
+class LocalQuery:
+    """Query builder berantai, meniru postgrest-py (SyncRequestBuilder)"""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.on_conflict = None
+        self.columns = None
+        self.count_mode = None
+        self.filters = []  # list of predicate(row) -> bool
+        self.filter_keys = []  # deskripsi filter untuk signature()
+        self.order_by = []
+        self.limit_n = None
+        self.offset_n = 0
+
+    # --- operasi ---
+    def select(self, *columns, count=None):
+        fields = [c.strip() for col in columns for c in col.split(",") if c.strip()]
+        self.columns = None if not fields or "*" in fields else fields
+        self.count_mode = count
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict="", **kwargs):
+        self.op, self.payload = "upsert", payload
+        self.on_conflict = [c.strip() for c in on_conflict.split(",") if c.strip()] or None
+        return self
+
+    def update(self, payload, **kwargs):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self, **kwargs):
+        self.op = "delete"
+        return self
+
+    # --- filter ---
+    def _add(self, op, column, value):
+        self.filters.append(lambda row: _compare(op, row.get(column), value))
+        self.filter_keys.append((op, column, repr(value)))
+        return self
+
+    def eq(self, column, value): return self._add("eq", column, value)
+    def neq(self, column, value): return self._add("neq", column, value)
+    def gt(self, column, value): return self._add("gt", column, value)
+    def gte(self, column, value): return self._add("gte", column, value)
+    def lt(self, column, value): return self._add("lt", column, value)
+    def lte(self, column, value): return self._add("lte", column, value)
+    def is_(self, column, value): return self._add("is", column, value)
+    def ilike(self, column, value): return self._add("ilike", column, value)
+
+    def in_(self, column, values):
+        return self._add("in", column, list(values))
+
+    def or_(self, filters, **kwargs):
+        """Format PostgREST 'col.op.value,col.op.value' (tanpa nested and/or)"""
+        clauses = []
+        for part in filters.split(","):
+            column, op, value = part.strip().split(".", 2)
+            clauses.append((op, column, _parse_literal(value)))
+        self.filters.append(lambda row: any(_compare(op, row.get(col), val) for op, col, val in clauses))
+        self.filter_keys.append(("or", filters))
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, n, **kwargs):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset_n, self.limit_n = start, end - start + 1
+        return self
+
+    def signature(self):
+        """Key single-flight (FIX V1.51) seperti method+path+params PostgREST. Hanya select."""
+        if self.op != "select":
+            return None
+        return ("local", self.table, tuple(self.columns or ("*",)), tuple(self.filter_keys), tuple(self.order_by),
+                self.limit_n, self.offset_n, self.count_mode)
+
+    # --- eksekusi ---
+    def _matching(self, rows):
+        return [row for row in rows.values() if all(f(row) for f in self.filters)]
+
+    def _project(self, row):
+        row = copy.deepcopy(row)
+        return row if self.columns is None else {c: row.get(c) for c in self.columns}
+
+    def execute(self):
+        db = self.db
+        db.simulate_latency()
+        with db.lock:
+            db.stats["queries"] += 1
+            rows = db.table_rows(self.table)
+
+            if self.op in ("insert", "upsert"):
+                db.stats["writes"] += 1
+                items = self.payload if isinstance(self.payload, list) else [self.payload]
+                inserted = []
+                for item in items:
+                    item = dict(item)
+                    if self.on_conflict:
+                        # Baris dengan nilai kolom on_conflict yang sama ditimpa (unique constraint selain id)
+                        existing = next((r for r in rows.values() if all(r.get(c) == item.get(c) for c in self.on_conflict)), None)
+                        if existing is not None:
+                            item["id"] = existing["id"]
+                    item.setdefault("id", str(uuid.uuid4()))
+                    item.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                    if self.op == "insert" and item["id"] in rows:
+                        raise APIError({"code": "23505", "message": "duplicate key value violates unique constraint"})
+                    rows[item["id"]] = {**rows.get(item["id"], {}), **item}
+                    inserted.append(copy.deepcopy(rows[item["id"]]))
+                return LocalResponse(inserted)
+
+            matched = self._matching(rows)
+
+            if self.op == "update":
+                db.stats["writes"] += 1
+                for row in matched:
+                    row.update(copy.deepcopy(self.payload))
+                return LocalResponse([copy.deepcopy(r) for r in matched])
+
+            if self.op == "delete":
+                db.stats["writes"] += 1
+                for row in matched:
+                    rows.pop(row["id"], None)
+                return LocalResponse(matched)
+
+            for column, desc in reversed(self.order_by):
+                matched.sort(key=lambda r: (r.get(column) is None, _as_comparable(r.get(column)) if r.get(column) is not None else 0), reverse=desc)
+            total = len(matched)
+            end = None if self.limit_n is None else self.offset_n + self.limit_n
+            data = [self._project(r) for r in matched[self.offset_n:end]]
+            return LocalResponse(data, total if self.count_mode else None)
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _rpc_add_qty(db, p_id, p_delta, p_operator):
+    """receiving_add_qty: qty_fisik += delta (min 0), log delta yang benar-benar diterapkan"""
+    row = db.table_rows(RECEIVING_TABLE).get(p_id)
+    if row is None:
+        return []
+    old = int(row.get("qty_fisik") or 0)
+    new = max(old + int(p_delta), 0)
+    row.update({"qty_fisik": new, "updated_by": p_operator, "updated_at": _now_iso()})
+    if new != old:
+        log_id = str(uuid.uuid4())
+        db.table_rows(QTY_DELTAS_TABLE)[log_id] = {
+            "id": log_id, "line_id": p_id, "gr_number": row.get("gr_number"), "delta": new - old,
+            "operator": p_operator, "created_at": row["updated_at"],
+        }
+    return [{"qty_fisik": new, "updated_at": row["updated_at"], "applied_delta": new - old}]
+
+
+def _rpc_bulk_update_non_sn(db, p_rows, p_operator, p_loaded_at):
+    """receiving_bulk_update_non_sn: update per baris hanya jika updated_at <= loaded_at baris itu"""
+    table = db.table_rows(RECEIVING_TABLE)
+    now = _now_iso()
+    results = []
+    for item in p_rows:
+        row = table.get(item["id"])
+        loaded_at = item.get("loaded_at") or p_loaded_at
+        if row is not None and (row.get("updated_at") is None or _compare("lte", row["updated_at"], loaded_at)):
+            row.update({
+                "qty_fisik": int(item["qty_fisik"]), "jenis": item.get("jenis"), "keterangan": item.get("keterangan") or None,
+                "updated_by": p_operator, "updated_at": now,
+            })
+            results.append({"id": item["id"], "status": "ok", "updated_by": p_operator, "updated_at": now})
+        else:
+            row = row or {}
+            results.append({"id": item["id"], "status": "conflict", "updated_by": row.get("updated_by"), "updated_at": row.get("updated_at")})
+    return results
+
+
+def _rpc_recorded_serials(db, p_serials, p_site):
+    """receiving_recorded_serials: SN (upper) dari p_serials yang ada di baris SN aktif"""
+    wanted = set(p_serials)
+    results = []
+    for row_id, row in sorted(db.table_rows(RECEIVING_TABLE).items(), key=lambda item: str(item[0])):
+        if not row.get("is_active") or row.get("kategori_barang") != "SN" or (p_site and row.get("site_code") != p_site):
+            continue
+        sn_list = row.get("sn_list")
+        sn_list = json.loads(sn_list) if isinstance(sn_list, str) and sn_list.startswith("[") else (sn_list or [])
+        results += [{"sn": key, "gr_number": row.get("gr_number")} for key in sorted({str(sn).upper() for sn in sn_list}) if key in wanted]
+    return results
+
+
+LOCAL_RPCS = {
+    "receiving_add_qty": _rpc_add_qty,
+    "receiving_bulk_update_non_sn": _rpc_bulk_update_non_sn,
+    "receiving_recorded_serials": _rpc_recorded_serials,
+}
+LOCAL_READ_RPCS = {"receiving_recorded_serials"} # Tidak dihitung sebagai write di stats
+
+
+class LocalRpc:
+    def __init__(self, db, name, params=None):
+        self.db = db
+        self.name = name
+        self.params = params or {}
+        self.offset_n, self.limit_n = 0, None
+
+    def range(self, start, end, **kwargs):
+        self.offset_n, self.limit_n = start, end - start + 1
+        return self
+
+    def execute(self):
+        func = LOCAL_RPCS.get(self.name) if self.db.rpc else None
+        if func is None:
+            raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{self.name}"})
+        db = self.db
+        db.simulate_latency()
+        with db.lock:
+            db.stats["queries"] += 1
+            db.stats["writes"] += self.name not in LOCAL_READ_RPCS
+            data = func(db, **self.params)
+            end = None if self.limit_n is None else self.offset_n + self.limit_n
+            return LocalResponse(copy.deepcopy(data[self.offset_n:end]))
+
+
+class LocalClient:
+    def __init__(self, db):
+        self.db = db
+
+    def table(self, name):
+        return LocalQuery(self.db, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None, **kwargs):
+        return LocalRpc(self.db, name, params)
+
+
+def get_local_database(url="local://default", latency_ms=0.0, jitter_ms=0.0):
+    """Satu database per URL per proses, dipakai bersama oleh semua sesi & load test"""
+    with _DATABASES_LOCK:
+        if url not in _DATABASES:
+            _DATABASES[url] = LocalDatabase(latency_ms, jitter_ms, rpc="rpc=0" not in url.partition("?")[2].split("&"))
+        return _DATABASES[url]
+
+
+def create_client(url, key=None, options=None):
+    return LocalClient(get_local_database(url))
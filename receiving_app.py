@@ -1,22 +1,197 @@
+import time
+_T_START = time.perf_counter() # FIX V1.36: Titik awal profil cold start
 import streamlit as st
+_T_STREAMLIT = time.perf_counter()
 import pandas as pd
-from supabase import create_client
+import numpy as np
+_T_PANDAS = time.perf_counter()
 from datetime import datetime, timezone
-import time
 import io
 import json
 import logging
+import sys
+import importlib
+import importlib.util
 from postgrest.exceptions import APIError
-from openpyxl.styles import PatternFill, Font, Alignment
 import uuid
+import re
+import random
+import threading
+import asyncio
+import sqlite3
+import csv
+import difflib
+import abc
+import copy
+import contextlib
+import cProfile
+import pstats
+from collections import Counter
+import os
+import tempfile
+import httpx
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+_T_IMPORTS = time.perf_counter()
+# FIX V1.36: supabase (gotrue/realtime/storage) dan openpyxl di-import saat pertama dipakai (_lazy_import)
 
-# --- KONFIGURASI [v1.29 - Fix Operator KeyError] ---
+# --- KONFIGURASI [v1.54 - Blind Receive Multi Baris] ---
 SUPABASE_URL = st.secrets.get("SUPABASE_URL")
 SUPABASE_KEY = st.secrets.get("SUPABASE_KEY")
 RESET_PIN = "123456" 
 SESSION_KEY_CHECKER = "current_checker_name_receiving" 
 RECEIVING_TABLE = "receiving_validation" # Nama Tabel GR/PO
 OPERATORS_TABLE = "store_operators" # Nama Tabel Operator
+BLIND_GR = "BLIND-RECEIVE" # gr_number baris Blind Receive (barang tanpa dokumen)
+
+# FIX V1.30: Konfigurasi Mode Scan Kontinu
+SCAN_FLUSH_BATCH = int(st.secrets.get("SCAN_FLUSH_BATCH", 25)) # Jumlah SN di buffer sebelum otomatis disimpan
+SN_PATTERN_RULES = dict(st.secrets.get("SN_PATTERN_RULES", {})) # {SKU: regex SN} untuk routing otomatis
+SCAN_BUFFER_KEY = "continuous_scan_buffer"
+SCAN_ACTIVE_LINE_KEY = "continuous_scan_active_line"
+SCAN_SYNCED_AT_KEY = "continuous_scan_synced_at"
+SCAN_LOG_KEY = "continuous_scan_log"
+SCAN_LINE_NAMES_KEY = "continuous_scan_line_names" # item_id -> nama barang (untuk pesan gagal)
+SCAN_CONFLICTS_KEY = "continuous_scan_conflicts" # item_id -> loaded_time saat konflik (tidak di-retry sebelum muat ulang)
+
+# FIX V1.31: Aturan Validasi SN per SKU/Brand
+# Contoh secrets.toml:
+#   [SN_VALIDATION_RULES.SKU."SAM-S24-ULT"]
+#   length = 15
+#   checksum = "luhn"
+#   [SN_VALIDATION_RULES.BRAND.LOGITECH]
+#   regex = "[0-9]{4}[A-Z]{2}[0-9A-Z]{4,8}"
+SN_VALIDATION_RULES = {k: dict(v) for k, v in dict(st.secrets.get("SN_VALIDATION_RULES", {})).items()}
+# Tanpa aturan SKU/Brand: hanya trim + buang duplikat/SN yang sudah tercatat (sama seperti sebelum V1.31).
+# Cek karakter/panjang hanya dari aturan yang dikonfigurasi, SN lama yang tidak standar tetap diterima.
+DEFAULT_SN_RULE = {}
+
+# FIX V1.34: Navigasi seksi (pengganti st.tabs agar eksekusi lazy)
+CHECKER_SECTIONS = ["⚡ Pindai SN Cepat", "📦 Input Qty Non-SN", "👻 Tambah Ad Hoc", "📋 Status & Review"]
+ADMIN_SECTIONS = ["🚀 Mulai Sesi GR", "🗄️ Laporan & Arsip", "📈 Analitik Selisih", "⏱️ Produktivitas Checker", "🔗 Rekonsiliasi Blind", "⚠️ Danger Zone", "📦 Inbound Control", "👥 Manajemen Operator", "🔧 Maintenance"]
+
+# FIX V1.32: Tabel log delta qty (Non-SN) dan kumpulan SQL yang harus dijalankan di Supabase SQL Editor
+QTY_DELTAS_TABLE = "receiving_qty_deltas"
+SQL_SETUP_SCRIPTS = {}
+
+# FIX V1.35: Konfigurasi Lapisan Koneksi (pool, retry, circuit breaker)
+DB_TIMEOUT_S = float(st.secrets.get("DB_TIMEOUT_S", 15))
+DB_POOL_SIZE = int(st.secrets.get("DB_POOL_SIZE", 10))
+DB_MAX_RETRIES = int(st.secrets.get("DB_MAX_RETRIES", 3))
+DB_BACKOFF_BASE_S = 0.2
+DB_BREAKER_THRESHOLD = int(st.secrets.get("DB_BREAKER_THRESHOLD", 5)) # Gagal berturut-turut sebelum circuit terbuka
+DB_BREAKER_COOLDOWN_S = float(st.secrets.get("DB_BREAKER_COOLDOWN_S", 20))
+# FIX V1.51: Single-flight (query baca identik digabung) + batas query bersamaan per replika
+DB_SINGLE_FLIGHT = bool(st.secrets.get("DB_SINGLE_FLIGHT", True))
+DB_MAX_CONCURRENT_QUERIES = int(st.secrets.get("DB_MAX_CONCURRENT_QUERIES", DB_POOL_SIZE))
+DB_ADMISSION_TIMEOUT_S = float(st.secrets.get("DB_ADMISSION_TIMEOUT_S", 10)) # Antre lebih lama = gagal cepat "server sibuk"
+RELOAD_DEBOUNCE_S = float(st.secrets.get("RELOAD_DEBOUNCE_S", 5)) # "Muat Ulang" tidak memuat dari DB jika snapshot lebih muda dari ini
+TRANSIENT_API_CODES = {"502", "503", "504", "520", "522", "524", "PGRST000", "PGRST001", "PGRST002", "PGRST003", "57014"}
+
+# FIX V1.36: Profil cold start (disimpan per proses, ditampilkan di tab Maintenance)
+@st.cache_resource
+def get_startup_profile():
+    return {
+        "phases": {
+            "import streamlit": (_T_STREAMLIT - _T_START) * 1000,
+            "import pandas/numpy": (_T_PANDAS - _T_STREAMLIT) * 1000,
+            "import stdlib/httpx/postgrest": (_T_IMPORTS - _T_PANDAS) * 1000,
+        },
+        "imports": {},
+        "probe": None,
+    }
+
+def _lazy_import(module_name):
+    """FIX V1.36: Import modul berat saat pertama kali dibutuhkan dan catat durasinya"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    get_startup_profile()["imports"].setdefault(module_name, elapsed_ms)
+    logging.info(f"Lazy import {module_name}: {elapsed_ms:.0f} ms")
+    return module
+
+def _openpyxl_styles():
+    styles = _lazy_import("openpyxl.styles")
+    return styles.PatternFill, styles.Font, styles.Alignment
+
+# FIX V1.37: Change feed per GR (local = pub/sub in-process, supabase = Realtime, off = nonaktif)
+CHANGE_FEED_BACKEND = st.secrets.get("CHANGE_FEED_BACKEND", "local")
+LIVE_REFRESH_S = int(st.secrets.get("LIVE_REFRESH_S", 5)) # Interval cek banner perubahan live
+SNAPSHOT_LAG_MARGIN_S = 2 # Toleransi keterlambatan event realtime untuk cek konflik
+# Backend 'local' hanya melihat write proses ini: snapshot-nya dipakai hanya jika 1 replika, atau jika
+# SHARED_CACHE_URL aktif (write replika lain membuang snapshot lewat invalidasi bersama)
+SINGLE_REPLICA = bool(st.secrets.get("SINGLE_REPLICA", False))
+
+# FIX V1.38: Cache bersama antar replika (kosong = nonaktif)
+# Contoh: "redis://cache.internal:6379/0" atau "sqlite:////mnt/shared/inbound_cache.db"
+SHARED_CACHE_URL = st.secrets.get("SHARED_CACHE_URL", "")
+SHARED_CACHE_PREFIX = "inbound"
+SHARED_SNAPSHOT_TTL_S = int(st.secrets.get("SHARED_SNAPSHOT_TTL_S", 300))
+
+# FIX V1.39: Job background arsip/hapus bertahap
+JOB_CHUNK_SIZE = int(st.secrets.get("JOB_CHUNK_SIZE", 1000)) # Baris per chunk (di bawah batas statement timeout PostgREST)
+JOBS_TABLE = "receiving_jobs" # State job (resume tetap bisa setelah restart/deploy)
+JOB_HISTORY_LIMIT = 20 # Job terakhir yang dimuat saat proses start
+JOB_STALE_S = 120 # Job RUNNING tanpa progress selama ini dianggap terputus (prosesnya mati)
+
+# FIX V1.40: Multi-site. Kosong = mode satu toko (kolom site_code tidak dipakai)
+SITE_CODES = [str(x) for x in st.secrets.get("SITE_CODES", [])]
+SESSION_KEY_SITE = "current_site_code_receiving"
+
+# FIX V1.41: Ekspor streaming (CSV/Parquet) multi-GR
+EXPORT_PAGE_SIZE = int(st.secrets.get("EXPORT_PAGE_SIZE", 1000)) # Baris DB per halaman (batas max-rows PostgREST)
+EXPORT_STORAGE_BUCKET = st.secrets.get("EXPORT_STORAGE_BUCKET", "") # Opsional: file besar diunggah ke Storage, bukan lewat memori app
+
+# FIX V1.44: Profiler per rerun (opt-in dari Maintenance)
+PROFILER_SAMPLE_INTERVAL_S = float(st.secrets.get("PROFILER_SAMPLE_INTERVAL_S", 0.005))
+PROFILER_TARGETS = {"Checker (page_checker)": "page_checker", "Admin (page_admin)": "page_admin"}
+
+# FIX V1.45: Tabel paginasi server-side
+TABLE_PAGE_SIZES = [25, 50, 100]
+
+# FIX V1.46: Detail SN di Status & Review dimuat saat dibuka
+SN_DETAIL_PAGE_SIZE = 100
+SN_DETAIL_OPEN_KEY = "status_sn_detail_open"
+
+# FIX V1.47: Event log append-only + snapshot kompaksi
+EVENTS_TABLE = "receiving_events"
+LINE_SNAPSHOTS_TABLE = "receiving_line_snapshots"
+EVENT_FLUSH_S = float(st.secrets.get("EVENT_FLUSH_S", 2)) # Interval batch insert event
+EVENT_BATCH_SIZE = int(st.secrets.get("EVENT_BATCH_SIZE", 200))
+EVENT_BUFFER_MAX = int(st.secrets.get("EVENT_BUFFER_MAX", 20000)) # Batas buffer saat DB tidak tersedia
+EVENT_COMPACT_INTERVAL_S = float(st.secrets.get("EVENT_COMPACT_INTERVAL_S", 900))
+EVENT_COMPACT_LAG_S = float(st.secrets.get("EVENT_COMPACT_LAG_S", 300)) # Snapshot hanya s/d now - lag (event replika lain bisa masih di buffer)
+
+# FIX V1.48: Upload banyak file GR (parsing di process pool, insert lewat writer bersama)
+UPLOAD_PARSE_WORKERS = int(st.secrets.get("UPLOAD_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+UPLOAD_WRITER_CONCURRENCY = int(st.secrets.get("UPLOAD_WRITER_CONCURRENCY", 3)) # Insert GR paralel ke DB (semua sesi)
+UPLOAD_BATCH_KEY = "multi_gr_upload"
+
+# FIX V1.49: Stale-while-revalidate snapshot GR aktif, daftar sesi & operator
+SWR_ENABLED = bool(st.secrets.get("SWR_ENABLED", True))
+SWR_STALENESS_BUDGET_S = float(st.secrets.get("SWR_STALENESS_BUDGET_S", 30)) # Umur maks. data yang disajikan tanpa menunggu DB
+SWR_MIN_INTERVAL_S = float(st.secrets.get("SWR_MIN_INTERVAL_S", 3)) # Interval refresh GR yang sedang ramai ditulis
+SWR_MAX_INTERVAL_S = float(st.secrets.get("SWR_MAX_INTERVAL_S", 15)) # Interval refresh GR yang sepi (dibatasi setengah budget)
+SWR_IDLE_EVICT_S = float(st.secrets.get("SWR_IDLE_EVICT_S", 600)) # Entri yang tidak dibaca selama ini dibuang (GR aktif juga)
+
+# FIX V1.50: Fetch awal halaman dijalankan paralel
+PAGE_FETCH_WORKERS = int(st.secrets.get("PAGE_FETCH_WORKERS", 16)) # Pool bersama semua sesi
+PAGE_FETCH_TIMEOUT_S = float(st.secrets.get("PAGE_FETCH_TIMEOUT_S", 8)) # Default per fetch; lewat batas = jalur sekuensial lama
+
+# FIX V1.52: Agregat analitik selisih (diperbarui saat GR diarsip)
+ANALYTICS_GR_TABLE = "receiving_agg_gr"
+ANALYTICS_SKU_TABLE = "receiving_agg_sku_month"
+ANALYTICS_BRAND_TABLE = "receiving_agg_brand_month"
+ANALYTICS_FALLBACK_MAX_ROWS = int(st.secrets.get("ANALYTICS_FALLBACK_MAX_ROWS", 5000)) # Tanpa RPC: batas baris agregat yang diambil
+
+# FIX V1.53: Metrik throughput checker (event timing per simpan/scan, di-batch di background)
+CHECKER_METRICS_TABLE = "receiving_checker_metrics"
+CHECKER_METRICS_HOURLY_TABLE = "receiving_checker_metrics_hourly"
+PRODUCTIVITY_MAX_ROWS = int(st.secrets.get("PRODUCTIVITY_MAX_ROWS", 20000)) # Batas baris rollup/raw yang dibaca dashboard
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO)
@@ -27,33 +202,400 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     st.markdown("**(Pastikan `SUPABASE_KEY` adalah SERVICE ROLE KEY/MASTER KEY untuk bypass RLS)**")
     st.stop()
 
+# --- FIX V1.35: LAPISAN KONEKSI TAHAN GANGGUAN ---
+
+class DatabaseUnavailableError(APIError):
+    """Dilempar saat circuit breaker terbuka (database dianggap down, gagal cepat)"""
+    def __init__(self, retry_in):
+        super().__init__({
+            "message": f"Database sedang tidak tersedia. Coba lagi dalam {retry_in:.0f} detik.",
+            "code": "CIRCUIT_OPEN", "hint": None, "details": None
+        })
+
+class CircuitBreaker:
+    """Circuit breaker sederhana: CLOSED -> OPEN (gagal cepat) -> HALF_OPEN (1 percobaan) -> CLOSED"""
+
+    def __init__(self, threshold, cooldown_s):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self.state = "CLOSED"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_latency_ms = None
+        self.last_error = None
+        self._probing = False # HALF_OPEN: hanya 1 panggilan probe yang boleh berjalan
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Return True jika panggilan ini adalah probe HALF_OPEN (wajib diakhiri record_* atau release_probe)"""
+        with self._lock:
+            if self.state == "OPEN":
+                remaining = self.cooldown_s - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    raise DatabaseUnavailableError(remaining)
+                self.state = "HALF_OPEN"
+            if self.state == "HALF_OPEN":
+                if self._probing:
+                    raise DatabaseUnavailableError(1) # Probe lain sedang berjalan: gagal cepat
+                self._probing = True
+                return True
+            return False
+
+    def release_probe(self):
+        """Probe selesai tanpa hasil yang menentukan (mis. error non-transient): pemanggil berikutnya jadi probe"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self, latency_ms):
+        with self._lock:
+            self._probing = False
+            self.state = "CLOSED"
+            self.failures = 0
+            self.last_latency_ms = latency_ms
+
+    def record_failure(self, error):
+        with self._lock:
+            self._probing = False
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == "HALF_OPEN" or self.failures >= self.threshold:
+                if self.state != "OPEN":
+                    logging.error(f"Circuit breaker OPEN setelah {self.failures} kegagalan: {error}")
+                self.state = "OPEN"
+                self.opened_at = time.monotonic()
+
+@st.cache_resource
+def get_circuit_breaker():
+    return CircuitBreaker(DB_BREAKER_THRESHOLD, DB_BREAKER_COOLDOWN_S)
+
+# --- FIX V1.51: SINGLE-FLIGHT & ADMISSION CONTROL ---
+
+class DatabaseBusyError(APIError):
+    """Dilempar saat antrean admission penuh terlalu lama (replika kelebihan beban, gagal cepat)"""
+    def __init__(self, waited_s):
+        super().__init__({
+            "message": f"Server sedang sibuk (antre {waited_s:.0f} detik). Coba lagi sebentar.",
+            "code": "ADMISSION_TIMEOUT", "hint": None, "details": None
+        })
+
+class QueryGate:
+    """Per replika: batas query bersamaan ke backend + penggabungan query baca identik yang sedang berjalan"""
+
+    def __init__(self, max_concurrent):
+        self._slots = threading.BoundedSemaphore(max(max_concurrent, 1))
+        self._lock = threading.Lock()
+        self._inflight = {} # signature -> {"done": Event, "result", "error", "waiters"}
+        self.stats = {"executed": 0, "coalesced": 0, "rejected": 0, "active": 0, "peak_active": 0}
+
+    def admit(self, func):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=DB_ADMISSION_TIMEOUT_S):
+            self.stats["rejected"] += 1
+            raise DatabaseBusyError(time.monotonic() - start)
+        with self._lock:
+            self.stats["active"] += 1
+            self.stats["peak_active"] = max(self.stats["peak_active"], self.stats["active"])
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self.stats["active"] -= 1
+                self.stats["executed"] += 1
+            self._slots.release()
+
+    def single_flight(self, signature, func):
+        """
+        Pemanggil pertama (leader) mengeksekusi; pemanggil lain dengan signature sama menunggu dan memakai hasilnya.
+        Return (hasil, waktu mulai baca leader): follower mendapat data per waktu leader mulai, bukan per waktu ia bergabung.
+        """
+        with self._lock:
+            call = self._inflight.get(signature)
+            leader = call is None
+            if leader:
+                call = self._inflight[signature] = {"done": threading.Event(), "result": None, "error": None, "waiters": 0,
+                                                    "started_at": datetime.now(timezone.utc)}
+            else:
+                call["waiters"] += 1
+                self.stats["coalesced"] += 1
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return _copy_query_result(call["result"]), call["started_at"]
+        try:
+            call["result"] = func()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(signature, None)
+            call["done"].set()
+        # Ada follower: leader juga memakai salinan agar hasil asli tidak berubah saat follower menyalinnya
+        return (_copy_query_result(call["result"]) if call["waiters"] else call["result"]), call["started_at"]
+
+@st.cache_resource
+def get_query_gate():
+    return QueryGate(DB_MAX_CONCURRENT_QUERIES)
+
+def _query_signature(query):
+    """
+    Key single-flight query baca: method + path + params (tabel, filter, kolom, order, limit) + header (count/range).
+    None = tidak digabung (write, RPC, atau builder yang tidak dikenali).
+    """
+    local_signature = getattr(query, "signature", None) # local_backend (load test)
+    if callable(local_signature):
+        return local_signature()
+    method, path, params = getattr(query, "http_method", None), getattr(query, "path", None), getattr(query, "params", None)
+    if str(method).upper() not in ("GET", "HEAD") or path is None:
+        return None
+    headers = getattr(query, "headers", None) or {}
+    return (str(method).upper(), str(path), str(params), tuple(sorted((str(k).lower(), str(v)) for k, v in dict(headers).items())))
+
+def _copy_query_result(result):
+    """Follower mendapat salinan baris (data hasil leader bisa dimodifikasi pemanggilnya)"""
+    data = getattr(result, "data", None)
+    if not isinstance(data, list):
+        return result
+    rows = [{k: (list(v) if isinstance(v, list) else v) for k, v in r.items()} if isinstance(r, dict) else r for r in data]
+    clone = copy.copy(result)
+    try:
+        clone.data = rows
+    except Exception:
+        clone = copy.deepcopy(result)
+    return clone
+
+def _is_transient_error(error, idempotent):
+    """Error yang layak di-retry. Request non-idempotent hanya di-retry jika pasti belum terkirim."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    if not idempotent:
+        return False
+    if isinstance(error, (httpx.TransportError, httpx.TimeoutException)):
+        return True
+    if isinstance(error, APIError) and not isinstance(error, DatabaseUnavailableError):
+        return str(getattr(error, 'code', '')) in TRANSIENT_API_CODES
+    return False
+
+def db_execute(query, idempotent=True, retries=None):
+    """
+    FIX V1.35: Eksekusi query PostgREST dengan retry (backoff + jitter) dan circuit breaker.
+    Query baca/update absolut = idempotent. Insert/RPC delta = idempotent=False.
+    """
+    # FIX V1.51: Query baca identik yang sedang berjalan (mis. reload storm satu GR) digabung jadi 1 panggilan
+    signature = _query_signature(query) if idempotent and DB_SINGLE_FLIGHT else None
+    if signature is not None:
+        result, started_at = get_query_gate().single_flight(signature, lambda: _db_execute_with_retry(query, idempotent, retries))
+        _note_read_start(started_at)
+        return result
+    _note_read_start(datetime.now(timezone.utc))
+    return _db_execute_with_retry(query, idempotent, retries)
+
+_read_clock = threading.local()
+
+@contextlib.contextmanager
+def read_clock():
+    """
+    Kumpulkan waktu mulai baca DB dari semua db_execute di blok ini (thread ini). Hasil single-flight memakai
+    waktu mulai leader. loaded_time = min(waktu) agar cek konflik tidak melewatkan tulisan sebelum data dibaca.
+    """
+    outer = getattr(_read_clock, "times", None)
+    _read_clock.times = times = []
+    try:
+        yield times
+    finally:
+        _read_clock.times = outer
+        if outer is not None:
+            outer.extend(times)
+
+def _note_read_start(started_at):
+    times = getattr(_read_clock, "times", None)
+    if times is not None:
+        times.append(started_at)
+
+def _db_execute_with_retry(query, idempotent, retries):
+    breaker = get_circuit_breaker()
+    gate = get_query_gate()
+    retries = DB_MAX_RETRIES if retries is None else retries
+
+    for attempt in range(retries + 1):
+        probe = breaker.before_call()
+        start = time.perf_counter()
+        try:
+            result = gate.admit(query.execute) # FIX V1.51: slot dipegang hanya selama query, bukan saat backoff
+        except Exception as e:
+            if isinstance(e, DatabaseBusyError):
+                if probe:
+                    breaker.release_probe()
+                raise # Beban lokal, bukan kegagalan database: tidak di-retry & tidak membuka circuit
+            transient = _is_transient_error(e, idempotent)
+            if transient or isinstance(e, httpx.TransportError):
+                breaker.record_failure(e)
+            elif probe:
+                breaker.release_probe()
+            if not transient or attempt >= retries:
+                raise
+            # Full jitter: tidur acak 0..(base * 2^attempt)
+            delay = random.uniform(0, DB_BACKOFF_BASE_S * (2 ** attempt))
+            logging.warning(f"Query gagal sementara ({e}), retry {attempt + 1}/{retries} dalam {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        breaker.record_success((time.perf_counter() - start) * 1000)
+        return result
+
+def _build_client_options():
+    """Client HTTP persisten (keep-alive) dipakai ulang oleh semua query PostgREST"""
+    ClientOptions = _lazy_import("supabase").ClientOptions
+    http_client = httpx.Client(
+        timeout=DB_TIMEOUT_S,
+        limits=httpx.Limits(max_connections=DB_POOL_SIZE * 2, max_keepalive_connections=DB_POOL_SIZE, keepalive_expiry=120)
+    )
+    try:
+        return ClientOptions(postgrest_client_timeout=DB_TIMEOUT_S, httpx_client=http_client)
+    except TypeError:
+        # Versi supabase lama: belum bisa inject httpx client, pool default dari postgrest tetap keep-alive
+        http_client.close()
+        return ClientOptions(postgrest_client_timeout=DB_TIMEOUT_S)
+
+def _probe_connection(client, breaker, profile):
+    """FIX V1.36: Probe koneksi di background thread agar tidak memblokir render pertama"""
+    start = time.perf_counter()
+    try:
+        client.table(RECEIVING_TABLE).select("id").limit(0).execute()
+        latency_ms = (time.perf_counter() - start) * 1000
+        breaker.record_success(latency_ms)
+        profile["probe"] = ("OK", latency_ms)
+    except Exception as e:
+        logging.error(f"Failed to connect to Supabase: {e}")
+        breaker.record_failure(e)
+        profile["probe"] = ("GAGAL", str(e))
+
 # Memaksa Streamlit me-rehash koneksi dengan Supabase
 @st.cache_resource(hash_funcs={type(st.secrets): lambda x: (x.get("SUPABASE_URL"), x.get("SUPABASE_KEY"))})
 def init_connection():
     try:
         logging.info("Attempting to connect to Supabase using Master Key method...")
-        client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        # Test connection by running a simple query
-        client.table(RECEIVING_TABLE).select("id").limit(0).execute()
+        start = time.perf_counter()
+        if str(SUPABASE_URL or "").startswith("local://"):
+            # FIX V1.43: Backend lokal in-memory untuk load test (lihat load_test.py)
+            client = _lazy_import("local_backend").create_client(SUPABASE_URL)
+        else:
+            client = _lazy_import("supabase").create_client(SUPABASE_URL, SUPABASE_KEY, options=_build_client_options())
+        profile = get_startup_profile()
+        profile["phases"]["create_client"] = (time.perf_counter() - start) * 1000
+        # FIX V1.36: Test connection dijalankan async, hasilnya tampil di indikator sidebar
+        threading.Thread(
+            target=_probe_connection, args=(client, get_circuit_breaker(), profile), daemon=True, name="db-probe"
+        ).start()
         return client
     except Exception as e:
         logging.error(f"Failed to connect to Supabase: {e}")
         st.error("❌ KONEKSI DATABASE GAGAL. Pastikan URL dan Kunci Supabase Anda (Service Role Key) benar.")
         st.stop()
 
+def render_db_health():
+    """FIX V1.35: Indikator kesehatan koneksi di sidebar"""
+    breaker = get_circuit_breaker()
+    probe = get_startup_profile()["probe"]
+    if probe and probe[0] == "GAGAL" and breaker.last_latency_ms is None:
+        st.sidebar.error("❌ KONEKSI DATABASE GAGAL. Pastikan URL dan Kunci Supabase Anda (Service Role Key) benar.")
+    elif breaker.state == "OPEN":
+        remaining = max(breaker.cooldown_s - (time.monotonic() - breaker.opened_at), 0)
+        st.sidebar.error(f"🔴 Database tidak tersedia (coba lagi {remaining:.0f}s)")
+    elif breaker.state == "HALF_OPEN" or breaker.failures > 0:
+        st.sidebar.warning(f"🟡 Koneksi tidak stabil ({breaker.failures} gagal)")
+    else:
+        latency = f"{breaker.last_latency_ms:.0f} ms" if breaker.last_latency_ms is not None else "-"
+        st.sidebar.caption(f"🟢 Database OK · {latency}")
+    # FIX V1.51: Beban query replika ini
+    gate_stats = get_query_gate().stats
+    if gate_stats["coalesced"] or gate_stats["rejected"]:
+        st.sidebar.caption(f"Query aktif {gate_stats['active']}/{DB_MAX_CONCURRENT_QUERIES} · digabung {gate_stats['coalesced']} · ditolak {gate_stats['rejected']}")
+
 supabase = init_connection()
 
+# FIX V1.30: st.fragment hanya ada di Streamlit baru, fallback ke rerun penuh
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+def _fragment_every(seconds):
+    """FIX V1.37: Fragment yang rerun otomatis periodik (tanpa fragment: render sekali per rerun)"""
+    if getattr(st, "fragment", None) is not None:
+        return st.fragment(run_every=seconds)
+    return lambda func: func
+
+# --- FIX V1.40: DIMENSI SITE / GUDANG ---
+
+SQL_SETUP_SCRIPTS["V1.40 - Multi-Site"] = f"""
+alter table {RECEIVING_TABLE} add column if not exists site_code text not null default '{SITE_CODES[0] if SITE_CODES else 'PUSAT'}';
+alter table {OPERATORS_TABLE} add column if not exists site_code text not null default '{SITE_CODES[0] if SITE_CODES else 'PUSAT'}';
+
+-- Semua query checker diawali site_code, sehingga biaya query tetap datar saat toko bertambah
+create index if not exists {RECEIVING_TABLE}_site_active_gr_idx on {RECEIVING_TABLE} (site_code, is_active, gr_number);
+create index if not exists {RECEIVING_TABLE}_site_gr_nama_idx on {RECEIVING_TABLE} (site_code, gr_number, nama_barang);
+create index if not exists {OPERATORS_TABLE}_site_active_idx on {OPERATORS_TABLE} (site_code, is_active, operator_name);
+
+-- OPSIONAL (jutaan baris): partisi list per site. Jalankan saat maintenance window.
+-- create table {RECEIVING_TABLE}_part (like {RECEIVING_TABLE} including defaults) partition by list (site_code);
+-- alter table {RECEIVING_TABLE}_part add primary key (site_code, id);
+""" + "".join(
+    f"-- create table {RECEIVING_TABLE}_{code.lower()} partition of {RECEIVING_TABLE}_part for values in ('{code}');\n"
+    for code in SITE_CODES
+) + f"""-- insert into {RECEIVING_TABLE}_part select * from {RECEIVING_TABLE};
+-- alter table {RECEIVING_TABLE} rename to {RECEIVING_TABLE}_old;
+-- alter table {RECEIVING_TABLE}_part rename to {RECEIVING_TABLE};
+"""
+
+def get_current_site():
+    """Site aktif sesi ini. None = mode satu toko."""
+    if not SITE_CODES:
+        return None
+    site = st.session_state.get(SESSION_KEY_SITE)
+    return site if site in SITE_CODES else SITE_CODES[0]
+
+def _site_filter(query, site_code=None):
+    """Tambahkan filter site_code (hanya di mode multi-site)"""
+    site_code = site_code or get_current_site()
+    return query.eq("site_code", site_code) if site_code else query
+
+def _with_site(payload, site_code=None):
+    """Tambahkan site_code ke payload insert (hanya di mode multi-site)"""
+    site_code = site_code or get_current_site()
+    return dict(payload, site_code=site_code) if site_code else payload
+
+def gr_key(gr_number, site_code=None):
+    """Key snapshot/cache per GR. Nomor GR bisa sama di dua toko, jadi diberi prefix site."""
+    site_code = site_code or get_current_site()
+    return f"{site_code}::{gr_number}" if site_code else gr_number
+
+def render_site_selector():
+    """Pilihan site di sidebar. Bisa dikunci per perangkat lewat URL ?site=KODE."""
+    if not SITE_CODES:
+        return
+    if SESSION_KEY_SITE not in st.session_state:
+        site_param = st.query_params.get("site")
+        st.session_state[SESSION_KEY_SITE] = site_param if site_param in SITE_CODES else SITE_CODES[0]
+
+    site = st.sidebar.selectbox("🏬 Site/Gudang", SITE_CODES, key="site_selector", index=SITE_CODES.index(get_current_site()))
+    if site != st.session_state[SESSION_KEY_SITE]:
+        st.session_state[SESSION_KEY_SITE] = site
+        # Ganti toko = operator dan GR toko lama tidak berlaku
+        st.session_state[SESSION_KEY_CHECKER] = "-- Pilih Petugas --"
+        st.session_state.pop('gr_session_selector', None)
+        st.session_state.pop('current_df', None)
+        st.rerun()
+
 # --- FUNGSI BARU: MANAJEMEN OPERATOR DARI DB ---
 # FIX V1.29: Memastikan DF yang dikembalikan memiliki kolom yang benar
-@st.cache_data(ttl=60)
-def get_all_operators():
-    """Mengambil SEMUA Operator aktif secara global"""
-    query = supabase.table(OPERATORS_TABLE).select("operator_name", "id", "is_active").eq("is_active", True).order("operator_name")
+# FIX V1.38: Tanpa st.cache_data: cache L1 = refresher SWR, yang ikut diinvalidasi replika lain (cache_data tidak)
+def get_all_operators(site_code=None):
+    """Mengambil SEMUA Operator aktif (FIX V1.40: per site jika multi-site)"""
     expected_cols = ["operator_name", "id", "is_active"]
+    site_code = site_code or get_current_site() # Loader SWR bisa dijalankan ulang oleh thread refresher tanpa sesi
     
     try:
-        res = query.execute()
-        df = pd.DataFrame(res.data)
+        # FIX V1.49: Disajikan dari refresher SWR (L2 lintas replika di dalam loader)
+        records, _, _ = swr_get(f"operators:{site_code or '-'}", lambda: _load_operators(site_code))
+        df = pd.DataFrame(records)
         
         if df.empty:
             return pd.DataFrame(columns=expected_cols)
@@ -64,97 +606,92 @@ def get_all_operators():
         # Return empty DF with expected columns structure on error
         return pd.DataFrame(columns=expected_cols)
 
+def _load_operators(site_code=None):
+    query = _site_filter(supabase.table(OPERATORS_TABLE).select("operator_name", "id", "is_active").eq("is_active", True), site_code).order("operator_name")
+    # FIX V1.38: L2 cache lintas replika
+    return shared_cache_get_or_load(f"operators:{site_code or '-'}", "active", lambda: db_execute(query).data, ttl=60)
+
 # --- FUNGSI HELPER WAKTU & KONVERSI ---
 def parse_supabase_timestamp(timestamp_str):
     """Mengubah string timestamp Supabase menjadi objek datetime yang aman"""
     try:
         if timestamp_str and timestamp_str.endswith('Z'):
              timestamp_str = timestamp_str[:-1] + '+00:00'
-        return datetime.fromisoformat(timestamp_str) if timestamp_str else datetime(1970, 1, 1, tzinfo=timezone.utc)
+        parsed = datetime.fromisoformat(timestamp_str) if timestamp_str else datetime(1970, 1, 1, tzinfo=timezone.utc)
+        # Timestamp tanpa zona (utcnow().isoformat()) dianggap UTC agar bisa dibandingkan dengan loaded_time
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
     except Exception:
         return datetime(1970, 1, 1, tzinfo=timezone.utc)
 
-def convert_df_to_excel(df, sheet_name='Data_Receiving'):
-    """Mengubah DataFrame menjadi file Excel dengan Header Cantik"""
-    output = io.BytesIO()
-    
-    # --- START FIX V1.26: Konversi 1 SKU per baris menjadi 1 SN per baris ---
-    
-    df_sn = df[df['kategori_barang'] == 'SN'].copy()
-    df_non_sn = df[df['kategori_barang'] == 'NON-SN'].copy()
-    
+REPORT_COLS_ORDER = [
+    'gr_number', 'kategori_barang', 'sku', 'nama_barang', 'qty_po', 'Qty Fisik Unit', 
+    'Serial Number', 'jenis', 'is_inbound', 'keterangan', 'updated_by', 'updated_at'
+]
+
+# Rename untuk header laporan yang lebih baik
+REPORT_COLUMN_MAPPING = {
+    'gr_number': 'Dokumen GR/PO',
+    'kategori_barang': 'Tipe',
+    'sku': 'SKU',
+    'nama_barang': 'BRAND',
+    'qty_po': 'Qty PO',
+    'Serial Number': 'Serial Number/SN',
+    'jenis': 'Alokasi',
+    'is_inbound': 'Status Inbound',
+    'keterangan': 'Keterangan',
+    'updated_by': 'Checker/Admin',
+    'updated_at': 'Waktu Update'
+}
+
+def build_report_frame(df):
+    """FIX V1.26: 1 SKU per baris -> 1 SN per baris. FIX V1.41: dipakai bersama Excel & ekspor streaming (vektorisasi)."""
+    if df.empty:
+        return pd.DataFrame(columns=[REPORT_COLUMN_MAPPING.get(c, c) for c in REPORT_COLS_ORDER])
+
+    df = df.copy()
+    if 'updated_at' not in df.columns: df['updated_at'] = None
+
     # 1. Proses Data SN (Unpivot)
-    rows_list = []
-    
-    for index, row in df_sn.iterrows():
-        sn_list = row.get('sn_list', [])
-        
-        # Jika Qty PO > 0 tetapi SN belum tercatat, masukkan satu baris placeholder
-        if not sn_list and row['qty_po'] > 0:
-             # Placeholder untuk item yang SHORT/Belum Dicek
-             new_row = row.drop('sn_list').to_dict()
-             new_row['Serial Number'] = 'BELUM DICATAT/SHORT'
-             new_row['Qty Fisik Unit'] = 0
-             rows_list.append(new_row)
-        
-        # Masukkan setiap SN sebagai baris baru
-        for sn in sn_list:
-            new_row = row.drop('sn_list').to_dict()
-            new_row['Serial Number'] = sn
-            new_row['Qty Fisik Unit'] = 1 # Qty per unit SN selalu 1
-            rows_list.append(new_row)
-            
-    df_sn_processed = pd.DataFrame(rows_list)
-    
+    df_sn = df[df['kategori_barang'] == 'SN'].copy()
+    if not df_sn.empty:
+        has_sn = df_sn['sn_list'].apply(lambda v: isinstance(v, list) and len(v) > 0)
+        # Jika Qty PO > 0 tetapi SN belum tercatat, masukkan satu baris placeholder (SHORT/Belum Dicek)
+        df_sn = df_sn[has_sn | (df_sn['qty_po'] > 0)].copy()
+        has_sn = has_sn.loc[df_sn.index]
+        df_sn['Serial Number'] = [v if h else ['BELUM DICATAT/SHORT'] for v, h in zip(df_sn['sn_list'], has_sn)]
+        df_sn['Qty Fisik Unit'] = np.where(has_sn, 1, 0) # Qty per unit SN selalu 1
+        df_sn = df_sn.explode('Serial Number')
+
     # 2. Proses Data Non-SN (Tetap)
+    df_non_sn = df[df['kategori_barang'] == 'NON-SN'].copy()
     if not df_non_sn.empty:
         df_non_sn['Serial Number'] = 'N/A'
         df_non_sn['Qty Fisik Unit'] = df_non_sn['qty_fisik']
-        
+
     # 3. Gabungkan Semua
-    final_cols_order = [
-        'gr_number', 'kategori_barang', 'sku', 'nama_barang', 'qty_po', 'Qty Fisik Unit', 
-        'Serial Number', 'jenis', 'is_inbound', 'keterangan', 'updated_by', 'updated_at'
-    ]
-    
-    # Rename untuk header Excel yang lebih baik
-    column_mapping = {
-        'gr_number': 'Dokumen GR/PO',
-        'kategori_barang': 'Tipe',
-        'sku': 'SKU',
-        'nama_barang': 'BRAND',
-        'qty_po': 'Qty PO',
-        'Serial Number': 'Serial Number/SN',
-        'jenis': 'Alokasi',
-        'is_inbound': 'Status Inbound',
-        'keterangan': 'Keterangan',
-        'updated_by': 'Checker/Admin',
-        'updated_at': 'Waktu Update'
-    }
+    parts = [part for part in (df_sn, df_non_sn) if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=[REPORT_COLUMN_MAPPING.get(c, c) for c in REPORT_COLS_ORDER])
+    df_final = pd.concat(parts, ignore_index=True)[REPORT_COLS_ORDER].rename(columns=REPORT_COLUMN_MAPPING)
+
+    # Atur Status Inbound
+    df_final['Status Inbound'] = np.where(df_final['Status Inbound'].fillna(False).astype(bool), 'OK', 'PENDING')
+    return df_final
+
+def convert_df_to_excel(df, sheet_name='Data_Receiving'):
+    """Mengubah DataFrame menjadi file Excel dengan Header Cantik"""
+    output = io.BytesIO()
     
-    if df_sn_processed.empty:
-        df_final = df_non_sn
-    elif df_non_sn.empty:
-        df_final = df_sn_processed
-    else:
-        df_final = pd.concat([df_sn_processed, df_non_sn], ignore_index=True)
-        
+    df_final = build_report_frame(df)
     if df_final.empty:
         return output.getvalue() # return empty excel
-        
-    df_final = df_final[final_cols_order]
-    df_final = df_final.rename(columns=column_mapping)
-    
-    # Atur Status Inbound
-    df_final['Status Inbound'] = df_final['Status Inbound'].apply(lambda x: 'OK' if x else 'PENDING')
-    
-    # --- END FIX V1.26 ---
     
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
         df_final.to_excel(writer, index=False, sheet_name=sheet_name)
         worksheet = writer.sheets[sheet_name]
         
         # FIX V1.25: Gaya header yang lebih menarik
+        PatternFill, Font, Alignment = _openpyxl_styles()
         HEADER_FILL = PatternFill(start_color="0072b2", end_color="0072b2", fill_type="solid") # Darker Blue
         HEADER_FONT = Font(color="FFFFFF", bold=True, size=11)
         HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True)
@@ -172,53 +709,151 @@ def convert_df_to_excel(df, sheet_name='Data_Receiving'):
             
     return output.getvalue()
 
+# --- FIX V1.31: ENGINE VALIDASI SERIAL NUMBER (VEKTORISASI) ---
+
+SN_REJECT_REASONS = {
+    "duplikat_batch": "Duplikat di batch yang sama",
+    "sudah_tercatat": "Sudah tercatat sebelumnya",
+    "panjang": "Panjang SN tidak sesuai",
+    "format": "Format/karakter tidak sesuai",
+    "prefix": "Prefix tidak sesuai",
+    "checksum": "Checksum (Luhn/IMEI) salah",
+}
+
+def get_sn_rule(sku=None, brand=None):
+    """Memilih aturan SN: SKU lebih spesifik dari Brand, fallback ke aturan default (permisif)"""
+    sku_rules = SN_VALIDATION_RULES.get("SKU", {})
+    if sku and str(sku).strip() in sku_rules:
+        return {**DEFAULT_SN_RULE, **dict(sku_rules[str(sku).strip()])}
+
+    brand_name = str(brand or "").strip().upper()
+    for brand_key, rule in SN_VALIDATION_RULES.get("BRAND", {}).items():
+        if brand_name.startswith(brand_key.upper()):
+            return {**DEFAULT_SN_RULE, **dict(rule)}
+
+    return dict(DEFAULT_SN_RULE)
+
+def _luhn_valid(serials):
+    """Cek Luhn untuk seluruh Series sekaligus (dikelompokkan per panjang agar bisa jadi matriks digit)"""
+    result = pd.Series(False, index=serials.index)
+    # Hanya digit ASCII: \d juga cocok dengan digit Unicode (full-width/Arab-Indic) yang gagal di encode("ascii")
+    digits_only = serials[serials.str.fullmatch(r"[0-9]+").fillna(False).astype(bool)]
+    if digits_only.empty:
+        return result
+
+    for length, group in digits_only.groupby(digits_only.str.len()):
+        digits = (np.frombuffer("".join(group).encode("ascii"), dtype=np.uint8).reshape(-1, length) - 48).astype(np.int16)
+        digits = digits[:, ::-1].copy() # Mulai dari digit paling kanan
+        doubled = digits[:, 1::2] * 2
+        digits[:, 1::2] = doubled - 9 * (doubled > 9)
+        result.loc[group.index] = digits.sum(axis=1) % 10 == 0
+
+    return result
+
+def validate_serial_batch(serials, rule=None, existing=None):
+    """
+    Validasi satu batch SN dalam satu pass vektor.
+    Return dict: valid (urutan input, tanpa duplikat), rejected {alasan: [SN]}, total.
+    """
+    rule = rule or DEFAULT_SN_RULE
+    sn = pd.Series(list(serials), dtype="object").astype(str).str.strip()
+    sn = sn[sn != ""].reset_index(drop=True)
+
+    reason = pd.Series("", index=sn.index, dtype="object")
+
+    def _mark(mask, label):
+        # Alasan pertama yang ditemukan yang dipakai
+        reason[mask & (reason == "")] = label
+
+    lengths = sn.str.len()
+    if rule.get("length"):
+        _mark(lengths != int(rule["length"]), "panjang")
+    if rule.get("min_length"):
+        _mark(lengths < int(rule["min_length"]), "panjang")
+    if rule.get("max_length"):
+        _mark(lengths > int(rule["max_length"]), "panjang")
+
+    if rule.get("regex"):
+        _mark(~sn.str.fullmatch(rule["regex"]).fillna(False).astype(bool), "format")
+
+    prefixes = rule.get("prefix")
+    if prefixes:
+        prefixes = [prefixes] if isinstance(prefixes, str) else list(prefixes)
+        prefix_pattern = "(?:" + "|".join(map(re.escape, prefixes)) + ")"
+        _mark(~sn.str.match(prefix_pattern).fillna(False).astype(bool), "prefix")
+
+    if "checksum" in rule and str(rule["checksum"]).lower() == "luhn":
+        _mark(~_luhn_valid(sn), "checksum")
+
+    if existing:
+        _mark(sn.isin(set(existing)), "sudah_tercatat")
+    _mark(sn.duplicated(), "duplikat_batch")
+
+    rejected = {label: sn[reason == label].tolist() for label in SN_REJECT_REASONS if (reason == label).any()}
+    return {"valid": sn[reason == ""].tolist(), "rejected": rejected, "total": len(sn)}
+
+def format_validation_summary(result, max_examples=5):
+    """Satu ringkasan teks untuk seluruh batch (pengganti st.warning per SN)"""
+    if not result["rejected"]:
+        return ""
+    lines = [f"**{sum(len(v) for v in result['rejected'].values())} dari {result['total']} SN ditolak:**"]
+    for label, sns in result["rejected"].items():
+        examples = ", ".join(f"`{sn}`" for sn in sns[:max_examples])
+        more = f" (+{len(sns) - max_examples} lainnya)" if len(sns) > max_examples else ""
+        lines.append(f"- {SN_REJECT_REASONS[label]}: {len(sns)} → {examples}{more}")
+    return "\n".join(lines)
+
 # --- FUNGSI HELPER DATABASE ---
 
-def get_active_session_info():
+def _load_active_gr_numbers(site_code=None):
+    site_code = site_code or get_current_site() # Ditentukan di sesi pemanggil, bukan di thread refresher
+    def _load():
+        # Mengambil semua GR number yang aktif
+        res = db_execute(_site_filter(supabase.table(RECEIVING_TABLE).select("gr_number").eq("is_active", True), site_code))
+        return sorted(list(set([x['gr_number'] for x in res.data])))
+    return shared_cache_get_or_load(f"sessions:{site_code or '-'}", "active", _load, ttl=30)
+
+@st.cache_data(ttl=30)
+def _fetch_active_gr_numbers(site_code=None):
+    """FIX V1.38: Daftar GR aktif, dicache per proses (L1) dan lintas replika (L2). Error tidak dicache."""
+    # FIX V1.49: Lewat refresher SWR; refresher juga memanaskan snapshot semua GR di daftar ini
+    active_grs, _, _ = swr_get(f"sessions:{site_code or '-'}", lambda: _load_active_gr_numbers(site_code))
+    return active_grs
+
+def invalidate_session_listing(site_code=None):
+    _fetch_active_gr_numbers.clear()
+    namespace = f"sessions:{site_code or get_current_site() or '-'}"
+    get_snapshot_refresher().invalidate(namespace)
+    shared_cache_invalidate(namespace)
+
+def get_active_session_info(site_code=None):
     """Mengambil SEMUA GR number sesi aktif saat ini"""
     try:
-        # Mengambil semua GR number yang aktif
-        res = supabase.table(RECEIVING_TABLE).select("gr_number").eq("is_active", True).execute()
-        active_grs = sorted(list(set([x['gr_number'] for x in res.data])))
+        active_grs = _fetch_active_gr_numbers(site_code or get_current_site())
         return active_grs if active_grs else ["Belum Ada Sesi Aktif"]
     except Exception as e:
         logging.warning(f"Failed to get active session info: {e}")
         return ["- Error Koneksi -"]
 
-def get_data(gr_number=None, search_term=None, only_active=True):
-    """Mengambil data GR untuk dicek, berdasarkan GR number yang dipilih"""
-    query = supabase.table(RECEIVING_TABLE).select("*")
-    
-    if gr_number:
-        query = query.eq("gr_number", gr_number)
-    
-    if only_active: 
-        query = query.eq("is_active", True)
+# FIX V1.24: Explicitly define columns for empty DF to avoid KeyError later
+RECEIVING_REQUIRED_COLS = [
+    'id', 'gr_number', 'sku', 'nama_barang', 'kategori_barang', 'qty_po', 
+    'qty_fisik', 'jenis', 'sn_list', 'keterangan', 'updated_by', 'is_active', 'is_inbound'
+]
 
-    # FIX V1.23: Handle missing is_inbound column if SQL hasn't been run
-    select_fields = "*"
-    query = supabase.table(RECEIVING_TABLE).select(select_fields) # Apply previous filters
+def _deserialize_sn_list(x):
+    return json.loads(x) if isinstance(x, str) and x.startswith('[') else (x if isinstance(x, list) else [])
 
-    start_time = datetime.now(timezone.utc)
-    try:
-        response = query.order("nama_barang").execute()
-    except Exception as e:
-        st.error(f"Gagal mengambil data dari Supabase. Cek RLS: {e}")
-        return pd.DataFrame()
-        
-    df = pd.DataFrame(response.data)
+def _records_to_receiving_df(records):
+    """Normalisasi hasil query/snapshot menjadi DF dengan kolom lengkap"""
+    df = pd.DataFrame(records)
 
-    # FIX V1.24: Explicitly define columns for empty DF to avoid KeyError later
-    required_cols = [
-        'id', 'gr_number', 'sku', 'nama_barang', 'kategori_barang', 'qty_po', 
-        'qty_fisik', 'jenis', 'sn_list', 'keterangan', 'updated_by', 'is_active', 'is_inbound'
-    ]
     if df.empty:
         # Create an empty DF with necessary columns
-        df = pd.DataFrame(columns=required_cols)
+        df = pd.DataFrame(columns=RECEIVING_REQUIRED_COLS)
     else:
         # Ensure all required columns exist (for safety, especially for 'is_inbound')
-        for col in required_cols:
+        for col in RECEIVING_REQUIRED_COLS:
             if col not in df.columns:
                 df[col] = False if col in ['is_active', 'is_inbound'] else None 
         
@@ -229,7 +864,49 @@ def get_data(gr_number=None, search_term=None, only_active=True):
 
     # Deserialisasi sn_list
     if 'sn_list' in df.columns:
-        df['sn_list'] = df['sn_list'].apply(lambda x: json.loads(x) if isinstance(x, str) and x.startswith('[') else (x if isinstance(x, list) else []))
+        df['sn_list'] = df['sn_list'].apply(_deserialize_sn_list)
+
+    return df
+
+def get_data(gr_number=None, search_term=None, only_active=True, prefetched=None):
+    """Mengambil data GR untuk dicek, berdasarkan GR number yang dipilih. prefetched: hasil swr_get dari load_page_data."""
+    start_time = datetime.now(timezone.utc)
+
+    # FIX V1.37: GR yang di-subscribe change feed dibaca dari snapshot bersama (tanpa query DB)
+    snapshot = get_live_gr_snapshot(gr_number) if gr_number and only_active else None
+
+    if snapshot is not None:
+        records, start_time = snapshot
+    elif gr_number and only_active:
+        # FIX V1.49: Versi cache langsung disajikan, refresh berjalan di thread refresher
+        try:
+            records, start_time, loaded_now = prefetched or swr_get(f"gr:{gr_key(gr_number)}", _gr_rows_loader(gr_number, get_current_site()))
+        except Exception as e:
+            st.error(f"Gagal mengambil data dari Supabase. Cek RLS: {e}")
+            return pd.DataFrame()
+        if loaded_now:
+            get_change_feed_hub().store.seed(gr_key(gr_number), records, start_time)
+    else:
+        # FIX V1.23: Handle missing is_inbound column if SQL hasn't been run
+        select_fields = "*"
+        # FIX V1.37: Filter GR/is_active sebelumnya tertimpa (query dibuat ulang) sehingga seluruh tabel ikut terambil
+        query = _site_filter(supabase.table(RECEIVING_TABLE).select(select_fields)) # FIX V1.40
+
+        if gr_number:
+            query = query.eq("gr_number", gr_number)
+    
+        if only_active: 
+            query = query.eq("is_active", True)
+
+        try:
+            with read_clock() as read_starts:
+                records = db_execute(query.order("nama_barang")).data
+            start_time = min(read_starts, default=start_time) # FIX V1.51: waktu mulai baca leader single-flight
+        except Exception as e:
+            st.error(f"Gagal mengambil data dari Supabase. Cek RLS: {e}")
+            return pd.DataFrame()
+
+    df = _records_to_receiving_df(records)
 
     if not df.empty and search_term:
         df = df[df['nama_barang'].str.contains(search_term, case=False, na=False) | 
@@ -240,10 +917,21 @@ def get_data(gr_number=None, search_term=None, only_active=True):
     
     return df
 
+def _gr_rows_loader(gr_number, site_code=None):
+    """Loader baris GR aktif (site eksplisit: juga dipanggil dari thread refresher tanpa session state)"""
+    site_code = site_code or get_current_site()
+    def _load():
+        query = _site_filter(supabase.table(RECEIVING_TABLE).select("*"), site_code).eq("gr_number", gr_number).eq("is_active", True)
+        # FIX V1.38: Snapshot GR aktif dibagi antar replika lewat shared cache
+        return shared_cache_get_or_load(
+            f"gr:{gr_key(gr_number, site_code)}", "rows", lambda: db_execute(query.order("nama_barang")).data, ttl=SHARED_SNAPSHOT_TTL_S
+        )
+    return _load
+
 def get_db_updated_at(id_barang):
     """Mengambil updated_at dari DB saat ini untuk cek konflik"""
     try:
-        res = supabase.table(RECEIVING_TABLE).select("updated_at, updated_by").eq("id", id_barang).limit(1).execute()
+        res = db_execute(supabase.table(RECEIVING_TABLE).select("updated_at, updated_by").eq("id", id_barang).limit(1))
         if res.data and len(res.data) > 0:
             data = res.data[0]
             return data.get('updated_at'), data.get('updated_by')
@@ -252,170 +940,1968 @@ def get_db_updated_at(id_barang):
     except Exception:
         return datetime(1970, 1, 1, tzinfo=timezone.utc).isoformat(), "SYSTEM_ERROR"
 
-# --- FUNGSI ADMIN: PROSES DATA ---
+# --- FIX V1.37: CHANGE FEED & SNAPSHOT GR BERSAMA ---
 
-def process_and_insert(df, gr_number):
-    """Memproses DF Master GR dan menginput ke DB"""
-    
-    required_cols = ['SKU', 'Nama Barang', 'Qty PO', 'Tipe Barang']
-    if not all(col in df.columns for col in required_cols):
-        return False, f"File Excel harus memiliki kolom: {', '.join(required_cols)}"
-        
-    # === [FIX v1.4: Robust NaN Handling] ===
-    if 'Qty PO' in df.columns:
-        df['Qty PO'] = df['Qty PO'].fillna(0).astype(int)
-    
-    df['Tujuan (Stok/Display)'] = df['Tujuan (Stok/Display)'].fillna('')
-    df['Keterangan Awal'] = df['Keterangan Awal'].fillna('')
-    df['SKU'] = df['SKU'].fillna('')
-    df['Nama Barang'] = df['Nama Barang'].fillna('')
-    df['Tipe Barang'] = df['Tipe Barang'].fillna('NON-SN')
+def _as_utc(dt):
+    """Timestamp dari utcnow() tidak punya tzinfo, timestamp dari DB punya"""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
 
-    data_to_insert = []
-    
-    for _, row in df.iterrows():
-        
-        jenis_val = str(row.get('Tujuan (Stok/Display)')).strip()
-        if jenis_val == '': jenis_val = 'Stok'
-        keterangan_val = str(row.get('Keterangan Awal')).strip()
-        keterangan_val = keterangan_val if keterangan_val else None
-        tipe_barang = str(row.get('Tipe Barang')).upper()
-        is_sn_item = tipe_barang == 'SN'
+class GRSnapshotStore:
+    """Snapshot baris per GR aktif, dibagi semua sesi dalam proses ini dan diperbarui oleh change feed"""
 
-        item = {
-            "sku": str(row.get('SKU')).strip(),
-            "nama_barang": str(row.get('Nama Barang')).strip(),
-            "kategori_barang": tipe_barang,
-            "qty_po": int(row.get('Qty PO', 0)),
-            "qty_fisik": 0, "updated_by": "-", "is_active": True, "gr_number": gr_number,
-            "jenis": jenis_val,
-            "keterangan": keterangan_val, 
-            "sn_list": [] if is_sn_item else None,
-            "is_inbound": False # FIX V1.23: Semua item baru status Inbound = FALSE
-        }
-        data_to_insert.append(item)
-    
-    if not data_to_insert:
-        return False, "Tidak ada data valid untuk diinput."
-        
-    try:
-        batch_size = 500
-        for i in range(0, len(data_to_insert), batch_size):
-            supabase.table(RECEIVING_TABLE).insert(data_to_insert[i:i+batch_size]).execute()
-            
-        return True, len(data_to_insert)
-    except APIError as e:
-         return False, f"Gagal API Supabase: {e.message}. Pastikan kolom DB sudah dibuat dengan benar."
-    except Exception as e:
-         return False, f"Error saat insert data: {str(e)}"
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._grs = {}      # gr_number -> {"rows": {id: row}, "version": int, "as_of": datetime}
+        self._gr_by_id = {} # id -> gr_number (event DELETE realtime hanya membawa id)
 
-def delete_active_session():
-    """Hapus sesi aktif tanpa arsip"""
-    try:
-        supabase.table(RECEIVING_TABLE).delete().eq("is_active", True).execute()
-        return True, "Sesi aktif berhasil dihapus total."
-    except Exception as e: return False, str(e)
+    def seed(self, gr_number, records, as_of):
+        """as_of = waktu mulai baca DB yang menghasilkan records (dipakai sebagai loaded_time cek konflik)"""
+        with self._lock:
+            version = self._grs.get(gr_number, {}).get("version", 0) + 1
+            self._grs[gr_number] = {"rows": {str(r['id']): dict(r) for r in records}, "version": version, "as_of": _as_utc(as_of)}
+            for r in records:
+                self._gr_by_id[str(r['id'])] = gr_number
 
-def delete_blind_receive_item(item_id):
-    """FIX V1.22: Hapus item Blind Receive berdasarkan ID"""
-    try:
-        supabase.table(RECEIVING_TABLE).delete().eq("id", item_id).execute()
-        return True, "Item Blind Receive berhasil dihapus."
-    except Exception as e:
-        error_msg = f"API Error: {str(e)}"
-        st.error(f"❌ Gagal menghapus item. DETAIL: {error_msg}")
-        return False, error_msg
-    
-def get_master_template_excel_receiving():
-    """Template untuk upload Master GR/PO"""
-    data = {
-        'SKU': ['SAM-S24-ULT', 'VIV-CBL-01', 'LOG-MOU-05'],
-        'Nama Barang': ['Samsung Galaxy S24 Ultra 256GB', 'Vivan Kabel C to C', 'Logitech G502 Hero Mouse'],
-        'Qty PO': [10, 500, 25],
-        'Tipe Barang': ['SN', 'NON-SN', 'NON-SN'],
-        'Tujuan (Stok/Display)': ['Display', 'Stok', 'Stok'],
-        'Keterangan Awal': ['Untuk Floor Display', None, None]
-    }
-    df = pd.DataFrame(data)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Template_Master_GR')
-        worksheet = writer.sheets['Template_Master_GR']
-        
-        # FIX V1.25: Gaya header yang lebih menarik
-        HEADER_FILL = PatternFill(start_color="0072b2", end_color="0072b2", fill_type="solid") # Darker Blue
-        HEADER_FONT = Font(color="FFFFFF", bold=True, size=11)
-        HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        for cell in worksheet[1]:
-            cell.fill = HEADER_FILL
-            cell.font = HEADER_FONT
-            cell.alignment = HEADER_ALIGNMENT
-            
-        for column_cells in worksheet.columns:
-            length = max(len(str(cell.value) if cell.value else "") for cell in column_cells)
-            worksheet.column_dimensions[column_cells[0].column_letter].width = max(length + 5, 15)
-            
-    return output.getvalue()
+    def get(self, gr_number):
+        """Return (rows, version, as_of) atau None"""
+        with self._lock:
+            snap = self._grs.get(gr_number)
+            if snap is None:
+                return None
+            rows = sorted(snap["rows"].values(), key=lambda r: str(r.get('nama_barang') or ''))
+            return [dict(r) for r in rows], snap["version"], snap["as_of"]
 
+    def version(self, gr_number):
+        with self._lock:
+            return self._grs.get(gr_number, {}).get("version", 0)
 
-# --- LOGIKA CARD VIEW & UPDATE ---
+    def gr_of(self, item_id):
+        with self._lock:
+            return self._gr_by_id.get(str(item_id))
 
-def handle_update_non_sn(row, new_qty, new_jenis, nama_user, loaded_time, keterangan=""):
-    """Update QTY dan Jenis untuk barang NON-SN"""
-    id_barang = row['id']
+    def row(self, item_id):
+        """Salinan baris saat ini (None jika GR-nya tidak di-snapshot)"""
+        with self._lock:
+            snap = self._grs.get(self._gr_by_id.get(str(item_id)))
+            row = snap["rows"].get(str(item_id)) if snap else None
+            return dict(row) if row else None
+
+    def apply(self, event, lag_margin_s=0):
+        """
+        Terapkan satu event {type, gr_number, record}. Record boleh parsial (hanya kolom yang berubah).
+        as_of hanya maju sampai updated_at event yang diterapkan (dikurangi toleransi lag), tidak pernah ke "sekarang".
+        """
+        record = event.get("record") or {}
+        item_id = str(record.get('id', ''))
+        with self._lock:
+            gr_number = event.get("gr_number") or record.get('gr_number') or self._gr_by_id.get(item_id)
+            snap = self._grs.get(gr_number)
+            if snap is None or not item_id:
+                return gr_number
+
+            if event.get("type") == "DELETE" or record.get('is_active') is False:
+                snap["rows"].pop(item_id, None)
+                self._gr_by_id.pop(item_id, None)
+            elif item_id in snap["rows"]:
+                snap["rows"][item_id].update(record)
+            elif event.get("type") == "INSERT":
+                snap["rows"][item_id] = dict(record)
+                self._gr_by_id[item_id] = gr_number
+            snap["version"] += 1
+            if record.get('updated_at'):
+                event_at = _as_utc(parse_supabase_timestamp(str(record['updated_at']))) - pd.Timedelta(seconds=lag_margin_s)
+                snap["as_of"] = max(snap["as_of"], event_at)
+            return gr_number
+
+    def changed_since(self, gr_number, since, exclude_user=None):
+        """Baris yang diubah orang lain setelah `since` (untuk menandai kartu stale)"""
+        with self._lock:
+            snap = self._grs.get(gr_number)
+            rows = list(snap["rows"].values()) if snap else []
+        return [
+            r for r in rows
+            if r.get('updated_at') and _as_utc(parse_supabase_timestamp(str(r['updated_at']))) > since
+            and r.get('updated_by') != exclude_user
+        ]
+
+    def gr_numbers(self):
+        with self._lock:
+            return list(self._grs.keys())
+
+    def invalidate(self, gr_number=None):
+        with self._lock:
+            if gr_number is None:
+                self._grs.clear()
+                self._gr_by_id.clear()
+            else:
+                self._grs.pop(gr_number, None)
+
+class ChangeFeedHub:
+    """Pub/sub in-process per GR. Backend 'local' = hanya write dari proses ini (juga stand-in untuk test)."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.store = GRSnapshotStore()
+        self._lock = threading.Lock()
+        self._subscribers = {} # gr_number -> list callback(event)
+        self._live = set()     # GR yang channel realtime-nya sudah SUBSCRIBED
+        self._realtime = None
+
+    def subscribe(self, gr_number, callback=None):
+        with self._lock:
+            first = gr_number not in self._subscribers
+            callbacks = self._subscribers.setdefault(gr_number, [])
+            if callback is not None:
+                callbacks.append(callback)
+        if self.backend == "supabase" and first:
+            if self._realtime is None:
+                self._realtime = SupabaseRealtimeFeed(self)
+            self._realtime.subscribe(gr_number)
+
+    def unsubscribe(self, gr_number, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(gr_number, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def publish(self, event):
+        gr_number = self.store.apply(event, 0 if self.backend == "local" else SNAPSHOT_LAG_MARGIN_S)
+        with self._lock:
+            callbacks = list(self._subscribers.get(gr_number, []))
+        for callback in callbacks:
+            try:
+                callback(dict(event, gr_number=gr_number))
+            except Exception as e:
+                logging.warning(f"Subscriber change feed error: {e}")
+
+    def set_live(self, gr_number, is_live):
+        with self._lock:
+            (self._live.add if is_live else self._live.discard)(gr_number)
+
+    def is_live(self, gr_number):
+        if self.backend == "local":
+            # Hanya write proses ini yang terlihat: aman jika tidak ada replika lain, atau replika lain menginvalidasi lewat L2
+            return SINGLE_REPLICA or get_shared_cache() is not None
+        with self._lock:
+            return gr_number in self._live
+
+class SupabaseRealtimeFeed:
+    """Subscription Supabase Realtime (logical replication) di event loop asyncio pada thread terpisah"""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True, name="realtime-feed").start()
+
+    def subscribe(self, gr_number):
+        asyncio.run_coroutine_threadsafe(self._subscribe(gr_number), self._loop)
+
+    async def _subscribe(self, key):
+        # FIX V1.40: key = "SITE::GR" di mode multi-site, realtime hanya bisa filter 1 kolom (gr_number)
+        site_code, _, gr_number = key.rpartition("::")
+        try:
+            if self._client is None:
+                self._client = await _lazy_import("supabase").acreate_client(SUPABASE_URL, SUPABASE_KEY)
+            channel = self._client.channel(f"receiving-{key}")
+            channel.on_postgres_changes(
+                "*", schema="public", table=RECEIVING_TABLE, filter=f"gr_number=eq.{gr_number}",
+                callback=lambda payload: self._on_change(key, site_code, payload)
+            )
+            await channel.subscribe(lambda status, err=None: self.hub.set_live(key, "SUBSCRIBED" in str(status)))
+        except Exception as e:
+            logging.error(f"Gagal subscribe realtime GR {key}: {e}")
+            self.hub.set_live(key, False)
+
+    def _on_change(self, key, site_code, payload):
+        data = payload.get("data", payload)
+        event_type = data.get("type") or data.get("eventType")
+        record = data.get("record") or data.get("new") or {}
+        if event_type == "DELETE":
+            record = data.get("old_record") or data.get("old") or {}
+        if site_code and record.get('site_code') not in (None, site_code):
+            return # GR dengan nomor sama di toko lain
+        if 'sn_list' in record:
+            record['sn_list'] = _deserialize_sn_list(record['sn_list'])
+        self.hub.publish({"type": event_type, "gr_number": key, "record": record})
+
+@st.cache_resource
+def get_change_feed_hub():
+    return ChangeFeedHub(CHANGE_FEED_BACKEND)
+
+def publish_row_change(item_id, changes, gr_number=None, event_type="UPDATE", before=None):
+    """Dipanggil setelah write sukses agar snapshot & sesi lain langsung melihat perubahan"""
+    log_row_change(item_id, changes, gr_number, event_type, before) # FIX V1.47
+    record = dict(changes, id=item_id)
+    if 'sn_list' in record:
+        record['sn_list'] = _deserialize_sn_list(record['sn_list'])
+    # FIX V1.49: Tulisan sendiri langsung terlihat di cache SWR (tanpa menunggu refresh)
+    get_snapshot_refresher().apply_change(item_id, record, event_type, f"gr:{gr_key(gr_number)}" if gr_number else None)
+    if CHANGE_FEED_BACKEND == "off":
+        return
+    hub = get_change_feed_hub()
+    key = gr_key(gr_number) if gr_number else hub.store.gr_of(item_id)
+    hub.publish({"type": event_type, "gr_number": key, "record": record})
+    # FIX V1.38: Replika lain membuang snapshot GR ini dan membaca versi baru
+    if key:
+        shared_cache_invalidate(f"gr:{key}")
+
+def invalidate_gr_snapshot(gr_number=None, site_code=None):
+    """Untuk write massal (insert sesi, arsip, hapus): snapshot dibuang dan dimuat ulang saat dibaca"""
+    store = get_change_feed_hub().store
+    site_code = site_code or get_current_site()
+    if gr_number:
+        keys = [gr_key(gr_number, site_code)]
+    else:
+        # FIX V1.40: Hapus semua sesi aktif hanya menyentuh snapshot site ini
+        keys = [k for k in store.gr_numbers() if not site_code or k.startswith(f"{site_code}::")]
+    # FIX V1.38: Invalidasi juga di shared cache + daftar sesi (write massal mengubah daftar GR aktif)
+    for key in keys:
+        shared_cache_invalidate(f"gr:{key}")
+        store.invalidate(key)
+    # FIX V1.49: Entri SWR ikut dibuang, pembaca berikutnya memuat sinkron
+    refresher = get_snapshot_refresher()
+    if gr_number:
+        refresher.invalidate(f"gr:{keys[0]}")
+    else:
+        refresher.invalidate(prefix=f"gr:{site_code}::" if site_code else "gr:")
+    invalidate_session_listing(site_code)
+
+def get_live_gr_snapshot(gr_number):
+    """Return (records, as_of) jika GR punya snapshot yang dijaga change feed, selain itu None"""
+    if CHANGE_FEED_BACKEND == "off":
+        return None
+    hub = get_change_feed_hub()
+    key = gr_key(gr_number)
+    hub.subscribe(key)
+    snapshot = hub.store.get(key)
+    if snapshot is None or not hub.is_live(key):
+        return None
+    records, _, as_of = snapshot
+    return records, as_of
+
+@_fragment_every(LIVE_REFRESH_S)
+def render_live_change_banner(gr_number, nama_user, loaded_time):
+    """Banner live: baris yang diubah checker lain sejak data Anda dimuat"""
+    changed = get_change_feed_hub().store.changed_since(gr_key(gr_number), loaded_time, exclude_user=nama_user)
+    if not changed:
+        return
+    names = ", ".join(f"{r.get('nama_barang')} ({r.get('updated_by')})" for r in changed[:5])
+    more = f" +{len(changed) - 5} lainnya" if len(changed) > 5 else ""
+    col_msg, col_btn = st.columns([4, 1])
+    col_msg.warning(f"🔔 {len(changed)} baris diubah checker lain: {names}{more}")
+    if col_btn.button("🔄 Terapkan", key="apply_live_changes"):
+        st.rerun()
+
+# --- FIX V1.38: CACHE BERSAMA ANTAR REPLIKA (REDIS / SQLITE) ---
+
+class SharedCacheBase:
+    """
+    Key berversi: {prefix}:{namespace}:v{versi}:{key}. Invalidasi = naikkan versi namespace
+    (key lama otomatis tidak terbaca & kedaluwarsa lewat TTL) lalu beri tahu replika lain.
+    """
+
+    def __init__(self, on_invalidate):
+        self.replica_id = uuid.uuid4().hex
+        self.on_invalidate = on_invalidate
+
+    def _key(self, namespace, version, key):
+        return f"{SHARED_CACHE_PREFIX}:{namespace}:v{version}:{key}"
+
+    def get_or_load(self, namespace, key, loader, ttl):
+        version = self.version(namespace)
+        cache_key = self._key(namespace, version, key)
+        try:
+            cached = self._get(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+        except Exception as e:
+            logging.warning(f"Shared cache GET gagal ({e}), langsung ke database.")
+            return loader()
+
+        value = loader()
+        try:
+            self._set(cache_key, json.dumps(value, default=str), ttl)
+        except Exception as e:
+            logging.warning(f"Shared cache SET gagal: {e}")
+        return value
+
+class RedisSharedCache(SharedCacheBase):
+    """Redis (atau server kompatibel: KeyDB/Dragonfly/Valkey) dengan pub/sub untuk invalidasi"""
+    CHANNEL = f"{SHARED_CACHE_PREFIX}:invalidate"
+
+    def __init__(self, url, on_invalidate):
+        super().__init__(on_invalidate)
+        self._redis = _lazy_import("redis").Redis.from_url(url, socket_timeout=2, health_check_interval=30)
+        self._lock = threading.Lock()
+        self._versions = {} # Memo versi lokal, diperbarui lewat pub/sub
+        self._epochs = Counter() # namespace -> jumlah invalidasi diterima (memo hasil GET yang sudah basi tidak disimpan)
+        self._resets = 0 # Naik saat pub/sub tersambung ulang (pesan selama terputus bisa hilang)
+        threading.Thread(target=self._listen, daemon=True, name="shared-cache-pubsub").start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    data = json.loads(message["data"])
+                    with self._lock:
+                        self._versions.pop(data["ns"], None)
+                        self._epochs[data["ns"]] += 1
+                    if data.get("origin") != self.replica_id:
+                        self.on_invalidate(data["ns"])
+            except Exception as e:
+                logging.warning(f"Pub/sub shared cache terputus ({e}), menyambung ulang...")
+                with self._lock:
+                    self._versions.clear()
+                    self._resets += 1
+                time.sleep(2)
+
+    def _epoch(self, namespace):
+        return self._epochs[namespace], self._resets
+
+    def _remember(self, namespace, version, epoch):
+        """Simpan memo hanya jika tidak ada invalidasi selama request ke Redis, dan versi tidak pernah turun"""
+        with self._lock:
+            if self._epoch(namespace) == epoch and version >= self._versions.get(namespace, 0):
+                self._versions[namespace] = version
+
+    def version(self, namespace):
+        with self._lock:
+            if namespace in self._versions:
+                return self._versions[namespace]
+            epoch = self._epoch(namespace)
+        version = int(self._redis.get(f"{SHARED_CACHE_PREFIX}:ver:{namespace}") or 0)
+        self._remember(namespace, version, epoch)
+        return version
+
+    def invalidate(self, namespace):
+        with self._lock:
+            epoch = self._epoch(namespace)
+        pipe = self._redis.pipeline()
+        pipe.incr(f"{SHARED_CACHE_PREFIX}:ver:{namespace}")
+        pipe.publish(self.CHANNEL, json.dumps({"ns": namespace, "origin": self.replica_id}))
+        new_version, _ = pipe.execute()
+        self._remember(namespace, int(new_version), epoch)
+
+    def _get(self, key):
+        return self._redis.get(key)
+
+    def _set(self, key, value, ttl):
+        self._redis.set(key, value, ex=ttl)
+
+class SqliteSharedCache(SharedCacheBase):
+    """File SQLite di storage bersama (satu host / volume). Invalidasi dideteksi lewat polling tabel versi."""
+    POLL_INTERVAL_S = 1.0
+
+    def __init__(self, path, on_invalidate):
+        super().__init__(on_invalidate)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("create table if not exists kv (key text primary key, value text, expires_at real)")
+        self._conn.execute("create table if not exists versions (ns text primary key, version integer, origin text)")
+        self._seen = dict(self._all_versions())
+        threading.Thread(target=self._poll, daemon=True, name="shared-cache-poll").start()
+
+    def _all_versions(self):
+        with self._lock:
+            return [(ns, (version, origin)) for ns, version, origin in self._conn.execute("select ns, version, origin from versions")]
+
+    def _poll(self):
+        while True:
+            time.sleep(self.POLL_INTERVAL_S)
+            try:
+                for ns, (version, origin) in self._all_versions():
+                    if self._seen.get(ns, (0, None))[0] != version:
+                        self._seen[ns] = (version, origin)
+                        if origin != self.replica_id:
+                            self.on_invalidate(ns)
+                with self._lock:
+                    self._conn.execute("delete from kv where expires_at < ?", (time.time(),))
+            except Exception as e:
+                logging.warning(f"Polling shared cache gagal: {e}")
+
+    def version(self, namespace):
+        with self._lock:
+            row = self._conn.execute("select version from versions where ns = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def invalidate(self, namespace):
+        with self._lock:
+            self._conn.execute(
+                "insert into versions (ns, version, origin) values (?, 1, ?) "
+                "on conflict(ns) do update set version = version + 1, origin = excluded.origin",
+                (namespace, self.replica_id)
+            )
+
+    def _get(self, key):
+        with self._lock:
+            row = self._conn.execute("select value from kv where key = ? and expires_at >= ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._conn.execute("insert or replace into kv (key, value, expires_at) values (?, ?, ?)", (key, value, time.time() + ttl))
+
+def _on_shared_invalidation(namespace):
+    """Dipanggil saat replika LAIN menginvalidasi namespace: buang cache L1 proses ini"""
+    get_snapshot_refresher().mark_due(namespace) # FIX V1.49: versi lama tetap disajikan sampai refresh selesai (juga operator)
+    if namespace.startswith("sessions"):
+        _fetch_active_gr_numbers.clear()
+    elif namespace.startswith("gr:"):
+        get_change_feed_hub().store.invalidate(namespace[3:])
+
+@st.cache_resource
+def get_shared_cache():
+    if not SHARED_CACHE_URL:
+        return None
+    try:
+        if SHARED_CACHE_URL.startswith(("redis://", "rediss://")):
+            return RedisSharedCache(SHARED_CACHE_URL, _on_shared_invalidation)
+        if SHARED_CACHE_URL.startswith("sqlite:///"):
+            return SqliteSharedCache(SHARED_CACHE_URL[len("sqlite:///"):], _on_shared_invalidation)
+        logging.error(f"SHARED_CACHE_URL tidak dikenali: {SHARED_CACHE_URL}")
+    except Exception as e:
+        logging.error(f"Shared cache tidak tersedia, memakai cache per proses saja: {e}")
+    return None
+
+def shared_cache_get_or_load(namespace, key, loader, ttl):
+    """L2 lintas replika. Tanpa SHARED_CACHE_URL langsung memanggil loader."""
+    cache = get_shared_cache()
+    return loader() if cache is None else cache.get_or_load(namespace, key, loader, ttl)
+
+def shared_cache_invalidate(namespace):
+    cache = get_shared_cache()
+    if cache is not None:
+        try:
+            cache.invalidate(namespace)
+        except Exception as e:
+            logging.warning(f"Invalidasi shared cache '{namespace}' gagal: {e}")
+
+# --- FIX V1.49: STALE-WHILE-REVALIDATE (REFRESHER BACKGROUND) ---
+
+def _swr_fingerprint(value):
+    """Penanda murah untuk mendeteksi perubahan data (baris GR: jumlah + updated_at terbaru)"""
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return len(value), max(str(r.get('updated_at') or '') for r in value), sum(int(r.get('qty_fisik') or 0) for r in value)
+    return json.dumps(value, sort_keys=True, default=str)
+
+class SnapshotRefresher:
+    """
+    Cache per proses dengan namespace sama seperti shared cache (gr:*, sessions:*, operators:*).
+    Pembaca langsung mendapat versi cache selama umurnya <= SWR_STALENESS_BUDGET_S; satu thread
+    me-refresh entri yang jatuh tempo. Interval per entri adaptif: pendek saat ada tulisan, memanjang saat sepi.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # namespace -> dict (value, as_of, loaded_mono, loader, interval, next_due, ...)
+        self._name_by_id = {} # id baris -> namespace gr:* (untuk tulisan tanpa gr_number)
+        self._warmed = set()  # GR aktif yang sudah pernah dipanaskan (tidak dibuat ulang setelah dibuang karena idle)
+        self._wake = threading.Event()
+        self.stats = {"hits": 0, "misses": 0, "over_budget": 0, "refreshes": 0, "errors": 0}
+        # Tanpa ScriptRunContext sesi pembuat: loader membawa site sendiri (ditentukan saat loader dibuat di sesi)
+        threading.Thread(target=self._loop, daemon=True, name="swr-refresher").start()
+
+    def get(self, name, loader):
+        """Return (value, as_of, dimuat_sinkron). Miss / melewati budget = load sinkron di thread pembaca."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and "value" in entry and now - entry["loaded_mono"] <= SWR_STALENESS_BUDGET_S:
+                self.stats["hits"] += 1
+                entry["last_read"] = now
+                if now >= entry["next_due"]:
+                    self._wake.set()
+                return entry["value"], entry["as_of"], False
+            self.stats["over_budget" if entry and "value" in entry else "misses"] += 1
+        value, as_of = self._load(name, loader)
+        return value, as_of, True
+
+    def _load(self, name, loader):
+        started = time.monotonic()
+        as_of = datetime.now(timezone.utc) # Diambil sebelum query: aman untuk cek konflik
+        with read_clock() as read_starts:
+            value = loader()
+        as_of = min(read_starts, default=as_of) # FIX V1.51: hasil gabungan bisa berasal dari baca yang mulai lebih awal
+        fingerprint = _swr_fingerprint(value)
+        with self._lock:
+            entry = self._entries.setdefault(name, {"interval": SWR_MIN_INTERVAL_S, "last_write": None, "last_read": started, "refreshes": 0})
+            if entry.get("loaded_mono", 0) > started:
+                return entry["value"], entry["as_of"] # Sudah ada versi yang lebih baru
+            recent_write = entry["last_write"] is not None and started - entry["last_write"] < SWR_MAX_INTERVAL_S
+            if "value" not in entry or entry.get("fingerprint") != fingerprint or recent_write:
+                entry["interval"] = SWR_MIN_INTERVAL_S
+            else:
+                entry["interval"] = min(entry["interval"] * 2, SWR_MAX_INTERVAL_S, SWR_STALENESS_BUDGET_S / 2)
+            entry.update(value=value, as_of=as_of, loaded_mono=started, loader=loader, fingerprint=fingerprint,
+                         next_due=started + entry["interval"], refreshes=entry["refreshes"] + 1)
+            if name.startswith("gr:") and isinstance(value, list):
+                for row in value:
+                    if isinstance(row, dict) and row.get('id') is not None:
+                        self._name_by_id[str(row['id'])] = name
+        return value, as_of
+
+    def apply_change(self, item_id, record, event_type="UPDATE", name=None):
+        """Tulisan proses ini: baris di-patch (copy-on-write), INSERT memicu refresh secepatnya"""
+        now = time.monotonic()
+        with self._lock:
+            name = name or self._name_by_id.get(str(item_id))
+            entry = self._entries.get(name)
+            if not entry or "value" not in entry:
+                return
+            entry["last_write"] = now
+            rows = entry["value"]
+            if event_type == "DELETE" or record.get('is_active') is False:
+                entry["value"] = [r for r in rows if str(r.get('id')) != str(item_id)]
+            elif event_type == "INSERT":
+                entry["next_due"] = 0
+                self._wake.set()
+            else:
+                entry["value"] = [dict(r, **record) if str(r.get('id')) == str(item_id) else r for r in rows]
+
+    def mark_due(self, name):
+        """Data berubah di replika lain: versi lama tetap disajikan, refresh dijadwalkan sekarang"""
+        with self._lock:
+            for entry_name, entry in self._entries.items():
+                if entry_name == name or (name.endswith(":") and entry_name.startswith(name)):
+                    entry["next_due"] = 0
+                    entry["last_write"] = time.monotonic()
+        self._wake.set()
+
+    def invalidate(self, name=None, prefix=None):
+        with self._lock:
+            for entry_name in [n for n in self._entries if n == name or (prefix and n.startswith(prefix))]:
+                self._entries.pop(entry_name, None)
+
+    def _active_gr_names(self):
+        """Namespace gr:* untuk semua GR di daftar sesi aktif yang sedang dicache"""
+        names = set()
+        for entry_name, entry in self._entries.items():
+            if entry_name.startswith("sessions:") and isinstance(entry.get("value"), list):
+                site = entry_name[len("sessions:"):]
+                site_code = None if site == "-" else site
+                names.update((f"gr:{gr_key(gr, site_code)}", gr, site_code) for gr in entry["value"])
+        return names
+
+    def _loop(self):
+        while True:
+            self._wake.wait(1.0)
+            self._wake.clear()
+            now = time.monotonic()
+            with self._lock:
+                # Panaskan snapshot semua GR aktif sekali (yang belum pernah dibaca pun)
+                active = self._active_gr_names()
+                for name, gr_number, site_code in active:
+                    if name not in self._entries and name not in self._warmed:
+                        self._warmed.add(name)
+                        self._entries[name] = {"interval": SWR_MIN_INTERVAL_S, "last_write": None, "last_read": now,
+                                               "refreshes": 0, "next_due": 0, "loader": _gr_rows_loader(gr_number, site_code)}
+                self._warmed &= {name for name, _, _ in active}
+                # Tidak dibaca selama SWR_IDLE_EVICT_S = dibuang, juga GR aktif (dimuat sinkron lagi jika dibuka)
+                for name in [n for n, e in self._entries.items() if now - e["last_read"] > SWR_IDLE_EVICT_S]:
+                    del self._entries[name]
+                # Refresh hanya jika versi terakhir sudah dibaca: entri yang tidak dibaca tidak menambah beban DB
+                due = sorted(
+                    (e["next_due"], n, e["loader"]) for n, e in self._entries.items()
+                    if now >= e["next_due"] and ("value" not in e or e["last_read"] > e["loaded_mono"])
+                )
+            # GR yang disajikan dari snapshot change feed tidak perlu dibaca ulang
+            live = {name for _, name, _ in due if _served_by_live_feed(name)}
+            with self._lock:
+                for name in live:
+                    if name in self._entries:
+                        self._entries[name]["next_due"] = now + SWR_MAX_INTERVAL_S
+            # Refresh berurutan: paling banyak 1 query refresher per proses ke DB
+            for _, name, loader in due:
+                if name in live:
+                    continue
+                try:
+                    self._load(name, loader)
+                    self.stats["refreshes"] += 1
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logging.warning(f"Refresh SWR {name} gagal: {e}")
+                    with self._lock:
+                        if name in self._entries:
+                            self._entries[name]["next_due"] = time.monotonic() + SWR_MIN_INTERVAL_S
+
+    def age(self, name):
+        """Umur (detik) versi yang sedang disajikan, None jika belum ada"""
+        with self._lock:
+            entry = self._entries.get(name)
+            return time.monotonic() - entry["loaded_mono"] if entry and "loaded_mono" in entry else None
+
+    def describe(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {"Namespace": name, "Umur (dtk)": round(now - e["loaded_mono"], 1) if "loaded_mono" in e else None,
+                 "Interval (dtk)": e["interval"], "Refresh": e["refreshes"],
+                 "Dibaca (dtk lalu)": round(now - e["last_read"], 1)}
+                for name, e in sorted(self._entries.items())
+            ]
+
+@st.cache_resource
+def get_snapshot_refresher():
+    return SnapshotRefresher()
+
+def _served_by_live_feed(name):
+    """Namespace gr:* yang dibaca checker dari snapshot change feed (get_data tidak memakai entri SWR-nya)"""
+    if not name.startswith("gr:") or CHANGE_FEED_BACKEND == "off":
+        return False
+    hub = get_change_feed_hub()
+    key = name[len("gr:"):]
+    return hub.store.version(key) > 0 and hub.is_live(key)
+
+def swr_get(name, loader):
+    """Return (value, as_of, dimuat_sinkron). SWR_ENABLED=False: selalu langsung ke loader."""
+    if not SWR_ENABLED:
+        as_of = datetime.now(timezone.utc)
+        with read_clock() as read_starts:
+            value = loader()
+        return value, min(read_starts, default=as_of), True
+    return get_snapshot_refresher().get(name, loader)
+
+def render_swr_status():
+    """Panel refresher SWR di Maintenance"""
+    st.subheader("♻️ Refresher Snapshot (Stale-While-Revalidate)")
+    if not SWR_ENABLED:
+        st.caption("Nonaktif (SWR_ENABLED = false).")
+        return
+    refresher = get_snapshot_refresher()
+    s = refresher.stats
+    st.caption(f"Budget basi {SWR_STALENESS_BUDGET_S:.0f} dtk · Interval {SWR_MIN_INTERVAL_S:.0f}–{SWR_MAX_INTERVAL_S:.0f} dtk · "
+               f"Hit {s['hits']} · Miss {s['misses']} · Lewat budget {s['over_budget']} · Refresh {s['refreshes']} · Gagal {s['errors']}")
+    rows = refresher.describe()
+    if rows:
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+# --- FIX V1.47: EVENT LOG APPEND-ONLY & SNAPSHOT KOMPAKSI ---
+
+SQL_SETUP_SCRIPTS["V1.47 - Event Log & Snapshot"] = f"""
+-- Tanpa foreign key: riwayat tetap ada walau baris dihapus
+create table if not exists {EVENTS_TABLE} (
+    id bigserial primary key,
+    line_id uuid not null,
+    gr_number text not null,
+    site_code text,
+    event_type text not null, -- insert | qty | sn | jenis | keterangan | inbound | delete
+    payload jsonb not null,
+    operator text,
+    created_at timestamptz not null
+);
+create index if not exists {EVENTS_TABLE}_gr_idx on {EVENTS_TABLE} (gr_number, created_at);
+create index if not exists {EVENTS_TABLE}_line_idx on {EVENTS_TABLE} (line_id, created_at);
+
+-- Satu snapshot (terbaru) per baris: kompaksi meng-upsert on conflict (line_id)
+create table if not exists {LINE_SNAPSHOTS_TABLE} (
+    id bigserial primary key,
+    line_id uuid not null,
+    gr_number text not null,
+    site_code text,
+    state jsonb not null,
+    as_of timestamptz not null, -- created_at event terakhir yang sudah dilipat
+    created_at timestamptz not null default now()
+);
+-- Tabel versi lama (insert-only): sisakan snapshot terbaru per baris sebelum membuat unique index
+delete from {LINE_SNAPSHOTS_TABLE} s using {LINE_SNAPSHOTS_TABLE} t
+ where s.line_id = t.line_id and (s.as_of, s.id) < (t.as_of, t.id);
+create unique index if not exists {LINE_SNAPSHOTS_TABLE}_line_uidx on {LINE_SNAPSHOTS_TABLE} (line_id);
+create index if not exists {LINE_SNAPSHOTS_TABLE}_gr_idx on {LINE_SNAPSHOTS_TABLE} (gr_number, as_of);
+
+-- Event GR yang belum tertutup snapshot: per baris hanya setelah as_of snapshot baris itu sendiri
+create or replace function receiving_gr_events_after_snapshot(p_gr text, p_site text, p_at timestamptz)
+returns setof {EVENTS_TABLE}
+language sql stable as $$
+    select e.*
+      from {EVENTS_TABLE} e
+      left join {LINE_SNAPSHOTS_TABLE} s on s.line_id = e.line_id and s.as_of <= p_at
+     where e.gr_number = p_gr
+       and (p_site is null or e.site_code = p_site)
+       and e.created_at <= p_at
+       and (s.line_id is null or e.created_at > s.as_of)
+     order by e.created_at, e.id
+$$;
+"""
+
+EVENT_STATE_FIELDS = ['qty_fisik', 'sn_list', 'jenis', 'keterangan', 'is_inbound']
+EVENT_INSERT_FIELDS = ['sku', 'nama_barang', 'kategori_barang', 'qty_po'] # Hanya dicatat di event insert
+
+def build_line_events(before, changes, event_type="UPDATE"):
+    """
+    Turunkan event dari perubahan satu baris. Payload selalu membawa nilai akhir (qty_fisik/jenis/...)
+    sehingga replay idempoten; delta/added/removed disimpan untuk audit.
+    """
+    if event_type == "DELETE":
+        return [("delete", {})]
+    if event_type == "INSERT":
+        state = {k: changes.get(k) for k in EVENT_STATE_FIELDS + EVENT_INSERT_FIELDS if k in changes or k in EVENT_STATE_FIELDS}
+        state['sn_list'] = _deserialize_sn_list(state['sn_list'])
+        return [("insert", state)]
+
+    before = before or {}
+    events = []
+    if 'sn_list' in changes:
+        new_sn = _deserialize_sn_list(changes['sn_list'])
+        if 'sn_list' in before:
+            old_sn = _deserialize_sn_list(before['sn_list'])
+            old_set, new_set = set(old_sn), set(new_sn)
+            added = [sn for sn in new_sn if sn not in old_set]
+            removed = [sn for sn in old_sn if sn not in new_set]
+            if added or removed:
+                events.append(("sn", {"added": added, "removed": removed, "qty_fisik": len(new_sn)}))
+        else:
+            events.append(("sn", {"sn_list": new_sn, "qty_fisik": len(new_sn)}))
+    elif 'qty_fisik' in changes:
+        new_qty = int(changes['qty_fisik'] or 0)
+        old_qty = before.get('qty_fisik')
+        if old_qty is None or int(old_qty) != new_qty:
+            payload = {"qty_fisik": new_qty}
+            if old_qty is not None:
+                payload["delta"] = new_qty - int(old_qty)
+            events.append(("qty", payload))
+
+    for field in ('jenis', 'keterangan'):
+        if field in changes and (field not in before or (before.get(field) or None) != (changes[field] or None)):
+            events.append((field, {field: changes[field], "from": before.get(field)}))
+    if changes.get('is_inbound') and not before.get('is_inbound'):
+        events.append(("inbound", {"is_inbound": True}))
+    return events
+
+def fold_line_events(state, events):
+    """Terapkan event (urut created_at) ke state baris. Dipakai kompaksi & rekonstruksi point-in-time."""
+    state = dict(state)
+    sn = list(state.get('sn_list') or [])
+    for event in events:
+        payload, kind = event['payload'], event['event_type']
+        if kind == 'insert':
+            state.update(payload)
+            sn = list(payload.get('sn_list') or [])
+            state.pop('deleted', None)
+        elif kind == 'delete':
+            state['deleted'] = True
+        elif kind == 'sn':
+            if 'sn_list' in payload:
+                sn = list(payload['sn_list'])
+            else:
+                removed = set(payload.get('removed', []))
+                sn = [x for x in sn if x not in removed]
+                existing = set(sn)
+                sn += [x for x in payload.get('added', []) if x not in existing]
+            state['qty_fisik'] = payload.get('qty_fisik', len(sn))
+        elif kind == 'qty':
+            if 'qty_fisik' in payload:
+                state['qty_fisik'] = payload['qty_fisik']
+            else: # Event tanpa nilai akhir (mis. rekonsiliasi): hanya delta
+                state['qty_fisik'] = int(state.get('qty_fisik') or 0) + int(payload.get('delta', 0))
+        elif kind in ('jenis', 'keterangan'):
+            state[kind] = payload.get(kind)
+        elif kind == 'inbound':
+            state['is_inbound'] = payload.get('is_inbound', True)
+        state['updated_by'] = event.get('operator')
+        state['updated_at'] = event.get('created_at')
+    state['sn_list'] = sn
+    return state
+
+class BufferedBatchWriter(abc.ABC):
+    """Buffer in-process, di-flush sebagai batch insert oleh thread background (bukan di jalur simpan)"""
+
+    def __init__(self, thread_name):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # flush() kembali setelah batch yang sedang ditulis thread lain selesai
+        self._buffer = []
+        self._wake = threading.Event()
+        self.stats = {"written": 0, "dropped": 0, "failed_flushes": 0}
+        # Tanpa ScriptRunContext: writer dipakai semua sesi, site/GR sudah ada di tiap item (diisi saat append)
+        threading.Thread(target=self._loop, daemon=True, name=thread_name).start()
+
+    def append(self, items):
+        with self._lock:
+            self._buffer.extend(items)
+            overflow = len(self._buffer) - EVENT_BUFFER_MAX
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.stats["dropped"] += overflow
+                logging.error(f"Buffer {type(self).__name__} penuh, {overflow} item terlama dibuang.")
+            if len(self._buffer) >= EVENT_BATCH_SIZE:
+                self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def _loop(self):
+        while True:
+            self._wake.wait(EVENT_FLUSH_S)
+            self._wake.clear()
+            self.flush()
+            self._on_tick()
+
+    @abc.abstractmethod
+    def _write(self, batch):
+        """Tulis satu batch ke DB. Exception = batch dikembalikan ke buffer."""
+
+    def _on_tick(self):
+        pass
+
+    def flush(self):
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._buffer[:EVENT_BATCH_SIZE]
+                    del self._buffer[:len(batch)]
+                if not batch:
+                    return
+                try:
+                    self._write(batch)
+                    self.stats["written"] += len(batch)
+                except Exception as e:
+                    # Kembalikan ke depan buffer, dicoba lagi pada flush berikutnya
+                    logging.warning(f"Flush {type(self).__name__} gagal ({len(batch)} item): {e}")
+                    self.stats["failed_flushes"] += 1
+                    with self._lock:
+                        self._buffer[:0] = batch
+                    return
+
+class EventLogWriter(BufferedBatchWriter):
+    """Event log baris GR + kompaksi periodik GR yang punya event baru"""
+
+    def __init__(self):
+        self._touched = set() # (site_code, gr_number) yang punya event baru sejak kompaksi terakhir
+        self._last_compact = time.monotonic()
+        super().__init__("event-log-writer")
+        self.stats["snapshots"] = 0
+
+    def _on_tick(self):
+        if time.monotonic() - self._last_compact >= EVENT_COMPACT_INTERVAL_S:
+            self.compact_touched()
+
+    def _resolve_gr_numbers(self, batch):
+        """Event tanpa gr_number (GR tidak di-snapshot saat simpan) dilengkapi di sini, di luar jalur simpan"""
+        missing = list({e['line_id'] for e in batch if not e.get('gr_number')})
+        if not missing:
+            return
+        res = db_execute(supabase.table(RECEIVING_TABLE).select("id, gr_number, site_code" if SITE_CODES else "id, gr_number").in_("id", missing))
+        by_id = {str(r['id']): r for r in res.data}
+        for event in batch:
+            if not event.get('gr_number'):
+                row = by_id.get(str(event['line_id']), {})
+                event['gr_number'] = row.get('gr_number') or "?"
+                if SITE_CODES and row.get('site_code'):
+                    event['site_code'] = row['site_code']
+
+    def _write(self, batch):
+        self._resolve_gr_numbers(batch)
+        db_execute(supabase.table(EVENTS_TABLE).insert(batch), idempotent=False)
+        with self._lock:
+            self._touched.update((e.get('site_code'), e['gr_number']) for e in batch)
+
+    def compact_touched(self):
+        self._last_compact = time.monotonic()
+        with self._lock:
+            touched, self._touched = self._touched, set()
+        for site_code, gr_number in touched:
+            try:
+                self.stats["snapshots"] += compact_gr_events(gr_number, site_code)
+            except Exception as e:
+                logging.warning(f"Kompaksi event GR {gr_number} gagal: {e}")
+                with self._lock:
+                    self._touched.add((site_code, gr_number))
+
+@st.cache_resource
+def get_event_log():
+    return EventLogWriter()
+
+def log_line_events(line_id, gr_number, events, operator, site_code=None):
+    if not events:
+        return
+    now_iso = datetime.now(timezone.utc).isoformat()
+    site_code = site_code or get_current_site()
+    get_event_log().append([
+        {
+            "line_id": str(line_id), "gr_number": gr_number, "event_type": kind, "payload": payload,
+            "operator": operator, "created_at": now_iso, **({"site_code": site_code} if site_code else {})
+        }
+        for kind, payload in events
+    ])
+
+def log_row_change(item_id, changes, gr_number=None, event_type="UPDATE", before=None):
+    """Catat perubahan satu baris ke event log. before: state sebelum (default: snapshot GR di memori)."""
+    try:
+        store = get_change_feed_hub().store
+        if before is None:
+            before = store.row(item_id)
+        if not gr_number:
+            key = store.gr_of(item_id)
+            gr_number = key.rpartition("::")[2] if key else None # None = dilengkapi saat flush
+        operator = changes.get('updated_by') or (before or {}).get('updated_by')
+        log_line_events(item_id, gr_number, build_line_events(before, changes, event_type), operator)
+    except Exception as e:
+        # Audit tidak boleh menggagalkan simpan
+        logging.warning(f"Gagal mencatat event log {item_id}: {e}")
+
+def _line_base_state(row, events):
+    """
+    State awal baris GR tanpa event insert (baris sebelum V1.47): belum dicek,
+    jenis/keterangan = nilai "from" perubahan pertama, atau nilai baris saat ini jika tidak pernah diubah
+    """
+    state = {"qty_fisik": 0, "sn_list": [], "is_inbound": False}
+    for field in ('jenis', 'keterangan'):
+        first = next((e['payload'] for e in events if e['event_type'] == field), None)
+        state[field] = first.get('from') if first else row.get(field)
+    return state
+
+def _gr_events_after_snapshots(gr_number, at_iso, site_code, rows_meta, latest_snapshot):
+    """
+    Event GR s/d at_iso yang belum tertutup snapshot baris masing-masing (urut created_at, id).
+    RPC V1.47 memfilter per baris di DB; fallback membaca per chunk baris yang diurutkan menurut as_of snapshot.
+    """
+    site_code = site_code or get_current_site()
+    try:
+        return _fetch_rows_paged(lambda: supabase.rpc("receiving_gr_events_after_snapshot", {
+            "p_gr": gr_number, "p_site": site_code, "p_at": at_iso
+        }), max_rows=10**7)
+    except APIError as api_e:
+        if getattr(api_e, 'code', None) != 'PGRST202':
+            raise
+
+    def _events(build):
+        return _fetch_rows_paged(lambda: build(_site_filter(supabase.table(EVENTS_TABLE).select(
+            "id, line_id, event_type, payload, operator, created_at"), site_code).eq("gr_number", gr_number).lte(
+            "created_at", at_iso)).order("created_at").order("id"), max_rows=10**7)
+
+    unsnapshotted = sorted(set(rows_meta) - set(latest_snapshot))
+    if not latest_snapshot or len(unsnapshotted) > len(rows_meta) / 2:
+        events = _events(lambda q: q) # Sebagian besar belum di-snapshot: satu bacaan penuh lebih murah
+    else:
+        # Chunk baris ber-as_of berdekatan: batas bawah tiap chunk = as_of terkecil di chunk itu, bukan di seluruh GR
+        events = []
+        snapshotted = sorted(latest_snapshot, key=lambda line_id: latest_snapshot[line_id]['as_of'])
+        for i in range(0, len(snapshotted), 200):
+            chunk = snapshotted[i:i + 200]
+            since = latest_snapshot[chunk[0]]['as_of']
+            events += _events(lambda q: q.in_("line_id", chunk).gt("created_at", since))
+        for i in range(0, len(unsnapshotted), 200):
+            chunk = unsnapshotted[i:i + 200]
+            events += _events(lambda q: q.in_("line_id", chunk))
+    return [
+        e for e in sorted(events, key=lambda e: (e['created_at'], e['id']))
+        if str(e['line_id']) not in latest_snapshot
+        or parse_supabase_timestamp(e['created_at']) > parse_supabase_timestamp(latest_snapshot[str(e['line_id'])]['as_of'])
+    ]
+
+def reconstruct_gr_state(gr_number, at=None, site_code=None):
+    """
+    State setiap baris GR pada waktu `at` (default: sekarang) = snapshot baris (jika as_of <= at) + event setelahnya.
+    Return (DF state, dict line_id -> (state, as_of event terakhir, jumlah event dilipat)).
+    """
+    at_iso = (at or datetime.now(timezone.utc)).astimezone(timezone.utc).isoformat()
+    lines = _fetch_rows_paged(lambda: _site_filter(supabase.table(RECEIVING_TABLE).select(
+        "id, gr_number, sku, nama_barang, kategori_barang, qty_po, jenis, keterangan, created_at"
+    ), site_code).eq("gr_number", gr_number).order("id"), max_rows=10**6)
+    # Satu snapshot per baris; snapshot yang lebih baru dari `at` tidak dipakai (baris dibangun dari riwayat penuh)
+    snapshots = _fetch_rows_paged(lambda: _site_filter(supabase.table(LINE_SNAPSHOTS_TABLE).select("line_id, state, as_of"), site_code).eq(
+        "gr_number", gr_number).lte("as_of", at_iso).order("line_id"), max_rows=10**6)
+    latest_snapshot = {str(s['line_id']): s for s in snapshots}
+    rows_meta = {str(r['id']): r for r in lines}
+
+    events_by_line = {}
+    for event in _gr_events_after_snapshots(gr_number, at_iso, site_code, rows_meta, latest_snapshot):
+        events_by_line.setdefault(str(event['line_id']), []).append(event)
+
+    results = {}
+    for line_id in set(rows_meta) | set(latest_snapshot) | set(events_by_line):
+        meta = rows_meta.get(line_id, {})
+        snapshot = latest_snapshot.get(line_id)
+        line_events = events_by_line.get(line_id, [])
+        state = dict(snapshot['state']) if snapshot else _line_base_state(meta, line_events)
+        if not snapshot and not line_events and meta.get('created_at') and str(meta['created_at']) > at_iso:
+            continue # Baris belum ada pada waktu tersebut
+        state = fold_line_events(state, line_events)
+        as_of = line_events[-1]['created_at'] if line_events else (snapshot['as_of'] if snapshot else None)
+        results[line_id] = (state, as_of, len(line_events))
+
+    records = [
+        {**{k: rows_meta.get(line_id, {}).get(k) for k in ('gr_number', 'sku', 'nama_barang', 'kategori_barang', 'qty_po')},
+         "id": line_id, **state}
+        for line_id, (state, _, _) in results.items() if not state.get('deleted')
+    ]
+    return _records_to_receiving_df(records), results
+
+def compact_gr_events(gr_number, site_code=None):
+    """
+    Upsert snapshot (satu per baris) untuk baris yang punya event setelah snapshot-nya, dan untuk baris yang belum punya
+    snapshot sama sekali (termasuk yang tidak pernah diubah), agar rekonstruksi berikutnya tidak membaca riwayat penuh.
+    Hanya s/d now - EVENT_COMPACT_LAG_S: event yang masih di buffer replika lain tidak tertutup snapshot. Return jumlah snapshot.
+    """
+    at = datetime.now(timezone.utc) - pd.Timedelta(seconds=EVENT_COMPACT_LAG_S)
+    _, results = reconstruct_gr_state(gr_number, at=at, site_code=site_code)
+    snapshots = [
+        {"line_id": line_id, "gr_number": gr_number, "state": state, "as_of": as_of or at.isoformat(),
+         **({"site_code": site_code} if site_code else {})}
+        for line_id, (state, as_of, n_events) in results.items() if n_events or as_of is None
+    ]
+    for i in range(0, len(snapshots), EVENT_BATCH_SIZE):
+        db_execute(supabase.table(LINE_SNAPSHOTS_TABLE).upsert(snapshots[i:i + EVENT_BATCH_SIZE], on_conflict="line_id"))
+    return len(snapshots)
+
+def render_gr_history(gr_number):
+    """Audit log & rekonstruksi point-in-time satu GR (di Laporan)"""
+    with st.expander("🕒 Riwayat Perubahan & Rekonstruksi Point-in-Time"):
+        c_date, c_time = st.columns(2)
+        at_date = c_date.date_input("Tanggal", datetime.now().date(), key=f"history_date_{gr_number}")
+        at_time = c_time.time_input("Jam", datetime.now().time().replace(second=0, microsecond=0), key=f"history_time_{gr_number}")
+        if st.button("🔁 Rekonstruksi GR pada waktu ini", key=f"history_run_{gr_number}"):
+            at = datetime.combine(at_date, at_time).astimezone(timezone.utc)
+            try:
+                df_state, _ = reconstruct_gr_state(gr_number, at)
+                st.session_state["gr_history_result"] = (gr_number, at, df_state)
+            except Exception as e:
+                st.error(f"Gagal rekonstruksi: {e}")
+
+        result = st.session_state.get("gr_history_result")
+        if result and result[0] == gr_number:
+            _, at, df_state = result
+            st.caption(f"State {gr_number} pada {at.astimezone(None):%Y-%m-%d %H:%M} · {len(df_state)} baris · Qty fisik {int(df_state['qty_fisik'].fillna(0).sum()) if not df_state.empty else 0}")
+            render_paginated_table(
+                "gr_history_table",
+                frame_page_fetcher(df_state.assign(jumlah_sn=df_state['sn_list'].apply(len)) if not df_state.empty else df_state, ['sku', 'nama_barang']),
+                {c: c for c in ['sku', 'nama_barang', 'kategori_barang', 'qty_po', 'qty_fisik', 'jumlah_sn', 'jenis', 'is_inbound', 'updated_by', 'updated_at']},
+                ['nama_barang', 'sku', 'qty_fisik', 'updated_at']
+            )
+
+        st.markdown("##### Event Terbaru")
+        try:
+            events = db_execute(_site_filter(supabase.table(EVENTS_TABLE).select("created_at, operator, event_type, payload, line_id")).eq(
+                "gr_number", gr_number).order("created_at", desc=True).limit(100)).data
+            st.dataframe(pd.DataFrame(events), use_container_width=True, hide_index=True)
+        except Exception as e:
+            st.caption(f"Event log belum tersedia (jalankan SQL V1.47): {e}")
+
+# --- FUNGSI ADMIN: PROSES DATA ---
+
+def build_gr_rows(df, gr_number):
+    """FIX V1.48: Validasi DF Master GR dan susun baris insert. Return (rows, pesan error)."""
     
-    original_row_match = st.session_state['current_df'].loc[st.session_state['current_df']['id'] == id_barang]
-    if original_row_match.empty: return 0, True
-    original_row = original_row_match.iloc[0]
+    required_cols = ['SKU', 'Nama Barang', 'Qty PO', 'Tipe Barang']
+    if not all(col in df.columns for col in required_cols):
+        return None, f"File Excel harus memiliki kolom: {', '.join(required_cols)}"
+        
+    # === [FIX v1.4: Robust NaN Handling] ===
+    if 'Qty PO' in df.columns:
+        df['Qty PO'] = df['Qty PO'].fillna(0).astype(int)
     
-    original_qty = original_row['qty_fisik']
-    original_jenis = original_row['jenis']
-    original_notes = original_row.get('keterangan', '') if original_row.get('keterangan') is not None else ''
+    df['Tujuan (Stok/Display)'] = df['Tujuan (Stok/Display)'].fillna('')
+    df['Keterangan Awal'] = df['Keterangan Awal'].fillna('')
+    df['SKU'] = df['SKU'].fillna('')
+    df['Nama Barang'] = df['Nama Barang'].fillna('')
+    df['Tipe Barang'] = df['Tipe Barang'].fillna('NON-SN')
+
+    data_to_insert = []
     
-    keterangan_to_save = keterangan if keterangan.strip() else None
+    for _, row in df.iterrows():
+        
+        jenis_val = str(row.get('Tujuan (Stok/Display)')).strip()
+        if jenis_val == '': jenis_val = 'Stok'
+        keterangan_val = str(row.get('Keterangan Awal')).strip()
+        keterangan_val = keterangan_val if keterangan_val else None
+        tipe_barang = str(row.get('Tipe Barang')).upper()
+        is_sn_item = tipe_barang == 'SN'
 
-    is_qty_changed = (original_qty != new_qty)
-    is_jenis_changed = (original_jenis != new_jenis)
-    is_notes_changed = (original_notes.strip() != (keterangan_to_save.strip() if keterangan_to_save else ''))
+        item = _with_site({
+            "sku": str(row.get('SKU')).strip(),
+            "nama_barang": str(row.get('Nama Barang')).strip(),
+            "kategori_barang": tipe_barang,
+            "qty_po": int(row.get('Qty PO', 0)),
+            "qty_fisik": 0, "updated_by": "-", "is_active": True, "gr_number": gr_number,
+            "jenis": jenis_val,
+            "keterangan": keterangan_val, 
+            "sn_list": [] if is_sn_item else None,
+            "is_inbound": False # FIX V1.23: Semua item baru status Inbound = FALSE
+        })
+        data_to_insert.append(item)
     
-    if is_qty_changed or is_jenis_changed or is_notes_changed:
+    if not data_to_insert:
+        return None, "Tidak ada data valid untuk diinput."
+    return data_to_insert, None
+
+def insert_gr_rows(data_to_insert):
+    batch_size = 500
+    for i in range(0, len(data_to_insert), batch_size):
+        inserted = db_execute(supabase.table(RECEIVING_TABLE).insert(data_to_insert[i:i+batch_size]), idempotent=False).data
+        # FIX V1.47: Event insert = state awal baris (qty_po/keterangan/jenis awal) untuk rekonstruksi
+        for row in inserted or []:
+            log_line_events(row['id'], row['gr_number'], build_line_events(None, row, "INSERT"), row.get('updated_by'), row.get('site_code'))
+
+def process_and_insert(df, gr_number):
+    """Memproses DF Master GR dan menginput ke DB"""
+    data_to_insert, error = build_gr_rows(df, gr_number)
+    if error:
+        return False, error
         
-        # Cek Konflik
-        db_updated_at_str, updated_by_db = get_db_updated_at(id_barang)
-        db_updated_at = parse_supabase_timestamp(db_updated_at_str)
-        if db_updated_at > loaded_time:
-            st.error(f"⚠️ KONFLIK DATA: **{row['nama_barang']}**! Diubah oleh **{updated_by_db}** pada {db_updated_at.astimezone(None).strftime('%H:%M:%S')}. Muat Ulang!")
-            return 0, True
+    try:
+        insert_gr_rows(data_to_insert)
+        invalidate_gr_snapshot(gr_number) # FIX V1.37
+        return True, len(data_to_insert)
+    except APIError as e:
+         return False, f"Gagal API Supabase: {e.message}. Pastikan kolom DB sudah dibuat dengan benar."
+    except Exception as e:
+         return False, f"Error saat insert data: {str(e)}"
 
-        # Lakukan Update
-        update_payload = {
-            "qty_fisik": new_qty, 
-            "jenis": new_jenis,
-            "updated_at": datetime.utcnow().isoformat(), 
-            "updated_by": nama_user,
-            "keterangan": keterangan_to_save
-            # is_inbound tidak diupdate oleh Checker
+def delete_active_session(nama_user="ADMIN"):
+    """Hapus sesi aktif tanpa arsip. FIX V1.39: dijalankan sebagai job background bertahap."""
+    try:
+        job = get_job_manager().submit("delete_active", {"site_code": get_current_site()}, nama_user)
+        return True, f"Penghapusan sesi aktif berjalan di background (Job {job['id']})."
+    except Exception as e: return False, str(e)
+
+def delete_blind_receive_item(item_id):
+    """FIX V1.22: Hapus item Blind Receive berdasarkan ID"""
+    try:
+        db_execute(supabase.table(RECEIVING_TABLE).delete().eq("id", item_id))
+        publish_row_change(item_id, {}, BLIND_GR, event_type="DELETE") # FIX V1.37
+        return True, "Item Blind Receive berhasil dihapus."
+    except Exception as e:
+        error_msg = f"API Error: {str(e)}"
+        st.error(f"❌ Gagal menghapus item. DETAIL: {error_msg}")
+        return False, error_msg
+    
+# --- FIX V1.39: JOB BACKGROUND ARSIP & HAPUS BERTAHAP ---
+
+JOB_KINDS = {
+    "archive": "Arsip Sesi",
+    "delete_active": "Hapus Semua Sesi Aktif",
+}
+JOB_STATE_FIELDS = ["id", "kind", "params", "submitted_by", "status", "total", "processed", "last_id", "pending_ids", "remaining", "error", "analytics_error"]
+ARCHIVE_ANALYTICS_COLS = "id, gr_number, sku, nama_barang, qty_po, qty_fisik, created_at" # Kolom yang dipakai DiscrepancyAccumulator
+
+SQL_SETUP_SCRIPTS["V1.39 - Job Background"] = f"""
+-- State job arsip/hapus bertahap: job yang terputus (restart/deploy) bisa dilanjutkan dari panel admin
+create table if not exists {JOBS_TABLE} (
+    id text primary key,
+    kind text not null,
+    params jsonb not null default '{{}}'::jsonb,
+    submitted_by text,
+    status text not null,
+    total integer,
+    processed integer not null default 0,
+    last_id text,
+    pending_ids jsonb,     -- chunk yang sedang ditulis: hasilnya dihitung ulang dari DB saat dilanjutkan
+    analytics jsonb,       -- akumulator analitik arsip (FIX V1.52)
+    remaining integer,
+    error text,
+    analytics_error text,
+    started_at timestamptz not null default now(),
+    finished_at timestamptz,
+    updated_at timestamptz not null default now()
+);
+create index if not exists {JOBS_TABLE}_started_idx on {JOBS_TABLE} (started_at desc);
+"""
+
+def _job_filters(query, job):
+    """Filter baris target job. Baris yang sudah diproses otomatis keluar dari filter (idempoten)."""
+    query = _site_filter(query.eq("is_active", True), job["params"].get("site_code"))
+    if job["params"].get("gr_number"):
+        query = query.eq("gr_number", job["params"]["gr_number"])
+    return query
+
+def _count_job_rows(job):
+    res = db_execute(_job_filters(supabase.table(RECEIVING_TABLE).select("id", count="exact"), job).limit(1))
+    return res.count or 0
+
+def _job_from_record(record):
+    """Baris JOBS_TABLE -> dict state job"""
+    job = {k: record.get(k) for k in JOB_STATE_FIELDS}
+    job["params"] = job["params"] or {}
+    job["processed"] = job["processed"] or 0
+    job["started_at"] = parse_supabase_timestamp(record.get('started_at'))
+    job["finished_at"] = parse_supabase_timestamp(record['finished_at']) if record.get('finished_at') else None
+    if record.get('analytics'):
+        job["analytics"] = DiscrepancyAccumulator.from_dict(record['analytics'])
+    if not job["analytics_error"]:
+        job.pop("analytics_error")
+    return job
+
+class BackgroundJobManager:
+    """
+    Menjalankan arsip/hapus dalam chunk id (keyset) di thread terpisah, dengan progress dan resume.
+    Thread job tidak memakai ScriptRunContext sesi mana pun: site & GR hanya dari job["params"].
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = {} # job_id -> dict state
+        self._load()
+
+    def _load(self):
+        """Job dari proses sebelumnya. RUNNING tanpa progress baru = prosesnya mati, ditandai gagal agar bisa dilanjutkan."""
+        try:
+            records = db_execute(supabase.table(JOBS_TABLE).select("*").order("started_at", desc=True).limit(JOB_HISTORY_LIMIT)).data
+        except Exception as e:
+            logging.warning(f"Riwayat job tidak bisa dimuat ({e}), state job hanya disimpan di memori.")
+            return
+        now = datetime.now(timezone.utc)
+        for record in records:
+            if record.get('status') == "RUNNING":
+                if (now - parse_supabase_timestamp(record.get('updated_at'))).total_seconds() < JOB_STALE_S:
+                    continue # Masih berjalan di replika lain
+                record = dict(record, status="FAILED", error="Proses berhenti (restart/deploy) sebelum job selesai.")
+            job = _job_from_record(record)
+            self.jobs[job["id"]] = job
+
+    def save(self, job):
+        """Simpan state job (upsert by id). Gagal simpan tidak menghentikan job."""
+        payload = {k: job.get(k) for k in JOB_STATE_FIELDS}
+        payload.update(
+            started_at=job["started_at"].isoformat(),
+            finished_at=job["finished_at"].isoformat() if job["finished_at"] else None,
+            analytics=job["analytics"].to_dict() if job.get("analytics") else None,
+            updated_at=datetime.now(timezone.utc).isoformat(),
+        )
+        try:
+            db_execute(supabase.table(JOBS_TABLE).upsert(payload))
+        except Exception as e:
+            logging.warning(f"State job {job['id']} gagal disimpan: {e}")
+
+    def find_running(self, kind, params):
+        with self._lock:
+            for job in self.jobs.values():
+                if job["kind"] == kind and job["params"] == params and job["status"] == "RUNNING":
+                    return job
+        return None
+
+    def submit(self, kind, params, submitted_by):
+        running = self.find_running(kind, params)
+        if running:
+            return running
+        job = {
+            "id": uuid.uuid4().hex[:8], "kind": kind, "params": params, "submitted_by": submitted_by,
+            "status": "RUNNING", "total": None, "processed": 0, "last_id": None, "pending_ids": None, "remaining": None,
+            "error": None, "started_at": datetime.now(timezone.utc), "finished_at": None,
         }
+        with self._lock:
+            self.jobs[job["id"]] = job
+        self.save(job)
+        self._start(job)
+        return job
+
+    def resume(self, job_id):
+        """
+        Lanjutkan job gagal. Keyset dimulai lagi dari awal (last_id = None): baris yang sudah diproses keluar dari filter,
+        baris ber-id kecil yang tertinggal (mis. ditambahkan saat job berjalan) ikut diproses.
+        """
+        job = self.jobs.get(job_id)
+        if job and job["status"] in ("FAILED", "VERIFY_FAILED"):
+            job.update(status="RUNNING", error=None, finished_at=None, last_id=None, remaining=None)
+            self.save(job)
+            self._start(job)
+        return job
 
+    def _start(self, job):
+        threading.Thread(target=self._run, args=(job,), daemon=True, name=f"job-{job['id']}").start()
+
+    def _settle_chunk(self, job, ids):
+        """
+        Hasil chunk dihitung dari DB, bukan dari response write: jika response hilang lalu request di-retry,
+        retry mengembalikan [] (baris sudah keluar dari filter) dan progress/analitik akan kurang hitung.
+        """
+        if job["kind"] == "archive":
+            done = db_execute(_site_filter(supabase.table(RECEIVING_TABLE).select(ARCHIVE_ANALYTICS_COLS).in_("id", ids).eq(
+                "is_active", False), job["params"].get("site_code"))).data or []
+            # FIX V1.52: Kontribusi analitik dari baris yang benar-benar berpindah ke arsip di chunk ini
+            job.setdefault("analytics", DiscrepancyAccumulator()).add(done)
+            job["processed"] += len(done)
+        else:
+            left = db_execute(supabase.table(RECEIVING_TABLE).select("id").in_("id", ids)).data or []
+            job["processed"] += len(ids) - len(left)
+        job["pending_ids"] = None
+
+    def _run(self, job):
         try:
-            supabase.table(RECEIVING_TABLE).update(update_payload).eq("id", id_barang).execute()
-            return 1, False # Success
-        except APIError as api_e:
-            error_msg = f"API Error: {api_e.message}. Status Code: {api_e.code}" if hasattr(api_e, 'message') else str(api_e)
-            st.error(f"❌ Gagal Simpan Item {row['nama_barang']}. DETAIL: {error_msg}")
-            # Auto-Heal untuk mengatasi cache RLS
-            st.cache_resource.clear()
-            st.rerun()
-            return 0, True 
-        
-    return 0, False # No change
+            if job.get("pending_ids"):
+                self._settle_chunk(job, job["pending_ids"]) # Chunk yang sedang ditulis saat job gagal/proses mati
+            if job["total"] is None:
+                job["total"] = _count_job_rows(job)
 
-def handle_update_sn_list(row, new_sn_list, new_jenis, nama_user, loaded_time, keterangan=""):
-    """Update SN List dan Jenis untuk barang SN"""
-    id_barang = row['id']
-    
-    original_row_match = st.session_state['current_df'].loc[st.session_state['current_df']['id'] == id_barang]
+            while True:
+                ids_query = _job_filters(supabase.table(RECEIVING_TABLE).select("id"), job).order("id").limit(JOB_CHUNK_SIZE)
+                if job["last_id"] is not None:
+                    ids_query = ids_query.gt("id", job["last_id"])
+                ids = [r['id'] for r in db_execute(ids_query).data]
+                if not ids:
+                    break
+
+                job["pending_ids"] = ids
+                self.save(job)
+                if job["kind"] == "archive":
+                    chunk_query = supabase.table(RECEIVING_TABLE).update({"is_active": False})
+                else:
+                    chunk_query = supabase.table(RECEIVING_TABLE).delete()
+                db_execute(_job_filters(chunk_query, job).in_("id", ids)) # Idempoten: aman di-retry
+                self._settle_chunk(job, ids)
+
+                job["last_id"] = ids[-1]
+                self.save(job)
+
+            # Verifikasi akhir: tidak boleh ada baris target yang tersisa
+            job["remaining"] = _count_job_rows(job)
+            job["status"] = "DONE" if job["remaining"] == 0 else "VERIFY_FAILED"
+            if job["kind"] == "archive":
+                try:
+                    record_gr_analytics(job) # FIX V1.52
+                except Exception as e:
+                    logging.error(f"Analitik job {job['id']} gagal: {e}")
+                    job["analytics_error"] = str(e)
+        except Exception as e:
+            logging.error(f"Job {job['id']} ({job['kind']}) gagal: {e}")
+            job["status"] = "FAILED"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = datetime.now(timezone.utc)
+            self.save(job)
+            try:
+                invalidate_gr_snapshot(job["params"].get("gr_number"), job["params"].get("site_code"))
+            except Exception as e:
+                logging.warning(f"Invalidasi cache setelah job gagal: {e}")
+
+@st.cache_resource
+def get_job_manager():
+    return BackgroundJobManager()
+
+@_fragment_every(2)
+def render_background_jobs(kind=None):
+    """Panel progress job background (refresh otomatis tiap 2 detik)"""
+    manager = get_job_manager()
+    jobs = [j for j in manager.jobs.values() if kind is None or j["kind"] == kind]
+    if not jobs:
+        return
+
+    st.markdown("#### ⏳ Job Background")
+    for job in sorted(jobs, key=lambda j: j["started_at"], reverse=True)[:5]:
+        target = job["params"].get("gr_number") or "SEMUA SESI AKTIF"
+        if job["params"].get("site_code"):
+            target = f"{job['params']['site_code']} / {target}"
+        total = job["total"] or 0
+        progress = min(job["processed"] / total, 1.0) if total else (1.0 if job["status"] == "DONE" else 0.0)
+        label = f"{JOB_KINDS[job['kind']]} · {target} · {job['processed']}/{total if job['total'] is not None else '?'} baris · {job['status']}"
+        st.progress(progress, text=label)
+
+        if job["status"] == "DONE":
+            st.caption(f"✅ Selesai & terverifikasi (sisa 0 baris) oleh {job['submitted_by']}.")
+        if job.get("analytics_error"):
+            st.warning(f"Arsip berhasil, tetapi agregat analitik gagal diperbarui: {job['analytics_error']}")
+            if st.button("🔁 Coba Lagi Analitik", key=f"retry_analytics_{job['id']}"):
+                try:
+                    record_gr_analytics(job)
+                    job.pop("analytics_error", None)
+                except Exception as e:
+                    job["analytics_error"] = str(e)
+                manager.save(job)
+        elif job["status"] == "VERIFY_FAILED":
+            st.warning(f"Verifikasi: masih ada {job['remaining']} baris (kemungkinan ditambahkan saat job berjalan).")
+        elif job["status"] == "FAILED":
+            st.error(f"Job gagal di id {job['last_id'] or '-'}: {job['error']}")
+
+        if job["status"] in ("FAILED", "VERIFY_FAILED"):
+            if st.button("▶️ Lanjutkan Job", key=f"resume_job_{job['id']}"):
+                manager.resume(job["id"])
+
+# --- FIX V1.52: ANALITIK SELISIH (AGREGAT INKREMENTAL SAAT ARSIP) ---
+
+ANALYTICS_METRICS = ["lines", "qty_po", "qty_fisik", "short_units", "over_units", "short_lines", "over_lines", "blind_lines", "blind_units"]
+
+def _analytics_metric_columns():
+    return ",\n    ".join(f"{m} bigint not null default 0" for m in ANALYTICS_METRICS)
+
+def _analytics_increment(table_alias="t"):
+    return ", ".join(f"{m} = {table_alias}.{m} + excluded.{m}" for m in ANALYTICS_METRICS)
+
+SQL_SETUP_SCRIPTS["V1.52 - Analitik Selisih"] = f"""
+-- Agregat ditambah (bukan dihitung ulang) setiap kali job arsip selesai. 1 job = 1 baris ledger (idempoten).
+create table if not exists {ANALYTICS_GR_TABLE} (
+    id bigserial primary key,
+    job_id text not null unique,
+    site_code text not null default '',
+    gr_number text not null,
+    month date not null,
+    {_analytics_metric_columns()},
+    archived_by text,
+    archived_at timestamptz not null default now()
+);
+create index if not exists {ANALYTICS_GR_TABLE}_month_idx on {ANALYTICS_GR_TABLE} (site_code, month);
+
+create table if not exists {ANALYTICS_SKU_TABLE} (
+    site_code text not null default '',
+    month date not null,
+    sku text not null,
+    brand text,
+    gr_count bigint not null default 0,
+    {_analytics_metric_columns()},
+    primary key (site_code, month, sku)
+);
+create index if not exists {ANALYTICS_SKU_TABLE}_short_idx on {ANALYTICS_SKU_TABLE} (site_code, month, short_units desc);
+
+create table if not exists {ANALYTICS_BRAND_TABLE} (
+    site_code text not null default '',
+    month date not null,
+    brand text not null,
+    gr_count bigint not null default 0,
+    {_analytics_metric_columns()},
+    primary key (site_code, month, brand)
+);
+
+create or replace function receiving_record_gr_analytics(p_gr jsonb, p_skus jsonb, p_brands jsonb)
+returns boolean language plpgsql as $$
+begin
+    insert into {ANALYTICS_GR_TABLE} (job_id, site_code, gr_number, month, {", ".join(ANALYTICS_METRICS)}, archived_by)
+    select job_id, site_code, gr_number, month, {", ".join(ANALYTICS_METRICS)}, archived_by
+      from jsonb_populate_record(null::{ANALYTICS_GR_TABLE}, p_gr)
+    on conflict (job_id) do nothing;
+    if not found then
+        return false; -- Job ini sudah tercatat
+    end if;
+
+    insert into {ANALYTICS_SKU_TABLE} as t (site_code, month, sku, brand, gr_count, {", ".join(ANALYTICS_METRICS)})
+    select site_code, month, sku, brand, gr_count, {", ".join(ANALYTICS_METRICS)}
+      from jsonb_populate_recordset(null::{ANALYTICS_SKU_TABLE}, p_skus)
+    on conflict (site_code, month, sku) do update set brand = excluded.brand, gr_count = t.gr_count + excluded.gr_count, {_analytics_increment()};
+
+    insert into {ANALYTICS_BRAND_TABLE} as t (site_code, month, brand, gr_count, {", ".join(ANALYTICS_METRICS)})
+    select site_code, month, brand, gr_count, {", ".join(ANALYTICS_METRICS)}
+      from jsonb_populate_recordset(null::{ANALYTICS_BRAND_TABLE}, p_brands)
+    on conflict (site_code, month, brand) do update set gr_count = t.gr_count + excluded.gr_count, {_analytics_increment()};
+    return true;
+end $$;
+
+-- Ranking SKU lintas bulan dikerjakan di DB (tabel SKU x bulan bisa besar setelah bertahun-tahun)
+create or replace function receiving_sku_discrepancy(p_site text, p_from date, p_to date, p_limit integer)
+returns table (sku text, brand text, gr_count bigint, {", ".join(f"{m} bigint" for m in ANALYTICS_METRICS)})
+language sql stable as $$
+    select sku, max(brand), sum(gr_count)::bigint, {", ".join(f"sum({m})::bigint" for m in ANALYTICS_METRICS)}
+      from {ANALYTICS_SKU_TABLE}
+     where site_code = coalesce(p_site, '') and month >= p_from and month <= p_to
+     group by sku
+     order by sum(short_units) desc, sum(over_units) desc
+     limit p_limit;
+$$;
+"""
+
+def _line_brand(nama_barang):
+    """Brand = kata pertama nama barang. Proxy supplier: data GR belum punya kolom supplier."""
+    words = str(nama_barang or "").strip().split()
+    return words[0].upper() if words else "-"
+
+def _line_metrics(row):
+    po, fisik = int(row.get('qty_po') or 0), int(row.get('qty_fisik') or 0)
+    if row.get('gr_number') == BLIND_GR:
+        return {"blind_lines": 1, "blind_units": fisik}
+    diff = fisik - po
+    return {
+        "lines": 1, "qty_po": po, "qty_fisik": fisik, "short_units": max(-diff, 0), "over_units": max(diff, 0),
+        "short_lines": int(diff < 0), "over_lines": int(diff > 0),
+    }
+
+class DiscrepancyAccumulator:
+    """Kontribusi baris yang diarsip satu job, dikelompokkan per (bulan, SKU) dan (bulan, brand)"""
+
+    def __init__(self):
+        self.total = Counter()
+        self.months = Counter()
+        self.skus = {}   # (bulan, sku) -> [brand, Counter]
+        self.brands = {} # (bulan, brand) -> Counter
+
+    def add(self, rows):
+        for row in rows:
+            # Bulan = bulan GR di-upload (created_at), bukan bulan arsip
+            month = str(row.get('created_at') or datetime.now(timezone.utc).isoformat())[:7] + "-01"
+            metrics = _line_metrics(row)
+            brand = _line_brand(row.get('nama_barang'))
+            sku = str(row.get('sku') or "-").strip().upper()
+            self.total.update(metrics)
+            self.months[month] += 1
+            self.skus.setdefault((month, sku), [brand, Counter()])[1].update(metrics)
+            self.brands.setdefault((month, brand), Counter()).update(metrics)
+
+    def to_dict(self):
+        """State JSON (disimpan bersama state job, FIX V1.39)"""
+        return {
+            "total": dict(self.total), "months": dict(self.months),
+            "skus": [[month, sku, brand, dict(counter)] for (month, sku), (brand, counter) in self.skus.items()],
+            "brands": [[month, brand, dict(counter)] for (month, brand), counter in self.brands.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        acc = cls()
+        acc.total, acc.months = Counter(data.get("total", {})), Counter(data.get("months", {}))
+        acc.skus = {(month, sku): [brand, Counter(counter)] for month, sku, brand, counter in data.get("skus", [])}
+        acc.brands = {(month, brand): Counter(counter) for month, brand, counter in data.get("brands", [])}
+        return acc
+
+    def payloads(self, job_id, site_code, gr_number, archived_by):
+        site_code = site_code or ""
+        as_metrics = lambda counter: {m: int(counter.get(m, 0)) for m in ANALYTICS_METRICS}
+        gr = {
+            "job_id": job_id, "site_code": site_code, "gr_number": gr_number,
+            "month": self.months.most_common(1)[0][0], "archived_by": archived_by, **as_metrics(self.total),
+        }
+        skus = [
+            {"site_code": site_code, "month": month, "sku": sku, "brand": brand, "gr_count": 1, **as_metrics(counter)}
+            for (month, sku), (brand, counter) in self.skus.items()
+        ]
+        brands = [
+            {"site_code": site_code, "month": month, "brand": brand, "gr_count": 1, **as_metrics(counter)}
+            for (month, brand), counter in self.brands.items()
+        ]
+        return gr, skus, brands
+
+def _merge_analytics_rows(table, key_cols, rows):
+    """Fallback tanpa RPC: baca baris agregat yang ada, tambahkan, upsert. TIDAK atomik terhadap arsip bersamaan."""
+    for month in sorted({r['month'] for r in rows}):
+        month_rows = [r for r in rows if r['month'] == month]
+        key_col = key_cols[-1]
+        existing = db_execute(supabase.table(table).select("*").eq("site_code", month_rows[0]['site_code']).eq("month", month).in_(
+            key_col, [r[key_col] for r in month_rows])).data
+        by_key = {r[key_col]: r for r in existing}
+        merged = []
+        for row in month_rows:
+            old = by_key.get(row[key_col], {})
+            merged.append({**row, **{m: int(old.get(m) or 0) + row[m] for m in ANALYTICS_METRICS + ["gr_count"]}})
+        db_execute(supabase.table(table).upsert(merged, on_conflict=",".join(key_cols)))
+
+def record_gr_analytics(job):
+    """Tambahkan kontribusi job arsip ke tabel agregat (sekali per job)"""
+    accumulator = job.get("analytics")
+    if accumulator is None or not accumulator.months:
+        return False
+    job_key = f"{job['started_at']:%Y%m%d%H%M%S}-{job['id']}"
+    gr, skus, brands = accumulator.payloads(job_key, job["params"].get("site_code"), job["params"].get("gr_number") or "*", job["submitted_by"])
+    try:
+        return bool(db_execute(supabase.rpc("receiving_record_gr_analytics", {"p_gr": gr, "p_skus": skus, "p_brands": brands}), idempotent=False).data)
+    except APIError as api_e:
+        if getattr(api_e, 'code', None) != 'PGRST202':
+            raise
+    logging.warning("RPC receiving_record_gr_analytics belum ada, memakai fallback (tidak atomik).")
+    try:
+        db_execute(supabase.table(ANALYTICS_GR_TABLE).insert(gr), idempotent=False)
+    except APIError as api_e:
+        if str(getattr(api_e, 'code', '')) == '23505':
+            return False # Ledger sudah ada: job ini sudah tercatat
+        raise
+    _merge_analytics_rows(ANALYTICS_SKU_TABLE, ["site_code", "month", "sku"], skus)
+    _merge_analytics_rows(ANALYTICS_BRAND_TABLE, ["site_code", "month", "brand"], brands)
+    return True
+
+def _analytics_query(table, date_from, date_to, select_fields="*", **select_kwargs):
+    return supabase.table(table).select(select_fields, **select_kwargs).eq("site_code", get_current_site() or "").gte(
+        "month", date_from.isoformat()).lte("month", date_to.isoformat())
+
+def _with_discrepancy_rates(df):
+    df['short_rate_pct'] = np.where(df['qty_po'] > 0, (df['short_units'] / df['qty_po'].where(df['qty_po'] > 0) * 100).round(1), 0.0)
+    df['short_line_pct'] = np.where(df['lines'] > 0, (df['short_lines'] / df['lines'].where(df['lines'] > 0) * 100).round(1), 0.0)
+    return df
+
+def fetch_sku_discrepancy(date_from, date_to, limit=200):
+    try:
+        rows = db_execute(supabase.rpc("receiving_sku_discrepancy", {
+            "p_site": get_current_site() or "", "p_from": date_from.isoformat(), "p_to": date_to.isoformat(), "p_limit": limit
+        })).data
+        return pd.DataFrame(rows), False
+    except APIError as api_e:
+        if getattr(api_e, 'code', None) != 'PGRST202':
+            raise
+    # Fallback: baris SKU x bulan dengan short terbesar, digabung di app (bisa tidak lengkap)
+    rows = _fetch_rows_paged(lambda: _analytics_query(ANALYTICS_SKU_TABLE, date_from, date_to).order("short_units", desc=True).order(
+        "month").order("sku"), ANALYTICS_FALLBACK_MAX_ROWS)
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df, False
+    df = df.groupby('sku', as_index=False).agg({'brand': 'last', 'gr_count': 'sum', **{m: 'sum' for m in ANALYTICS_METRICS}})
+    return df.sort_values(['short_units', 'over_units'], ascending=False).head(limit), len(rows) >= ANALYTICS_FALLBACK_MAX_ROWS
+
+def section_admin_analytics():
+    """Seksi Analitik Selisih: brand/SKU yang kronis SHORT/OVER, hanya dari tabel agregat"""
+    st.header("📈 Analitik Selisih PO vs Fisik")
+    st.caption("Diperbarui otomatis setiap GR selesai diarsip. Brand = kata pertama Nama Barang (proxy supplier).")
+
+    today = datetime.now().date()
+    c_from, c_to = st.columns(2)
+    date_from = c_from.date_input("Dari Bulan", (pd.Timestamp(today.replace(day=1)) - pd.DateOffset(months=11)).date(), key="analytics_from")
+    date_to = c_to.date_input("Sampai Bulan", today, key="analytics_to")
+    date_from, date_to = pd.Timestamp(date_from).date().replace(day=1), pd.Timestamp(date_to).date()
+
+    try:
+        # Brand x bulan dibaca utuh per halaman (max-rows PostgREST default 1000 memotong total diam-diam)
+        brand_rows = _fetch_rows_paged(lambda: _analytics_query(ANALYTICS_BRAND_TABLE, date_from, date_to).order("month").order("brand"), max_rows=10**6)
+    except Exception as e:
+        st.error(f"Tabel analitik belum tersedia (jalankan SQL V1.52 di Maintenance): {e}")
+        return
+    df_brand_month = pd.DataFrame(brand_rows)
+    if df_brand_month.empty:
+        st.info("Belum ada GR yang diarsip pada rentang ini.")
+        return
+
+    totals = df_brand_month[ANALYTICS_METRICS].sum()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Baris GR", f"{int(totals['lines']):,}")
+    c2.metric("Unit SHORT", f"{int(totals['short_units']):,}", f"{(totals['short_units'] / totals['qty_po'] * 100 if totals['qty_po'] else 0):.1f}% dari PO", delta_color="inverse")
+    c3.metric("Unit OVER", f"{int(totals['over_units']):,}")
+    c4.metric("Blind Receive", f"{int(totals['blind_lines']):,} baris", f"{int(totals['blind_units']):,} unit", delta_color="off")
+
+    # Tren bulanan
+    df_month = df_brand_month.groupby('month', as_index=False)[ANALYTICS_METRICS].sum().sort_values('month')
+    df_month = _with_discrepancy_rates(df_month)
+    st.markdown("#### Tren Bulanan")
+    st.line_chart(df_month.set_index('month')[['short_rate_pct', 'short_line_pct']].rename(columns={
+        'short_rate_pct': '% Unit SHORT', 'short_line_pct': '% Baris SHORT'
+    }))
+
+    labels = {
+        'brand': 'Brand', 'sku': 'SKU', 'gr_count': 'Jumlah GR', 'lines': 'Baris', 'qty_po': 'Qty PO', 'qty_fisik': 'Qty Fisik',
+        'short_units': 'Unit SHORT', 'short_rate_pct': '% Unit SHORT', 'short_lines': 'Baris SHORT', 'short_line_pct': '% Baris SHORT',
+        'over_units': 'Unit OVER', 'over_lines': 'Baris OVER', 'blind_lines': 'Baris Blind', 'blind_units': 'Unit Blind',
+    }
+    gr_labels = {**labels, 'gr_number': 'Nomor GR', 'month': 'Bulan', 'archived_by': 'Diarsip Oleh', 'archived_at': 'Waktu Arsip'}
+
+    st.markdown("#### Per Brand")
+    df_brand = df_brand_month.groupby('brand', as_index=False)[['gr_count'] + ANALYTICS_METRICS].sum()
+    df_brand = _with_discrepancy_rates(df_brand).sort_values(['short_rate_pct', 'short_units'], ascending=False)
+    st.dataframe(df_brand.reindex(columns=list(labels)[:1] + list(labels)[2:]).rename(columns=labels), use_container_width=True, hide_index=True)
+
+    st.markdown("#### SKU Paling Sering SHORT/OVER")
+    try:
+        df_sku, truncated = fetch_sku_discrepancy(date_from, date_to)
+    except Exception as e:
+        st.error(f"Gagal mengambil analitik SKU: {e}")
+        df_sku, truncated = pd.DataFrame(), False
+    if truncated:
+        st.caption("⚠️ RPC receiving_sku_discrepancy belum terpasang: ranking dihitung dari sebagian data. Jalankan SQL V1.52.")
+    if not df_sku.empty:
+        df_sku = _with_discrepancy_rates(df_sku)
+        st.dataframe(df_sku.reindex(columns=['sku'] + list(labels)[:1] + list(labels)[2:]).rename(columns=labels), use_container_width=True, hide_index=True)
+
+    st.markdown("#### Per GR (Diarsip)")
+    render_paginated_table(
+        "analytics_gr_table",
+        query_page_fetcher(lambda **kw: _analytics_query(ANALYTICS_GR_TABLE, date_from, date_to, **kw), ['gr_number', 'archived_by']),
+        {c: gr_labels[c] for c in ['gr_number', 'month', 'lines', 'qty_po', 'qty_fisik', 'short_units', 'over_units', 'short_lines', 'over_lines', 'blind_lines', 'archived_by', 'archived_at']},
+        ['archived_at', 'short_units', 'over_units', 'gr_number', 'month']
+    )
+
+# --- FIX V1.53: METRIK THROUGHPUT CHECKER ---
+
+SQL_SETUP_SCRIPTS["V1.53 - Metrik Produktivitas Checker"] = f"""
+create table if not exists {CHECKER_METRICS_TABLE} (
+    id bigserial primary key,
+    created_at timestamptz not null,
+    site_code text not null default '',
+    gr_number text,
+    operator text,
+    action text not null, -- sn_scan | qty_save | qty_delta | bulk_save | blind
+    units integer not null default 0,
+    lines integer not null default 1,
+    latency_ms real,
+    ok boolean not null default true
+);
+create index if not exists {CHECKER_METRICS_TABLE}_time_idx on {CHECKER_METRICS_TABLE} (site_code, created_at);
+
+-- Rollup per jam, ditambah saat ingest (dashboard tidak membaca event mentah)
+create table if not exists {CHECKER_METRICS_HOURLY_TABLE} (
+    site_code text not null default '',
+    hour timestamptz not null,
+    operator text not null,
+    gr_number text not null,
+    action text not null,
+    events bigint not null default 0,
+    units bigint not null default 0,
+    lines bigint not null default 0,
+    errors bigint not null default 0,
+    latency_sum_ms double precision not null default 0,
+    latency_max_ms real not null default 0,
+    first_at timestamptz,
+    last_at timestamptz,
+    primary key (site_code, hour, operator, gr_number, action)
+);
+create index if not exists {CHECKER_METRICS_HOURLY_TABLE}_gr_idx on {CHECKER_METRICS_HOURLY_TABLE} (site_code, gr_number);
+
+create or replace function receiving_ingest_checker_metrics(p_events jsonb)
+returns integer language plpgsql as $$
+begin
+    insert into {CHECKER_METRICS_TABLE} (created_at, site_code, gr_number, operator, action, units, lines, latency_ms, ok)
+    select created_at, site_code, gr_number, operator, action, units, lines, latency_ms, ok
+      from jsonb_populate_recordset(null::{CHECKER_METRICS_TABLE}, p_events);
+
+    insert into {CHECKER_METRICS_HOURLY_TABLE} as t
+           (site_code, hour, operator, gr_number, action, events, units, lines, errors, latency_sum_ms, latency_max_ms, first_at, last_at)
+    select site_code, date_trunc('hour', created_at), coalesce(operator, '-'), coalesce(gr_number, '-'), action,
+           count(*), sum(units), sum(lines), count(*) filter (where not ok),
+           sum(coalesce(latency_ms, 0)), coalesce(max(latency_ms), 0), min(created_at), max(created_at)
+      from jsonb_populate_recordset(null::{CHECKER_METRICS_TABLE}, p_events)
+     group by 1, 2, 3, 4, 5
+    on conflict (site_code, hour, operator, gr_number, action) do update set
+           events = t.events + excluded.events, units = t.units + excluded.units, lines = t.lines + excluded.lines,
+           errors = t.errors + excluded.errors, latency_sum_ms = t.latency_sum_ms + excluded.latency_sum_ms,
+           latency_max_ms = greatest(t.latency_max_ms, excluded.latency_max_ms),
+           first_at = least(t.first_at, excluded.first_at), last_at = greatest(t.last_at, excluded.last_at);
+    return jsonb_array_length(p_events);
+end $$;
+"""
+
+class CheckerMetricsWriter(BufferedBatchWriter):
+    """Event timing checker. Tanpa RPC ingest: hanya event mentah (dashboard menghitung rollup sendiri)."""
+
+    def __init__(self):
+        self.rollup_available = True
+        super().__init__("checker-metrics-writer")
+
+    def _write(self, batch):
+        if self.rollup_available:
+            try:
+                db_execute(supabase.rpc("receiving_ingest_checker_metrics", {"p_events": batch}), idempotent=False)
+                return
+            except APIError as api_e:
+                if getattr(api_e, 'code', None) != 'PGRST202':
+                    raise
+                logging.warning("RPC receiving_ingest_checker_metrics belum ada, hanya menyimpan event mentah.")
+                self.rollup_available = False
+        db_execute(supabase.table(CHECKER_METRICS_TABLE).insert(batch), idempotent=False)
+
+@st.cache_resource
+def get_checker_metrics():
+    return CheckerMetricsWriter()
+
+def record_checker_metric(action, gr_number, operator, units, lines=1, latency_start=None, ok=True):
+    """Catat 1 event timing (hanya append ke buffer, tidak pernah menggagalkan simpan)"""
+    try:
+        get_checker_metrics().append([{
+            "created_at": datetime.now(timezone.utc).isoformat(), "site_code": get_current_site() or "",
+            "gr_number": gr_number, "operator": operator, "action": action, "units": int(units), "lines": int(lines),
+            "latency_ms": round((time.perf_counter() - latency_start) * 1000, 1) if latency_start is not None else None, "ok": bool(ok),
+        }])
+    except Exception as e:
+        logging.warning(f"Gagal mencatat metrik checker: {e}")
+
+def _fetch_rows_paged(build_query, max_rows, page_size=1000):
+    """Ambil hasil query (sudah di-order) per halaman (batas max-rows PostgREST) sampai max_rows"""
+    rows = []
+    while len(rows) < max_rows:
+        page = db_execute(build_query().range(len(rows), len(rows) + page_size - 1)).data
+        rows.extend(page)
+        if len(page) < page_size:
+            break
+    return rows[:max_rows]
+
+def fetch_checker_hourly(date_from, date_to):
+    """Rollup per jam (site, jam, operator, GR, aksi). Fallback: dihitung dari event mentah."""
+    site_code = get_current_site() or ""
+    start_iso, end_iso = pd.Timestamp(date_from, tz="UTC").isoformat(), (pd.Timestamp(date_to, tz="UTC") + pd.Timedelta(days=1)).isoformat()
+    if get_checker_metrics().rollup_available:
+        try:
+            rows = _fetch_rows_paged(lambda: supabase.table(CHECKER_METRICS_HOURLY_TABLE).select("*").eq("site_code", site_code).gte(
+                "hour", start_iso).lt("hour", end_iso).order("hour").order("operator").order("gr_number").order("action"), PRODUCTIVITY_MAX_ROWS)
+            if rows:
+                return pd.DataFrame(rows), False
+        except APIError as e:
+            logging.warning(f"Rollup metrik checker tidak tersedia: {e}")
+
+    raw = _fetch_rows_paged(lambda: supabase.table(CHECKER_METRICS_TABLE).select("*").eq("site_code", site_code).gte(
+        "created_at", start_iso).lt("created_at", end_iso).order("id"), PRODUCTIVITY_MAX_ROWS)
+    df = pd.DataFrame(raw)
+    if df.empty:
+        return df, False
+    df['created_at'] = pd.to_datetime(df['created_at'], utc=True, format="ISO8601")
+    df['hour'] = df['created_at'].dt.floor("h")
+    df['operator'] = df['operator'].fillna("-")
+    df['gr_number'] = df['gr_number'].fillna("-")
+    df['errors'] = (~df['ok'].astype(bool)).astype(int)
+    df['latency_ms'] = df['latency_ms'].fillna(0)
+    hourly = df.groupby(['hour', 'operator', 'gr_number', 'action'], as_index=False).agg(
+        events=('id', 'size'), units=('units', 'sum'), lines=('lines', 'sum'), errors=('errors', 'sum'),
+        latency_sum_ms=('latency_ms', 'sum'), latency_max_ms=('latency_ms', 'max'),
+        first_at=('created_at', 'min'), last_at=('created_at', 'max'),
+    )
+    return hourly, len(raw) >= PRODUCTIVITY_MAX_ROWS
+
+def section_admin_productivity():
+    """Seksi Produktivitas: unit per jam per checker, waktu penyelesaian GR, korelasi latency simpan"""
+    st.header("⏱️ Produktivitas Checker & Dock")
+    writer = get_checker_metrics()
+    st.caption(f"Event menunggu flush: {writer.pending()} · tertulis: {writer.stats['written']} · gagal flush: {writer.stats['failed_flushes']}")
+
+    today = datetime.now().date()
+    c_from, c_to = st.columns(2)
+    date_from = c_from.date_input("Dari", today - pd.Timedelta(days=6), key="productivity_from")
+    date_to = c_to.date_input("Sampai", today, key="productivity_to")
+
+    try:
+        df, truncated = fetch_checker_hourly(date_from, date_to)
+    except Exception as e:
+        st.error(f"Tabel metrik belum tersedia (jalankan SQL V1.53 di Maintenance): {e}")
+        return
+    if df.empty:
+        st.info("Belum ada aktivitas checker pada rentang ini.")
+        return
+    if truncated:
+        st.caption(f"⚠️ Dihitung dari {PRODUCTIVITY_MAX_ROWS} event mentah pertama. Jalankan SQL V1.53 untuk rollup per jam.")
+
+    df['hour'] = pd.to_datetime(df['hour'], utc=True, format="ISO8601")
+    for col in ['first_at', 'last_at']:
+        df[col] = pd.to_datetime(df[col], utc=True, format="ISO8601")
+
+    # --- Per checker ---
+    st.markdown("#### Per Checker")
+    per_op = df.groupby('operator').agg(
+        units=('units', 'sum'), events=('events', 'sum'), errors=('errors', 'sum'),
+        latency_sum_ms=('latency_sum_ms', 'sum'), latency_max_ms=('latency_max_ms', 'max'), active_hours=('hour', 'nunique'),
+    )
+    per_op['units_per_hour'] = (per_op['units'] / per_op['active_hours']).round(1)
+    per_op['avg_latency_ms'] = (per_op['latency_sum_ms'] / per_op['events']).round(0)
+    st.dataframe(per_op.sort_values('units_per_hour', ascending=False).reset_index()[[
+        'operator', 'units', 'active_hours', 'units_per_hour', 'events', 'avg_latency_ms', 'latency_max_ms', 'errors'
+    ]].rename(columns={
+        'operator': 'Checker', 'units': 'Unit', 'active_hours': 'Jam Aktif', 'units_per_hour': 'Unit/Jam Aktif', 'events': 'Simpan/Scan',
+        'avg_latency_ms': 'Rata-rata Latency (ms)', 'latency_max_ms': 'Latency Maks (ms)', 'errors': 'Gagal'
+    }), use_container_width=True, hide_index=True)
+
+    st.markdown("#### Unit per Jam per Checker")
+    series = df.groupby([df['hour'].dt.tz_convert(None), 'operator'])['units'].sum().unstack(fill_value=0)
+    st.line_chart(series)
+
+    # --- Per GR ---
+    st.markdown("#### Per GR (Waktu Penyelesaian)")
+    per_gr = df[df['gr_number'] != "-"].groupby('gr_number').agg(
+        units=('units', 'sum'), checkers=('operator', 'nunique'), first_at=('first_at', 'min'), last_at=('last_at', 'max'),
+    )
+    if not per_gr.empty:
+        # GR yang sudah diarsip: selesai = waktu arsip (tabel analitik V1.52), selain itu aktivitas terakhir
+        try:
+            archived = db_execute(supabase.table(ANALYTICS_GR_TABLE).select("gr_number, archived_at").eq("site_code", get_current_site() or "").in_(
+                "gr_number", list(per_gr.index)[:500])).data
+            archived_at = pd.to_datetime(pd.Series({r['gr_number']: r['archived_at'] for r in archived}, dtype=object), utc=True, format="ISO8601")
+        except Exception:
+            archived_at = pd.Series(dtype="datetime64[ns, UTC]")
+        per_gr['closed_at'] = archived_at.reindex(per_gr.index)
+        per_gr['status'] = np.where(per_gr['closed_at'].notna(), "Diarsip", "Aktif")
+        per_gr['closed_at'] = per_gr['closed_at'].fillna(per_gr['last_at'])
+        per_gr['hours_to_close'] = ((per_gr['closed_at'] - per_gr['first_at']).dt.total_seconds() / 3600).round(2)
+        per_gr['units_per_hour'] = (per_gr['units'] / per_gr['hours_to_close'].where(per_gr['hours_to_close'] > 0)).round(1)
+        view = per_gr.reset_index().sort_values('first_at', ascending=False)
+        for col in ['first_at', 'closed_at']:
+            view[col] = view[col].dt.tz_convert(None).dt.strftime('%Y-%m-%d %H:%M')
+        st.dataframe(view[['gr_number', 'status', 'first_at', 'closed_at', 'hours_to_close', 'units', 'units_per_hour', 'checkers']].rename(columns={
+            'gr_number': 'Nomor GR', 'status': 'Status', 'first_at': 'Mulai', 'closed_at': 'Selesai', 'hours_to_close': 'Jam s/d Selesai',
+            'units': 'Unit', 'units_per_hour': 'Unit/Jam', 'checkers': 'Jumlah Checker'
+        }), use_container_width=True, hide_index=True)
+
+    # --- Korelasi latency simpan vs kecepatan scan ---
+    st.markdown("#### Latency Simpan vs Kecepatan Scan (per checker per jam)")
+    per_op_hour = df.groupby(['operator', 'hour']).agg(units=('units', 'sum'), events=('events', 'sum'), latency_sum_ms=('latency_sum_ms', 'sum')).reset_index()
+    per_op_hour['avg_latency_ms'] = per_op_hour['latency_sum_ms'] / per_op_hour['events']
+    if len(per_op_hour) >= 3 and per_op_hour['avg_latency_ms'].std() > 0 and per_op_hour['units'].std() > 0:
+        corr = per_op_hour['avg_latency_ms'].corr(per_op_hour['units'])
+        st.caption(f"Korelasi (Pearson) rata-rata latency simpan vs unit per jam: **{corr:.2f}** (negatif = simpan lambat ↔ scan lambat)")
+    scatter = getattr(st, "scatter_chart", None)
+    if scatter is not None:
+        scatter(per_op_hour, x='avg_latency_ms', y='units', color='operator')
+    else:
+        st.dataframe(per_op_hour[['operator', 'hour', 'units', 'avg_latency_ms']], use_container_width=True, hide_index=True)
+
+def get_master_template_excel_receiving():
+    """Template untuk upload Master GR/PO"""
+    data = {
+        'SKU': ['SAM-S24-ULT', 'VIV-CBL-01', 'LOG-MOU-05'],
+        'Nama Barang': ['Samsung Galaxy S24 Ultra 256GB', 'Vivan Kabel C to C', 'Logitech G502 Hero Mouse'],
+        'Qty PO': [10, 500, 25],
+        'Tipe Barang': ['SN', 'NON-SN', 'NON-SN'],
+        'Tujuan (Stok/Display)': ['Display', 'Stok', 'Stok'],
+        'Keterangan Awal': ['Untuk Floor Display', None, None]
+    }
+    df = pd.DataFrame(data)
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Template_Master_GR')
+        worksheet = writer.sheets['Template_Master_GR']
+        
+        # FIX V1.25: Gaya header yang lebih menarik
+        PatternFill, Font, Alignment = _openpyxl_styles()
+        HEADER_FILL = PatternFill(start_color="0072b2", end_color="0072b2", fill_type="solid") # Darker Blue
+        HEADER_FONT = Font(color="FFFFFF", bold=True, size=11)
+        HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        
+        for cell in worksheet[1]:
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            cell.alignment = HEADER_ALIGNMENT
+            
+        for column_cells in worksheet.columns:
+            length = max(len(str(cell.value) if cell.value else "") for cell in column_cells)
+            worksheet.column_dimensions[column_cells[0].column_letter].width = max(length + 5, 15)
+            
+    return output.getvalue()
+
+
+# --- LOGIKA CARD VIEW & UPDATE ---
+
+def handle_update_non_sn(row, new_qty, new_jenis, nama_user, loaded_time, keterangan=""):
+    """Update QTY dan Jenis untuk barang NON-SN"""
+    id_barang = row['id']
+    
+    original_row_match = st.session_state['current_df'].loc[st.session_state['current_df']['id'] == id_barang]
+    if original_row_match.empty: return 0, True
+    original_row = original_row_match.iloc[0]
+    
+    original_qty = original_row['qty_fisik']
+    original_jenis = original_row['jenis']
+    original_notes = original_row.get('keterangan', '') if original_row.get('keterangan') is not None else ''
+    
+    keterangan_to_save = keterangan if keterangan.strip() else None
+
+    is_qty_changed = (original_qty != new_qty)
+    is_jenis_changed = (original_jenis != new_jenis)
+    is_notes_changed = (original_notes.strip() != (keterangan_to_save.strip() if keterangan_to_save else ''))
+    
+    if is_qty_changed or is_jenis_changed or is_notes_changed:
+        save_start = time.perf_counter() # FIX V1.53
+        
+        # Cek Konflik
+        db_updated_at_str, updated_by_db = get_db_updated_at(id_barang)
+        db_updated_at = parse_supabase_timestamp(db_updated_at_str)
+        if db_updated_at > loaded_time:
+            st.error(f"⚠️ KONFLIK DATA: **{row['nama_barang']}**! Diubah oleh **{updated_by_db}** pada {db_updated_at.astimezone(None).strftime('%H:%M:%S')}. Muat Ulang!")
+            return 0, True
+
+        # Lakukan Update
+        update_payload = {
+            "qty_fisik": new_qty, 
+            "jenis": new_jenis,
+            "updated_at": datetime.utcnow().isoformat(), 
+            "updated_by": nama_user,
+            "keterangan": keterangan_to_save
+            # is_inbound tidak diupdate oleh Checker
+        }
+
+        try:
+            db_execute(supabase.table(RECEIVING_TABLE).update(update_payload).eq("id", id_barang))
+            publish_row_change(id_barang, update_payload, row.get('gr_number'), before=dict(row)) # FIX V1.37
+            record_checker_metric("qty_save", row.get('gr_number'), nama_user, max(int(new_qty) - int(original_qty or 0), 0), latency_start=save_start)
+            return 1, False # Success
+        except APIError as api_e:
+            record_checker_metric("qty_save", row.get('gr_number'), nama_user, 0, latency_start=save_start, ok=False)
+            error_msg = f"API Error: {api_e.message}. Status Code: {api_e.code}" if hasattr(api_e, 'message') else str(api_e)
+            st.error(f"❌ Gagal Simpan Item {row['nama_barang']}. DETAIL: {error_msg}")
+            # FIX V1.35: Tidak lagi clear koneksi + rerun (input user hilang). Retry sudah ditangani db_execute.
+            return 0, True 
+        
+    return 0, False # No change
+
+def handle_update_sn_list(row, new_sn_list, new_jenis, nama_user, loaded_time, keterangan=""):
+    """Update SN List dan Jenis untuk barang SN"""
+    id_barang = row['id']
+    
+    original_row_match = st.session_state['current_df'].loc[st.session_state['current_df']['id'] == id_barang]
     if original_row_match.empty: return 0, True
     original_row = original_row_match.iloc[0]
     
@@ -425,134 +2911,1575 @@ def handle_update_sn_list(row, new_sn_list, new_jenis, nama_user, loaded_time, k
     
     keterangan_to_save = keterangan if keterangan.strip() else None
 
-    is_sn_list_changed = set(map(str.strip, original_sn_list)) != set(map(str.strip, new_sn_list))
-    is_jenis_changed = (original_jenis != new_jenis)
-    is_notes_changed = (original_notes.strip() != (keterangan_to_save.strip() if keterangan_to_save else ''))
-    
-    if is_sn_list_changed or is_jenis_changed or is_notes_changed:
-        
-        # Cek Konflik
-        db_updated_at_str, updated_by_db = get_db_updated_at(id_barang)
-        db_updated_at = parse_supabase_timestamp(db_updated_at_str)
-        if db_updated_at > loaded_time:
-            st.error(f"⚠️ KONFLIK DATA: **{row['nama_barang']}**! Diubah oleh **{updated_by_db}** pada {db_updated_at.astimezone(None).strftime('%H:%M:%S')}. Muat Ulang!")
-            return 0, True
+    is_sn_list_changed = set(map(str.strip, original_sn_list)) != set(map(str.strip, new_sn_list))
+    is_jenis_changed = (original_jenis != new_jenis)
+    is_notes_changed = (original_notes.strip() != (keterangan_to_save.strip() if keterangan_to_save else ''))
+    
+    if is_sn_list_changed or is_jenis_changed or is_notes_changed:
+        save_start = time.perf_counter() # FIX V1.53
+        
+        # Cek Konflik
+        db_updated_at_str, updated_by_db = get_db_updated_at(id_barang)
+        db_updated_at = parse_supabase_timestamp(db_updated_at_str)
+        if db_updated_at > loaded_time:
+            st.error(f"⚠️ KONFLIK DATA: **{row['nama_barang']}**! Diubah oleh **{updated_by_db}** pada {db_updated_at.astimezone(None).strftime('%H:%M:%S')}. Muat Ulang!")
+            return 0, True
+
+        # Lakukan Update
+        update_payload = {
+            "sn_list": new_sn_list,
+            "qty_fisik": len(new_sn_list), # Qty Fisik = Jumlah SN yang dimasukkan
+            "jenis": new_jenis,
+            "updated_at": datetime.utcnow().isoformat(), 
+            "updated_by": nama_user,
+            "keterangan": keterangan_to_save
+            # is_inbound tidak diupdate oleh Checker
+        }
+
+        try:
+            # Gunakan json.dumps untuk memastikan array tersimpan dengan benar di Supabase
+            payload_to_db = update_payload.copy()
+            payload_to_db['sn_list'] = json.dumps(new_sn_list) 
+            
+            db_execute(supabase.table(RECEIVING_TABLE).update(payload_to_db).eq("id", id_barang))
+            publish_row_change(id_barang, update_payload, row.get('gr_number'), before=original_row.to_dict()) # FIX V1.37
+            record_checker_metric("sn_scan", row.get('gr_number'), nama_user, len(set(new_sn_list) - set(original_sn_list)), latency_start=save_start)
+            return 1, False # Success
+        except APIError as api_e:
+            record_checker_metric("sn_scan", row.get('gr_number'), nama_user, 0, latency_start=save_start, ok=False)
+            # FIX v1.7: Tampilkan pesan API error spesifik dari Supabase
+            error_msg = f"API Error: {api_e.message}. Status Code: {api_e.code}" if hasattr(api_e, 'message') else str(api_e)
+            st.error(f"❌ Gagal Simpan Item SN {row['nama_barang']}. DETAIL RLS: {error_msg}")
+            # FIX V1.35: Tidak lagi clear koneksi + rerun (input user hilang). Retry sudah ditangani db_execute.
+            return 0, True 
+        
+    return 0, False # No change
+
+# --- FIX V1.32: UPDATE QTY BERBASIS DELTA (ATOMIK) ---
+
+SQL_SETUP_SCRIPTS["V1.32 - Delta Qty Non-SN"] = f"""
+create table if not exists {QTY_DELTAS_TABLE} (
+    id bigserial primary key,
+    line_id uuid not null references {RECEIVING_TABLE}(id) on delete cascade,
+    gr_number text,
+    delta integer not null,
+    operator text not null,
+    created_at timestamptz not null default now()
+);
+create index if not exists {QTY_DELTAS_TABLE}_line_idx on {QTY_DELTAS_TABLE} (line_id, created_at);
+
+-- applied_delta = perubahan yang benar-benar terjadi (qty tidak boleh < 0), itu yang dicatat di log
+drop function if exists receiving_add_qty(uuid, integer, text);
+create or replace function receiving_add_qty(p_id uuid, p_delta integer, p_operator text)
+returns table (qty_fisik integer, updated_at timestamptz, applied_delta integer)
+language plpgsql as $$
+#variable_conflict use_column
+declare
+    v_old integer; v_new integer; v_gr text; v_at timestamptz;
+begin
+    select coalesce(r.qty_fisik, 0), r.gr_number into v_old, v_gr from {RECEIVING_TABLE} r where r.id = p_id for update;
+    if not found then
+        return;
+    end if;
+    v_new := greatest(v_old + p_delta, 0);
+
+    update {RECEIVING_TABLE} r
+       set qty_fisik = v_new, updated_by = p_operator, updated_at = now()
+     where r.id = p_id
+    returning r.updated_at into v_at;
+
+    if v_new <> v_old then
+        insert into {QTY_DELTAS_TABLE} (line_id, gr_number, delta, operator) values (p_id, v_gr, v_new - v_old, p_operator);
+    end if;
+    return query select v_new, v_at, v_new - v_old;
+end $$;
+"""
+
+def _add_qty_delta_fallback(row, delta, nama_user):
+    """
+    Fallback jika fungsi RPC belum dibuat: compare-and-set pada qty_fisik.
+    Tidak atomik: log delta ditulis (hanya jika CAS berhasil) sebagai request terpisah dan bisa hilang jika request itu gagal.
+    """
+    id_barang = row['id']
+    for _ in range(5):
+        res = db_execute(supabase.table(RECEIVING_TABLE).select("qty_fisik").eq("id", id_barang).limit(1))
+        if not res.data:
+            return 0, None
+        raw_qty = res.data[0].get('qty_fisik')
+        current_qty = int(raw_qty or 0)
+        new_qty = max(current_qty + delta, 0)
+
+        # Update hanya berhasil jika qty belum diubah orang lain sejak dibaca (qty NULL dicocokkan dengan IS NULL, bukan = 0)
+        query = supabase.table(RECEIVING_TABLE).update({
+            "qty_fisik": new_qty,
+            "updated_by": nama_user,
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("id", id_barang)
+        query = query.is_("qty_fisik", "null") if raw_qty is None else query.eq("qty_fisik", current_qty)
+        upd = db_execute(query, idempotent=False)
+
+        if upd.data:
+            applied = new_qty - current_qty # Setelah clamp ke 0
+            try:
+                if applied:
+                    db_execute(supabase.table(QTY_DELTAS_TABLE).insert({
+                        "line_id": id_barang, "gr_number": row.get('gr_number'), "delta": applied, "operator": nama_user
+                    }), idempotent=False)
+            except Exception as e:
+                logging.warning(f"Gagal mencatat log delta qty: {e}")
+            publish_row_change(id_barang, {"qty_fisik": new_qty, "updated_by": nama_user, "updated_at": datetime.utcnow().isoformat()}, row.get('gr_number'), before={"qty_fisik": current_qty})
+            return 1, new_qty
+
+    return 0, None
+
+def handle_add_qty_delta(row, delta, nama_user):
+    """FIX V1.32: Tambah/kurangi qty_fisik secara atomik di server. Tidak pernah konflik antar checker."""
+    delta = int(delta)
+    if delta == 0:
+        return 0, None
+    save_start = time.perf_counter() # FIX V1.53
+    saved, new_qty = _add_qty_delta(row, delta, nama_user)
+    record_checker_metric("qty_delta", row.get('gr_number'), nama_user, max(delta, 0) if saved else 0, latency_start=save_start, ok=bool(saved))
+    return saved, new_qty
+
+def _add_qty_delta(row, delta, nama_user):
+    try:
+        res = db_execute(supabase.rpc("receiving_add_qty", {"p_id": row['id'], "p_delta": delta, "p_operator": nama_user}), idempotent=False)
+        new_qty = res.data[0]['qty_fisik'] if res.data else None
+        if res.data:
+            # Delta yang diterapkan (bisa lebih kecil dari diminta karena clamp ke 0); fungsi versi lama tidak mengembalikannya
+            applied = res.data[0].get('applied_delta', delta)
+            publish_row_change(row['id'], {"qty_fisik": new_qty, "updated_by": nama_user, "updated_at": res.data[0].get('updated_at')}, row.get('gr_number'), before={"qty_fisik": new_qty - applied})
+        return 1, new_qty
+    except APIError as api_e:
+        # PGRST202 = fungsi RPC tidak ditemukan (SQL V1.32 belum dijalankan)
+        if getattr(api_e, 'code', None) != 'PGRST202':
+            error_msg = f"API Error: {api_e.message}. Status Code: {api_e.code}" if hasattr(api_e, 'message') else str(api_e)
+            st.error(f"❌ Gagal Tambah Qty {row['nama_barang']}. DETAIL: {error_msg}")
+            return 0, None
+        logging.warning("RPC receiving_add_qty belum ada, memakai fallback compare-and-set.")
+
+    try:
+        return _add_qty_delta_fallback(row, delta, nama_user)
+    except Exception as e:
+        st.error(f"❌ Gagal Tambah Qty {row['nama_barang']}. DETAIL: {e}")
+        return 0, None
+
+# --- FIX V1.33: EDIT MASSAL NON-SN (GRID) ---
+
+NON_SN_GRID_COLS = ['qty_fisik', 'jenis', 'keterangan']
+GRID_CONFLICTS_KEY = "non_sn_grid_conflicts"
+GRID_SYNCED_KEY = "non_sn_grid_synced" # id -> nilai tersimpan + updated_at (snapshot bisa belum memuatnya)
+
+SQL_SETUP_SCRIPTS["V1.33 - Bulk Update Non-SN"] = f"""
+create or replace function receiving_bulk_update_non_sn(p_rows jsonb, p_operator text, p_loaded_at timestamptz)
+returns table (id uuid, status text, updated_by text, updated_at timestamptz)
+language plpgsql as $$
+#variable_conflict use_column
+begin
+    return query
+    with input as (
+        select (x->>'id')::uuid as id,
+               (x->>'qty_fisik')::integer as qty_fisik,
+               x->>'jenis' as jenis,
+               nullif(x->>'keterangan', '') as keterangan,
+               coalesce((x->>'loaded_at')::timestamptz, p_loaded_at) as loaded_at -- per baris: baris yang baru kita simpan
+          from jsonb_array_elements(p_rows) x
+    ), updated as (
+        update {RECEIVING_TABLE} r
+           set qty_fisik = i.qty_fisik, jenis = i.jenis, keterangan = i.keterangan,
+               updated_by = p_operator, updated_at = now()
+          from input i
+         where r.id = i.id
+           and coalesce(r.updated_at, '-infinity'::timestamptz) <= i.loaded_at
+        returning r.id
+    )
+    select i.id,
+           case when u.id is not null then 'ok' else 'conflict' end,
+           case when u.id is not null then p_operator else r.updated_by end,
+           case when u.id is not null then now() else r.updated_at end
+      from input i
+      left join updated u on u.id = i.id
+      left join {RECEIVING_TABLE} r on r.id = i.id;
+end $$;
+"""
+
+def compute_non_sn_diff(df_snapshot, df_edited):
+    """Membandingkan hasil edit grid dengan snapshot yang dimuat, hanya baris yang berubah"""
+    base = df_snapshot.set_index('id')[NON_SN_GRID_COLS]
+    edited = df_edited.set_index('id')[NON_SN_GRID_COLS].reindex(base.index)
+
+    base_qty = pd.to_numeric(base['qty_fisik'], errors='coerce').fillna(0).astype(int)
+    # Sel qty yang dikosongkan = tidak berubah (bukan tulis 0)
+    edit_qty = pd.to_numeric(edited['qty_fisik'], errors='coerce').fillna(base_qty).clip(lower=0).astype(int)
+    base_notes = base['keterangan'].fillna('').astype(str).str.strip()
+    edit_notes = edited['keterangan'].fillna('').astype(str).str.strip()
+    edit_jenis = edited['jenis'].fillna('Stok')
+
+    changed = (edit_qty != base_qty) | (edit_jenis != base['jenis']) | (edit_notes != base_notes)
+
+    return pd.DataFrame({
+        'id': base.index[changed],
+        'qty_fisik': edit_qty[changed].values,
+        'jenis': edit_jenis[changed].values,
+        'keterangan': edit_notes[changed].values,
+    })
+
+def _bulk_update_non_sn_fallback(rows, nama_user, loaded_iso):
+    """Fallback tanpa RPC: update bersyarat per baris (updated_at belum berubah sejak dimuat)"""
+    results = []
+    for item in rows:
+        payload = {
+            "qty_fisik": item['qty_fisik'], "jenis": item['jenis'], "keterangan": item['keterangan'] or None,
+            "updated_by": nama_user, "updated_at": datetime.utcnow().isoformat()
+        }
+        res = db_execute(supabase.table(RECEIVING_TABLE).update(payload).eq("id", item['id']).or_(
+            f"updated_at.is.null,updated_at.lte.{item.get('loaded_at') or loaded_iso}"
+        ), idempotent=False)
+        if res.data:
+            results.append({"id": item['id'], "status": "ok", "updated_at": payload['updated_at']})
+        else:
+            updated_at_db, updated_by_db = get_db_updated_at(item['id'])
+            results.append({"id": item['id'], "status": "conflict", "updated_by": updated_by_db, "updated_at": updated_at_db})
+    return results
+
+def handle_bulk_update_non_sn(df_diff, nama_user, loaded_time):
+    """
+    FIX V1.33: Simpan semua perubahan grid dalam satu RPC (semua atau tidak sama sekali).
+    Return (jumlah tersimpan, dict konflik {id: (updated_by, updated_at)}).
+    """
+    if df_diff.empty:
+        return 0, {}
+
+    rows = df_diff.to_dict('records')
+    loaded_iso = loaded_time.astimezone(timezone.utc).isoformat()
+    results = []
+    save_start = time.perf_counter() # FIX V1.53
+
+    # Baris yang sudah kita simpan setelah data dimuat: cek konflik terhadap waktu simpan kita, bukan loaded_time
+    synced = st.session_state.get(GRID_SYNCED_KEY, {})
+    for item in rows:
+        synced_at = synced.get(str(item['id']), {}).get('updated_at')
+        if synced_at and parse_supabase_timestamp(synced_at) > loaded_time:
+            item['loaded_at'] = synced_at
+
+    try:
+        # Satu RPC untuk seluruh diff (satu transaksi): tidak ada chunk yang sudah commit lalu hilang saat chunk berikutnya gagal
+        res = db_execute(supabase.rpc("receiving_bulk_update_non_sn", {
+            "p_rows": rows, "p_operator": nama_user, "p_loaded_at": loaded_iso
+        }), idempotent=False)
+        results = res.data or []
+    except APIError as api_e:
+        if getattr(api_e, 'code', None) != 'PGRST202':
+            error_msg = f"API Error: {api_e.message}. Status Code: {api_e.code}" if hasattr(api_e, 'message') else str(api_e)
+            st.error(f"❌ Gagal Simpan Grid Non-SN. DETAIL: {error_msg}")
+            record_checker_metric("bulk_save", None, nama_user, 0, lines=len(rows), latency_start=save_start, ok=False)
+            return 0, {}
+        logging.warning("RPC receiving_bulk_update_non_sn belum ada, memakai fallback update bersyarat.")
+        results = _bulk_update_non_sn_fallback(rows, nama_user, loaded_iso)
+
+    saved = sum(1 for r in results if r.get('status') == 'ok')
+
+    # FIX V1.37: Publikasikan baris yang tersimpan ke change feed
+    saved_ids = {str(r['id']) for r in results if r.get('status') == 'ok'}
+    now_iso = datetime.now(timezone.utc).isoformat()
+    saved_at = {str(r['id']): str(r.get('updated_at') or now_iso) for r in results if r.get('status') == 'ok'}
+    for item in rows:
+        if str(item['id']) in saved_ids:
+            changes = {
+                "qty_fisik": item['qty_fisik'], "jenis": item['jenis'], "keterangan": item['keterangan'] or None,
+                "updated_by": nama_user, "updated_at": saved_at[str(item['id'])]
+            }
+            publish_row_change(item['id'], changes)
+            # Snapshot/loaded_time belum tentu diperbarui (tidak ada rerun saat ada konflik): ingat nilai tersimpan
+            synced[str(item['id'])] = changes
+    st.session_state[GRID_SYNCED_KEY] = synced
+
+    conflicts = {
+        str(r['id']): (r.get('updated_by'), r.get('updated_at'))
+        for r in results if r.get('status') == 'conflict'
+    }
+
+    # FIX V1.53: Unit = kenaikan qty dibanding data yang dimuat
+    current = st.session_state.get('current_df')
+    before = current.set_index(current['id'].astype(str))[['qty_fisik', 'gr_number']].to_dict('index') if current is not None and not current.empty else {}
+    units = sum(max(int(item['qty_fisik'] or 0) - int(before.get(str(item['id']), {}).get('qty_fisik') or 0), 0) for item in rows if str(item['id']) in saved_ids)
+    gr_number = next((before[str(item['id'])]['gr_number'] for item in rows if str(item['id']) in before), None)
+    record_checker_metric("bulk_save", gr_number, nama_user, units, lines=saved, latency_start=save_start)
+    return saved, conflicts
+
+def _utc_timestamps(values):
+    """Series timestamp (string ISO/None) ke datetime UTC; kosong/tidak valid = epoch (seperti parse_supabase_timestamp)"""
+    parsed = pd.to_datetime(pd.Series(values, dtype="object"), utc=True, errors="coerce", format="ISO8601")
+    return parsed.fillna(pd.Timestamp(0, tz="UTC")).to_numpy()
+
+def apply_grid_synced(df_non):
+    """
+    Timpa baris yang sudah tersimpan dari grid tapi belum ada di snapshot (updated_at snapshot lebih lama),
+    agar tidak muncul lagi di diff dan tidak dilaporkan sebagai konflik milik sendiri.
+    """
+    synced = st.session_state.get(GRID_SYNCED_KEY)
+    if not synced or df_non.empty:
+        return df_non
+    ids = df_non['id'].astype(str)
+    saved = pd.DataFrame.from_dict(synced, orient='index', dtype=object).reindex(ids.values)
+    has_saved = saved['updated_at'].notna().to_numpy()
+    stale = has_saved & (_utc_timestamps(df_non['updated_at']) < _utc_timestamps(saved['updated_at']))
+
+    # Snapshot sudah memuat simpanan kita (atau yang lebih baru)
+    for item_id in ids[has_saved & ~stale]:
+        synced.pop(item_id, None)
+    if not stale.any():
+        return df_non
+
+    df_non = df_non.copy()
+    for col in NON_SN_GRID_COLS + ['updated_by', 'updated_at']:
+        values = pd.Series(saved[col].to_numpy(dtype=object), index=df_non.index)
+        df_non[col] = df_non[col].astype(object).where(~stale, values).infer_objects()
+    return df_non
+
+def render_non_sn_grid(df_non, nama_user, loaded_time):
+    """Grid spreadsheet untuk Non-SN: edit banyak baris, simpan sekali"""
+    conflicts = st.session_state.get(GRID_CONFLICTS_KEY, {})
+    df_non = apply_grid_synced(df_non)
+
+    df_grid = df_non[['id', 'sku', 'nama_barang', 'qty_po'] + NON_SN_GRID_COLS].copy()
+    df_grid['keterangan'] = df_grid['keterangan'].fillna('')
+    df_grid['status_simpan'] = df_grid['id'].astype(str).map(
+        lambda x: f"⚠️ Konflik: diubah {conflicts[x][0]}" if x in conflicts else ""
+    )
+
+    df_edited = st.data_editor(
+        df_grid,
+        key="non_sn_grid_editor",
+        hide_index=True,
+        use_container_width=True,
+        disabled=['id', 'sku', 'nama_barang', 'qty_po', 'status_simpan'],
+        column_order=['sku', 'nama_barang', 'qty_po', 'qty_fisik', 'jenis', 'keterangan', 'status_simpan'],
+        column_config={
+            'sku': "SKU",
+            'nama_barang': "Nama Barang",
+            'qty_po': "Qty PO",
+            'qty_fisik': st.column_config.NumberColumn("Qty Fisik", min_value=0, step=1),
+            'jenis': st.column_config.SelectboxColumn("Alokasi", options=['Stok', 'Display'], required=True),
+            'keterangan': st.column_config.TextColumn("Keterangan"),
+            'status_simpan': "Status",
+        },
+    )
+
+    df_diff = compute_non_sn_diff(df_non, df_edited)
+    st.caption(f"{len(df_diff)} baris berubah.")
+
+    if st.button(f"💾 SIMPAN {len(df_diff)} PERUBAHAN", type="primary", disabled=df_diff.empty, key="btn_save_grid", use_container_width=True):
+        saved, conflicts = handle_bulk_update_non_sn(df_diff, nama_user, loaded_time)
+        st.session_state[GRID_CONFLICTS_KEY] = conflicts
+        if conflicts:
+            st.error(f"⚠️ {len(conflicts)} baris KONFLIK (diubah checker lain setelah data dimuat). {saved} baris lain tersimpan. Muat ulang untuk melihat data terbaru.")
+        else:
+            st.toast(f"✅ {saved} baris Non-SN disimpan!", icon="💾")
+            st.session_state.pop("non_sn_grid_editor", None)
+            time.sleep(0.5)
+            st.rerun()
+
+# --- FIX V1.30: LOGIKA MODE SCAN KONTINU ---
+
+def build_scan_index(df_sn):
+    """Membuat index kode barang (SKU/EAN) dan pola SN per baris untuk routing scan"""
+    code_index = {}
+    for col in ['sku', 'ean', 'barcode']:
+        if col not in df_sn.columns:
+            continue
+        codes = df_sn[col].fillna('').astype(str).str.strip().str.upper()
+        for code, item_id in zip(codes, df_sn['id']):
+            if code:
+                code_index.setdefault(code, item_id)
+
+    pattern_index = []
+    for sku, item_id in zip(df_sn['sku'], df_sn['id']):
+        pattern = SN_PATTERN_RULES.get(str(sku).strip()) or SN_VALIDATION_RULES.get("SKU", {}).get(str(sku).strip(), {}).get("regex")
+        if pattern:
+            try:
+                pattern_index.append((re.compile(pattern), item_id))
+            except re.error as e:
+                logging.warning(f"Pola SN tidak valid untuk SKU {sku}: {e}")
+
+    return code_index, pattern_index
+
+def classify_scan(code, code_index, pattern_index, active_line_id):
+    """Menentukan apakah hasil scan adalah kode barang (ganti baris aktif) atau SN (masuk ke baris)"""
+    line_id = code_index.get(code.upper())
+    if line_id is not None:
+        return "line", line_id
+
+    # Routing berdasarkan pola SN per SKU, hanya jika pola menunjuk tepat satu baris
+    candidates = {item_id for pattern, item_id in pattern_index if pattern.fullmatch(code)}
+    if len(candidates) == 1:
+        return "serial", candidates.pop()
+
+    return "serial", active_line_id
+
+def _on_continuous_scan():
+    """Callback input scan: dipanggil sekali per scan (Enter dari scanner)"""
+    code = st.session_state.get("continuous_scan_input", "").strip()
+    st.session_state["continuous_scan_input"] = ""
+    if not code:
+        return
+
+    code_index, pattern_index = st.session_state.get("continuous_scan_index", ({}, []))
+    buffer = st.session_state.setdefault(SCAN_BUFFER_KEY, {})
+    log = st.session_state.setdefault(SCAN_LOG_KEY, [])
+
+    kind, line_id = classify_scan(code, code_index, pattern_index, st.session_state.get(SCAN_ACTIVE_LINE_KEY))
+    if kind == "line":
+        st.session_state[SCAN_ACTIVE_LINE_KEY] = line_id
+        log.append(f"🔀 Baris aktif: {code}")
+    elif line_id is None:
+        log.append(f"❓ `{code}` dilewati: scan SKU/EAN barang terlebih dahulu.")
+    else:
+        st.session_state[SCAN_ACTIVE_LINE_KEY] = line_id
+        line_row = _current_line(line_id)
+        if line_row:
+            st.session_state.setdefault(SCAN_LINE_NAMES_KEY, {})[line_id] = line_row['nama_barang']
+        line_buffer = buffer.setdefault(line_id, [])
+        if code in line_buffer:
+            log.append(f"⚠️ `{code}` sudah ada di buffer.")
+        else:
+            line_buffer.append(code)
+            log.append(f"✅ {code}")
+
+    del log[:-10] # Simpan 10 log terakhir saja
+
+def _current_line(item_id):
+    """Mengambil baris terbaru dari snapshot session (sudah termasuk hasil flush sebelumnya)"""
+    df_current = st.session_state.get('current_df')
+    if df_current is None:
+        return None
+    match = df_current.loc[df_current['id'] == item_id]
+    return None if match.empty else match.iloc[0].to_dict()
+
+def _scan_line_label(item_id):
+    row = _current_line(item_id)
+    if row:
+        return row['nama_barang']
+    return st.session_state.get(SCAN_LINE_NAMES_KEY, {}).get(item_id, f"Barang tidak dikenal ({item_id})")
+
+def scan_buffer_blocked(loaded_time):
+    """Baris buffer yang konflik dan data belum dimuat ulang sejak itu (tidak di-flush otomatis)"""
+    conflicts = st.session_state.get(SCAN_CONFLICTS_KEY, {})
+    for item_id in [i for i, at in conflicts.items() if loaded_time > at]:
+        conflicts.pop(item_id) # Data sudah dimuat ulang: boleh dicoba lagi
+    return set(conflicts)
+
+def flush_scan_buffer(nama_user, loaded_time):
+    """Menyimpan isi buffer scan, satu update per baris barang. Baris yang konflik dilewati sampai data dimuat ulang."""
+    buffer = st.session_state.get(SCAN_BUFFER_KEY, {})
+    synced_at = st.session_state.setdefault(SCAN_SYNCED_AT_KEY, {})
+    conflicts = st.session_state.setdefault(SCAN_CONFLICTS_KEY, {})
+    blocked = scan_buffer_blocked(loaded_time)
+    saved_lines, saved_sns, failed_lines, rejected_lines = 0, 0, [], []
+
+    for item_id in list(buffer.keys()):
+        if item_id in blocked:
+            continue
+        row = _current_line(item_id)
+        if row is None:
+            failed_lines.append(_scan_line_label(item_id))
+            conflicts[item_id] = loaded_time
+            continue
+
+        current_sn_list = row.get('sn_list', []) or []
+        # FIX V1.31: Validasi buffer per baris dengan aturan SKU/Brand
+        validation = validate_serial_batch(buffer[item_id], get_sn_rule(row['sku'], row['nama_barang']), existing=current_sn_list)
+        new_sns = validation['valid']
+        if validation['rejected']:
+            rejected_lines.append((row['nama_barang'], validation))
+        if not new_sns:
+            buffer.pop(item_id)
+            continue
+
+        final_sn_list = current_sn_list + new_sns
+        # Baris yang sudah kita flush sebelumnya tidak boleh terdeteksi sebagai konflik
+        line_loaded_time = max(loaded_time, synced_at.get(item_id, loaded_time))
+        updates, conflict = handle_update_sn_list(
+            row, final_sn_list, row.get('jenis', 'Stok'), nama_user, line_loaded_time, row.get('keterangan') or ""
+        )
+
+        if conflict:
+            failed_lines.append(row['nama_barang'])
+            conflicts[item_id] = loaded_time
+            continue
+
+        if updates > 0:
+            synced_at[item_id] = datetime.now(timezone.utc)
+            df_current = st.session_state['current_df']
+            idx = df_current.index[df_current['id'] == item_id][0]
+            df_current.at[idx, 'sn_list'] = final_sn_list
+            df_current.at[idx, 'qty_fisik'] = len(final_sn_list)
+            saved_lines += 1
+            saved_sns += len(new_sns)
+        buffer.pop(item_id)
+
+    return saved_lines, saved_sns, failed_lines, rejected_lines
+
+@_fragment
+def render_continuous_scanner(df_sn, nama_user, loaded_time):
+    """FIX V1.30: Scanner kontinu, hanya fragment ini yang di-rerun per scan"""
+    st.session_state["continuous_scan_index"] = build_scan_index(df_sn)
+    buffer = st.session_state.setdefault(SCAN_BUFFER_KEY, {})
+
+    active_line_id = st.session_state.get(SCAN_ACTIVE_LINE_KEY)
+    active_row = _current_line(active_line_id) if active_line_id else None
+
+    st.text_input(
+        "Scan SKU/EAN untuk ganti barang, lalu scan SN",
+        key="continuous_scan_input",
+        on_change=_on_continuous_scan,
+        placeholder="Arahkan scanner ke sini..."
+    )
+
+    if active_row:
+        st.markdown(f"🎯 Barang aktif: **{active_row['sku']} - {active_row['nama_barang']}** (PO: {active_row['qty_po']} | Tercatat: {len(active_row.get('sn_list') or [])})")
+    else:
+        st.info("Scan SKU/EAN barang untuk memilih baris aktif.")
+
+    total_buffered = sum(len(sns) for sns in buffer.values())
+    # FIX V1.30: Buffer baris yang konflik tidak ikut memicu flush otomatis (pesan error tidak berulang tiap rerun)
+    blocked = scan_buffer_blocked(loaded_time)
+    pending_auto = sum(len(sns) for item_id, sns in buffer.items() if item_id not in blocked)
+    if blocked:
+        st.warning(f"⏸️ Buffer ditahan (konflik): {', '.join(_scan_line_label(i) for i in blocked)}. Muat ulang data untuk mencoba lagi.")
+    if pending_auto >= SCAN_FLUSH_BATCH or st.button(f"💾 Simpan Buffer Sekarang ({total_buffered} SN)", disabled=total_buffered == 0, key="flush_scan_btn"):
+        saved_lines, saved_sns, failed_lines, rejected_lines = flush_scan_buffer(nama_user, loaded_time)
+        if saved_sns:
+            st.toast(f"✅ {saved_sns} SN disimpan ke {saved_lines} barang.", icon="💾")
+        for nama_barang, validation in rejected_lines:
+            st.warning(f"{nama_barang}\n\n{format_validation_summary(validation)}")
+        if failed_lines:
+            st.error(f"Gagal simpan buffer untuk: {', '.join(failed_lines)}. Muat ulang data lalu simpan ulang buffer.")
+        total_buffered = sum(len(sns) for sns in buffer.values())
+
+    st.caption(f"Buffer: {total_buffered} SN (otomatis disimpan setiap {SCAN_FLUSH_BATCH} SN)")
+    for item_id, sns in buffer.items():
+        row = _current_line(item_id)
+        if row and sns:
+            st.caption(f"• {row['nama_barang']}: {len(sns)} SN menunggu")
+
+    for entry in reversed(st.session_state.get(SCAN_LOG_KEY, [])):
+        st.caption(entry)
+
+def _blind_payload(brand, sku, tipe_barang, final_qty, final_sn_list, jenis, keterangan, nama_user):
+    """Payload 1 baris Blind Receive (dipakai insert tunggal & batch FIX V1.54)"""
+    # Payload mapping user input to DB columns
+    return {
+        "sku": sku.strip(),          # User's input for SKU goes to DB SKU
+        "nama_barang": brand.strip(), # User's input for Brand goes to DB Nama Barang
+        "kategori_barang": tipe_barang, 
+        "qty_po": 0, 
+        "qty_fisik": final_qty,
+        "jenis": jenis,
+        "keterangan": f"BLIND RECEIVE ({nama_user}): {keterangan}",
+        "updated_by": nama_user,
+        "is_active": True,
+        "gr_number": BLIND_GR,
+        "sn_list": json.dumps(final_sn_list) if final_sn_list is not None else None,
+        "is_inbound": False # FIX V1.23: Item Blind Receive juga perlu ditandai Inbound
+    }
+
+def handle_blind_insert(brand, sku, qty, sn_list, tipe_barang, jenis, keterangan, nama_user):
+    """Menangani INSERT barang tanpa dokumen (Blind Receive)"""
+    
+    if not brand or not sku or not keterangan.strip():
+        return False, "Brand, SKU, dan Keterangan wajib diisi."
+        
+    if tipe_barang == 'SN':
+        if not sn_list: return False, "Untuk barang SN, Serial Number wajib diisi."
+        # FIX V1.31: SN Blind Receive juga melewati engine validasi
+        validation = validate_serial_batch(sn_list, get_sn_rule(sku, brand))
+        if validation['rejected']:
+            return False, format_validation_summary(validation)
+        final_qty = len(validation['valid'])
+        final_sn_list = validation['valid']
+    else:
+        if qty <= 0: return False, "Quantity Fisik harus lebih dari 0."
+        final_qty = qty
+        final_sn_list = None # DB expects None for NON-SN sn_list
+
+    save_start = time.perf_counter() # FIX V1.53
+    try:
+        payload = _blind_payload(brand, sku, tipe_barang, final_qty, final_sn_list, jenis, keterangan, nama_user)
+        inserted = db_execute(supabase.table(RECEIVING_TABLE).insert(_with_site(payload)), idempotent=False).data
+        if inserted:
+            log_row_change(inserted[0]['id'], payload, BLIND_GR, event_type="INSERT") # FIX V1.47
+        invalidate_gr_snapshot(BLIND_GR) # FIX V1.37
+        record_checker_metric("blind", BLIND_GR, nama_user, final_qty, latency_start=save_start)
+        return True, "Barang tanpa dokumen berhasil diregistrasi!"
+
+    except APIError as api_e:
+        record_checker_metric("blind", BLIND_GR, nama_user, 0, latency_start=save_start, ok=False)
+        error_msg = f"API Error: {api_e.message}. Status Code: {api_e.code}" if hasattr(api_e, 'message') else str(api_e)
+        st.error(f"❌ Gagal Registrasi Blind Receive. DETAIL: {error_msg}")
+        return False, "Terjadi kesalahan database (RLS/API)."
+    except Exception as e:
+        return False, f"Error umum: {str(e)}"
+
+# --- FIX V1.54: BLIND RECEIVE MULTI BARIS (KARTON CAMPUR) ---
+
+BLIND_BATCH_COLUMNS = ['Brand', 'SKU', 'Tipe Barang', 'Qty', 'SN', 'Tujuan', 'Keterangan']
+BLIND_BATCH_KEY = "blind_batch_lines"
+BLIND_BATCH_RESULT_KEY = "blind_batch_result"
+BLIND_BATCH_MAX_LINES = 500 # 1 request insert = 1 statement (atomik); lebih dari ini dipecah oleh user
+_SN_SPLIT_RE = re.compile(r"[\s,;]+")
+
+def blind_batch_template():
+    return pd.DataFrame([{col: None for col in BLIND_BATCH_COLUMNS}]).astype(object)
+
+def read_blind_batch_file(uploaded):
+    """Sheet/CSV upload -> DF kolom BLIND_BATCH_COLUMNS (header dicocokkan tanpa beda huruf besar/kecil)"""
+    df = pd.read_csv(uploaded, dtype=str) if uploaded.name.lower().endswith(".csv") else pd.read_excel(uploaded, dtype=str)
+    by_name = {str(c).strip().lower(): c for c in df.columns}
+    aliases = {'Tipe Barang': ['tipe barang', 'tipe'], 'Tujuan': ['tujuan', 'tujuan (stok/display)', 'jenis'], 'SN': ['sn', 'sn list', 'serial number']}
+    out = pd.DataFrame(index=df.index)
+    for col in BLIND_BATCH_COLUMNS:
+        source = next((by_name[name] for name in aliases.get(col, [col.lower()]) if name in by_name), None)
+        out[col] = df[source] if source is not None else None
+    return out.astype(object).where(out.notna(), None)
+
+SQL_SETUP_SCRIPTS["V1.54 - Blind Receive Multi Baris"] = f"""
+-- SN (upper) per baris sebagai jsonb untuk GIN index: cek duplikat cukup membaca baris yang memuat SN yang dikirim
+create or replace function receiving_sn_keys(p_sn_list text)
+returns jsonb
+language sql immutable as $$
+    select coalesce(jsonb_agg(upper(sn)), '[]'::jsonb)
+      from jsonb_array_elements_text(case when p_sn_list like '[%' then p_sn_list::jsonb else '[]'::jsonb end) as t(sn)
+$$;
+create index if not exists {RECEIVING_TABLE}_sn_keys_idx on {RECEIVING_TABLE}
+    using gin (receiving_sn_keys(sn_list)) where is_active and kategori_barang = 'SN';
+
+create or replace function receiving_recorded_serials(p_serials jsonb, p_site text)
+returns table (sn text, gr_number text)
+language sql stable as $$
+    select k.sn, r.gr_number
+      from {RECEIVING_TABLE} r
+      cross join lateral jsonb_array_elements_text(receiving_sn_keys(r.sn_list)) as k(sn)
+     where r.is_active and r.kategori_barang = 'SN'
+       and (p_site is null or r.site_code = p_site)
+       and receiving_sn_keys(r.sn_list) ?| array(select jsonb_array_elements_text(p_serials))
+       and p_serials ? k.sn
+     order by r.id, k.sn
+$$;
+"""
+
+def _fetch_recorded_serials(serials, site_code=None):
+    """
+    SN (dari serials) yang sudah tercatat di baris SN aktif (site ini): {SN upper: gr_number}.
+    RPC V1.54 hanya membaca baris yang memuat SN tersebut (GIN index); fallback membaca semua baris SN aktif.
+    """
+    wanted = sorted({str(sn).strip().upper() for sn in serials if str(sn).strip()})
+    if not wanted:
+        return {}
+    site_code = site_code or get_current_site()
+    try:
+        rows = _fetch_rows_paged(lambda: supabase.rpc("receiving_recorded_serials", {"p_serials": wanted, "p_site": site_code}), max_rows=10**6)
+        return {r['sn']: r['gr_number'] for r in rows}
+    except APIError as api_e:
+        if getattr(api_e, 'code', None) != 'PGRST202':
+            raise
+    rows = _fetch_rows_paged(lambda: _site_filter(supabase.table(RECEIVING_TABLE).select("id, gr_number, sn_list").eq(
+        "is_active", True).eq("kategori_barang", "SN"), site_code).order("id"), max_rows=10**6)
+    wanted = set(wanted)
+    return {key: r['gr_number'] for r in rows for key in (str(sn).strip().upper() for sn in _deserialize_sn_list(r.get('sn_list'))) if key in wanted}
+
+def _blind_cell(value):
+    return "" if value is None or (isinstance(value, float) and np.isnan(value)) else str(value).strip()
+
+def validate_blind_batch(df_lines, nama_user, default_keterangan="", recorded_sn=None):
+    """
+    Validasi semua baris sekaligus. SN dicek terhadap aturan SN, baris lain di batch, dan SN yang sudah tercatat.
+    Return (payloads, report): payload per baris valid (urutan input) & laporan per baris (Baris, SKU, Status, Detail).
+    """
+    recorded_sn = recorded_sn or {}
+    seen_sn = {} # SN upper -> nomor baris batch yang pertama memakai
+    payloads, report = [], []
+
+    for line_no, line in enumerate(df_lines.to_dict('records'), start=1):
+        brand, sku = _blind_cell(line.get('Brand')), _blind_cell(line.get('SKU'))
+        serials = [sn for sn in _SN_SPLIT_RE.split(_blind_cell(line.get('SN'))) if sn]
+        qty_text = _blind_cell(line.get('Qty'))
+        if not brand and not sku and not serials and not qty_text:
+            continue # Baris kosong dari editor
+
+        tipe = _blind_cell(line.get('Tipe Barang')).upper() or ('SN' if serials else 'NON-SN')
+        jenis = _blind_cell(line.get('Tujuan')).title() or 'Stok'
+        keterangan = _blind_cell(line.get('Keterangan')) or default_keterangan.strip()
+        errors = []
+
+        if not brand or not sku or not keterangan:
+            errors.append("Brand, SKU, dan Keterangan wajib diisi")
+        if tipe not in ('SN', 'NON-SN'):
+            errors.append(f"Tipe Barang '{tipe}' tidak dikenal (SN/NON-SN)")
+        if jenis not in ('Stok', 'Display'):
+            errors.append(f"Tujuan '{jenis}' tidak dikenal (Stok/Display)")
+
+        final_qty, final_sn_list = 0, None
+        if tipe == 'SN':
+            if not serials:
+                errors.append("Untuk barang SN, Serial Number wajib diisi")
+            else:
+                existing = [sn for sn in serials if sn.upper() in recorded_sn]
+                validation = validate_serial_batch(serials, get_sn_rule(sku, brand), existing=existing)
+                if validation['rejected']:
+                    detail = re.sub(r"[*`]", "", format_validation_summary(validation)).replace("\n", " ")
+                    if existing:
+                        detail += " · Tercatat di: " + ", ".join(sorted({recorded_sn[sn.upper()] for sn in existing}))
+                    errors.append(detail)
+                in_batch = [sn for sn in validation['valid'] if sn.upper() in seen_sn]
+                if in_batch:
+                    errors.append(f"SN sudah ada di baris {', '.join(sorted({str(seen_sn[sn.upper()]) for sn in in_batch}))}: {', '.join(in_batch[:5])}")
+                for sn in validation['valid']:
+                    seen_sn.setdefault(sn.upper(), line_no)
+                final_qty, final_sn_list = len(validation['valid']), validation['valid']
+        elif tipe == 'NON-SN':
+            try:
+                final_qty = int(float(qty_text or 0))
+            except ValueError:
+                final_qty = 0
+            if final_qty <= 0:
+                errors.append("Quantity Fisik harus lebih dari 0")
+
+        report.append({"Baris": line_no, "SKU": sku, "Tipe": tipe, "Qty": final_qty, "Status": "❌ Ditolak" if errors else "✅ Valid", "Detail": " | ".join(errors)})
+        if not errors:
+            payloads.append((line_no, _blind_payload(brand, sku, tipe, final_qty, final_sn_list, jenis, keterangan, nama_user)))
+
+    return payloads, report
+
+def handle_blind_batch_insert(df_lines, nama_user, default_keterangan="", skip_invalid=False):
+    """
+    FIX V1.54: Registrasi banyak baris Blind Receive dalam satu insert (atomik, maks. BLIND_BATCH_MAX_LINES baris).
+    Default semua-atau-tidak: jika ada baris ditolak, tidak ada yang di-insert. Return (jumlah tersimpan, laporan per baris).
+    """
+    save_start = time.perf_counter()
+    try:
+        serials = [sn for value in df_lines.get('SN', pd.Series(dtype=object)) for sn in _SN_SPLIT_RE.split(_blind_cell(value)) if sn]
+        recorded_sn = _fetch_recorded_serials(serials, get_current_site())
+    except Exception as e:
+        return 0, [{"Baris": "-", "SKU": "", "Tipe": "", "Qty": 0, "Status": "❌ Gagal", "Detail": f"Gagal membaca SN tercatat: {e}"}]
+
+    payloads, report = validate_blind_batch(df_lines, nama_user, default_keterangan, recorded_sn)
+    rejected = sum(1 for r in report if r['Status'] != "✅ Valid")
+    if not payloads or (rejected and not skip_invalid):
+        return 0, report
+    if len(payloads) > BLIND_BATCH_MAX_LINES:
+        for r in report:
+            if r['Status'] == "✅ Valid":
+                r['Status'], r['Detail'] = "❌ Ditolak", f"Batch maksimal {BLIND_BATCH_MAX_LINES} baris, pecah menjadi beberapa submit"
+        return 0, report
+
+    try:
+        # Satu request insert = satu statement di PostgreSQL: semua baris masuk atau tidak sama sekali
+        inserted = db_execute(supabase.table(RECEIVING_TABLE).insert([_with_site(p) for _, p in payloads]), idempotent=False).data or []
+    except APIError as api_e:
+        error_msg = f"API Error: {api_e.message}. Status Code: {api_e.code}" if hasattr(api_e, 'message') else str(api_e)
+        record_checker_metric("blind", BLIND_GR, nama_user, 0, lines=len(payloads), latency_start=save_start, ok=False)
+        for r in report:
+            if r['Status'] == "✅ Valid":
+                r['Status'], r['Detail'] = "❌ Gagal", error_msg
+        return 0, report
+
+    for row, (_, payload) in zip(inserted, payloads):
+        log_row_change(row['id'], payload, BLIND_GR, event_type="INSERT") # FIX V1.47
+    invalidate_gr_snapshot(BLIND_GR) # FIX V1.37
+    record_checker_metric("blind", BLIND_GR, nama_user, sum(p['qty_fisik'] for _, p in payloads), lines=len(payloads), latency_start=save_start)
+    for r in report:
+        if r['Status'] == "✅ Valid":
+            r['Status'] = "✅ Tersimpan"
+    return len(inserted), report
+
+def render_blind_batch(final_nama_user):
+    """Form multi baris: ketik/tempel (copy dari Excel) di grid atau upload sheet, lalu 1x submit"""
+    uploaded = st.file_uploader("Upload Sheet (opsional, kolom: " + ", ".join(BLIND_BATCH_COLUMNS) + ")", type=["xlsx", "csv"], key="blind_batch_file")
+    file_id = f"{uploaded.name}-{uploaded.size}" if uploaded is not None else None
+    if file_id and st.session_state.get("blind_batch_loaded_file") != file_id:
+        try:
+            st.session_state[BLIND_BATCH_KEY] = read_blind_batch_file(uploaded)
+            st.session_state["blind_batch_loaded_file"] = st.session_state["blind_batch_file_id"] = file_id
+        except Exception as e:
+            st.error(f"Gagal membaca file: {e}")
+
+    base = st.session_state.get(BLIND_BATCH_KEY)
+    edited = st.data_editor(
+        base if base is not None else blind_batch_template(),
+        key=f"blind_batch_editor_{st.session_state.get('blind_batch_file_id', '')}",
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'Brand': st.column_config.TextColumn("Brand"),
+            'SKU': st.column_config.TextColumn("SKU"),
+            'Tipe Barang': st.column_config.SelectboxColumn("Tipe Barang", options=['NON-SN', 'SN']),
+            'Qty': st.column_config.TextColumn("Qty (Non-SN)"),
+            'SN': st.column_config.TextColumn("SN (pisah spasi/koma)", width="large"),
+            'Tujuan': st.column_config.SelectboxColumn("Tujuan", options=['Stok', 'Display']),
+            'Keterangan': st.column_config.TextColumn("Keterangan"),
+        },
+    )
+    st.caption("Tipe kosong = SN jika kolom SN terisi. Tujuan kosong = Stok. Keterangan kosong memakai keterangan umum.")
+
+    col_notes, col_skip = st.columns([3, 1])
+    default_keterangan = col_notes.text_input("Keterangan Umum (dipakai baris tanpa keterangan)", key="blind_batch_notes")
+    skip_invalid = col_skip.checkbox("Lewati baris ditolak", key="blind_batch_skip", help="Jika tidak dicentang, batch hanya disimpan jika SEMUA baris valid.")
+
+    if st.button("➕ REGISTRASI SEMUA BARIS", type="secondary", use_container_width=True, key="btn_blind_batch"):
+        with st.spinner("Validasi & menyimpan batch..."):
+            saved, report = handle_blind_batch_insert(edited, final_nama_user, default_keterangan, skip_invalid)
+        st.session_state[BLIND_BATCH_RESULT_KEY] = {"saved": saved, "report": report}
+        if saved:
+            # Grid dikosongkan; laporan tetap tampil setelah rerun
+            st.session_state.pop(BLIND_BATCH_KEY, None)
+            st.session_state["blind_batch_file_id"] = f"done-{time.time()}"
+            st.rerun()
+
+    result = st.session_state.get(BLIND_BATCH_RESULT_KEY)
+    if result:
+        rejected = sum(1 for r in result['report'] if r['Status'].startswith("❌"))
+        if result['saved']:
+            st.success(f"✅ {result['saved']} baris Blind Receive tersimpan dalam 1 batch." + (f" {rejected} baris dilewati." if rejected else ""))
+        elif result['report']:
+            st.error(f"Tidak ada yang disimpan: {rejected} baris ditolak. Perbaiki baris di bawah lalu submit ulang.")
+        else:
+            st.info("Tidak ada baris yang diisi.")
+        if result['report']:
+            st.dataframe(pd.DataFrame(result['report']), use_container_width=True, hide_index=True)
+
+# --- FIX V1.42: REKONSILIASI OTOMATIS BLIND RECEIVE vs BARIS SHORT ---
+
+RECON_FUZZY_MIN_SCORE = 0.8
+RECON_PROPOSALS_KEY = "blind_recon_proposals"
+RECON_MAX_ROWS = int(st.secrets.get("RECON_MAX_ROWS", 50000)) # Batas baris aktif yang dibaca (per halaman max-rows PostgREST)
+RECON_COLS = "id, gr_number, sku, nama_barang, kategori_barang, qty_po, qty_fisik, sn_list, updated_at"
+_SKU_CONFUSABLES = str.maketrans({"O": "0", "I": "1", "L": "1", "S": "5", "B": "8", "Z": "2"})
+
+SQL_SETUP_SCRIPTS["V1.42 - Rekonsiliasi Blind Receive"] = f"""
+-- Satu transaksi untuk semua match yang disetujui. sn_list disimpan sebagai teks JSON.
+create or replace function receiving_apply_blind_matches(p_matches jsonb, p_operator text)
+returns table (blind_id uuid, line_id uuid, status text)
+language plpgsql as $$
+#variable_conflict use_column
+declare
+    m jsonb; b record; l record; moved jsonb; qty integer;
+    b_sn jsonb; l_sn jsonb;
+begin
+    for m in select * from jsonb_array_elements(p_matches) loop
+        blind_id := (m->>'blind_id')::uuid; line_id := (m->>'line_id')::uuid;
+        qty := (m->>'qty')::integer; moved := coalesce(m->'serials', '[]'::jsonb);
+
+        select * into b from {RECEIVING_TABLE} r where r.id = blind_id and r.gr_number = '{BLIND_GR}' and r.is_active for update;
+        select * into l from {RECEIVING_TABLE} r where r.id = line_id and r.is_active for update;
+        b_sn := coalesce(nullif(b.sn_list, '')::jsonb, '[]'::jsonb);
+        l_sn := coalesce(nullif(l.sn_list, '')::jsonb, '[]'::jsonb);
+
+        -- Data berubah sejak proposal dibuat, atau baris tujuan tidak lagi SHORT: lewati, dilaporkan ke admin.
+        -- updated_at = now() berarti baris ditulis match sebelumnya di transaksi ini (bukan perubahan orang lain).
+        if b.id is null or l.id is null or b.qty_fisik < qty or not b_sn @> moved
+           or coalesce(l.qty_fisik, 0) + qty > l.qty_po
+           or (l.updated_at is distinct from (m->>'line_updated_at')::timestamptz and l.updated_at is distinct from now())
+           or (b.updated_at is distinct from (m->>'blind_updated_at')::timestamptz and b.updated_at is distinct from now()) then
+            status := 'stale'; return next; continue;
+        end if;
+
+        update {RECEIVING_TABLE} r
+           set qty_fisik = coalesce(r.qty_fisik, 0) + qty,
+               sn_list = case when jsonb_array_length(moved) > 0 then (
+                   l_sn || coalesce((select jsonb_agg(e) from jsonb_array_elements(moved) e where not l_sn @> jsonb_build_array(e)), '[]'::jsonb)
+               )::text else r.sn_list end,
+               keterangan = concat_ws(' | ', nullif(r.keterangan, ''), 'REKONSILIASI BLIND RECEIVE (' || p_operator || ')'),
+               updated_by = p_operator, updated_at = now()
+         where r.id = line_id;
+
+        if b.qty_fisik - qty <= 0 then
+            delete from {RECEIVING_TABLE} r where r.id = blind_id;
+        else
+            update {RECEIVING_TABLE} r
+               set qty_fisik = r.qty_fisik - qty,
+                   sn_list = case when jsonb_array_length(moved) > 0 then coalesce(
+                       (select jsonb_agg(e) from jsonb_array_elements(b_sn) e where not moved @> jsonb_build_array(e)), '[]'::jsonb
+                   )::text else r.sn_list end,
+                   updated_by = p_operator, updated_at = now()
+             where r.id = blind_id;
+        end if;
+        status := 'ok'; return next;
+    end loop;
+end $$;
+"""
+
+def normalize_sku(sku):
+    """Huruf besar, hanya alfanumerik (spasi/strip/titik diabaikan)"""
+    return re.sub(r"[^0-9A-Z]", "", str(sku or "").upper())
+
+def _sku_deletes(key):
+    """Semua varian dengan 1 karakter dihapus (indeks symmetric-delete, edit distance 1)"""
+    return {key[:i] + key[i+1:] for i in range(len(key))}
+
+class SkuMatchIndex:
+    """Indeks hash SKU baris SHORT: exact, tanpa karakter mirip (O/0, I/1, ...), dan edit distance 1"""
+
+    def __init__(self, lines):
+        self.exact, self.confusable, self.deletes = {}, {}, {}
+        for line in lines:
+            key = normalize_sku(line['sku'])
+            if not key:
+                continue
+            self.exact.setdefault(key, []).append(line)
+            self.confusable.setdefault(key.translate(_SKU_CONFUSABLES), []).append(line)
+            for variant in _sku_deletes(key) | {key}:
+                self.deletes.setdefault(variant, []).append(line)
+
+    def candidates(self, sku):
+        """Return [(skor, baris)]: 1.0 exact, selain itu skor kemiripan (difflib) untuk kandidat dari indeks"""
+        key = normalize_sku(sku)
+        if not key:
+            return []
+        if key in self.exact:
+            return [(1.0, line) for line in self.exact[key]]
+
+        found = {}
+        for line in self.confusable.get(key.translate(_SKU_CONFUSABLES), []):
+            found[line['id']] = (0.95, line)
+        for variant in _sku_deletes(key) | {key}:
+            for line in self.deletes.get(variant, []):
+                if line['id'] not in found:
+                    ratio = difflib.SequenceMatcher(None, key, normalize_sku(line['sku'])).ratio()
+                    found[line['id']] = (ratio, line)
+        return [c for c in found.values() if c[0] >= RECON_FUZZY_MIN_SCORE]
+
+def propose_blind_matches(df_active):
+    """
+    Satu pass: indeks SKU & SN dibangun sekali dari baris aktif, lalu tiap item Blind Receive dicari di indeks.
+    Return (proposals, duplicates). Proposal = pindahkan qty/SN dari baris blind ke baris GR yang SHORT.
+    """
+    if df_active.empty:
+        return [], []
+
+    records = df_active.to_dict('records')
+    blind_rows = [r for r in records if r['gr_number'] == BLIND_GR and int(r.get('qty_fisik') or 0) > 0]
+    gr_rows = [r for r in records if r['gr_number'] != BLIND_GR]
+
+    # SN yang sudah tercatat di GR mana pun -> duplikat, bukan kandidat pindah
+    recorded_sn = {}
+    for r in gr_rows:
+        for sn in (r.get('sn_list') or []):
+            recorded_sn[str(sn).strip().upper()] = r
+
+    short_lines = [r for r in gr_rows if int(r.get('qty_fisik') or 0) < int(r.get('qty_po') or 0)]
+    shortage = {r['id']: int(r['qty_po']) - int(r.get('qty_fisik') or 0) for r in short_lines}
+    index = SkuMatchIndex(short_lines)
+
+    proposals, duplicates = [], []
+    for blind in blind_rows:
+        serials = [str(sn).strip() for sn in (blind.get('sn_list') or [])]
+        if blind['kategori_barang'] == 'SN':
+            dup = [sn for sn in serials if sn.upper() in recorded_sn]
+            for sn in dup:
+                duplicates.append({"blind_id": blind['id'], "sku": blind['sku'], "serial": sn, "gr_number": recorded_sn[sn.upper()]['gr_number']})
+            serials = [sn for sn in serials if sn.upper() not in recorded_sn]
+            remaining = len(serials)
+        else:
+            remaining = int(blind['qty_fisik'])
+
+        blind_brand = normalize_sku(blind.get('nama_barang'))[:3]
+        candidates = [
+            (score + (0.01 if normalize_sku(line['nama_barang'])[:3] == blind_brand else 0), line)
+            for score, line in index.candidates(blind['sku'])
+            if line['kategori_barang'] == blind['kategori_barang']
+        ]
+        # Skor tertinggi dulu, lalu GR paling lama (urutan nama) agar deterministik
+        for score, line in sorted(candidates, key=lambda c: (-c[0], str(c[1]['gr_number']), str(c[1]['id']))):
+            if remaining <= 0:
+                break
+            capacity = shortage.get(line['id'], 0)
+            if capacity <= 0:
+                continue
+
+            moved = []
+            if blind['kategori_barang'] == 'SN':
+                # SN harus lolos aturan SN milik baris tujuan
+                validation = validate_serial_batch(serials, get_sn_rule(line['sku'], line['nama_barang']), line.get('sn_list') or [])
+                moved = validation['valid'][:capacity]
+                if not moved:
+                    continue
+                serials = [sn for sn in serials if sn not in set(moved)]
+                qty = len(moved)
+            else:
+                qty = min(remaining, capacity)
+
+            shortage[line['id']] -= qty
+            remaining -= qty
+            proposals.append({
+                "blind_id": blind['id'], "line_id": line['id'], "qty": qty, "serials": moved,
+                "score": round(min(score, 1.0), 2), "blind_sku": blind['sku'], "blind_brand": blind['nama_barang'],
+                "gr_number": line['gr_number'], "line_sku": line['sku'], "line_brand": line['nama_barang'],
+                "blind_updated_at": blind.get('updated_at'), "line_updated_at": line.get('updated_at'),
+            })
+    return proposals, duplicates
+
+def fetch_recon_rows(site_code=None):
+    """Baris aktif (Blind Receive + GR) untuk rekonsiliasi, dibaca per halaman. Return (DF, terpotong?)."""
+    rows = _fetch_rows_paged(
+        lambda: _site_filter(supabase.table(RECEIVING_TABLE).select(RECON_COLS).eq("is_active", True), site_code).order("id"),
+        RECON_MAX_ROWS
+    )
+    return _records_to_receiving_df(rows), len(rows) >= RECON_MAX_ROWS
+
+def _apply_blind_matches_fallback(matches, nama_user):
+    """Fallback tanpa RPC: per match, update bersyarat (updated_at belum berubah). TIDAK atomik antar match."""
+    results = []
+    written = {} # id -> updated_at yang kita tulis sendiri (match kedua pada baris yang sama tetap valid)
+    for m in matches:
+        now_iso = datetime.utcnow().isoformat()
+        rows = db_execute(supabase.table(RECEIVING_TABLE).select("*").in_("id", [m['blind_id'], m['line_id']])).data
+        by_id = {str(r['id']): r for r in rows}
+        blind, line = by_id.get(str(m['blind_id'])), by_id.get(str(m['line_id']))
+        if (not blind or not line
+                or int(line.get('qty_fisik') or 0) + m['qty'] > int(line.get('qty_po') or 0) # Tidak lagi SHORT
+                or str(blind.get('updated_at')) != str(written.get(str(m['blind_id']), m['blind_updated_at']))
+                or str(line.get('updated_at')) != str(written.get(str(m['line_id']), m['line_updated_at']))):
+            results.append({"blind_id": m['blind_id'], "line_id": m['line_id'], "status": "stale"})
+            continue
+
+        line_sn = _deserialize_sn_list(line.get('sn_list'))
+        line_payload = {
+            "qty_fisik": int(line['qty_fisik'] or 0) + m['qty'],
+            "keterangan": " | ".join(x for x in [line.get('keterangan'), f"REKONSILIASI BLIND RECEIVE ({nama_user})"] if x),
+            "updated_by": nama_user, "updated_at": now_iso,
+        }
+        if m['serials']:
+            line_payload["sn_list"] = json.dumps(line_sn + [sn for sn in m['serials'] if sn not in set(line_sn)])
+        line_query = supabase.table(RECEIVING_TABLE).update(line_payload).eq("id", m['line_id'])
+        line_query = line_query.eq("updated_at", line['updated_at']) if line.get('updated_at') else line_query.is_("updated_at", "null")
+        updated_line = db_execute(line_query, idempotent=False).data
+        if not updated_line:
+            results.append({"blind_id": m['blind_id'], "line_id": m['line_id'], "status": "stale"})
+            continue
+        written[str(m['line_id'])] = updated_line[0].get('updated_at')
+
+        blind_qty = int(blind['qty_fisik'] or 0) - m['qty']
+        if blind_qty <= 0:
+            db_execute(supabase.table(RECEIVING_TABLE).delete().eq("id", m['blind_id']))
+        else:
+            blind_payload = {"qty_fisik": blind_qty, "updated_by": nama_user, "updated_at": now_iso}
+            if m['serials']:
+                blind_payload["sn_list"] = json.dumps([sn for sn in _deserialize_sn_list(blind.get('sn_list')) if sn not in set(m['serials'])])
+            updated_blind = db_execute(supabase.table(RECEIVING_TABLE).update(blind_payload).eq("id", m['blind_id']), idempotent=False).data
+            written[str(m['blind_id'])] = updated_blind[0].get('updated_at') if updated_blind else None
+        results.append({"blind_id": m['blind_id'], "line_id": m['line_id'], "status": "ok"})
+    return results
+
+def apply_blind_matches(matches, nama_user):
+    """Terapkan match yang disetujui dalam 1 RPC (1 transaksi). Return (jumlah ok, jumlah stale)."""
+    if not matches:
+        return 0, 0
+    payload = [
+        {"blind_id": m['blind_id'], "line_id": m['line_id'], "qty": m['qty'], "serials": m['serials'],
+         "blind_updated_at": m['blind_updated_at'], "line_updated_at": m['line_updated_at']}
+        for m in matches
+    ]
+    try:
+        results = db_execute(supabase.rpc("receiving_apply_blind_matches", {"p_matches": payload, "p_operator": nama_user}), idempotent=False).data or []
+    except APIError as api_e:
+        if getattr(api_e, 'code', None) != 'PGRST202':
+            raise
+        logging.warning("RPC receiving_apply_blind_matches belum ada, memakai fallback per match.")
+        results = _apply_blind_matches_fallback(matches, nama_user)
+
+    # FIX V1.47: Catat perpindahan qty/SN ke event log (hanya delta, state akhir tidak diketahui di sini)
+    ok_pairs = {(str(r.get('blind_id')), str(r.get('line_id'))) for r in results if r.get('status') == 'ok'}
+    for m in matches:
+        if (str(m['blind_id']), str(m['line_id'])) in ok_pairs:
+            target_event = ("sn", {"added": m['serials']}) if m['serials'] else ("qty", {"delta": m['qty']})
+            blind_event = ("sn", {"removed": m['serials']}) if m['serials'] else ("qty", {"delta": -m['qty']})
+            log_line_events(m['line_id'], m['gr_number'], [target_event], nama_user)
+            log_line_events(m['blind_id'], BLIND_GR, [blind_event], nama_user)
+
+    # Write massal lintas GR: snapshot GR tujuan & Blind Receive dimuat ulang
+    for gr in {m['gr_number'] for m in matches} | {BLIND_GR}:
+        invalidate_gr_snapshot(gr)
+    ok = sum(1 for r in results if r.get('status') == 'ok')
+    return ok, len(results) - ok
+
+# --- FUNGSI HALAMAN ADMIN ---
+
+def update_inbound_status(item_id, current_gr, nama_user):
+    """FIX V1.23: Update status is_inbound menjadi True"""
+    try:
+        update_payload = {
+            "is_inbound": True,
+            "updated_by": f"INBOUND-{nama_user}",
+            "updated_at": datetime.utcnow().isoformat(),
+            "keterangan": f"INBOUND OK oleh {nama_user}."
+        }
+        
+        db_execute(supabase.table(RECEIVING_TABLE).update(update_payload).eq("id", item_id))
+        publish_row_change(item_id, update_payload, current_gr) # FIX V1.37
+        return True, f"Item {item_id} berhasil ditandai INBOUND."
+    except Exception as e:
+        return False, f"Gagal update status inbound: {str(e)}"
+
+# FIX V1.28: Operator Management tanpa Cabang
+def add_operator(operator_name, is_active=True):
+    """Menambahkan operator baru ke tabel store_operators"""
+    if not operator_name:
+        return False, "Nama Operator wajib diisi."
+    try:
+        payload = {
+            "operator_name": operator_name.strip(),
+            "is_active": is_active,
+        }
+        db_execute(supabase.table(OPERATORS_TABLE).insert(_with_site(payload)), idempotent=False) # FIX V1.40
+        get_snapshot_refresher().invalidate(f"operators:{get_current_site() or '-'}") # FIX V1.49
+        shared_cache_invalidate(f"operators:{get_current_site() or '-'}") # FIX V1.38
+        return True, f"Operator {operator_name} berhasil ditambahkan."
+    except Exception as e:
+        return False, f"Gagal menambahkan operator: {str(e)}"
+
+def delete_operator(operator_id):
+    """Menghapus operator dari tabel store_operators"""
+    try:
+        # Menandai non-aktif (Soft delete)
+        db_execute(supabase.table(OPERATORS_TABLE).update({"is_active": False}).eq("id", operator_id))
+        get_snapshot_refresher().invalidate(f"operators:{get_current_site() or '-'}") # FIX V1.49
+        shared_cache_invalidate(f"operators:{get_current_site() or '-'}") # FIX V1.38
+        return True, "Operator berhasil dinonaktifkan."
+    except Exception as e:
+        return False, f"Gagal menonaktifkan operator: {str(e)}"
+
+
+# --- FIX V1.45: TABEL PAGINASI SERVER-SIDE ---
+
+def query_page_fetcher(build_query, search_cols):
+    """Sumber halaman dari DB: filter ilike, sort & range dikerjakan PostgREST, hanya 1 halaman yang diambil"""
+    def fetch(offset, limit, sort_col, desc, search):
+        query = build_query(count="exact")
+        if search:
+            term = re.sub(r"[,()*%]", " ", search).strip() # Karakter sintaks filter or_ PostgREST
+            query = query.or_(",".join(f"{col}.ilike.*{term}*" for col in search_cols))
+        res = db_execute(query.order(sort_col, desc=desc).order("id").range(offset, offset + limit - 1))
+        return _records_to_receiving_df(res.data), res.count or 0
+    return fetch
+
+def frame_page_fetcher(df, search_cols):
+    """Sumber halaman dari DF yang sudah ada di server (mis. snapshot GR), hanya 1 halaman yang dikirim ke browser"""
+    def fetch(offset, limit, sort_col, desc, search):
+        view = df
+        if search:
+            mask = pd.Series(False, index=view.index)
+            for col in search_cols:
+                mask |= view[col].astype(str).str.contains(search, case=False, na=False, regex=False)
+            view = view[mask]
+        view = view.sort_values(sort_col, ascending=not desc, kind="stable")
+        return view.iloc[offset:offset + limit], len(view)
+    return fetch
+
+@_fragment
+def render_paginated_table(key, fetch, columns, sort_options, transform=None, actions=None):
+    """
+    Tabel dengan cari/sort/halaman. Hanya halaman aktif yang diambil & diserialisasi.
+    columns = {kolom: label} (urutan tampil), sort_options = kolom yang bisa di-sort di sumber data.
+    actions(df_page) dipanggil di dalam fragment yang sama untuk aksi per baris halaman aktif (FIX V1.45).
+    """
+    state = st.session_state.setdefault(f"ptable_{key}", {"page": 0, "sig": None})
+
+    c_search, c_sort, c_dir, c_size = st.columns([3, 2, 1, 1])
+    search = c_search.text_input("🔍 Cari", key=f"{key}_search", placeholder="SKU/Nama/Keterangan...").strip()
+    sort_col = c_sort.selectbox("Urutkan", sort_options, format_func=lambda c: columns.get(c, c), key=f"{key}_sort")
+    desc = c_dir.toggle("Z→A", key=f"{key}_desc")
+    page_size = c_size.selectbox("Baris", TABLE_PAGE_SIZES, key=f"{key}_size")
+
+    # Cari/sort/ukuran berubah = kembali ke halaman pertama
+    signature = (search, sort_col, desc, page_size)
+    if state["sig"] != signature:
+        state.update(page=0, sig=signature)
+
+    df_page, total = fetch(state["page"] * page_size, page_size, sort_col, desc, search)
+    n_pages = max(-(-total // page_size), 1)
+    if state["page"] >= n_pages: # Data berkurang sejak halaman dibuka
+        state["page"] = n_pages - 1
+        df_page, total = fetch(state["page"] * page_size, page_size, sort_col, desc, search)
+
+    if transform is not None and not df_page.empty:
+        df_page = transform(df_page.copy())
+    st.dataframe(df_page.reindex(columns=list(columns)).rename(columns=columns), use_container_width=True, hide_index=True)
+
+    def _go(delta):
+        state["page"] += delta
+
+    c_prev, c_info, c_next = st.columns([1, 3, 1])
+    c_prev.button("◀ Sebelumnya", key=f"{key}_prev", disabled=state["page"] == 0, on_click=_go, args=(-1,), use_container_width=True)
+    c_info.caption(f"Halaman {state['page'] + 1}/{n_pages} · {total} baris")
+    c_next.button("Berikutnya ▶", key=f"{key}_next", disabled=state["page"] >= n_pages - 1, on_click=_go, args=(1,), use_container_width=True)
+
+    if actions is not None and not df_page.empty:
+        actions(df_page)
+
+def _inbound_status_label(df):
+    df['Status Inbound'] = np.where(df['is_inbound'].fillna(False).astype(bool), "OK", "PENDING")
+    return df
+
+# --- SEKSI HALAMAN CHECKER (FIX V1.34: dieksekusi hanya jika dipilih) ---
+
+def section_checker_scan_sn(df_sn, final_nama_user, loaded_time):
+    """Seksi Pindai SN Cepat (Global SN Scanner)"""
+    if not df_sn.empty:
+        st.subheader("⚡ Pemindaian Global Serial Number (Scan Cepat)")
+
+        # FIX V1.30: Mode Scan Kontinu untuk karton campur
+        if st.toggle("🔁 Mode Scan Kontinu (Scan SKU/EAN lalu SN)", key="continuous_scan_mode"):
+            render_continuous_scanner(df_sn, final_nama_user, loaded_time)
+        else:
+            # Pilihan untuk Selectbox: SKU - Nama Barang (ID)
+            sn_select_options = ["-- Pilih Barang SN yang Sedang Anda Scan --"] + [
+                f"{row['sku']} - {row['nama_barang']} (PO: {row['qty_po']} | Tercatat: {len(row['sn_list'])}) (ID: {row['id'][:4]}...)" 
+                for _, row in df_sn.iterrows()
+            ]
+        
+            with st.form("global_sn_form", clear_on_submit=True):
+            
+                col_sku, col_jenis = st.columns([2, 1])
+            
+                selected_item_str = col_sku.selectbox(
+                    "Pilih Barang SN yang Sedang Anda Scan", 
+                    options=sn_select_options,
+                    key="global_sn_selector_tab1" # Updated Key
+                )
+
+                # Cari ID barang yang dipilih
+                selected_row = None
+                if "ID:" in selected_item_str:
+                    item_id_part = selected_item_str.split('(ID: ')[1].strip(')')
+                    selected_id_prefix = item_id_part.split('...')[0]
+                    selected_row_match = df_sn[df_sn['id'].str.startswith(selected_id_prefix)]
+                    if not selected_row_match.empty:
+                        selected_row = selected_row_match.iloc[0].to_dict()
+                
+                # Menggunakan jenis barang saat ini sebagai default radio
+                current_jenis = selected_row.get('jenis', 'Stok') if selected_row else 'Stok'
+                new_jenis = col_jenis.radio(
+                    "Tujuan Alokasi SN", 
+                    ['Stok', 'Display'], 
+                    index=['Stok', 'Display'].index(current_jenis),
+                    key="radio_jenis_tab1" # Updated Key
+                )
+            
+                st.markdown("##### 📝 Scan SN di Bawah (Satu SN per Baris)")
+            
+                col_scan, col_exist = st.columns([2, 1])
+            
+                # Input Area
+                batch_input = col_scan.text_area(
+                    "Scan SN List", 
+                    placeholder="Scan SN pertama...\nScan SN kedua...\n[Tekan Ctrl+Enter atau Tombol Simpan]",
+                    height=250
+                )
+            
+                # FIX V1.22: Display SN yang sudah tercatat
+                if selected_row:
+                    current_sn_list = selected_row.get('sn_list', [])
+                    if current_sn_list:
+                        sn_display = "\n".join(current_sn_list)
+                        col_exist.text_area(
+                            f"SN Sudah Tercatat ({len(current_sn_list)})",
+                            value=sn_display,
+                            height=250,
+                            disabled=True
+                        )
+                    else:
+                        col_exist.info("Belum ada SN tercatat.")
+
+
+                if st.form_submit_button("💾 SUBMIT & SIMPAN SN BATCH", type="primary", use_container_width=True):
+                
+                    if not selected_row:
+                        st.error("Pilih Barang SN yang valid terlebih dahulu.")
+                        st.stop()
+                    
+                    submitted_sns = [s.strip() for s in batch_input.split('\n') if s.strip()]
+                
+                    if not submitted_sns:
+                        st.warning("Tidak ada Serial Number yang dimasukkan.")
+                        st.stop()
+                
+                    # Pemrosesan Batch
+                    # FIX V1.31: Validasi + dedupe satu pass, satu ringkasan (bukan warning per SN)
+                    current_sn_list = selected_row.get('sn_list', [])
+                    validation = validate_serial_batch(
+                        submitted_sns, get_sn_rule(selected_row['sku'], selected_row['nama_barang']), existing=current_sn_list
+                    )
+                    final_sn_list = current_sn_list + validation['valid']
+                    new_count = len(validation['valid'])
+
+                    summary_text = format_validation_summary(validation)
+                    if summary_text:
+                        st.warning(summary_text)
+
+                    if new_count == 0:
+                        st.error("Tidak ada SN baru yang valid untuk disimpan.")
+                        st.stop()
+                
+                    # Keterangan diabaikan untuk Global Scan, hanya fokus pada SN/Jenis
+                    updates, conflict = handle_update_sn_list(
+                        selected_row, final_sn_list, new_jenis, final_nama_user, loaded_time, 
+                        selected_row.get('keterangan')
+                    )
+
+                    if not conflict and updates > 0:
+                        st.success(f"✅ {new_count} SN baru ditambahkan untuk **{selected_row['nama_barang']}**! Total: {len(final_sn_list)}")
+                        time.sleep(1) 
+                        st.rerun() 
+                    elif conflict:
+                         st.error("Gagal simpan SN. Silakan Muat Ulang Data lalu scan kembali.")
+    else:
+        st.info("Tidak ada item SN yang aktif dalam sesi ini.")
+
+
+def section_checker_non_sn(df_non, final_nama_user, loaded_time):
+    """Seksi Input Qty Non-SN"""
+    if not df_non.empty:
+        st.subheader(f"📦 Non-SN ({len(df_non)}) - Input Kuantitas")
+
+        # FIX V1.33: Mode grid untuk edit massal, satu kali simpan
+        if st.toggle("🧮 Mode Grid (Edit Massal)", key="non_sn_grid_mode"):
+            render_non_sn_grid(df_non, final_nama_user, loaded_time)
+        else:
+            for index, row in df_non.iterrows():
+                item_id = row['id']
+                qty_po = row['qty_po']
+                default_qty = row['qty_fisik']
+                default_jenis = row['jenis']
+                selisih_po = default_qty - qty_po
+            
+                status_text = "MATCH" if selisih_po == 0 else ("OVER" if selisih_po > 0 else "SHORT")
+                status_color = "green" if selisih_po == 0 else "red"
+            
+                header_text = f"**{row['nama_barang']}** (PO: {qty_po}) | Selisih: :{status_color}[{selisih_po}]"
+            
+                notes_key = f"notes_non_{item_id}"
+                current_notes = row.get('keterangan', '') if row.get('keterangan') is not None else ''
+            
+                # Card Non-SN (sembunyi default)
+                with st.expander(header_text, expanded=False):
+                    col_info, col_input = st.columns([1.5, 1.5])
+                
+                    with col_info:
+                        st.markdown(f"**SKU:** {row['sku']}")
+                        st.markdown(f"**Qty PO (Harapan):** `{qty_po}`")
+                        st.markdown(f"**Dicek Oleh:** {row['updated_by']}")
+                        if current_notes: st.markdown(f"**Catatan Sebelumnya:** `{current_notes}`")
+                
+                    with col_input:
+                        # FIX V1.32: Mode tambah hitungan (delta) untuk penghitungan paralel per palet
+                        input_mode = st.radio("Mode Input", ["✏️ Set Total", "➕ Tambah Hitungan"], horizontal=True, key=f"mode_non_{item_id}")
+
+                        if input_mode == "➕ Tambah Hitungan":
+                            delta_seq = st.session_state.get(f"delta_seq_{item_id}", 0)
+                            delta_qty = st.number_input("JML DIHITUNG (+/-)", value=0, step=1, key=f"delta_non_{item_id}_{delta_seq}")
+                            st.caption(f"Qty tercatat saat ini: **{default_qty}**. Gunakan angka negatif untuk koreksi.")
+
+                            if st.button("➕ Tambahkan ke Qty", key=f"btn_delta_{item_id}", type="primary", use_container_width=True):
+                                updates, new_total = handle_add_qty_delta(row, delta_qty, final_nama_user)
+                                if updates > 0:
+                                    st.session_state[f"delta_seq_{item_id}"] = delta_seq + 1
+                                    st.toast(f"✅ {delta_qty:+d} {row['nama_barang']} dicatat. Total: {new_total}", icon="💾")
+                                    time.sleep(0.5)
+                                    st.rerun()
+                                elif delta_qty == 0:
+                                    st.info("Masukkan jumlah selain 0.")
+                                else:
+                                    st.error("Gagal menambahkan qty. Coba lagi.")
+                            continue
+
+                        new_qty = st.number_input("JML FISIK DITERIMA", value=default_qty, min_value=0, step=1, key=f"qty_non_{item_id}")
+                    
+                        new_jenis = st.radio("Tujuan Alokasi", ['Stok', 'Display'], index=['Stok', 'Display'].index(default_jenis), horizontal=True, key=f"jenis_non_{item_id}")
+                    
+                        keterangan = st.text_area("Keterangan/Isu (Opsional)", value=current_notes, key=notes_key, height=50)
+
+                        if st.button("Simpan Non-SN", key=f"btn_non_{item_id}", type="primary", use_container_width=True):
+                            updates, conflict = handle_update_non_sn(row, new_qty, new_jenis, final_nama_user, loaded_time, keterangan.strip())
+                        
+                            if not conflict and updates > 0:
+                                st.toast(f"✅ Qty {row['nama_barang']} ({new_jenis}) disimpan!", icon="💾")
+                                time.sleep(0.5)
+                                st.rerun()
+                            elif not conflict:
+                                st.info("Tidak ada perubahan yang tersimpan.")
+                            elif conflict:
+                                st.error("Gagal simpan Non-SN. Input Anda tidak dihapus, silakan Muat Ulang Data lalu simpan kembali.")
+    else:
+        st.info("Tidak ada item Non-SN yang aktif dalam sesi ini.")
 
-        # Lakukan Update
-        update_payload = {
-            "sn_list": new_sn_list,
-            "qty_fisik": len(new_sn_list), # Qty Fisik = Jumlah SN yang dimasukkan
-            "jenis": new_jenis,
-            "updated_at": datetime.utcnow().isoformat(), 
-            "updated_by": nama_user,
-            "keterangan": keterangan_to_save
-            # is_inbound tidak diupdate oleh Checker
-        }
 
-        try:
-            # Gunakan json.dumps untuk memastikan array tersimpan dengan benar di Supabase
-            payload_to_db = update_payload.copy()
-            payload_to_db['sn_list'] = json.dumps(new_sn_list) 
-            
-            supabase.table(RECEIVING_TABLE).update(payload_to_db).eq("id", id_barang).execute()
-            return 1, False # Success
-        except APIError as api_e:
-            # FIX v1.7: Tampilkan pesan API error spesifik dari Supabase
-            error_msg = f"API Error: {api_e.message}. Status Code: {api_e.code}" if hasattr(api_e, 'message') else str(api_e)
-            st.error(f"❌ Gagal Simpan Item SN {row['nama_barang']}. DETAIL RLS: {error_msg}")
-            # Auto-Heal untuk mengatasi cache RLS
-            st.cache_resource.clear()
-            st.rerun()
-            return 0, True 
-        
-    return 0, False # No change
+def section_checker_adhoc(final_nama_user):
+    """Seksi Tambah Ad Hoc (Blind Receive)"""
+    st.subheader("👻 Registrasi Barang Tanpa Dokumen (Blind Receive)")
+    st.warning("Gunakan fitur ini dengan bijak, karena akan mencatat item yang TIDAK ADA di dokumen GR/PO.")
 
-def handle_blind_insert(brand, sku, qty, sn_list, tipe_barang, jenis, keterangan, nama_user):
-    """Menangani INSERT barang tanpa dokumen (Blind Receive)"""
+    # FIX V1.54: Karton campur: banyak baris dalam 1 submit
+    if st.radio("Mode Input", ["Satu Item", "Multi Baris (Karton Campur)"], horizontal=True, key="blind_mode") != "Satu Item":
+        render_blind_batch(final_nama_user)
+        return
     
-    if not brand or not sku or not keterangan.strip():
-        return False, "Brand, SKU, dan Keterangan wajib diisi."
-        
-    if tipe_barang == 'SN':
-        if not sn_list: return False, "Untuk barang SN, Serial Number wajib diisi."
-        final_qty = len(sn_list)
-        final_sn_list = sn_list
-    else:
-        if qty <= 0: return False, "Quantity Fisik harus lebih dari 0."
-        final_qty = qty
-        final_sn_list = None # DB expects None for NON-SN sn_list
+    # --- FIX V1.20: Tipe Barang dan Tujuan di luar form untuk reaktivitas ---
+    col_tipe, col_jenis = st.columns(2)
+    blind_tipe = col_tipe.radio("Tipe Barang", ['NON-SN', 'SN'], index=0, horizontal=True, key="blind_tipe_radio")
+    blind_jenis = col_jenis.radio("Tujuan Alokasi", ['Stok', 'Display'], index=0, horizontal=True, key="blind_jenis_radio")
 
-    try:
-        # Payload mapping user input to DB columns
-        payload = {
-            "sku": sku.strip(),          # User's input for SKU goes to DB SKU
-            "nama_barang": brand.strip(), # User's input for Brand goes to DB Nama Barang
-            "kategori_barang": tipe_barang, 
-            "qty_po": 0, 
-            "qty_fisik": final_qty,
-            "jenis": jenis,
-            "keterangan": f"BLIND RECEIVE ({nama_user}): {keterangan}",
-            "updated_by": nama_user,
-            "is_active": True,
-            "gr_number": "BLIND-RECEIVE",
-            "sn_list": json.dumps(final_sn_list) if final_sn_list is not None else None,
-            "is_inbound": False # FIX V1.23: Item Blind Receive juga perlu ditandai Inbound
-        }
+    with st.form("blind_receive_form", clear_on_submit=True):
         
-        supabase.table(RECEIVING_TABLE).insert(payload).execute()
-        return True, "Barang tanpa dokumen berhasil diregistrasi!"
+        # Input Brand dan SKU
+        col_brand, col_sku = st.columns(2)
+        blind_brand = col_brand.text_input("Brand", placeholder="Contoh: Samsung/Vivan/Robot")
+        blind_sku = col_sku.text_input("SKU Barang", placeholder="Contoh: S24-ULT-512")
+        
+        st.markdown("---")
+        
+        # --- Conditional Input (Digerakkan oleh blind_tipe di luar form) ---
+        blind_qty = 0
+        blind_sn_list = None
+        
+        if blind_tipe == 'NON-SN':
+            blind_qty = st.number_input("Quantity Fisik Diterima", min_value=1, step=1)
+            st.caption("Item akan di-insert sebagai 1 baris data Non-SN.")
+        else:
+            blind_sn_input = st.text_area(
+                "Scan SN List (Satu SN per Baris)", 
+                height=150, 
+                placeholder="Scan SN pertama...\nScan SN kedua..."
+            )
+            blind_sn_list = [s.strip() for s in blind_sn_input.split('\n') if s.strip()]
+            if blind_sn_list:
+                st.info(f"Total SN yang discan: **{len(blind_sn_list)}** (Ini akan menjadi Qty Fisik)")
+        
+        st.markdown("---")
+        blind_keterangan = st.text_area("Keterangan Tambahan (Wajib)", height=50)
 
-    except APIError as api_e:
-        error_msg = f"API Error: {api_e.message}. Status Code: {api_e.code}" if hasattr(api_e, 'message') else str(api_e)
-        st.error(f"❌ Gagal Registrasi Blind Receive. DETAIL: {error_msg}")
-        st.cache_resource.clear()
-        st.rerun()
-        return False, "Terjadi kesalahan database (RLS/API)."
-    except Exception as e:
-        return False, f"Error umum: {str(e)}"
+        if st.form_submit_button("➕ REGISTRASI BLIND RECEIVE (INSERT BARU)", type="secondary", use_container_width=True):
+            
+            # Check umum
+            if not blind_brand or not blind_sku or not blind_keterangan.strip():
+                st.error("Brand, SKU, dan Keterangan wajib diisi.")
+                st.stop()
+                
+            success, msg = handle_blind_insert(
+                blind_brand, blind_sku, blind_qty, blind_sn_list, blind_tipe, blind_jenis, blind_keterangan, final_nama_user
+            )
+            
+            if success:
+                st.success(f"✅ Registrasi Blind Receive berhasil! Item: {blind_brand} ({blind_sku})")
+                time.sleep(1)
+                st.rerun()
+            else:
+                st.error(f"Gagal Registrasi: {msg}")
 
-# --- FUNGSI HALAMAN ADMIN ---
 
-def update_inbound_status(item_id, current_gr, nama_user):
-    """FIX V1.23: Update status is_inbound menjadi True"""
+@_fragment
+def render_sn_detail(item_id):
+    """FIX V1.46: Detail 1 baris SN, SN list diambil saat dibuka dan ditampilkan per halaman dengan pencarian"""
     try:
-        update_payload = {
-            "is_inbound": True,
-            "updated_by": f"INBOUND-{nama_user}",
-            "updated_at": datetime.utcnow().isoformat(),
-            "keterangan": f"INBOUND OK oleh {nama_user}."
-        }
-        
-        supabase.table(RECEIVING_TABLE).update(update_payload).eq("id", item_id).execute()
-        return True, f"Item {item_id} berhasil ditandai INBOUND."
+        res = db_execute(supabase.table(RECEIVING_TABLE).select("sku, updated_by, keterangan, sn_list").eq("id", item_id).limit(1))
     except Exception as e:
-        return False, f"Gagal update status inbound: {str(e)}"
+        st.error(f"Gagal memuat detail SN: {e}")
+        return
+    if not res.data:
+        st.warning("Baris tidak ditemukan. Muat ulang data.")
+        return
+    row = res.data[0]
+    sn_list = _deserialize_sn_list(row.get('sn_list'))
 
-# FIX V1.28: Operator Management tanpa Cabang
-def add_operator(operator_name, is_active=True):
-    """Menambahkan operator baru ke tabel store_operators"""
-    if not operator_name:
-        return False, "Nama Operator wajib diisi."
-    try:
-        payload = {
-            "operator_name": operator_name.strip(),
-            "is_active": is_active,
-        }
-        supabase.table(OPERATORS_TABLE).insert(payload).execute()
-        get_all_operators.clear() # Clear cache
-        return True, f"Operator {operator_name} berhasil ditambahkan."
-    except Exception as e:
-        return False, f"Gagal menambahkan operator: {str(e)}"
+    with st.container(border=True):
+        st.markdown(f"**SKU:** {row['sku']}")
+        st.markdown(f"**Dicek Oleh:** {row['updated_by']}")
+        if row.get('keterangan'): st.markdown(f"**Catatan:** `{row['keterangan']}`")
 
-def delete_operator(operator_id):
-    """Menghapus operator dari tabel store_operators"""
-    try:
-        # Menandai non-aktif (Soft delete)
-        supabase.table(OPERATORS_TABLE).update({"is_active": False}).eq("id", operator_id).execute()
-        get_all_operators.clear() # Clear cache
-        return True, "Operator berhasil dinonaktifkan."
-    except Exception as e:
-        return False, f"Gagal menonaktifkan operator: {str(e)}"
+        if not sn_list:
+            st.caption("Belum ada SN tercatat.")
+            return
+
+        search = st.text_input("🔍 Cari SN", key=f"sn_detail_search_{item_id}", placeholder="Ketik sebagian SN...").strip().upper()
+        matches = [sn for sn in sn_list if search in str(sn).upper()] if search else sn_list
+        n_pages = max(-(-len(matches) // SN_DETAIL_PAGE_SIZE), 1)
+        page_key = f"sn_detail_page_{item_id}"
+        if st.session_state.get(f"{page_key}_search") != search: # Pencarian baru = halaman pertama
+            st.session_state[f"{page_key}_search"] = search
+            st.session_state[page_key] = 0
+        page = min(st.session_state.get(page_key, 0), n_pages - 1)
+
+        def _go(target):
+            st.session_state[page_key] = target
+
+        st.markdown(f"##### SN List yang sudah tercatat ({len(matches)}/{len(sn_list)}):")
+        st.code("\n".join(matches[page * SN_DETAIL_PAGE_SIZE:(page + 1) * SN_DETAIL_PAGE_SIZE]), language='text')
+
+        if n_pages > 1:
+            c_prev, c_info, c_next = st.columns([1, 3, 1])
+            c_prev.button("◀", key=f"sn_detail_prev_{item_id}", disabled=page == 0, on_click=_go, args=(page - 1,))
+            c_info.caption(f"Halaman {page + 1}/{n_pages}")
+            c_next.button("▶", key=f"sn_detail_next_{item_id}", disabled=page >= n_pages - 1, on_click=_go, args=(page + 1,))
+
+def section_checker_status(df_sn, df_non):
+    """Seksi Status & Review (Display Only)"""
+    st.subheader(f"📋 Status Barang SN ({len(df_sn)})")
+
+    if not df_sn.empty:
+        # FIX V1.46: Isi expander selalu dieksekusi, jadi SN list tidak lagi dirender per baris.
+        # Tampilan ringkas hanya berisi angka dari baris; SN dimuat saat baris dibuka.
+        open_id = st.session_state.get(SN_DETAIL_OPEN_KEY)
+        for row in df_sn[['id', 'nama_barang', 'qty_po', 'qty_fisik', 'jenis', 'is_inbound']].to_dict('records'):
+            item_id = row['id']
+            qty_po = row['qty_po']
+            qty_fisik = int(row['qty_fisik'] or 0)
+            default_jenis = row['jenis']
+            selisih_po = qty_fisik - qty_po
+            
+            status_text = "MATCH" if selisih_po == 0 else ("OVER" if selisih_po > 0 else "SHORT")
+            status_color = "green" if selisih_po == 0 else "red"
+            
+            # FIX V1.23: Tampilkan status Inbound di header status
+            inbound_status = "✅ INBOUND OK" if row.get('is_inbound') else "⏳ BELUM INBOUND"
+            inbound_color = "blue" if row.get('is_inbound') else "orange"
+            
+            header_text = f"**{row['nama_barang']}** | Tercatat: {qty_fisik} | Selisih: :{status_color}[{selisih_po}] | Alokasi: {default_jenis} | Status: :{inbound_color}[{inbound_status}]"
+            
+            col_header, col_btn = st.columns([5, 1])
+            col_header.markdown(header_text)
+            is_open = open_id == item_id
+            if col_btn.button("🔼 Tutup" if is_open else "🔎 Detail", key=f"sn_detail_btn_{item_id}", use_container_width=True):
+                st.session_state[SN_DETAIL_OPEN_KEY] = None if is_open else item_id
+                st.rerun()
+            if is_open:
+                render_sn_detail(item_id)
+    else:
+         st.info("Tidak ada item SN dalam sesi ini.")
+
+    st.markdown("---")
+    
+    if not df_non.empty:
+        st.subheader(f"📦 Status Barang Non-SN ({len(df_non)})")
+        
+        # Menampilkan Non-SN dalam bentuk tabel sederhana untuk review
+        # FIX V1.45: Dipaginasi dari snapshot di server, browser hanya menerima 1 halaman
+        df_review = df_non[['id', 'sku', 'nama_barang', 'qty_po', 'qty_fisik', 'jenis', 'updated_by', 'keterangan', 'is_inbound']].copy()
+        df_review['Selisih'] = df_review['qty_fisik'] - df_review['qty_po']
+        
+        # FIX V1.23: Format Inbound Status
+        df_review = _inbound_status_label(df_review)
+        
+        render_paginated_table(
+            "checker_non_sn_review",
+            frame_page_fetcher(df_review, ['sku', 'nama_barang', 'keterangan', 'updated_by']),
+            {'sku': 'sku', 'nama_barang': 'nama_barang', 'qty_po': 'qty_po', 'qty_fisik': 'qty_fisik', 'jenis': 'jenis',
+             'updated_by': 'updated_by', 'keterangan': 'keterangan', 'Selisih': 'Selisih', 'Status Inbound': 'Status Inbound'},
+            ['nama_barang', 'sku', 'Selisih', 'qty_fisik', 'updated_by', 'Status Inbound']
+        )
+    else:
+        st.info("Tidak ada item Non-SN dalam sesi ini.")
 
 
 # --- HALAMAN CHECKER ---
@@ -576,13 +4503,18 @@ def page_checker():
         </style>
         """, unsafe_allow_html=True)
 
+    # FIX V1.50: Sesi aktif, operator & baris GR terpilih diambil paralel, di-join sebelum render
+    page_data = load_page_data(_checker_page_fetches(get_current_site()))
+
     # FIX V1.19: Mengambil SEMUA sesi aktif
-    active_grs = get_active_session_info()
+    active_grs = page_data["sessions"] or get_active_session_info()
     
     st.title("📱 Validasi Kedatangan Barang")
     
     # --- Pilihan Checker (Global) ---
-    df_operators = get_all_operators()
+    df_operators = page_data["operators"]
+    if df_operators is None:
+        df_operators = get_all_operators(get_current_site())
     operator_names = ["-- Pilih Petugas --"] + list(df_operators['operator_name'].unique())
         
     if SESSION_KEY_CHECKER not in st.session_state or st.session_state[SESSION_KEY_CHECKER] not in operator_names:
@@ -603,7 +4535,7 @@ def page_checker():
              st.rerun() 
     
     # 2. Pilihan Sesi GR
-    current_active_grs = [gr for gr in active_grs if gr != "BLIND-RECEIVE"]
+    current_active_grs = [gr for gr in active_grs if gr != BLIND_GR]
     gr_options = ["-- Pilih Sesi GR/PO --"] + current_active_grs
     
     if 'selected_gr_session' not in st.session_state:
@@ -629,7 +4561,7 @@ def page_checker():
         st.info("👋 Mohon **pilih nama Anda** terlebih dahulu untuk memulai validasi.")
         
         # Tampilkan status Blind Receive secara cepat jika ada
-        blind_df = get_data(gr_number="BLIND-RECEIVE", only_active=True)
+        blind_df = get_data(gr_number=BLIND_GR, only_active=True)
         if not blind_df.empty:
              st.caption(f"ℹ️ Ada {len(blind_df)} item Blind Receive aktif yang menunggu review Admin.")
              
@@ -643,15 +4575,27 @@ def page_checker():
     search_txt = st.text_input(f"🔍 Cari Barang di {selected_gr}", placeholder="Ketik SKU/Nama...")
     
     if st.button("🔄 Muat Ulang Data", key="reload_btn"):
-        st.cache_data.clear()
+        # FIX V1.37: Hanya snapshot GR ini yang dimuat ulang, cache lain tetap
+        # FIX V1.51: Reload storm (banyak checker klik bersamaan) tidak memicu 1 query per klik
+        snapshot_age = get_snapshot_refresher().age(f"gr:{gr_key(selected_gr)}")
+        if snapshot_age is None or snapshot_age >= RELOAD_DEBOUNCE_S:
+            invalidate_gr_snapshot(selected_gr)
         st.session_state.pop('current_df', None)
         st.rerun()
 
-    df = get_data(gr_number=selected_gr, search_term=search_txt, only_active=True)
+    prefetched_gr, prefetched = page_data.get("gr_rows") or (None, None)
+    df = get_data(gr_number=selected_gr, search_term=search_txt, only_active=True, prefetched=prefetched if prefetched_gr == selected_gr else None)
     loaded_time = st.session_state.get('data_loaded_time', datetime(1970, 1, 1, tzinfo=timezone.utc))
+    # FIX V1.49: Tampilkan umur data (bisa disajikan dari cache SWR)
+    data_age = (datetime.now(timezone.utc) - loaded_time).total_seconds()
+    st.caption(f"🕒 Data per {loaded_time.astimezone(None):%H:%M:%S} ({max(data_age, 0):.0f} dtk lalu, batas basi {SWR_STALENESS_BUDGET_S:.0f} dtk)")
     
     if df.empty:
         st.info(f"Tidak ada data barang yang valid untuk GR **{selected_gr}**.")
+
+    # FIX V1.37: Banner live perubahan dari checker lain (via change feed)
+    if CHANGE_FEED_BACKEND != "off":
+        render_live_change_banner(selected_gr, final_nama_user, loaded_time)
         
     df_sn = df[df['kategori_barang'] == 'SN'].copy()
     df_non = df[df['kategori_barang'] == 'NON-SN'].copy()
@@ -672,594 +4616,981 @@ def page_checker():
     st.markdown("---")
     
     # =========================================================================
-    # TAB NAVIGATION
+    # NAVIGASI SEKSI
     # =========================================================================
-    tab_sn, tab_non_sn, tab_adhoc, tab_status = st.tabs([
-        "⚡ Pindai SN Cepat", 
-        "📦 Input Qty Non-SN", 
-        "👻 Tambah Ad Hoc", 
-        "📋 Status & Review"
-    ])
+    # FIX V1.34: st.tabs menjalankan SEMUA isi tab setiap rerun. Navigasi radio
+    # memastikan hanya seksi yang dipilih yang menjalankan query & rendering.
+    section = st.radio(
+        "Navigasi Checker",
+        CHECKER_SECTIONS,
+        horizontal=True,
+        label_visibility="collapsed",
+        key="checker_section"
+    )
+
+    if section == "⚡ Pindai SN Cepat":
+        section_checker_scan_sn(df_sn, final_nama_user, loaded_time)
+    elif section == "📦 Input Qty Non-SN":
+        section_checker_non_sn(df_non, final_nama_user, loaded_time)
+    elif section == "👻 Tambah Ad Hoc":
+        section_checker_adhoc(final_nama_user)
+    elif section == "📋 Status & Review":
+        section_checker_status(df_sn, df_non)
+
+
+# --- FIX V1.50: LOADING DATA AWAL HALAMAN SECARA PARALEL ---
+
+@st.cache_resource
+def get_page_fetch_pool():
+    return ThreadPoolExecutor(max_workers=max(PAGE_FETCH_WORKERS, 1), thread_name_prefix="page-fetch")
+
+def load_page_data(fetches):
+    """
+    Jalankan fetch independen satu halaman secara paralel lalu join sebelum render.
+    fetches: dict nama -> callable atau (callable, timeout_s). Return dict nama -> hasil;
+    fetch yang gagal, atau belum mulai saat batas waktu, bernilai None dan pemanggil memakai jalur sekuensial lama.
+    Fetch dijalankan tanpa konteks sesi: site/GR sudah ditentukan saat callable dibuat di thread sesi.
+    """
+    pool = get_page_fetch_pool()
+    start = time.monotonic()
+    futures = {}
+    for name, fetch in fetches.items():
+        func, timeout_s = fetch if isinstance(fetch, tuple) else (fetch, PAGE_FETCH_TIMEOUT_S)
+        futures[name] = (pool.submit(func), start + timeout_s)
+
+    results = {}
+    for name, (future, deadline) in futures.items():
+        try:
+            try:
+                results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FuturesTimeout:
+                if future.cancel():
+                    # Masih antre di pool (sedang penuh): dibatalkan, jalur sekuensial satu-satunya yang membaca DB
+                    logging.warning(f"Fetch awal '{name}' belum mulai sebelum batas waktu, memakai jalur sekuensial.")
+                    results[name] = None
+                else:
+                    # Sudah berjalan: ditunggu, bukan diulang sekuensial (beban DB dua kali, hasilnya datang terlambat)
+                    logging.warning(f"Fetch awal '{name}' melewati batas waktu, menunggu hasil yang sedang berjalan.")
+                    results[name] = future.result()
+        except Exception as e:
+            logging.warning(f"Fetch awal '{name}' gagal: {e}")
+            results[name] = None
+    return results
+
+def _fetch_archived_gr_numbers(site_code=None):
+    return sorted(set(x['gr_number'] for x in db_execute(_site_filter(supabase.table(RECEIVING_TABLE).select("gr_number").eq("is_active", False), site_code)).data))
+
+def _inbound_pending_query(select_fields="id, gr_number, sku, nama_barang, qty_fisik, jenis, updated_by, updated_at, is_inbound", site_code=None, **select_kwargs):
+    """Item AKTIF yang sudah divalidasi (qty_fisik > 0) tetapi BELUM Inbound"""
+    return _site_filter(supabase.table(RECEIVING_TABLE).select(select_fields, **select_kwargs), site_code).eq(
+        "is_active", True).eq("is_inbound", False).gt("qty_fisik", 0)
+
+def _count_inbound_pending(site_code=None):
+    """Jumlah item pending saja; daftar item diambil per halaman oleh tabel (FIX V1.45)"""
+    return db_execute(_inbound_pending_query("id", site_code, count="exact").limit(1)).count or 0
+
+def _checker_page_fetches(site_code):
+    """Fetch awal page_checker: daftar sesi, operator, dan baris GR yang terakhir dipilih (jika belum ada snapshot live)"""
+    fetches = {"sessions": lambda: get_active_session_info(site_code), "operators": lambda: get_all_operators(site_code)}
+    selected_gr = st.session_state.get('gr_session_selector')
+    if selected_gr and not selected_gr.startswith("--") and get_live_gr_snapshot(selected_gr) is None:
+        fetches["gr_rows"] = lambda: (selected_gr, swr_get(f"gr:{gr_key(selected_gr, site_code)}", _gr_rows_loader(selected_gr, site_code)))
+    return fetches
+
+def _admin_page_fetches(site_code):
+    """Fetch awal page_admin: daftar sesi + data seksi yang sedang dibuka"""
+    fetches = {"sessions": lambda: get_active_session_info(site_code)}
+    section = st.session_state.get("admin_section", ADMIN_SECTIONS[0])
+    if section == "🗄️ Laporan & Arsip":
+        fetches["archived"] = lambda: _fetch_archived_gr_numbers(site_code)
+    elif section == "📦 Inbound Control":
+        fetches["inbound_pending"] = lambda: _count_inbound_pending(site_code)
+    return fetches
+
+# --- SEKSI HALAMAN ADMIN (FIX V1.34: dieksekusi hanya jika dipilih) ---
+
+def section_admin_start_session():
+    """Seksi Mulai Sesi GR"""
+    st.markdown("### 1️⃣ Download Template Master GR/PO")
+    st.caption("Gunakan template ini untuk menyusun data GR/PO yang akan di-upload.")
+    st.download_button("⬇️ Download Template Master GR/PO", get_master_template_excel_receiving(), "Template_Master_Receiving.xlsx")
     
-    # -------------------------------------------------------------------------
-    # TAB 1: Pindai SN Cepat (Global SN Scanner)
-    # -------------------------------------------------------------------------
-    with tab_sn:
-        if not df_sn.empty:
-            st.subheader("⚡ Pemindaian Global Serial Number (Scan Cepat)")
-            
-            # Pilihan untuk Selectbox: SKU - Nama Barang (ID)
-            sn_select_options = ["-- Pilih Barang SN yang Sedang Anda Scan --"] + [
-                f"{row['sku']} - {row['nama_barang']} (PO: {row['qty_po']} | Tercatat: {len(row['sn_list'])}) (ID: {row['id'][:4]}...)" 
-                for _, row in df_sn.iterrows()
-            ]
-            
-            with st.form("global_sn_form", clear_on_submit=True):
-                
-                col_sku, col_jenis = st.columns([2, 1])
-                
-                selected_item_str = col_sku.selectbox(
-                    "Pilih Barang SN yang Sedang Anda Scan", 
-                    options=sn_select_options,
-                    key="global_sn_selector_tab1" # Updated Key
-                )
+    st.write("---")
 
-                # Cari ID barang yang dipilih
-                selected_row = None
-                if "ID:" in selected_item_str:
-                    item_id_part = selected_item_str.split('(ID: ')[1].strip(')')
-                    selected_id_prefix = item_id_part.split('...')[0]
-                    selected_row_match = df_sn[df_sn['id'].str.startswith(selected_id_prefix)]
-                    if not selected_row_match.empty:
-                        selected_row = selected_row_match.iloc[0].to_dict()
-                    
-                # Menggunakan jenis barang saat ini sebagai default radio
-                current_jenis = selected_row.get('jenis', 'Stok') if selected_row else 'Stok'
-                new_jenis = col_jenis.radio(
-                    "Tujuan Alokasi SN", 
-                    ['Stok', 'Display'], 
-                    index=['Stok', 'Display'].index(current_jenis),
-                    key="radio_jenis_tab1" # Updated Key
-                )
-                
-                st.markdown("##### 📝 Scan SN di Bawah (Satu SN per Baris)")
-                
-                col_scan, col_exist = st.columns([2, 1])
-                
-                # Input Area
-                batch_input = col_scan.text_area(
-                    "Scan SN List", 
-                    placeholder="Scan SN pertama...\nScan SN kedua...\n[Tekan Ctrl+Enter atau Tombol Simpan]",
-                    height=250
-                )
-                
-                # FIX V1.22: Display SN yang sudah tercatat
-                if selected_row:
-                    current_sn_list = selected_row.get('sn_list', [])
-                    if current_sn_list:
-                        sn_display = "\n".join(current_sn_list)
-                        col_exist.text_area(
-                            f"SN Sudah Tercatat ({len(current_sn_list)})",
-                            value=sn_display,
-                            height=250,
-                            disabled=True
-                        )
-                    else:
-                        col_exist.info("Belum ada SN tercatat.")
+    st.markdown("### 2️⃣ Mulai Sesi Penerimaan Baru")
+    st.caption("Upload File Master GR/PO di sini. Sesi yang di-upload akan menjadi AKTIF.")
 
+    # FIX V1.48: Mode banyak file untuk batch pengiriman pagi
+    if st.radio("Mode Upload", ["Satu File", "Banyak File"], horizontal=True, key="upload_mode") == "Banyak File":
+        render_multi_gr_upload()
+        return
+    
+    gr_number = st.text_input("Nomor GR/PO Baru", placeholder="Contoh: GR/2025/11/001")
+    file_master = st.file_uploader("Upload File Master GR/PO", type="xlsx", key="u_main_gr")
+    
+    if file_master and gr_number:
+        if st.button("🔥 MULAI SESI RECEIVING BARU", type="primary"):
+            with st.spinner("Meng-upload Data GR..."):
+                df = pd.read_excel(file_master)
+                # FIX V1.19: Tidak lagi menonaktifkan sesi lama
+                ok, msg = process_and_insert(df, gr_number.strip())
+                if ok: st.success(f"Sesi '{gr_number.strip()}' Dimulai! {msg} data GR masuk."); time.sleep(2); st.cache_data.clear(); st.rerun()
+                else: st.error(f"Gagal: {msg}")
 
-                if st.form_submit_button("💾 SUBMIT & SIMPAN SN BATCH", type="primary", use_container_width=True):
-                    
-                    if not selected_row:
-                        st.error("Pilih Barang SN yang valid terlebih dahulu.")
-                        st.stop()
-                        
-                    submitted_sns = [s.strip() for s in batch_input.split('\n') if s.strip()]
-                    
-                    if not submitted_sns:
-                        st.warning("Tidak ada Serial Number yang dimasukkan.")
-                        st.stop()
-                    
-                    # Pemrosesan Batch
-                    current_sn_list = selected_row.get('sn_list', [])
-                    final_sn_list = current_sn_list[:]
-                    new_count = 0
-                    
-                    for sn in submitted_sns:
-                        if sn not in final_sn_list:
-                            final_sn_list.append(sn)
-                            new_count += 1
-                        else:
-                            st.warning(f"SN `{sn}` sudah ada di list sebelumnya, dilewati.")
-                    
-                    # Keterangan diabaikan untuk Global Scan, hanya fokus pada SN/Jenis
-                    updates, conflict = handle_update_sn_list(
-                        selected_row, final_sn_list, new_jenis, final_nama_user, loaded_time, 
-                        selected_row.get('keterangan')
-                    )
 
-                    if not conflict and updates > 0:
-                        st.success(f"✅ {new_count} SN baru ditambahkan untuk **{selected_row['nama_barang']}**! Total: {len(final_sn_list)}")
-                        time.sleep(1) 
-                        st.rerun() 
-                    elif conflict:
-                         st.error("Gagal simpan SN. Mencoba perbaikan otomatis (cache clear)...")
-                         st.cache_resource.clear()
-                         st.rerun()
-        else:
-            st.info("Tidak ada item SN yang aktif dalam sesi ini.")
+# --- FIX V1.48: UPLOAD BANYAK FILE GR ---
+
+@st.cache_resource
+def get_parse_pool():
+    """Process pool parsing workbook (openpyxl CPU-bound). spawn: aman dipakai dari server Streamlit yang multi-thread."""
+    return ProcessPoolExecutor(max_workers=max(UPLOAD_PARSE_WORKERS, 1), mp_context=multiprocessing.get_context("spawn"))
+
+@st.cache_resource
+def get_upload_writer():
+    """Writer bersama semua sesi: membatasi jumlah insert GR yang berjalan bersamaan ke DB"""
+    return ThreadPoolExecutor(max_workers=max(UPLOAD_WRITER_CONCURRENCY, 1), thread_name_prefix="gr-upload-writer")
+
+def parse_gr_files(files, on_result):
+    """Parse semua file paralel di process pool. on_result(result) dipanggil per file saat selesai."""
+    gr_parsing = _lazy_import("gr_parsing")
+    futures = {} # Pool yang sudah rusak bisa gagal saat submit
+    try:
+        pool = get_parse_pool()
+        futures = {pool.submit(gr_parsing.parse_gr_workbook, name, content): name for name, content in files}
+        for future in as_completed(futures):
+            on_result(future.result())
+    except BrokenProcessPool:
+        # Worker mati (mis. kehabisan memori): pool dibuat ulang pada upload berikutnya, sisa file di-parse di sini
+        logging.error("Process pool parsing GR rusak, lanjut parsing di proses utama.")
+        get_parse_pool.clear()
+        done = {f.result()["filename"] for f in futures if f.done() and not f.exception()}
+        for name, content in files:
+            if name not in done:
+                on_result(gr_parsing.parse_gr_workbook(name, content))
+
+def _write_gr_file(rows):
+    start = time.perf_counter()
+    insert_gr_rows(rows)
+    return time.perf_counter() - start
+
+def insert_gr_files(jobs, on_result):
+    """jobs: list (filename, gr_number, rows). Insert lewat writer bersama; on_result(filename, ok, pesan) per file."""
+    writer = get_upload_writer()
+    futures = {writer.submit(_write_gr_file, rows): (filename, gr_number, len(rows)) for filename, gr_number, rows in jobs}
+    for future in as_completed(futures):
+        filename, gr_number, n_rows = futures[future]
+        try:
+            elapsed = future.result()
+            invalidate_gr_snapshot(gr_number)
+            on_result(filename, True, f"{n_rows} baris masuk ke {gr_number} ({elapsed:.1f} dtk)")
+        except APIError as e:
+            on_result(filename, False, f"Gagal API Supabase: {e.message}")
+        except Exception as e:
+            on_result(filename, False, f"Error saat insert data: {e}")
+
+def render_multi_gr_upload():
+    """Upload 15-30 file GR sekaligus: 1) baca paralel & petakan Nomor GR, 2) mulai semua sesi paralel"""
+    files = st.file_uploader("Upload File Master GR/PO (bisa banyak)", type="xlsx", accept_multiple_files=True, key="u_multi_gr")
+    st.caption("Nomor GR diambil dari sel 'Nomor GR' di atas header tabel; jika tidak ada, dari nama file (GR-2025-11-001.xlsx → GR/2025/11/001). Periksa sebelum memulai.")
+    if not files:
+        st.session_state.pop(UPLOAD_BATCH_KEY, None)
+        return
+
+    signature = tuple((f.name, f.size) for f in files)
+    batch = st.session_state.get(UPLOAD_BATCH_KEY)
+    if batch is None or batch["signature"] != signature:
+        if not st.button(f"🔍 Baca {len(files)} File", type="primary"):
+            return
+        parsed = {}
+        progress = st.progress(0.0, text="Membaca file...")
+        def _on_parsed(result):
+            parsed[result["filename"]] = result
+            progress.progress(len(parsed) / len(files), text=f"Membaca file... {len(parsed)}/{len(files)} ({result['filename']})")
+        start = time.perf_counter()
+        parse_gr_files([(f.name, f.getvalue()) for f in files], _on_parsed)
+        progress.empty()
+        batch = {"signature": signature, "parsed": parsed, "results": {}, "parse_s": time.perf_counter() - start}
+        st.session_state[UPLOAD_BATCH_KEY] = batch
+
+    parsed = batch["parsed"]
+    slowest = max((r["elapsed_s"] for r in parsed.values()), default=0)
+    st.caption(f"Dibaca dalam {batch['parse_s']:.1f} dtk (file terlama {slowest:.1f} dtk, total kerja {sum(r['elapsed_s'] for r in parsed.values()):.1f} dtk).")
+
+    mapping = pd.DataFrame([
+        {
+            "File": f.name,
+            "Nomor GR": parsed[f.name]["gr_from_cell"] or parsed[f.name]["gr_from_filename"],
+            "Sumber": "Sel" if parsed[f.name]["gr_from_cell"] else "Nama File",
+            "Baris": len(parsed[f.name]["df"]) if parsed[f.name]["df"] is not None else 0,
+            "Status": batch["results"].get(f.name) or (f"❌ {parsed[f.name]['error']}" if parsed[f.name]["error"] else "Siap"),
+        }
+        for f in files
+    ])
+    edited = st.data_editor(
+        mapping, hide_index=True, use_container_width=True, key="multi_gr_mapping",
+        disabled=["File", "Sumber", "Baris", "Status"]
+    )
+
+    pending = [r for r in edited.to_dict("records") if not str(r["Status"]).startswith(("✅", "❌"))]
+    if not pending:
+        return
+    gr_counts = Counter(str(r["Nomor GR"]).strip() for r in pending)
+    if st.button(f"🔥 MULAI {len(pending)} SESI RECEIVING", type="primary"):
+        jobs = []
+        for r in pending:
+            gr_number = str(r["Nomor GR"] or "").strip()
+            if not gr_number:
+                batch["results"][r["File"]] = "❌ Nomor GR kosong"
+            elif gr_counts[gr_number] > 1:
+                batch["results"][r["File"]] = f"❌ Nomor GR {gr_number} dipakai lebih dari 1 file"
+            else:
+                rows, error = build_gr_rows(parsed[r["File"]]["df"].copy(), gr_number)
+                if error:
+                    batch["results"][r["File"]] = f"❌ {error}"
+                else:
+                    jobs.append((r["File"], gr_number, rows))
+
+        progress = st.progress(0.0, text="Meng-upload Data GR...")
+        done = []
+        def _on_written(filename, ok, msg):
+            done.append(filename)
+            batch["results"][filename] = f"{'✅' if ok else '❌'} {msg}"
+            progress.progress(len(done) / max(len(jobs), 1), text=f"Meng-upload Data GR... {len(done)}/{len(jobs)}")
+        start = time.perf_counter()
+        insert_gr_files(jobs, _on_written)
+        progress.empty()
+        n_ok = sum(1 for v in batch["results"].values() if v.startswith("✅"))
+        st.toast(f"{n_ok}/{len(files)} sesi dimulai dalam {time.perf_counter() - start:.1f} dtk.")
+        st.cache_data.clear()
+        st.rerun()
+
+# --- FIX V1.41: EKSPOR STREAMING CSV/PARQUET (MULTI-GR / RENTANG TANGGAL) ---
 
-    # -------------------------------------------------------------------------
-    # TAB 2: Input Qty Non-SN
-    # -------------------------------------------------------------------------
-    with tab_non_sn:
-        if not df_non.empty:
-            st.subheader(f"📦 Non-SN ({len(df_non)}) - Input Kuantitas")
+SQL_SETUP_SCRIPTS["V1.41 - Ekspor Rentang Tanggal"] = f"""
+-- Ekspor rentang tanggal memakai created_at (updated_at kosong untuk item yang belum dicek)
+-- Kolom dibuat tanpa default dulu: "default now()" akan mengisi semua baris lama dengan waktu migrasi
+alter table {RECEIVING_TABLE} add column if not exists created_at timestamptz;
 
-            for index, row in df_non.iterrows():
-                item_id = row['id']
-                qty_po = row['qty_po']
-                default_qty = row['qty_fisik']
-                default_jenis = row['jenis']
-                selisih_po = default_qty - qty_po
-                
-                status_text = "MATCH" if selisih_po == 0 else ("OVER" if selisih_po > 0 else "SHORT")
-                status_color = "green" if selisih_po == 0 else "red"
-                
-                header_text = f"**{row['nama_barang']}** (PO: {qty_po}) | Selisih: :{status_color}[{selisih_po}]"
-                
-                notes_key = f"notes_non_{item_id}"
-                current_notes = row.get('keterangan', '') if row.get('keterangan') is not None else ''
-                
-                # Card Non-SN (sembunyi default)
-                with st.expander(header_text, expanded=False):
-                    col_info, col_input = st.columns([1.5, 1.5])
-                    
-                    with col_info:
-                        st.markdown(f"**SKU:** {row['sku']}")
-                        st.markdown(f"**Qty PO (Harapan):** `{qty_po}`")
-                        st.markdown(f"**Dicek Oleh:** {row['updated_by']}")
-                        if current_notes: st.markdown(f"**Catatan Sebelumnya:** `{current_notes}`")
-                    
-                    with col_input:
-                        new_qty = st.number_input("JML FISIK DITERIMA", value=default_qty, min_value=0, step=1, key=f"qty_non_{item_id}")
-                        
-                        new_jenis = st.radio("Tujuan Alokasi", ['Stok', 'Display'], index=['Stok', 'Display'].index(default_jenis), horizontal=True, key=f"jenis_non_{item_id}")
-                        
-                        keterangan = st.text_area("Keterangan/Isu (Opsional)", value=current_notes, key=notes_key, height=50)
+-- Backfill baris lama (juga memperbaiki instalasi yang sudah terisi waktu migrasi): GR di-upload sebelum baris
+-- pertamanya dicek, jadi tanggal GR = updated_at paling awal di GR itu. Blind Receive: updated_at baris itu sendiri.
+with gr_first as (
+    select site_code, gr_number, min(updated_at) as first_at
+      from {RECEIVING_TABLE}
+     where updated_at is not null and gr_number <> '{BLIND_GR}'
+     group by site_code, gr_number
+)
+update {RECEIVING_TABLE} r set created_at = g.first_at
+  from gr_first g
+ where r.site_code = g.site_code and r.gr_number = g.gr_number
+   and (r.created_at is null or r.created_at > g.first_at);
+update {RECEIVING_TABLE} set created_at = updated_at
+ where updated_at is not null and (created_at is null or created_at > updated_at);
+update {RECEIVING_TABLE} set created_at = now() where created_at is null; -- GR yang belum pernah dicek sama sekali
 
-                        if st.button("Simpan Non-SN", key=f"btn_non_{item_id}", type="primary", use_container_width=True):
-                            updates, conflict = handle_update_non_sn(row, new_qty, new_jenis, final_nama_user, loaded_time, keterangan.strip())
-                            
-                            if not conflict and updates > 0:
-                                st.toast(f"✅ Qty {row['nama_barang']} ({new_jenis}) disimpan!", icon="💾")
-                                time.sleep(0.5)
-                                st.rerun()
-                            elif not conflict:
-                                st.info("Tidak ada perubahan yang tersimpan.")
-                            elif conflict:
-                                st.error("Gagal simpan Non-SN. Mencoba perbaikan otomatis (cache clear)...")
-                                st.cache_resource.clear()
-                                st.rerun()
-        else:
-            st.info("Tidak ada item Non-SN yang aktif dalam sesi ini.")
+alter table {RECEIVING_TABLE} alter column created_at set default now();
+alter table {RECEIVING_TABLE} alter column created_at set not null;
+create index if not exists {RECEIVING_TABLE}_created_idx on {RECEIVING_TABLE} (created_at, id);
+"""
 
-    # -------------------------------------------------------------------------
-    # TAB 3: Tambah Ad Hoc (Blind Receive) - New Structure
-    # -------------------------------------------------------------------------
-    with tab_adhoc:
-        st.subheader("👻 Registrasi Barang Tanpa Dokumen (Blind Receive)")
-        st.warning("Gunakan fitur ini dengan bijak, karena akan mencatat item yang TIDAK ADA di dokumen GR/PO.")
-        
-        # --- FIX V1.20: Tipe Barang dan Tujuan di luar form untuk reaktivitas ---
-        col_tipe, col_jenis = st.columns(2)
-        blind_tipe = col_tipe.radio("Tipe Barang", ['NON-SN', 'SN'], index=0, horizontal=True, key="blind_tipe_radio")
-        blind_jenis = col_jenis.radio("Tujuan Alokasi", ['Stok', 'Display'], index=0, horizontal=True, key="blind_jenis_radio")
+EXPORT_FORMATS = {"CSV": ("csv", "text/csv"), "Parquet": ("parquet", "application/octet-stream")}
 
-        with st.form("blind_receive_form", clear_on_submit=True):
-            
-            # Input Brand dan SKU
-            col_brand, col_sku = st.columns(2)
-            blind_brand = col_brand.text_input("Brand", placeholder="Contoh: Samsung/Vivan/Robot")
-            blind_sku = col_sku.text_input("SKU Barang", placeholder="Contoh: S24-ULT-512")
-            
-            st.markdown("---")
-            
-            # --- Conditional Input (Digerakkan oleh blind_tipe di luar form) ---
-            blind_qty = 0
-            blind_sn_list = None
-            
-            if blind_tipe == 'NON-SN':
-                blind_qty = st.number_input("Quantity Fisik Diterima", min_value=1, step=1)
-                st.caption("Item akan di-insert sebagai 1 baris data Non-SN.")
-            else:
-                blind_sn_input = st.text_area(
-                    "Scan SN List (Satu SN per Baris)", 
-                    height=150, 
-                    placeholder="Scan SN pertama...\nScan SN kedua..."
-                )
-                blind_sn_list = [s.strip() for s in blind_sn_input.split('\n') if s.strip()]
-                if blind_sn_list:
-                    st.info(f"Total SN yang discan: **{len(blind_sn_list)}** (Ini akan menjadi Qty Fisik)")
-            
-            st.markdown("---")
-            blind_keterangan = st.text_area("Keterangan Tambahan (Wajib)", height=50)
+def _export_query(select_fields, gr_numbers=None, date_from=None, date_to=None, **select_kwargs):
+    query = _site_filter(supabase.table(RECEIVING_TABLE).select(select_fields, **select_kwargs))
+    if gr_numbers:
+        query = query.in_("gr_number", list(gr_numbers))
+    if date_from:
+        query = query.gte("created_at", date_from.isoformat())
+    if date_to:
+        query = query.lt("created_at", date_to.isoformat())
+    return query
 
-            if st.form_submit_button("➕ REGISTRASI BLIND RECEIVE (INSERT BARU)", type="secondary", use_container_width=True):
-                
-                # Check umum
-                if not blind_brand or not blind_sku or not blind_keterangan.strip():
-                    st.error("Brand, SKU, dan Keterangan wajib diisi.")
-                    st.stop()
-                    
-                success, msg = handle_blind_insert(
-                    blind_brand, blind_sku, blind_qty, blind_sn_list, blind_tipe, blind_jenis, blind_keterangan, final_nama_user
-                )
-                
-                if success:
-                    st.success(f"✅ Registrasi Blind Receive berhasil! Item: {blind_brand} ({blind_sku})")
-                    time.sleep(1)
-                    st.rerun()
-                else:
-                    st.error(f"Gagal Registrasi: {msg}")
+def count_export_rows(gr_numbers=None, date_from=None, date_to=None):
+    res = db_execute(_export_query("id", gr_numbers, date_from, date_to, count="exact").limit(1))
+    return res.count or 0
 
+def iter_export_pages(gr_numbers=None, date_from=None, date_to=None, page_size=None):
+    """Generator (jumlah baris DB, DF laporan layout SN-unpivot) per halaman, keyset by id. Tidak pernah memuat seluruh hasil."""
+    page_size = page_size or EXPORT_PAGE_SIZE
+    last_id = None
+    while True:
+        query = _export_query("*", gr_numbers, date_from, date_to)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        records = db_execute(query.order("id").limit(page_size)).data
+        if not records:
+            return
+        last_id = records[-1]['id']
+        yield len(records), build_report_frame(_records_to_receiving_df(records))
+        if len(records) < page_size:
+            return
 
-    # -------------------------------------------------------------------------
-    # TAB 4: Status & Review (Display Only)
-    # -------------------------------------------------------------------------
-    with tab_status:
-        st.subheader(f"📋 Status Barang SN ({len(df_sn)})")
+def _export_arrow_schema():
+    pa = _lazy_import("pyarrow")
+    int_cols = {'Qty PO', 'Qty Fisik Unit'}
+    return pa.schema([
+        (name, pa.int64() if name in int_cols else pa.string())
+        for name in (REPORT_COLUMN_MAPPING.get(c, c) for c in REPORT_COLS_ORDER)
+    ])
 
-        if not df_sn.empty:
-            for index, row in df_sn.iterrows():
-                item_id = row['id']
-                qty_po = row['qty_po']
-                qty_fisik = len(row.get('sn_list', []))
-                default_jenis = row['jenis']
-                selisih_po = qty_fisik - qty_po
-                
-                status_text = "MATCH" if selisih_po == 0 else ("OVER" if selisih_po > 0 else "SHORT")
-                status_color = "green" if selisih_po == 0 else "red"
-                
-                # FIX V1.23: Tampilkan status Inbound di header status
-                inbound_status = "✅ INBOUND OK" if row.get('is_inbound') else "⏳ BELUM INBOUND"
-                inbound_color = "blue" if row.get('is_inbound') else "orange"
-                
-                header_text = f"**{row['nama_barang']}** | Tercatat: {qty_fisik} | Selisih: :{status_color}[{selisih_po}] | Alokasi: {default_jenis} | Status: :{inbound_color}[{inbound_status}]"
-                
-                # Card Status SN (sembunyi default)
-                with st.expander(header_text, expanded=False):
-                    st.markdown(f"**SKU:** {row['sku']}")
-                    st.markdown(f"**Dicek Oleh:** {row['updated_by']}")
-                    if row.get('keterangan'): st.markdown(f"**Catatan:** `{row['keterangan']}`")
-                    
-                    # Tombol untuk melihat SN list
-                    if qty_fisik > 0:
-                        st.markdown("##### SN List yang sudah tercatat:")
-                        sn_display = "\n".join(row.get('sn_list', []))
-                        st.code(sn_display, language='text')
+def stream_export_to_file(fmt, pages, progress_callback=None):
+    """Tulis halaman demi halaman ke file sementara (CSV append / Parquet row group). Return (path, jumlah baris)."""
+    ext, _ = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(prefix="gr_export_", suffix=f".{ext}")
+    os.close(fd)
+    rows_written = 0
+    db_rows = 0
+    writer = None
+    try:
+        if fmt == "CSV":
+            with open(path, "w", newline="", encoding="utf-8-sig") as f: # BOM agar Excel membaca UTF-8
+                header = True
+                for n_db, frame in pages:
+                    frame.to_csv(f, index=False, header=header)
+                    header = False
+                    rows_written += len(frame)
+                    db_rows += n_db
+                    if progress_callback: progress_callback(db_rows, rows_written)
+                if header: # Tidak ada data: tetap tulis header
+                    csv.writer(f).writerow([REPORT_COLUMN_MAPPING.get(c, c) for c in REPORT_COLS_ORDER])
         else:
-             st.info("Tidak ada item SN dalam sesi ini.")
+            pa = _lazy_import("pyarrow")
+            pq = _lazy_import("pyarrow.parquet")
+            schema = _export_arrow_schema()
+            writer = pq.ParquetWriter(path, schema, compression="zstd")
+            for n_db, frame in pages:
+                if not frame.empty:
+                    frame = frame.astype({
+                        name: ("int64" if pa.types.is_integer(schema.field(name).type) else "string")
+                        for name in schema.names
+                    })
+                    writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+                rows_written += len(frame)
+                db_rows += n_db
+                if progress_callback: progress_callback(db_rows, rows_written)
+    except Exception:
+        os.remove(path)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+    return path, rows_written
 
-        st.markdown("---")
-        
-        if not df_non.empty:
-            st.subheader(f"📦 Status Barang Non-SN ({len(df_non)})")
-            
-            # Menampilkan Non-SN dalam bentuk tabel sederhana untuk review
-            df_review = df_non[['sku', 'nama_barang', 'qty_po', 'qty_fisik', 'jenis', 'updated_by', 'keterangan', 'is_inbound']].copy()
-            df_review['Selisih'] = df_review['qty_fisik'] - df_review['qty_po']
-            
-            # FIX V1.23: Format Inbound Status
-            df_review['Status Inbound'] = df_review['is_inbound'].apply(lambda x: "OK" if x else "PENDING")
-            df_review = df_review.drop(columns=['is_inbound'])
-            
-            st.dataframe(df_review, use_container_width=True)
+def publish_export_file(path, filename):
+    """Jika bucket Storage dikonfigurasi, unggah file dan kembalikan signed URL (file tidak lewat memori app)"""
+    if not EXPORT_STORAGE_BUCKET:
+        return None
+    object_path = f"exports/{uuid.uuid4().hex[:8]}_{filename}"
+    bucket = supabase.storage.from_(EXPORT_STORAGE_BUCKET)
+    bucket.upload(object_path, path)
+    res = bucket.create_signed_url(object_path, 3600)
+    return res.get("signedURL") or res.get("signedUrl")
+
+def render_bulk_export(gr_options):
+    """UI ekspor massal untuk Finance: rentang tanggal atau daftar GR, CSV/Parquet"""
+    with st.expander("📦 Ekspor Massal (CSV/Parquet) - Rentang Tanggal / Multi GR"):
+        mode = st.radio("Pilih data berdasarkan:", ["Rentang Tanggal", "Daftar GR"], horizontal=True, key="export_mode")
+        gr_numbers, date_from, date_to = None, None, None
+        if mode == "Rentang Tanggal":
+            today = datetime.now().date()
+            date_range = st.date_input("Tanggal GR dibuat:", (today.replace(day=1), today), key="export_dates")
+            st.caption("Difilter berdasarkan tanggal upload baris GR (created_at), bukan tanggal dicek/diarsip. "
+                       "Data sebelum SQL V1.41 memakai perkiraan: waktu baris pertama GR itu dicek.")
+            if len(date_range) != 2:
+                st.info("Pilih tanggal awal dan akhir.")
+                return
+            # Batas tanggal di zona waktu lokal server, tanggal akhir inklusif
+            date_from = datetime.combine(date_range[0], datetime.min.time()).astimezone(timezone.utc)
+            date_to = (datetime.combine(date_range[1], datetime.min.time()) + pd.Timedelta(days=1)).astimezone(timezone.utc)
+            label = f"{date_range[0]:%Y%m%d}-{date_range[1]:%Y%m%d}"
         else:
-            st.info("Tidak ada item Non-SN dalam sesi ini.")
-            
-# --- FUNGSI ADMIN ---
-def page_admin():
-    st.title("🛡️ Admin Dashboard (Receiving)")
-    active_grs = get_active_session_info()
+            gr_numbers = st.multiselect("Pilih GR:", gr_options, key="export_grs")
+            if not gr_numbers:
+                st.info("Pilih minimal satu GR.")
+                return
+            label = gr_numbers[0] if len(gr_numbers) == 1 else f"{len(gr_numbers)}GR"
+
+        formats = ["CSV", "Parquet"] if importlib.util.find_spec("pyarrow") else ["CSV"]
+        fmt = st.radio("Format:", formats, horizontal=True, key="export_format")
+
+        if st.button("🚀 Buat File Ekspor", key="export_run"):
+            previous = st.session_state.pop("export_result", None)
+            if previous and os.path.exists(previous["path"]):
+                os.remove(previous["path"])
+            progress = st.progress(0.0, text="Menghitung data...")
+            try:
+                total = count_export_rows(gr_numbers, date_from, date_to)
+                path, n_rows = stream_export_to_file(
+                    fmt, iter_export_pages(gr_numbers, date_from, date_to),
+                    lambda db_rows, out_rows: progress.progress(
+                        min(db_rows / total, 1.0) if total else 1.0,
+                        text=f"{db_rows}/{total} baris DB dibaca → {out_rows} baris laporan"
+                    )
+                )
+                ext, mime = EXPORT_FORMATS[fmt]
+                filename = f"Laporan_GR_{label}_{datetime.now():%Y%m%d_%H%M}.{ext}"
+                url = publish_export_file(path, filename)
+                progress.progress(1.0, text=f"Selesai: {n_rows} baris laporan.")
+                st.session_state["export_result"] = {"path": path, "filename": filename, "mime": mime, "url": url, "rows": n_rows}
+            except Exception as e:
+                progress.empty()
+                st.error(f"Gagal membuat ekspor: {e}")
+
+        result = st.session_state.get("export_result")
+        if result and os.path.exists(result["path"]):
+            size_mb = os.path.getsize(result["path"]) / 1e6
+            st.caption(f"{result['filename']} · {result['rows']} baris · {size_mb:.1f} MB")
+            if result["url"]:
+                st.link_button("⬇️ Download (link berlaku 1 jam)", result["url"])
+            else:
+                with open(result["path"], "rb") as f:
+                    st.download_button("⬇️ Download File Ekspor", f, result["filename"], result["mime"], key="export_download")
+
+def section_admin_report(admin_active_grs, all_archived_grs=None):
+    """Seksi Laporan & Arsip"""
+    st.markdown("### 📊 Laporan Penerimaan")
     
-    # Menghilangkan BLIND-RECEIVE dari daftar yang harus diadministrasi
-    admin_active_grs = [gr for gr in active_grs if gr != "BLIND-RECEIVE" and gr != "- Error Koneksi -"]
+    # FIX V1.50: Daftar arsip biasanya sudah diambil paralel oleh page_admin (daftar sesi aktif tidak diambil ulang)
+    if all_archived_grs is None:
+        all_archived_grs = _fetch_archived_gr_numbers()
     
-    if not admin_active_grs:
-        st.warning("⚠️ Belum ada sesi GR aktif yang di-upload.")
-    else:
-        st.info(f"📅 Sesi Aktif: **{', '.join(admin_active_grs)}**")
+    gr_report_options = (
+        ["-- Pilih Dokumen --"] + 
+        [f"AKTIF: {gr}" for gr in admin_active_grs] +
+        [f"AKTIF: {BLIND_GR}"] +
+        [f"ARSIP: {gr}" for gr in all_archived_grs]
+    )
     
-    tab1, tab2, tab3, tab_inbound, tab_operator, tab_maintenance = st.tabs([
-        "🚀 Mulai Sesi GR", 
-        "🗄️ Laporan & Arsip", 
-        "⚠️ Danger Zone", 
-        "📦 Inbound Control",
-        "👥 Manajemen Operator", # New Tab
-        "🔧 Maintenance"
-    ])
+    selected_report_str = st.selectbox("Pilih Dokumen untuk Laporan:", gr_report_options)
+    render_bulk_export(sorted(set(admin_active_grs) | set(all_archived_grs) | {BLIND_GR})) # FIX V1.41
     
-    with tab1:
-        st.markdown("### 1️⃣ Download Template Master GR/PO")
-        st.caption("Gunakan template ini untuk menyusun data GR/PO yang akan di-upload.")
-        st.download_button("⬇️ Download Template Master GR/PO", get_master_template_excel_receiving(), "Template_Master_Receiving.xlsx")
-        
-        st.write("---")
+    df = pd.DataFrame()
+    report_name = ""
+    is_active_session = False
+    
+    if selected_report_str.startswith("AKTIF:"):
+        report_name = selected_report_str.split("AKTIF: ")[1]
+        df = get_data(gr_number=report_name, only_active=True)
+        is_active_session = True
+    elif selected_report_str.startswith("ARSIP:"):
+        report_name = selected_report_str.split("ARSIP: ")[1]
+        df = get_data(gr_number=report_name, only_active=False)
 
-        st.markdown("### 2️⃣ Mulai Sesi Penerimaan Baru")
-        st.caption("Upload File Master GR/PO di sini. Sesi yang di-upload akan menjadi AKTIF.")
-        
-        gr_number = st.text_input("Nomor GR/PO Baru", placeholder="Contoh: GR/2025/11/001")
-        file_master = st.file_uploader("Upload File Master GR/PO", type="xlsx", key="u_main_gr")
-        
-        if file_master and gr_number:
-            if st.button("🔥 MULAI SESI RECEIVING BARU", type="primary"):
-                with st.spinner("Meng-upload Data GR..."):
-                    df = pd.read_excel(file_master)
-                    # FIX V1.19: Tidak lagi menonaktifkan sesi lama
-                    ok, msg = process_and_insert(df, gr_number.strip())
-                    if ok: st.success(f"Sesi '{gr_number.strip()}' Dimulai! {msg} data GR masuk."); time.sleep(2); st.cache_data.clear(); st.rerun()
-                    else: st.error(f"Gagal: {msg}")
-
-
-    with tab2:
-        st.markdown("### 📊 Laporan Penerimaan")
+    if not df.empty and report_name:
+        st.markdown("---")
+        df['qty_diff'] = df['qty_fisik'] - df['qty_po']
         
-        # Mengambil semua GR, termasuk yang Blind Receive
-        all_gr_numbers = get_active_session_info()
-        all_archived_grs = sorted(list(set([x['gr_number'] for x in supabase.table(RECEIVING_TABLE).select("gr_number").eq("is_active", False).execute().data])) if supabase.table(RECEIVING_TABLE).select("gr_number").execute().data else [])
+        total_sku = len(df)
+        total_po = df['qty_po'].sum()
+        total_fisik = df['qty_fisik'].sum()
+        total_diff = df['qty_diff'].sum()
+
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Total SKU", total_sku)
+        c2.metric("Total Qty PO", total_po)
+        c3.metric("Total Qty Fisik", total_fisik)
+        c4.metric("Total Selisih", total_diff)
         
-        gr_report_options = (
-            ["-- Pilih Dokumen --"] + 
-            [f"AKTIF: {gr}" for gr in admin_active_grs] +
-            [f"AKTIF: BLIND-RECEIVE"] +
-            [f"ARSIP: {gr}" for gr in all_archived_grs]
+        # FIX V1.45: Tabel laporan dipaginasi di DB (range + count), bukan seluruh DF dikirim ke browser
+        def _report_query(**select_kwargs):
+            query = _site_filter(supabase.table(RECEIVING_TABLE).select(
+                "id, gr_number, sku, nama_barang, kategori_barang, jenis, qty_po, qty_fisik, keterangan, is_inbound, updated_by, updated_at", **select_kwargs
+            )).eq("gr_number", report_name)
+            return query.eq("is_active", True) if is_active_session else query
+
+        def _add_qty_diff(df_page):
+            df_page['qty_diff'] = df_page['qty_fisik'] - df_page['qty_po']
+            return df_page
+
+        report_cols = ['gr_number', 'sku', 'nama_barang', 'kategori_barang', 'jenis', 'qty_po', 'qty_fisik', 'qty_diff', 'keterangan', 'is_inbound', 'updated_by', 'updated_at']
+        render_paginated_table(
+            "admin_report_table",
+            query_page_fetcher(_report_query, ['sku', 'nama_barang', 'keterangan', 'updated_by']),
+            {c: c for c in report_cols},
+            ['nama_barang', 'sku', 'kategori_barang', 'qty_po', 'qty_fisik', 'updated_by', 'updated_at'],
+            transform=_add_qty_diff
         )
         
-        selected_report_str = st.selectbox("Pilih Dokumen untuk Laporan:", gr_report_options)
-        
-        df = pd.DataFrame()
-        report_name = ""
-        is_active_session = False
-        
-        if selected_report_str.startswith("AKTIF:"):
-            report_name = selected_report_str.split("AKTIF: ")[1]
-            df = get_data(gr_number=report_name, only_active=True)
-            is_active_session = True
-        elif selected_report_str.startswith("ARSIP:"):
-            report_name = selected_report_str.split("ARSIP: ")[1]
-            df = get_data(gr_number=report_name, only_active=False)
-
-        if not df.empty and report_name:
-            st.markdown("---")
-            df['qty_diff'] = df['qty_fisik'] - df['qty_po']
-            
-            total_sku = len(df)
-            total_po = df['qty_po'].sum()
-            total_fisik = df['qty_fisik'].sum()
-            total_diff = df['qty_diff'].sum()
-
-            c1, c2, c3, c4 = st.columns(4)
-            c1.metric("Total SKU", total_sku)
-            c2.metric("Total Qty PO", total_po)
-            c3.metric("Total Qty Fisik", total_fisik)
-            c4.metric("Total Selisih", total_diff)
+        # --- FIX V1.22: Hapus Item Blind Receive ---
+        if report_name == BLIND_GR and is_active_session:
+            st.markdown("### 🗑️ Hapus Item Blind Receive (Review)")
+            blind_items = df[['id', 'nama_barang', 'sku', 'qty_fisik', 'keterangan']].copy()
+            blind_items['Display'] = blind_items['nama_barang'] + " (" + blind_items['sku'] + f") - Qty: {blind_items['qty_fisik']}"
             
-            st.dataframe(df[['gr_number', 'sku', 'nama_barang', 'kategori_barang', 'jenis', 'qty_po', 'qty_fisik', 'qty_diff', 'keterangan', 'is_inbound', 'updated_by', 'updated_at']])
-            
-            # --- FIX V1.22: Hapus Item Blind Receive ---
-            if report_name == "BLIND-RECEIVE" and is_active_session:
-                st.markdown("### 🗑️ Hapus Item Blind Receive (Review)")
-                blind_items = df[['id', 'nama_barang', 'sku', 'qty_fisik', 'keterangan']].copy()
-                blind_items['Display'] = blind_items['nama_barang'] + " (" + blind_items['sku'] + f") - Qty: {blind_items['qty_fisik']}"
-                
-                item_to_delete_id = st.selectbox(
-                    "Pilih Item Blind Receive untuk Dihapus:", 
-                    options=["-- Pilih Item --"] + list(blind_items['Display']),
-                    key="blind_delete_selector"
-                )
-                
-                if item_to_delete_id != "-- Pilih Item --":
-                    item_id = blind_items[blind_items['Display'] == item_to_delete_id]['id'].iloc[0]
-                    if st.button(f"🔥 KONFIRMASI HAPUS: {item_to_delete_id}", type="primary"):
-                        success, msg = delete_blind_receive_item(item_id)
-                        if success:
-                            st.success(f"✅ Item '{item_to_delete_id}' berhasil dihapus.")
-                            st.cache_data.clear()
-                            st.rerun()
-                        else:
-                            st.error(f"Gagal menghapus: {msg}")
-            
-            st.markdown("### 📥 Download Laporan")
-            tgl = datetime.now().strftime('%Y-%m-%d')
-            st.download_button(f"📥 Download Laporan {report_name}", convert_df_to_excel(df), f"Laporan_GR_{report_name}_{tgl}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            item_to_delete_id = st.selectbox(
+                "Pilih Item Blind Receive untuk Dihapus:", 
+                options=["-- Pilih Item --"] + list(blind_items['Display']),
+                key="blind_delete_selector"
+            )
             
-            # Tambahkan fungsi arsip sesi yang aktif
-            if is_active_session and report_name != "BLIND-RECEIVE":
-                if st.button(f"✅ ARSIPKAN SESI {report_name}", type="secondary"):
-                     try:
-                        supabase.table(RECEIVING_TABLE).update({"is_active": False}).eq("gr_number", report_name).execute()
-                        st.success(f"Sesi {report_name} berhasil diarsipkan!")
+            if item_to_delete_id != "-- Pilih Item --":
+                item_id = blind_items[blind_items['Display'] == item_to_delete_id]['id'].iloc[0]
+                if st.button(f"🔥 KONFIRMASI HAPUS: {item_to_delete_id}", type="primary"):
+                    success, msg = delete_blind_receive_item(item_id)
+                    if success:
+                        st.success(f"✅ Item '{item_to_delete_id}' berhasil dihapus.")
                         st.cache_data.clear()
-                        time.sleep(2); st.rerun()
-                     except Exception as e:
-                         st.error(f"Gagal mengarsipkan: {e}")
-
+                        st.rerun()
+                    else:
+                        st.error(f"Gagal menghapus: {msg}")
+        
+        render_gr_history(report_name) # FIX V1.47
 
-    with tab3:
-        st.header("⚠️ DANGER ZONE")
-        st.error("Tindakan di sini bersifat permanen.")
+        st.markdown("### 📥 Download Laporan")
+        tgl = datetime.now().strftime('%Y-%m-%d')
+        st.download_button(f"📥 Download Laporan {report_name}", convert_df_to_excel(df), f"Laporan_GR_{report_name}_{tgl}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
         
-        st.markdown(f"**Menghapus SEMUA Sesi Aktif:** Ini akan menghapus **SELURUH** data sesi GR yang sedang berjalan (is_active=True) tanpa arsip. Hati-hati.")
+        # Tambahkan fungsi arsip sesi yang aktif
+        if is_active_session and report_name != BLIND_GR:
+            # FIX V1.39: Arsip berjalan sebagai job background bertahap, admin tetap bisa memakai aplikasi
+            if st.button(f"✅ ARSIPKAN SESI {report_name}", type="secondary"):
+                 try:
+                    job = get_job_manager().submit("archive", {"gr_number": report_name, "site_code": get_current_site()}, st.session_state[SESSION_KEY_CHECKER])
+                    st.success(f"Arsip sesi {report_name} berjalan di background (Job {job['id']}).")
+                 except Exception as e:
+                     st.error(f"Gagal mengarsipkan: {e}")
+
+    render_background_jobs("archive")
+
+
+def section_admin_reconcile():
+    """FIX V1.42: Seksi Rekonsiliasi Blind Receive vs baris SHORT di GR aktif"""
+    st.markdown("### 🔗 Rekonsiliasi Blind Receive")
+    st.caption("Item Blind Receive dicocokkan otomatis (SKU persis/mirip & SN) dengan baris yang masih SHORT di GR aktif.")
+
+    if st.button("🔍 Cari Kecocokan", type="primary"):
+        df_active, truncated = fetch_recon_rows(get_current_site())
+        proposals, duplicates = propose_blind_matches(df_active)
+        st.session_state[RECON_PROPOSALS_KEY] = {"proposals": proposals, "duplicates": duplicates, "truncated": truncated}
+
+    state = st.session_state.get(RECON_PROPOSALS_KEY)
+    if not state:
+        return
+
+    if state.get("truncated"):
+        st.warning(f"⚠️ Baris aktif lebih dari {RECON_MAX_ROWS}: hanya {RECON_MAX_ROWS} baris pertama yang dicocokkan. Arsipkan GR yang sudah selesai.")
+
+    if state["duplicates"]:
+        st.warning(f"⚠️ {len(state['duplicates'])} SN Blind Receive sudah tercatat di GR aktif (kemungkinan scan ganda).")
+        st.dataframe(pd.DataFrame(state["duplicates"]).drop(columns=["blind_id"]), hide_index=True)
+
+    proposals = state["proposals"]
+    if not proposals:
+        st.info("Tidak ada kecocokan Blind Receive dengan baris SHORT.")
+        return
+
+    df_prop = pd.DataFrame(proposals)
+    df_prop.insert(0, "Terapkan", df_prop["score"] >= 1.0) # Match persis dicentang otomatis, match mirip direview
+    df_prop["SN"] = df_prop["serials"].apply(lambda x: ", ".join(x[:3]) + (f" (+{len(x) - 3})" if len(x) > 3 else ""))
+    edited = st.data_editor(
+        df_prop[["Terapkan", "score", "blind_brand", "blind_sku", "gr_number", "line_brand", "line_sku", "qty", "SN"]],
+        column_config={
+            "Terapkan": st.column_config.CheckboxColumn("Terapkan"),
+            "score": st.column_config.NumberColumn("Skor", format="%.2f"),
+            "blind_brand": "Brand (Blind)", "blind_sku": "SKU (Blind)", "gr_number": "GR Tujuan",
+            "line_brand": "Brand (GR)", "line_sku": "SKU (GR)", "qty": "Qty Pindah",
+        },
+        disabled=["score", "blind_brand", "blind_sku", "gr_number", "line_brand", "line_sku", "qty", "SN"],
+        hide_index=True, use_container_width=True, key="blind_recon_editor"
+    )
+
+    accepted = [proposals[i] for i in edited.index[edited["Terapkan"]]]
+    if st.button(f"✅ Terapkan {len(accepted)} Kecocokan", disabled=not accepted):
+        try:
+            ok, stale = apply_blind_matches(accepted, st.session_state.get(SESSION_KEY_CHECKER) or "ADMIN")
+            st.session_state.pop(RECON_PROPOSALS_KEY, None)
+            st.success(f"✅ {ok} kecocokan diterapkan.")
+            if stale:
+                st.warning(f"{stale} kecocokan dilewati karena data berubah sejak dicari. Jalankan pencarian ulang.")
+        except Exception as e:
+            st.error(f"Gagal menerapkan rekonsiliasi: {e}")
+
+def section_admin_danger_zone():
+    """Seksi Danger Zone"""
+    st.header("⚠️ DANGER ZONE")
+    st.error("Tindakan di sini bersifat permanen.")
+    
+    st.markdown(f"**Menghapus SEMUA Sesi Aktif:** Ini akan menghapus **SELURUH** data sesi GR yang sedang berjalan (is_active=True) tanpa arsip. Hati-hati.")
+    
+    st.divider()
+    input_pin = st.text_input("Masukkan PIN Keamanan", type="password", placeholder="PIN Standar: 123456", key="final_pin")
+    st.session_state['confirm_reset_state'] = st.checkbox("Saya sadar data sesi ini akan hilang permanen.", key="final_check")
+    
+    if st.button("🔥 HAPUS SEMUA SESI AKTIF", use_container_width=True):
+        if input_pin == RESET_PIN:
+            if st.session_state.get('confirm_reset_state', False): 
+                ok, msg = delete_active_session(st.session_state[SESSION_KEY_CHECKER])
+                if ok: st.success(msg)
+                else: st.error(f"Gagal: {msg}")
+            else:
+                st.error("Harap centang konfirmasi dulu.")
+        else:
+            st.error("PIN Salah.")
+
+    render_background_jobs("delete_active")
+
+
+def _render_inbound_confirm(df_page):
+    """Konfirmasi Inbound untuk item di halaman tabel yang sedang tampil (gunakan Cari untuk item tertentu)"""
+    items = df_page.set_index(df_page['id'].astype(str))
+    selected_id = st.selectbox(
+        "Pilih Item Selesai Inbound (halaman ini):",
+        options=[None] + list(items.index),
+        format_func=lambda i: "-- Pilih Item untuk Inbound --" if i is None else
+            f"{items.at[i, 'gr_number']} | {items.at[i, 'nama_barang']} ({items.at[i, 'qty_fisik']} unit) | SKU: {items.at[i, 'sku']}"
+    )
+    if selected_id is None:
+        return
+
+    item_details = items.loc[selected_id]
+    if st.button(f"✅ KONFIRMASI INBOUND: {item_details['nama_barang']}", type="primary"):
+        # Nama Admin (dari sidebar)
+        admin_name = st.session_state[SESSION_KEY_CHECKER]
+        if admin_name == "-- Pilih Petugas --":
+             st.error("Pilih nama Anda di sidebar sebelum konfirmasi Inbound.")
+        else:
+            success, msg = update_inbound_status(selected_id, item_details['gr_number'], admin_name)
+            if success:
+                st.success(f"Status INBOUND berhasil diperbarui untuk {item_details['nama_barang']}!")
+                st.cache_data.clear()
+                st.rerun()
+            else:
+                st.error(f"Gagal: {msg}")
+
+def section_admin_inbound(pending_count=None):
+    """Seksi Kontrol Status Inbound"""
+    st.header("📦 Kontrol Status Inbound")
+    st.caption("Supervisor menandai item yang SUDAH divalidasi dan SUDAH dipindahkan ke area akhir (Display/Stok).")
+    
+    # Item AKTIF yang sudah divalidasi tetapi BELUM Inbound
+    # FIX V1.45: Filter dikerjakan di DB dan hanya halaman tabel yang diambil (bukan seluruh item pending)
+    # FIX V1.50: Jumlah pending biasanya sudah diambil paralel oleh page_admin
+    try:
+        if pending_count is None:
+            pending_count = _count_inbound_pending()
+    except Exception as e:
+        st.error(f"Gagal mengambil data inbound: {e}")
+        return
+    
+    if not pending_count:
+        st.success("🎉 Tidak ada item yang menunggu status INBOUND.")
+    else:
+        st.info(f"Ditemukan {pending_count} item menunggu konfirmasi Inbound. Cari/pilih halaman tabel, lalu konfirmasi item dari halaman tersebut.")
+        inbound_cols = ['gr_number', 'sku', 'nama_barang', 'qty_fisik', 'jenis', 'updated_by', 'updated_at']
+        render_paginated_table(
+            "admin_inbound_table",
+            query_page_fetcher(lambda **kw: _inbound_pending_query(**kw), ['sku', 'nama_barang', 'gr_number', 'updated_by']),
+            {c: c for c in inbound_cols},
+            ['gr_number', 'nama_barang', 'sku', 'qty_fisik', 'updated_at'],
+            actions=_render_inbound_confirm
+        )
+
+
+def section_admin_operator():
+    """Seksi Manajemen Operator"""
+    st.header("👥 Manajemen Operator")
+    st.caption("Admin mengelola daftar Operator yang dapat login.")
+    
+    # --- Form Tambah Operator ---
+    st.subheader("1. Tambah Operator Baru")
+    with st.form("add_operator_form", clear_on_submit=True):
         
-        st.divider()
-        input_pin = st.text_input("Masukkan PIN Keamanan", type="password", placeholder="PIN Standar: 123456", key="final_pin")
-        st.session_state['confirm_reset_state'] = st.checkbox("Saya sadar data sesi ini akan hilang permanen.", key="final_check")
+        new_operator_name = st.text_input("Nama Checker/Operator", placeholder="Wajib Diisi")
         
-        if st.button("🔥 HAPUS SEMUA SESI AKTIF", use_container_width=True):
-            if input_pin == RESET_PIN:
-                if st.session_state.get('confirm_reset_state', False): 
-                    with st.spinner("Menghapus Sesi Aktif..."):
-                        ok, msg = delete_active_session()
-                        if ok: st.success("Semua Sesi Aktif berhasil di-reset!"); st.cache_data.clear(); time.sleep(2); st.rerun()
-                        else: st.error(f"Gagal: {msg}")
+        if st.form_submit_button("➕ Tambah Checker"):
+            if new_operator_name:
+                # FIX V1.28: Panggil add_operator tanpa store_name
+                success, msg = add_operator(new_operator_name.title())
+                if success:
+                    st.success(msg)
+                    time.sleep(1)
+                    st.rerun()
                 else:
-                    st.error("Harap centang konfirmasi dulu.")
+                    st.error(f"Gagal: {msg}")
             else:
-                st.error("PIN Salah.")
-                
-    with tab_inbound:
-        st.header("📦 Kontrol Status Inbound")
-        st.caption("Supervisor menandai item yang SUDAH divalidasi dan SUDAH dipindahkan ke area akhir (Display/Stok).")
-        
-        # Ambil semua data AKTIF yang sudah divalidasi tetapi BELUM Inbound
-        df_inbound_pending = get_data(only_active=True)
-        # Filter: qty_fisik > 0 DAN is_inbound == False
-        # FIX V1.24: Explicitly cast qty_fisik to integer before filtering
-        df_inbound_pending = df_inbound_pending[
-            (df_inbound_pending['qty_fisik'].astype(int) > 0) & 
-            (df_inbound_pending['is_inbound'] == False)
-        ].copy()
+                st.error("Nama Operator wajib diisi.")
+
+    st.markdown("---")
+    
+    # --- View & Hapus Operator ---
+    st.subheader("2. Daftar Operator Aktif")
+    
+    df_all_operators = get_all_operators(get_current_site())
+    
+    if not df_all_operators.empty:
+        df_display = df_all_operators.rename(columns={'operator_name': 'Nama Checker'})
+        df_display = df_display[['Nama Checker', 'id']]
+        st.dataframe(df_display, use_container_width=True, hide_index=True)
+
+        # Form Hapus Operator
+        st.markdown("### 🗑️ Hapus Operator")
         
-        if df_inbound_pending.empty:
-            st.success("🎉 Tidak ada item yang menunggu status INBOUND.")
-        else:
-            st.info(f"Ditemukan {len(df_inbound_pending)} item menunggu konfirmasi Inbound.")
-            
-            # Persiapan Data untuk Diproses
-            inbound_options = ["-- Pilih Item untuk Inbound --"] + [
-                f"{row['gr_number']} | {row['nama_barang']} ({row['qty_fisik']} unit) | SKU: {row['sku']}"
-                for _, row in df_inbound_pending.iterrows()
-            ]
-            
-            selected_inbound_item = st.selectbox(
-                "Pilih Item Selesai Inbound:", 
-                options=inbound_options
-            )
-            
-            if selected_inbound_item != "-- Pilih Item --":
-                # Mendapatkan ID dari baris yang dipilih
-                try:
-                    # Mencari ID berdasarkan GR dan SKU
-                    gr_number_selected = selected_inbound_item.split(' | ')[0].strip()
-                    sku_selected = selected_inbound_item.split('SKU: ')[1].strip()
-                    
-                    item_details = df_inbound_pending[
-                        (df_inbound_pending['gr_number'] == gr_number_selected) &
-                        (df_inbound_pending['sku'] == sku_selected)
-                    ].iloc[0]
-                except IndexError:
-                    st.error("Gagal menemukan detail item. Muat ulang data.")
-                    item_details = None
-
-                if item_details is not None:
-                    if st.button(f"✅ KONFIRMASI INBOUND: {item_details['nama_barang']}", type="primary"):
-                        # Nama Admin (dari sidebar)
-                        admin_name = st.session_state[SESSION_KEY_CHECKER]
-                        if admin_name == "-- Pilih Petugas --":
-                             st.error("Pilih nama Anda di sidebar sebelum konfirmasi Inbound.")
-                        else:
-                            success, msg = update_inbound_status(item_details['id'], item_details['gr_number'], admin_name)
-                            if success:
-                                st.success(f"Status INBOUND berhasil diperbarui untuk {item_details['nama_barang']}!")
-                                st.cache_data.clear()
-                                st.rerun()
-                            else:
-                                st.error(f"Gagal: {msg}")
-                            
-            st.markdown("---")
-            st.dataframe(df_inbound_pending[['gr_number', 'sku', 'nama_barang', 'qty_fisik', 'jenis', 'updated_by', 'updated_at']], use_container_width=True)
-
-    with tab_operator: # New Tab: Manajemen Operator
-        st.header("👥 Manajemen Operator")
-        st.caption("Admin mengelola daftar Operator yang dapat login.")
+        # Buat list display untuk selectbox hapus
+        delete_options = ["-- Pilih Operator untuk Dihapus --"] + [
+            f"{row['Nama Checker']} (ID: {row['id'][:4]}...)" 
+            for _, row in df_display.iterrows()
+        ]
         
-        # --- Form Tambah Operator ---
-        st.subheader("1. Tambah Operator Baru")
-        with st.form("add_operator_form", clear_on_submit=True):
+        operator_to_delete_display = st.selectbox(
+            "Pilih Operator yang Akan Dinonaktifkan Permanen:", 
+            options=delete_options,
+            key="delete_op_selector"
+        )
+
+        if operator_to_delete_display != "-- Pilih Operator untuk Dihapus --":
+            # Ekstrak ID dari string display
+            operator_id_prefix = operator_to_delete_display.split('(ID: ')[1].strip(')').split('...')[0]
             
-            new_operator_name = st.text_input("Nama Checker/Operator", placeholder="Wajib Diisi")
+            # Cari ID lengkap
+            operator_id = df_all_operators[df_all_operators['id'].str.startswith(operator_id_prefix)].iloc[0]['id']
             
-            if st.form_submit_button("➕ Tambah Checker"):
-                if new_operator_name:
-                    # FIX V1.28: Panggil add_operator tanpa store_name
-                    success, msg = add_operator(new_operator_name.title())
-                    if success:
-                        st.success(msg)
-                        time.sleep(1)
-                        st.rerun()
-                    else:
-                        st.error(f"Gagal: {msg}")
+            if st.button(f"🔥 KONFIRMASI HAPUS OPERATOR {operator_to_delete_display}", type="primary"):
+                success, msg = delete_operator(operator_id)
+                if success:
+                    st.success(msg)
+                    st.cache_data.clear()
+                    st.rerun()
                 else:
-                    st.error("Nama Operator wajib diisi.")
+                    st.error(f"Gagal menghapus: {msg}")
+    else:
+        st.info("Belum ada operator yang terdaftar.")
 
-        st.markdown("---")
-        
-        # --- View & Hapus Operator ---
-        st.subheader("2. Daftar Operator Aktif")
-        
-        df_all_operators = get_all_operators()
-        
-        if not df_all_operators.empty:
-            df_display = df_all_operators.rename(columns={'operator_name': 'Nama Checker'})
-            df_display = df_display[['Nama Checker', 'id']]
-            st.dataframe(df_display, use_container_width=True, hide_index=True)
 
-            # Form Hapus Operator
-            st.markdown("### 🗑️ Hapus Operator")
-            
-            # Buat list display untuk selectbox hapus
-            delete_options = ["-- Pilih Operator untuk Dihapus --"] + [
-                f"{row['Nama Checker']} (ID: {row['id'][:4]}...)" 
-                for _, row in df_display.iterrows()
-            ]
-            
-            operator_to_delete_display = st.selectbox(
-                "Pilih Operator yang Akan Dinonaktifkan Permanen:", 
-                options=delete_options,
-                key="delete_op_selector"
-            )
+# --- FIX V1.44: PROFILER PER RERUN (OPT-IN) ---
 
-            if operator_to_delete_display != "-- Pilih Operator untuk Dihapus --":
-                # Ekstrak ID dari string display
-                operator_id_prefix = operator_to_delete_display.split('(ID: ')[1].strip(')').split('...')[0]
-                
-                # Cari ID lengkap
-                operator_id = df_all_operators[df_all_operators['id'].str.startswith(operator_id_prefix)].iloc[0]['id']
-                
-                if st.button(f"🔥 KONFIRMASI HAPUS OPERATOR {operator_to_delete_display}", type="primary"):
-                    success, msg = delete_operator(operator_id)
-                    if success:
-                        st.success(msg)
-                        st.cache_data.clear()
-                        st.rerun()
+class RerunProfiler:
+    """
+    Profil N rerun berikutnya dari page_checker/page_admin (semua sesi di replika ini).
+    cProfile = statistik per fungsi (pstats), sampling = stack tiap interval (collapsed stack untuk flamegraph).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._busy = threading.Lock() # cProfile: hanya satu profiler aktif per proses
+        self.reset()
+
+    def reset(self, target=None, mode="cProfile", reruns=0):
+        with self._lock:
+            self.target, self.mode = target, mode
+            self.remaining, self.done = reruns, 0
+            self.stats = None # pstats.Stats gabungan
+            self.stacks = Counter() # "root;...;leaf" -> jumlah sampel
+            self.total_ms = 0.0
+
+    @property
+    def active(self):
+        return self.target is not None and self.remaining > 0
+
+    def _sample(self, thread_id, stop):
+        while not stop.wait(PROFILER_SAMPLE_INTERVAL_S):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                with self._lock:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def run(self, target, func):
+        """Jalankan func; diprofil hanya jika target cocok, kuota masih ada, dan tidak ada profil lain berjalan"""
+        if self.target != target or self.remaining <= 0 or not self._busy.acquire(blocking=False):
+            return func()
+
+        start = time.perf_counter()
+        profiler, stop = None, threading.Event()
+        try:
+            if self.mode == "cProfile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                threading.Thread(target=self._sample, args=(threading.get_ident(), stop), daemon=True, name="rerun-sampler").start()
+            return func()
+        finally:
+            # st.stop()/st.rerun() juga lewat sini (exception), rerun tetap dihitung
+            stop.set()
+            if profiler is not None:
+                profiler.disable()
+            with self._lock:
+                if profiler is not None:
+                    if self.stats is None:
+                        self.stats = pstats.Stats(profiler)
                     else:
-                        st.error(f"Gagal menghapus: {msg}")
-        else:
-            st.info("Belum ada operator yang terdaftar.")
-            
+                        self.stats.add(profiler)
+                self.total_ms += (time.perf_counter() - start) * 1000
+                self.done += 1
+                self.remaining -= 1
+            self._busy.release()
+
+    def top_functions(self, limit=30):
+        if self.stats is None:
+            return pd.DataFrame()
+        rows = [
+            {"Fungsi": f"{func} ({os.path.basename(file)}:{line})", "Panggilan": nc,
+             "Self (ms)": round(tt * 1000, 1), "Kumulatif (ms)": round(ct * 1000, 1)}
+            for (file, line, func), (cc, nc, tt, ct, callers) in self.stats.stats.items()
+        ]
+        return pd.DataFrame(rows).sort_values("Self (ms)", ascending=False).head(limit)
+
+    def export_pstats(self):
+        """File .prof (marshal) untuk snakeviz / python -m pstats"""
+        fd, path = tempfile.mkstemp(suffix=".prof")
+        os.close(fd)
+        try:
+            self.stats.dump_stats(path)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    def export_collapsed(self):
+        """Format collapsed stack (flamegraph.pl / speedscope)"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()).encode()
+
+@st.cache_resource
+def get_rerun_profiler():
+    return RerunProfiler()
+
+def render_rerun_profiler():
+    """Panel profiler di Maintenance"""
+    st.subheader("🔬 Profiler Rerun (CPU)")
+    profiler = get_rerun_profiler()
 
-    with tab_maintenance:
-        st.header("🔧 Debugging & Cache Maintenance")
-        st.caption("Gunakan ini hanya jika Anda mendapat error aneh setelah mengganti Kunci API atau RLS.")
-        if st.button("🗑️ HAPUS SEMUA CACHE STREAMLIT", type="secondary"):
-            st.cache_data.clear()
-            st.cache_resource.clear()
-            st.success("Cache Data dan Koneksi berhasil dihapus! Aplikasi akan di-refresh.")
+    if profiler.active:
+        st.info(f"Memprofil **{profiler.target}** ({profiler.mode}): {profiler.done} rerun selesai, sisa {profiler.remaining}. Gunakan aplikasi seperti biasa.")
+        if st.button("⏹️ Hentikan Profil", key="profiler_stop"):
+            profiler.remaining = 0
             st.rerun()
+    else:
+        c1, c2, c3 = st.columns(3)
+        target_label = c1.selectbox("Halaman", list(PROFILER_TARGETS), key="profiler_target")
+        mode = c2.radio("Mode", ["cProfile", "Sampling"], horizontal=True, key="profiler_mode",
+                        help="cProfile: akurat per fungsi, overhead lebih besar. Sampling: overhead kecil, hasil collapsed stack.")
+        reruns = c3.number_input("Jumlah rerun", min_value=1, max_value=500, value=20, step=1, key="profiler_reruns")
+        if st.button("▶️ Mulai Profil", key="profiler_start"):
+            profiler.reset(PROFILER_TARGETS[target_label], mode, int(reruns))
+            st.rerun()
+
+    if profiler.done:
+        st.caption(f"{profiler.done} rerun diprofil, rata-rata {profiler.total_ms / profiler.done:.0f} ms/rerun.")
+        if profiler.stats is not None:
+            st.dataframe(profiler.top_functions(), use_container_width=True, hide_index=True)
+            st.download_button("⬇️ Download pstats (.prof)", profiler.export_pstats(), f"rerun_{profiler.target}.prof", key="profiler_dl_pstats")
+        if profiler.stacks:
+            st.download_button("⬇️ Download Collapsed Stack (.txt)", profiler.export_collapsed(), f"rerun_{profiler.target}.collapsed.txt", key="profiler_dl_collapsed")
+
+def section_admin_maintenance():
+    """Seksi Debugging & Cache Maintenance"""
+    st.header("🔧 Debugging & Cache Maintenance")
+    st.caption("Gunakan ini hanya jika Anda mendapat error aneh setelah mengganti Kunci API atau RLS.")
+    if st.button("🗑️ HAPUS SEMUA CACHE STREAMLIT", type="secondary"):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        st.success("Cache Data dan Koneksi berhasil dihapus! Aplikasi akan di-refresh.")
+        st.rerun()
+
+    # FIX V1.36: Laporan profil cold start (import & fase startup)
+    st.markdown("---")
+    st.subheader("⏱️ Profil Cold Start Proses Ini")
+    profile = get_startup_profile()
+    df_profile = pd.DataFrame(
+        [{"Tahap": k, "Tipe": "Fase", "Durasi (ms)": round(v, 1)} for k, v in profile["phases"].items()] +
+        [{"Tahap": f"import {k}", "Tipe": "Lazy Import", "Durasi (ms)": round(v, 1)} for k, v in profile["imports"].items()]
+    )
+    st.dataframe(df_profile, use_container_width=True, hide_index=True)
+    if profile["probe"]:
+        status, detail = profile["probe"]
+        st.caption(f"Probe koneksi async: {status} ({detail:.0f} ms)" if status == "OK" else f"Probe koneksi async: {status} - {detail}")
+    st.caption("Detail per modul: jalankan `python -X importtime -c \"import streamlit, pandas, supabase, openpyxl\"` di shell.")
+
+    st.markdown("---")
+    render_rerun_profiler() # FIX V1.44
+
+    st.markdown("---")
+    render_swr_status() # FIX V1.49
+
+    # FIX V1.47: Status event log
+    st.markdown("---")
+    st.subheader("🧾 Event Log")
+    event_log = get_event_log()
+    st.caption(f"Menunggu flush: {event_log.pending()} · Tertulis: {event_log.stats['written']} · Snapshot: {event_log.stats['snapshots']} · Gagal flush: {event_log.stats['failed_flushes']} · Dibuang: {event_log.stats['dropped']}")
+    if st.button("🗜️ Flush & Kompaksi Sekarang", key="event_log_compact"):
+        event_log.flush()
+        event_log.compact_touched()
+        st.success("Event log di-flush dan snapshot diperbarui.")
+
+    # FIX V1.32: SQL tambahan yang dibutuhkan fitur baru (jalankan sekali di Supabase SQL Editor)
+    st.markdown("---")
+    st.subheader("🧾 SQL Setup Database")
+    st.caption("Fitur tetap berjalan dengan fallback jika SQL belum dijalankan, tetapi performa & atomisitas terbaik membutuhkan SQL ini.")
+    for sql_name, sql_text in SQL_SETUP_SCRIPTS.items():
+        with st.expander(sql_name):
+            st.code(sql_text.strip(), language='sql')
+
+
+# --- FUNGSI ADMIN ---
+def page_admin():
+    st.title("🛡️ Admin Dashboard (Receiving)")
+    page_data = load_page_data(_admin_page_fetches(get_current_site())) # FIX V1.50
+    active_grs = page_data["sessions"] or get_active_session_info()
+    
+    # Menghilangkan BLIND-RECEIVE dari daftar yang harus diadministrasi
+    admin_active_grs = [gr for gr in active_grs if gr != BLIND_GR and gr != "- Error Koneksi -"]
+    
+    if not admin_active_grs:
+        st.warning("⚠️ Belum ada sesi GR aktif yang di-upload.")
+    else:
+        st.info(f"📅 Sesi Aktif: **{', '.join(admin_active_grs)}**")
+    
+    # FIX V1.34: Navigasi lazy, hanya seksi terpilih yang dieksekusi
+    section = st.radio(
+        "Navigasi Admin",
+        ADMIN_SECTIONS,
+        horizontal=True,
+        label_visibility="collapsed",
+        key="admin_section"
+    )
+
+    if section == "🚀 Mulai Sesi GR":
+        section_admin_start_session()
+    elif section == "🗄️ Laporan & Arsip":
+        section_admin_report(admin_active_grs, page_data.get("archived"))
+    elif section == "📈 Analitik Selisih":
+        section_admin_analytics() # FIX V1.52
+    elif section == "⏱️ Produktivitas Checker":
+        section_admin_productivity() # FIX V1.53
+    elif section == "🔗 Rekonsiliasi Blind":
+        section_admin_reconcile()
+    elif section == "⚠️ Danger Zone":
+        section_admin_danger_zone()
+    elif section == "📦 Inbound Control":
+        section_admin_inbound(page_data.get("inbound_pending"))
+    elif section == "👥 Manajemen Operator":
+        section_admin_operator()
+    elif section == "🔧 Maintenance":
+        section_admin_maintenance()
 
 
 # --- MAIN ---
 def main():
-    st.set_page_config(page_title="GR Validation v1.29", page_icon="📦", layout="wide")
+    st.set_page_config(page_title="GR Validation v1.54", page_icon="📦", layout="wide")
     # FIX V1.19: Sidebar hanya menampilkan Nama Aplikasi dan Navigasi
-    st.sidebar.title("GR Validation Apps v1.29")
+    st.sidebar.title("GR Validation Apps v1.54")
     menu = st.sidebar.radio("Navigasi", ["Checker Input", "Admin Panel"])
-    if menu == "Checker Input": page_checker()
+    render_site_selector() # FIX V1.40
+    render_db_health()
+    # FIX V1.44: Rerun bisa diprofil (opt-in dari Maintenance), tanpa overhead jika tidak aktif
+    profiler = get_rerun_profiler()
+    if menu == "Checker Input": profiler.run("page_checker", page_checker)
     elif menu == "Admin Panel":
         pwd = st.sidebar.text_input("Password Admin", type="password")
-        if pwd == "admin123": page_admin()
+        if pwd == "admin123": profiler.run("page_admin", page_admin)
+
+    # FIX V1.36: Catat time-to-first-render proses ini (hanya rerun pertama yang disimpan)
+    phases = get_startup_profile()["phases"]
+    if "first render" not in phases:
+        phases["first render"] = (time.perf_counter() - _T_START) * 1000
+        logging.info("Startup profile (ms): " + ", ".join(f"{k}={v:.0f}" for k, v in phases.items()))
 
 if __name__ == "__main__":
     # Inisialisasi default session state keys
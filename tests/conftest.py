@@ -0,0 +1,70 @@
+"""
+Fixture bersama: receiving_app di-import dengan backend lokal in-memory (local_backend.py),
+sama seperti load_test.py, sehingga test tidak butuh Supabase.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+LOCAL_URL = "local://pytest"
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    # st.secrets dibaca dari .streamlit/secrets.toml di direktori kerja saat import
+    workdir = tmp_path_factory.mktemp("app")
+    (workdir / ".streamlit").mkdir()
+    (workdir / ".streamlit" / "secrets.toml").write_text(
+        f'SUPABASE_URL = "{LOCAL_URL}"\nSUPABASE_KEY = "local"\n'
+    )
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import receiving_app
+    finally:
+        os.chdir(cwd)
+    return receiving_app
+
+
+@pytest.fixture
+def db(app):
+    """Database lokal yang dipakai app, dikosongkan per test"""
+    import local_backend
+
+    database = local_backend.get_local_database(LOCAL_URL)
+    database.tables.clear()
+    yield database
+    app.get_event_log().flush() # Event yang masih di buffer tidak bocor ke test berikutnya
+    app.get_checker_metrics().flush()
+    database.tables.clear()
+
+
+@pytest.fixture
+def session(app):
+    """st.session_state (mode bare) dikosongkan per test"""
+    import streamlit as st
+
+    st.session_state.clear()
+    yield st.session_state
+    st.session_state.clear()
+
+
+@pytest.fixture
+def app_test(db):
+    """Satu sesi browser headless (AppTest) terhadap database lokal yang sama, seperti load_test.py"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # Cache operator/GR/snapshot dari test sebelumnya tidak boleh terbawa (sama seperti run_level di load_test.py)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = AppTest.from_file(str(ROOT / "receiving_app.py"), default_timeout=30)
+    at.secrets["SUPABASE_URL"] = LOCAL_URL
+    at.secrets["SUPABASE_KEY"] = "local"
+    at.secrets["SINGLE_REPLICA"] = True
+    return at
@@ -0,0 +1,55 @@
+from datetime import date, datetime, timezone
+
+
+def _rows(app):
+    return [
+        {"gr_number": "GR1", "sku": "sm-a15", "nama_barang": "Samsung A15", "qty_po": 5, "qty_fisik": 3, "created_at": "2025-01-10T08:00:00+00:00"},
+        {"gr_number": "GR1", "sku": "SM-A25", "nama_barang": "samsung A25", "qty_po": 2, "qty_fisik": 4, "created_at": "2025-01-10T08:00:00+00:00"},
+        {"gr_number": "GR1", "sku": "KBL", "nama_barang": "Vivan Kabel", "qty_po": 1, "qty_fisik": 1, "created_at": "2025-02-01T08:00:00+00:00"},
+        {"gr_number": app.BLIND_GR, "sku": "X", "nama_barang": "Samsung", "qty_po": 0, "qty_fisik": 2, "created_at": "2025-01-11T08:00:00+00:00"},
+    ]
+
+
+def _job(app, job_id, rows):
+    acc = app.DiscrepancyAccumulator()
+    acc.add(rows)
+    return {"id": job_id, "analytics": acc, "started_at": datetime(2025, 3, 1, tzinfo=timezone.utc),
+            "params": {"gr_number": "GR1"}, "submitted_by": "admin"}
+
+
+def test_accumulator_groups_by_month_sku_and_brand(app):
+    acc = app.DiscrepancyAccumulator()
+    acc.add(_rows(app))
+    assert (acc.total["short_units"], acc.total["over_units"], acc.total["blind_units"]) == (2, 2, 2)
+
+    gr, skus, brands = app.DiscrepancyAccumulator.from_dict(acc.to_dict()).payloads("job-1", None, "GR1", "admin")
+    assert (gr["month"], gr["site_code"], gr["lines"], gr["blind_lines"]) == ("2025-01-01", "", 3, 1)
+    by_sku = {(s["month"], s["sku"]): s for s in skus}
+    assert by_sku[("2025-01-01", "SM-A15")]["short_units"] == 2 and by_sku[("2025-02-01", "KBL")]["lines"] == 1
+    by_brand = {(b["month"], b["brand"]): b for b in brands}
+    assert by_brand[("2025-01-01", "SAMSUNG")]["lines"] == 2 and by_brand[("2025-01-01", "SAMSUNG")]["blind_units"] == 2
+
+
+def test_record_gr_analytics_fallback_adds_to_aggregates(app, db):
+    assert app.record_gr_analytics(_job(app, "j1", _rows(app)))
+    assert app.record_gr_analytics(_job(app, "j2", _rows(app)[:1]))
+
+    assert len(db.table_rows(app.ANALYTICS_GR_TABLE)) == 2
+    sku = {(r["month"], r["sku"]): r for r in db.table_rows(app.ANALYTICS_SKU_TABLE).values()}
+    assert len(sku) == 4 # Upsert per (site, bulan, SKU), bukan baris baru per job
+    assert (sku[("2025-01-01", "SM-A15")]["short_units"], sku[("2025-01-01", "SM-A15")]["gr_count"]) == (4, 2)
+    assert not app.record_gr_analytics(_job(app, "j3", []))
+
+
+def test_fetch_sku_discrepancy_fallback_pages_and_flags_truncation(app, db, session, monkeypatch):
+    db.seed(app.ANALYTICS_SKU_TABLE, [
+        {"site_code": "", "month": f"2025-{m:02d}-01", "sku": sku, "brand": "B", "gr_count": 1,
+         **{k: 0 for k in app.ANALYTICS_METRICS}, "short_units": short}
+        for m, sku, short in [(1, "A", 5), (2, "A", 4), (1, "B", 7), (3, "C", 1)]
+    ])
+    df, truncated = app.fetch_sku_discrepancy(date(2025, 1, 1), date(2025, 12, 31))
+    assert not truncated and df[["sku", "short_units"]].values.tolist() == [["A", 9], ["B", 7], ["C", 1]]
+
+    monkeypatch.setattr(app, "ANALYTICS_FALLBACK_MAX_ROWS", 3)
+    df, truncated = app.fetch_sku_discrepancy(date(2025, 1, 1), date(2025, 12, 31))
+    assert truncated and "C" not in df["sku"].tolist()
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.fixture
+def manager(app, db, monkeypatch):
+    monkeypatch.setattr(app, "JOB_CHUNK_SIZE", 3)
+    manager = app.BackgroundJobManager()
+    monkeypatch.setattr(manager, "_start", manager._run) # Job dijalankan sinkron di test
+    return manager
+
+
+def _seed_gr(app, db, n=7, gr_number="GR1"):
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": f"{gr_number}-{i:02d}", "gr_number": gr_number, "sku": f"S{i}", "nama_barang": "Samsung HP", "qty_po": 5,
+         "qty_fisik": 4, "is_active": True, "created_at": "2025-03-10T00:00:00+00:00"}
+        for i in range(n)
+    ])
+
+
+def test_archive_job_processes_chunks_and_persists_state(app, db, manager):
+    _seed_gr(app, db)
+    _seed_gr(app, db, 2, "GR2")
+    job = manager.submit("archive", {"gr_number": "GR1", "site_code": None}, "admin")
+
+    assert (job["status"], job["total"], job["processed"], job["remaining"]) == ("DONE", 7, 7, 0)
+    rows = db.table_rows(app.RECEIVING_TABLE).values()
+    assert sorted(r["gr_number"] for r in rows if r["is_active"]) == ["GR2", "GR2"]
+    assert job["analytics"].total["short_units"] == 7
+
+    stored = db.table_rows(app.JOBS_TABLE)[job["id"]]
+    assert (stored["status"], stored["processed"], stored["pending_ids"]) == ("DONE", 7, None)
+    assert [r["short_units"] for r in db.table_rows(app.ANALYTICS_GR_TABLE).values()] == [7]
+
+
+def test_archive_job_counts_chunk_whose_response_was_lost(app, db, manager, monkeypatch):
+    _seed_gr(app, db)
+    real_execute = app.db_execute
+
+    def lossy_execute(query, *args, **kwargs):
+        if getattr(query, "op", None) == "update":
+            real_execute(query, *args, **kwargs) # Write diterapkan, response hilang, retry tidak menemukan baris lagi
+            query.filters.append(lambda row: row.get("is_active"))
+        return real_execute(query, *args, **kwargs)
+
+    monkeypatch.setattr(app, "db_execute", lossy_execute)
+    job = manager.submit("archive", {"gr_number": "GR1", "site_code": None}, "admin")
+    assert (job["status"], job["processed"]) == ("DONE", 7)
+    assert job["analytics"].total["lines"] == 7
+
+
+def test_interrupted_job_is_resumed_after_restart(app, db, manager, monkeypatch):
+    _seed_gr(app, db)
+    # Proses lama mati di tengah chunk: 2 baris sudah diarsip, chunk itu belum dihitung
+    for item_id in ("GR1-00", "GR1-01"):
+        db.table_rows(app.RECEIVING_TABLE)[item_id]["is_active"] = False
+    stale = (datetime.now(timezone.utc) - timedelta(minutes=10)).isoformat()
+    db.seed(app.JOBS_TABLE, [{
+        "id": "job1", "kind": "archive", "params": {"gr_number": "GR1", "site_code": None}, "submitted_by": "admin",
+        "status": "RUNNING", "total": 7, "processed": 0, "last_id": "GR1-05", "pending_ids": ["GR1-00", "GR1-01", "GR1-02"],
+        "started_at": stale, "updated_at": stale,
+    }])
+
+    restarted = app.BackgroundJobManager()
+    monkeypatch.setattr(restarted, "_start", restarted._run)
+    job = restarted.jobs["job1"]
+    assert job["status"] == "FAILED"
+
+    restarted.resume("job1")
+    # last_id direset: baris di bawah last_id yang masih aktif ikut diarsip
+    assert (job["status"], job["processed"], job["remaining"]) == ("DONE", 7, 0)
+    assert not any(r["is_active"] for r in db.table_rows(app.RECEIVING_TABLE).values())
+
+
+def test_running_job_of_live_replica_is_not_taken_over(app, db):
+    now = datetime.now(timezone.utc).isoformat()
+    db.seed(app.JOBS_TABLE, [{"id": "job2", "kind": "delete_active", "params": {}, "status": "RUNNING", "processed": 0,
+                              "started_at": now, "updated_at": now}])
+    assert "job2" not in app.BackgroundJobManager().jobs
+
+
+def test_delete_job_removes_only_target_site(app, db, manager, monkeypatch):
+    monkeypatch.setattr(app, "SITE_CODES", ["JKT", "BDG"])
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": f"{site}-{i}", "gr_number": "GR1", "site_code": site, "is_active": True} for site in ("JKT", "BDG") for i in range(4)
+    ])
+    job = manager.submit("delete_active", {"site_code": "BDG"}, "admin")
+    assert (job["status"], job["processed"]) == ("DONE", 4)
+    assert sorted(db.table_rows(app.RECEIVING_TABLE)) == [f"JKT-{i}" for i in range(4)]
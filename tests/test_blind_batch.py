@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+
+def _blind_lines(*rows):
+    return pd.DataFrame([dict(dict.fromkeys(["Brand", "SKU", "Tipe Barang", "Qty", "SN", "Tujuan", "Keterangan"]), **r) for r in rows])
+
+
+def test_validate_blind_batch_per_line_report(app):
+    df = _blind_lines(
+        {"Brand": "Samsung", "SKU": "A1", "SN": "SN0001, SN0002 SN0003"},
+        {"Brand": "Vivan", "SKU": "B1", "Qty": "5", "Tujuan": "display", "Keterangan": "rusak"},
+        {"Brand": "Samsung", "SKU": "A2", "Tipe Barang": "SN", "SN": "SN0003 OLD0009"},
+        {},
+        {"Brand": "Robot", "SKU": "C", "Tipe Barang": "NON-SN", "Qty": "0"},
+    )
+    payloads, report = app.validate_blind_batch(df, "budi", "karton campur", {"OLD0009": "GR/1"})
+
+    assert [(r["Baris"], r["Status"]) for r in report] == [(1, "✅ Valid"), (2, "✅ Valid"), (3, "❌ Ditolak"), (5, "❌ Ditolak")]
+    assert "GR/1" in report[2]["Detail"] and "baris 1" in report[2]["Detail"]
+    assert [line_no for line_no, _ in payloads] == [1, 2]
+    sn_line, non_sn_line = payloads[0][1], payloads[1][1]
+    assert (sn_line["kategori_barang"], sn_line["qty_fisik"], sn_line["sn_list"]) == ("SN", 3, '["SN0001", "SN0002", "SN0003"]')
+    assert (non_sn_line["kategori_barang"], non_sn_line["qty_fisik"], non_sn_line["jenis"]) == ("NON-SN", 5, "Display")
+    assert sn_line["keterangan"].endswith("karton campur") and non_sn_line["keterangan"].endswith("rusak")
+
+
+def test_handle_blind_batch_insert_is_all_or_nothing(app, db):
+    df = _blind_lines({"Brand": "Vivan", "SKU": "B1", "Qty": "2"}, {"Brand": "Robot", "SKU": "C", "Qty": "0"})
+    saved, _ = app.handle_blind_batch_insert(df, "budi", "karton")
+    assert saved == 0 and not db.table_rows(app.RECEIVING_TABLE)
+
+    saved, report = app.handle_blind_batch_insert(df, "budi", "karton", skip_invalid=True)
+    assert saved == 1
+    assert [r["Status"] for r in report] == ["✅ Tersimpan", "❌ Ditolak"]
+    assert [r["sku"] for r in db.table_rows(app.RECEIVING_TABLE).values()] == ["B1"]
+
+
+def _seed_recorded(app, db):
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": "L1", "gr_number": "GR1", "sku": "A1", "kategori_barang": "SN", "sn_list": '["sn0001", "SN0002"]', "is_active": True},
+        {"id": "L2", "gr_number": "GR2", "sku": "A2", "kategori_barang": "SN", "sn_list": '["SN0003"]', "is_active": False},
+        {"id": "L3", "gr_number": "GR3", "sku": "A3", "kategori_barang": "SN", "sn_list": '["SN0004"]', "is_active": True},
+    ])
+
+
+@pytest.mark.parametrize("rpc", [True, False], ids=["rpc", "fallback"])
+def test_fetch_recorded_serials_only_submitted(app, db, monkeypatch, rpc):
+    monkeypatch.setattr(db, "rpc", rpc)
+    _seed_recorded(app, db)
+    assert app._fetch_recorded_serials(["SN0001", " sn0003 ", "SN0004", "NEW1"]) == {"SN0001": "GR1", "SN0004": "GR3"}
+    queries = db.stats["queries"]
+    assert app._fetch_recorded_serials([]) == {} and db.stats["queries"] == queries
+
+
+def test_handle_blind_batch_insert_rejects_recorded_serials(app, db):
+    _seed_recorded(app, db)
+    df = _blind_lines({"Brand": "Samsung", "SKU": "A1", "SN": "SN0002 SN0009"})
+    saved, report = app.handle_blind_batch_insert(df, "budi", "karton")
+    assert saved == 0 and report[0]["Status"] == "❌ Ditolak" and "GR1" in report[0]["Detail"]
+
+    saved, _ = app.handle_blind_batch_insert(_blind_lines({"Brand": "Samsung", "SKU": "A1", "SN": "SN0009"}), "budi", "karton")
+    blind = [r for r in db.table_rows(app.RECEIVING_TABLE).values() if r["gr_number"] == app.BLIND_GR]
+    assert saved == 1 and blind[0]["sn_list"] == '["SN0009"]'
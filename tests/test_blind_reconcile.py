@@ -0,0 +1,61 @@
+import pytest
+
+
+def _rows(app, db, line_qty_fisik=1):
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": "L1", "gr_number": "GR1", "sku": "SM-A155F", "nama_barang": "Samsung A15", "kategori_barang": "SN", "qty_po": 3,
+         "qty_fisik": line_qty_fisik, "sn_list": '["R1"]', "is_active": True, "updated_at": "2025-01-01T10:00:00+00:00"},
+        {"id": "L2", "gr_number": "GR1", "sku": "KBL-01", "nama_barang": "Vivan Kabel", "kategori_barang": "NON-SN", "qty_po": 10,
+         "qty_fisik": 4, "is_active": True, "updated_at": "2025-01-01T10:00:00+00:00"},
+        {"id": "B1", "gr_number": app.BLIND_GR, "sku": "SMA155F", "nama_barang": "Samsung", "kategori_barang": "SN", "qty_po": 0,
+         "qty_fisik": 3, "sn_list": '["R1", "R2", "R3"]', "is_active": True, "updated_at": "2025-01-01T11:00:00+00:00"},
+        {"id": "B2", "gr_number": app.BLIND_GR, "sku": "KBL-0I", "nama_barang": "Vivan", "kategori_barang": "NON-SN", "qty_po": 0,
+         "qty_fisik": 8, "is_active": True, "updated_at": "2025-01-01T11:00:00+00:00"},
+    ])
+
+
+def test_propose_blind_matches(app, db):
+    _rows(app, db)
+    df, truncated = app.fetch_recon_rows()
+    assert not truncated and len(df) == 4
+    proposals, duplicates = app.propose_blind_matches(df)
+
+    assert duplicates == [{"blind_id": "B1", "sku": "SMA155F", "serial": "R1", "gr_number": "GR1"}]
+    by_blind = {p["blind_id"]: p for p in proposals}
+    assert (by_blind["B1"]["line_id"], by_blind["B1"]["qty"], by_blind["B1"]["serials"]) == ("L1", 2, ["R2", "R3"])
+    # O/0, I/1 dianggap mirip; qty dibatasi kekurangan baris tujuan
+    assert (by_blind["B2"]["line_id"], by_blind["B2"]["qty"]) == ("L2", 6)
+    assert by_blind["B2"]["score"] < 1.0
+
+
+def test_fetch_recon_rows_reports_truncation(app, db, monkeypatch):
+    _rows(app, db)
+    monkeypatch.setattr(app, "RECON_MAX_ROWS", 3)
+    df, truncated = app.fetch_recon_rows()
+    assert truncated and df["id"].tolist() == ["B1", "B2", "L1"]
+
+
+def test_apply_blind_matches_moves_qty_and_serials(app, db):
+    _rows(app, db)
+    proposals, _ = app.propose_blind_matches(app.fetch_recon_rows()[0])
+    assert app.apply_blind_matches(proposals, "admin") == (2, 0)
+
+    rows = db.table_rows(app.RECEIVING_TABLE)
+    assert (rows["L1"]["qty_fisik"], rows["L2"]["qty_fisik"]) == (3, 10)
+    assert app._deserialize_sn_list(rows["L1"]["sn_list"]) == ["R1", "R2", "R3"]
+    # B1 masih menyimpan SN duplikat R1, B2 tersisa 2 unit
+    assert rows["B1"]["qty_fisik"] == 1 and app._deserialize_sn_list(rows["B1"]["sn_list"]) == ["R1"]
+    assert rows["B2"]["qty_fisik"] == 2
+
+
+@pytest.mark.parametrize("change", [
+    {"updated_at": "2025-01-01T12:00:00+00:00"}, # Baris diubah checker lain
+    {"qty_fisik": 3},                           # Baris sudah tidak SHORT
+])
+def test_apply_blind_matches_skips_changed_line(app, db, change):
+    _rows(app, db)
+    proposals, _ = app.propose_blind_matches(app.fetch_recon_rows()[0])
+    db.table_rows(app.RECEIVING_TABLE)["L1"].update(change)
+
+    assert app.apply_blind_matches([p for p in proposals if p["line_id"] == "L1"], "admin") == (0, 1)
+    assert db.table_rows(app.RECEIVING_TABLE)["B1"]["qty_fisik"] == 3
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+
+T0 = datetime(2025, 1, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def _store(app):
+    store = app.GRSnapshotStore()
+    store.seed("GR1", [{"id": 1, "nama_barang": "B", "qty_fisik": 0}, {"id": 2, "nama_barang": "A", "qty_fisik": 0}], T0)
+    return store
+
+
+def test_snapshot_store_applies_partial_updates_and_advances_as_of(app):
+    store = _store(app)
+    assert store.gr_of(1) == "GR1" and store.version("GR1") == 1
+
+    at = T0 + timedelta(minutes=5)
+    store.apply({"type": "UPDATE", "record": {"id": 1, "qty_fisik": 3, "updated_by": "ani", "updated_at": at.isoformat()}}, lag_margin_s=2)
+    rows, version, as_of = store.get("GR1")
+    assert [r["nama_barang"] for r in rows] == ["A", "B"] # urut nama barang
+    assert store.row(1)["qty_fisik"] == 3 and version == 2
+    assert as_of == at - timedelta(seconds=2)
+
+    # Event lama tidak memundurkan as_of
+    store.apply({"type": "UPDATE", "record": {"id": 2, "qty_fisik": 1, "updated_at": T0.isoformat()}})
+    assert store.get("GR1")[2] == at - timedelta(seconds=2)
+
+
+def test_snapshot_store_insert_delete_and_deactivate(app):
+    store = _store(app)
+    store.apply({"type": "INSERT", "gr_number": "GR1", "record": {"id": 3, "nama_barang": "C"}})
+    assert store.gr_of(3) == "GR1"
+    store.apply({"type": "DELETE", "record": {"id": 3}})
+    store.apply({"type": "UPDATE", "record": {"id": 2, "is_active": False}})
+    assert [r["id"] for r in store.get("GR1")[0]] == [1]
+    # GR yang tidak di-snapshot diabaikan
+    assert store.apply({"type": "INSERT", "gr_number": "GR9", "record": {"id": 9}}) == "GR9"
+    assert store.get("GR9") is None
+
+
+def test_snapshot_store_changed_since_excludes_own_writes(app):
+    store = _store(app)
+    at = (T0 + timedelta(minutes=1)).isoformat()
+    store.apply({"type": "UPDATE", "record": {"id": 1, "updated_by": "ani", "updated_at": at}})
+    store.apply({"type": "UPDATE", "record": {"id": 2, "updated_by": "budi", "updated_at": at}})
+    assert [r["id"] for r in store.changed_since("GR1", T0, exclude_user="budi")] == [1]
+    assert store.changed_since("GR1", T0 + timedelta(minutes=2)) == []
+
+
+def test_hub_publish_notifies_subscribers_of_that_gr(app):
+    hub = app.ChangeFeedHub("local")
+    hub.store.seed("GR1", [{"id": 1, "nama_barang": "A"}], T0)
+    seen = []
+    hub.subscribe("GR1", seen.append)
+    hub.subscribe("GR2", lambda e: seen.append(("GR2", e)))
+
+    hub.publish({"type": "UPDATE", "record": {"id": 1, "qty_fisik": 2}})
+    assert len(seen) == 1 and seen[0]["gr_number"] == "GR1"
+
+    hub.unsubscribe("GR1", seen.append)
+    hub.publish({"type": "UPDATE", "record": {"id": 1, "qty_fisik": 3}})
+    assert len(seen) == 1 and hub.store.row(1)["qty_fisik"] == 3
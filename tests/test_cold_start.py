@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def test_import_does_not_load_heavy_modules(tmp_path):
+    # Proses baru: modul yang sudah di-import test lain tidak ikut terhitung
+    (tmp_path / ".streamlit").mkdir()
+    (tmp_path / ".streamlit" / "secrets.toml").write_text('SUPABASE_URL = "local://cold"\nSUPABASE_KEY = "local"\n')
+    code = (
+        f"import sys; sys.path.insert(0, {str(ROOT)!r}); import receiving_app; "
+        "print(sorted(m for m in ('supabase', 'openpyxl', 'gr_parsing') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr[-2000:]
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_lazy_import_records_first_import_time(app):
+    profile = app.get_startup_profile()
+    module = app._lazy_import("json")
+    assert module is sys.modules["json"]
+    # Sudah ter-import: tidak dicatat sebagai lazy import
+    assert "json" not in profile["imports"]
+    app._lazy_import("xml.dom.minidom")
+    assert "xml.dom.minidom" in profile["imports"]
+
+
+def test_probe_connection_reports_result_without_blocking(app):
+    profile = {"probe": None}
+    breaker = app.CircuitBreaker(threshold=1, cooldown_s=60)
+
+    class DownClient:
+        def table(self, name):
+            raise ConnectionError("refused")
+
+    app._probe_connection(DownClient(), breaker, profile)
+    assert profile["probe"] == ("GAGAL", "refused") and breaker.state == "OPEN"
+
+    app._probe_connection(app.supabase, breaker, profile)
+    assert profile["probe"][0] == "OK" and breaker.state == "CLOSED"
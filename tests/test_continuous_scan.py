@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+
+def _lines():
+    return pd.DataFrame([
+        {"id": "L1", "sku": "SKU-A", "ean": "8991111", "nama_barang": "Samsung A15"},
+        {"id": "L2", "sku": "SKU-B", "ean": "8992222", "nama_barang": "Xiaomi 13"},
+    ])
+
+
+def test_scan_sku_or_ean_switches_active_line(app):
+    code_index, pattern_index = app.build_scan_index(_lines())
+    assert app.classify_scan("sku-b", code_index, pattern_index, "L1") == ("line", "L2")
+    assert app.classify_scan("8991111", code_index, pattern_index, "L2") == ("line", "L1")
+    # Kode lain = SN untuk baris aktif
+    assert app.classify_scan("R58N123", code_index, pattern_index, "L2") == ("serial", "L2")
+    assert app.classify_scan("R58N123", code_index, pattern_index, None) == ("serial", None)
+
+
+def test_scan_serial_pattern_routes_to_line(app, monkeypatch):
+    monkeypatch.setattr(app, "SN_PATTERN_RULES", {"SKU-A": r"R58[A-Z0-9]{5}", "SKU-B": r"\d{15}"})
+    code_index, pattern_index = app.build_scan_index(_lines())
+    assert app.classify_scan("R58N1234", code_index, pattern_index, "L2") == ("serial", "L1")
+    assert app.classify_scan("861234567890123", code_index, pattern_index, "L1") == ("serial", "L2")
+    # Pola tidak cocok: tetap ke baris aktif
+    assert app.classify_scan("ZZ999", code_index, pattern_index, "L2") == ("serial", "L2")
+
+
+def test_scan_ambiguous_pattern_keeps_active_line(app, monkeypatch):
+    monkeypatch.setattr(app, "SN_PATTERN_RULES", {"SKU-A": r"[A-Z0-9]+", "SKU-B": r"[A-Z0-9]+"})
+    code_index, pattern_index = app.build_scan_index(_lines())
+    assert app.classify_scan("ABC123", code_index, pattern_index, "L2") == ("serial", "L2")
+
+
+def _load_line(app, db, session, updated_at):
+    db.seed(app.RECEIVING_TABLE, [{
+        "id": "L1", "gr_number": "GR1", "sku": "SKU-A", "nama_barang": "Samsung A15", "qty_po": 5, "qty_fisik": 0,
+        "sn_list": [], "jenis": "Stok", "keterangan": None, "is_active": True, "updated_at": updated_at.isoformat(),
+    }])
+    session["current_df"] = app._records_to_receiving_df(list(db.table_rows(app.RECEIVING_TABLE).values()))
+
+
+def test_flush_scan_buffer_saves_lines(app, db, session):
+    loaded_time = datetime.now(timezone.utc)
+    _load_line(app, db, session, loaded_time - timedelta(minutes=5))
+    session[app.SCAN_BUFFER_KEY] = {"L1": ["SN0001", "SN0002", "SN0001 "]}
+
+    saved_lines, saved_sns, failed, rejected = app.flush_scan_buffer("Budi", loaded_time)
+
+    assert (saved_lines, saved_sns, failed) == (1, 2, [])
+    assert session[app.SCAN_BUFFER_KEY] == {}
+    row = db.table_rows(app.RECEIVING_TABLE)["L1"]
+    assert row["qty_fisik"] == 2 and row["updated_by"] == "Budi"
+    assert list(session["current_df"].loc[0, "sn_list"]) == ["SN0001", "SN0002"]
+
+
+def test_flush_scan_buffer_holds_conflicting_line_until_reload(app, db, session):
+    loaded_time = datetime.now(timezone.utc) - timedelta(minutes=1)
+    _load_line(app, db, session, datetime.now(timezone.utc)) # diubah sesi lain setelah data dimuat
+    session[app.SCAN_BUFFER_KEY] = {"L1": ["SN0001"]}
+
+    _, saved_sns, failed, _ = app.flush_scan_buffer("Budi", loaded_time)
+    assert saved_sns == 0 and failed == ["Samsung A15"]
+    assert session[app.SCAN_BUFFER_KEY] == {"L1": ["SN0001"]}
+    assert app.scan_buffer_blocked(loaded_time) == {"L1"}
+
+    # Flush berikutnya sebelum muat ulang tidak menyentuh DB
+    queries = db.stats["queries"]
+    assert app.flush_scan_buffer("Budi", loaded_time)[1] == 0
+    assert db.stats["queries"] == queries
+
+    # Setelah data dimuat ulang, buffer dilepas dan tersimpan
+    reloaded = datetime.now(timezone.utc) + timedelta(seconds=1)
+    assert app.scan_buffer_blocked(reloaded) == set()
+    assert app.flush_scan_buffer("Budi", reloaded)[1] == 1
+    assert db.table_rows(app.RECEIVING_TABLE)["L1"]["qty_fisik"] == 1
@@ -0,0 +1,93 @@
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+
+class FlakyQuery:
+    """Query palsu: melempar error dari daftar dulu, lalu sukses"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture
+def fresh_breaker(app, monkeypatch):
+    breaker = app.CircuitBreaker(threshold=3, cooldown_s=60)
+    monkeypatch.setattr(app, "get_circuit_breaker", lambda: breaker)
+    monkeypatch.setattr(app, "DB_BACKOFF_BASE_S", 0)
+    return breaker
+
+
+def test_db_execute_retries_transient_read_errors(app, fresh_breaker):
+    query = FlakyQuery(httpx.ReadTimeout("lambat"), APIError({"code": "503", "message": "unavailable"}))
+    assert app.db_execute(query, retries=2) == "ok"
+    assert query.calls == 3 and fresh_breaker.state == "CLOSED"
+
+
+def test_db_execute_does_not_retry_sent_writes(app, fresh_breaker):
+    # Timeout baca pada write: request mungkin sudah diterapkan, tidak boleh dikirim ulang
+    query = FlakyQuery(httpx.ReadTimeout("lambat"))
+    with pytest.raises(httpx.ReadTimeout):
+        app.db_execute(query, idempotent=False, retries=2)
+    assert query.calls == 1
+
+    # Gagal connect = pasti belum terkirim, aman di-retry
+    query = FlakyQuery(httpx.ConnectError("refused"))
+    assert app.db_execute(query, idempotent=False, retries=2) == "ok"
+
+
+def test_db_execute_client_errors_are_not_retried_and_keep_circuit_closed(app, fresh_breaker):
+    query = FlakyQuery(*[APIError({"code": "23505", "message": "duplicate"})] * 5)
+    with pytest.raises(APIError):
+        app.db_execute(query, retries=3)
+    assert query.calls == 1 and fresh_breaker.state == "CLOSED"
+
+
+def test_db_execute_opens_circuit_after_repeated_failures(app, fresh_breaker):
+    with pytest.raises(httpx.ConnectError):
+        app.db_execute(FlakyQuery(*[httpx.ConnectError("down")] * 5), retries=2)
+    assert fresh_breaker.state == "OPEN"
+    with pytest.raises(app.DatabaseUnavailableError):
+        app.db_execute(FlakyQuery())
+
+
+def test_circuit_breaker_allows_single_half_open_probe(app):
+    breaker = app.CircuitBreaker(threshold=1, cooldown_s=0)
+    breaker.record_failure(RuntimeError("down"))
+    assert breaker.state == "OPEN"
+
+    assert breaker.before_call() is True # Probe
+    assert breaker.state == "HALF_OPEN"
+    with pytest.raises(app.DatabaseUnavailableError):
+        breaker.before_call()
+
+    breaker.record_success(5.0)
+    assert breaker.state == "CLOSED"
+    assert breaker.before_call() is False
+
+
+def test_circuit_breaker_failed_probe_reopens_and_release_hands_over(app):
+    breaker = app.CircuitBreaker(threshold=3, cooldown_s=0)
+    for _ in range(3):
+        breaker.record_failure(RuntimeError("down"))
+    assert breaker.before_call() is True
+    breaker.record_failure(RuntimeError("still down"))
+    assert breaker.state == "OPEN"
+
+    assert breaker.before_call() is True
+    breaker.release_probe() # Probe tanpa hasil menentukan: pemanggil berikutnya jadi probe
+    assert breaker.before_call() is True
+
+
+def test_circuit_breaker_open_fails_fast(app):
+    breaker = app.CircuitBreaker(threshold=1, cooldown_s=60)
+    breaker.record_failure(RuntimeError("down"))
+    with pytest.raises(app.DatabaseUnavailableError):
+        breaker.before_call()
@@ -0,0 +1,65 @@
+import csv
+import importlib.util
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+
+def _seed(app, db):
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": f"a{i}", "gr_number": "GR1", "kategori_barang": "SN", "sku": "HP", "nama_barang": "Samsung", "qty_po": 2, "qty_fisik": 2,
+         "sn_list": '["X%d1", "X%d2"]' % (i, i), "jenis": "Stok", "is_inbound": False, "created_at": "2025-03-05T10:00:00+00:00"}
+        for i in range(3)
+    ] + [
+        {"id": "b1", "gr_number": "GR2", "kategori_barang": "NON-SN", "sku": "KBL", "nama_barang": "Kabel", "qty_po": 5, "qty_fisik": 4,
+         "jenis": "Stok", "is_inbound": False, "created_at": "2025-04-01T10:00:00+00:00"},
+    ])
+
+
+def test_export_pages_by_keyset_and_filters(app, db):
+    _seed(app, db)
+    pages = list(app.iter_export_pages(page_size=2))
+    assert [n for n, _ in pages] == [2, 2]
+    assert sum(len(frame) for _, frame in pages) == 7 # 6 SN + 1 Non-SN
+
+    march = dict(date_from=datetime(2025, 3, 1, tzinfo=timezone.utc), date_to=datetime(2025, 4, 1, tzinfo=timezone.utc))
+    assert app.count_export_rows(**march) == 3
+    assert app.count_export_rows(gr_numbers=["GR2"]) == 1
+    assert [n for n, _ in app.iter_export_pages(gr_numbers=["GR2"], page_size=2)] == [1]
+
+
+def test_stream_export_csv(app, db):
+    _seed(app, db)
+    progress = []
+    path, n_rows = app.stream_export_to_file("CSV", app.iter_export_pages(page_size=2), lambda db_rows, out: progress.append(db_rows))
+    try:
+        with open(path, encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+    finally:
+        os.remove(path)
+    assert n_rows == len(rows) == 7 and progress == [2, 4]
+    assert sorted(r["Serial Number/SN"] for r in rows if r["Serial Number/SN"] != "N/A") == ["X01", "X02", "X11", "X12", "X21", "X22"]
+
+
+def test_stream_export_empty_writes_header(app, db):
+    path, n_rows = app.stream_export_to_file("CSV", app.iter_export_pages())
+    try:
+        with open(path, encoding="utf-8-sig") as f:
+            assert n_rows == 0 and "Serial Number/SN" in f.read()
+    finally:
+        os.remove(path)
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is None, reason="pyarrow tidak terpasang")
+def test_stream_export_parquet(app, db):
+    import pyarrow.parquet as pq
+
+    _seed(app, db)
+    path, n_rows = app.stream_export_to_file("Parquet", app.iter_export_pages(page_size=2))
+    try:
+        table = pq.read_table(path)
+    finally:
+        os.remove(path)
+    assert n_rows == table.num_rows == 7
+    assert table.schema.equals(app._export_arrow_schema())
@@ -0,0 +1,95 @@
+import io
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from openpyxl import Workbook
+from postgrest.exceptions import APIError
+
+import gr_parsing
+
+
+def _workbook(rows):
+    wb = Workbook()
+    for row in rows:
+        wb.active.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+HEADER = ['SKU', 'Nama Barang', 'Qty PO', 'Tipe Barang']
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("GR-2025-11-001.xlsx", "GR/2025/11/001"),
+    ("po_2025_1_A7.xlsx", "PO/2025/1/A7"),
+    ("kiriman pagi.xlsx", "kiriman pagi"),
+])
+def test_gr_number_from_filename(filename, expected):
+    assert gr_parsing.gr_number_from_filename(filename) == expected
+
+
+def test_parse_gr_workbook_header_below_gr_cell():
+    content = _workbook([
+        ["Nomor GR:", "GR/2025/11/009"],
+        [],
+        HEADER,
+        ["S1", "Kabel", 5, "NON-SN"],
+        [None, None, None, None],
+        ["S2", "HP", 2, "SN"],
+    ])
+    result = gr_parsing.parse_gr_workbook("GR-2025-11-001.xlsx", content)
+
+    assert result["error"] is None
+    assert (result["gr_from_cell"], result["gr_from_filename"]) == ("GR/2025/11/009", "GR/2025/11/001")
+    assert result["df"]["SKU"].tolist() == ["S1", "S2"]
+    assert {'Tujuan (Stok/Display)', 'Keterangan Awal'} <= set(result["df"].columns)
+
+
+def test_parse_gr_workbook_reports_errors():
+    assert "Kolom wajib" in gr_parsing.parse_gr_workbook("a.xlsx", _workbook([["SKU", "Nama"]]))["error"]
+    assert "Gagal membaca" in gr_parsing.parse_gr_workbook("b.xlsx", b"bukan excel")["error"]
+
+
+class _BrokenPool:
+    def submit(self, *args):
+        raise BrokenProcessPool("worker mati")
+
+
+class _PoolFactory:
+    cleared = False
+
+    def __call__(self):
+        return _BrokenPool()
+
+    def clear(self):
+        self.cleared = True
+
+
+def test_parse_gr_files_falls_back_in_process(app, monkeypatch):
+    factory = _PoolFactory()
+    monkeypatch.setattr(app, "get_parse_pool", factory)
+    results = []
+    files = [("GR-2025-01-001.xlsx", _workbook([HEADER, ["S1", "A", 1, "SN"]])), ("x.xlsx", _workbook([HEADER, ["S2", "B", 2, "SN"]]))]
+    app.parse_gr_files(files, results.append)
+    assert sorted(r["filename"] for r in results) == ["GR-2025-01-001.xlsx", "x.xlsx"]
+    assert all(r["error"] is None for r in results) and factory.cleared
+
+
+def test_insert_gr_files_reports_per_file(app, db, monkeypatch):
+    real_insert = app.insert_gr_rows
+
+    def insert(rows):
+        if rows[0]["gr_number"] == "GR-BAD":
+            raise APIError({"code": "23505", "message": "duplicate"})
+        real_insert(rows)
+
+    monkeypatch.setattr(app, "insert_gr_rows", insert)
+    row = lambda gr: {"gr_number": gr, "sku": "S1", "nama_barang": "A", "kategori_barang": "NON-SN", "qty_po": 1, "qty_fisik": 0, "is_active": True}
+    results = {}
+    app.insert_gr_files([("a.xlsx", "GR-A", [row("GR-A"), row("GR-A")]), ("b.xlsx", "GR-BAD", [row("GR-BAD")])],
+                        lambda filename, ok, msg: results.__setitem__(filename, (ok, msg)))
+
+    assert results["a.xlsx"][0] and "2 baris masuk ke GR-A" in results["a.xlsx"][1]
+    assert results["b.xlsx"] == (False, "Gagal API Supabase: duplicate")
+    assert sorted(r["gr_number"] for r in db.table_rows(app.RECEIVING_TABLE).values()) == ["GR-A", "GR-A"]
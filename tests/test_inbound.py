@@ -0,0 +1,47 @@
+def _seed_pending(app, db, n):
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": f"L{i:03d}", "gr_number": "GR1", "sku": f"SKU-{i:03d}", "nama_barang": f"Barang {i:03d}", "qty_po": 5,
+         "qty_fisik": 2, "jenis": "Stok", "is_active": True, "is_inbound": False, "updated_by": "BUDI",
+         "updated_at": "2025-01-01T10:00:00+00:00"}
+        for i in range(n)
+    ])
+
+
+def _open_inbound(app, at):
+    at.run()
+    at.sidebar.radio[0].set_value("Admin Panel").run()
+    at.sidebar.text_input[0].set_value("admin123").run()
+    at.session_state[app.SESSION_KEY_CHECKER] = "ADMIN"
+    at.radio(key="admin_section").set_value("📦 Inbound Control").run()
+    assert not at.exception
+    return at
+
+
+def _inbound_selector(at):
+    return next(s for s in at.selectbox if str(s.label).startswith("Pilih Item Selesai Inbound"))
+
+
+def test_count_inbound_pending(app, db):
+    _seed_pending(app, db, 3)
+    db.seed(app.RECEIVING_TABLE, [{"id": "done", "gr_number": "GR1", "qty_fisik": 1, "is_active": True, "is_inbound": True}])
+    assert app._count_inbound_pending() == 3
+
+
+def test_inbound_confirm_lists_only_current_page(app, db, app_test):
+    _seed_pending(app, db, app.TABLE_PAGE_SIZES[0] + 5)
+    at = _open_inbound(app, app_test)
+
+    selector = _inbound_selector(at)
+    assert len(selector.options) == app.TABLE_PAGE_SIZES[0] + 1 # placeholder + satu halaman
+
+    # Cari = lookup item di luar halaman pertama
+    at.text_input(key="admin_inbound_table_search").set_value("SKU-029").run()
+    selector = _inbound_selector(at)
+    assert len(selector.options) == 2
+    selector.select_index(1).run()
+    next(b for b in at.button if b.label.startswith("✅ KONFIRMASI INBOUND")).click().run()
+
+    assert not at.exception and not at.error
+    rows = db.table_rows(app.RECEIVING_TABLE)
+    assert rows["L029"]["is_inbound"] is True
+    assert sum(1 for r in rows.values() if r["is_inbound"]) == 1
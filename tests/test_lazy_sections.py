@@ -0,0 +1,39 @@
+def _headers(at):
+    return [h.value for h in at.header] + [m.value for m in at.markdown]
+
+
+def test_admin_runs_only_selected_section(app, db, app_test):
+    at = app_test.run()
+    at.sidebar.radio[0].set_value("Admin Panel").run()
+    at.sidebar.text_input[0].set_value("admin123").run()
+    assert not at.exception
+
+    at.radio(key="admin_section").set_value("⚠️ Danger Zone").run()
+    assert "⚠️ DANGER ZONE" in _headers(at)
+    assert "👥 Manajemen Operator" not in _headers(at)
+    assert not [b for b in at.button if b.label.startswith("🔍 Cari Kecocokan")]
+
+    at.radio(key="admin_section").set_value("🔗 Rekonsiliasi Blind").run()
+    assert "⚠️ DANGER ZONE" not in _headers(at)
+    assert [b for b in at.button if b.label.startswith("🔍 Cari Kecocokan")]
+
+
+def test_checker_runs_only_selected_section(app, db, app_test):
+    db.seed(app.OPERATORS_TABLE, [{"operator_name": "BUDI", "is_active": True}])
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": "sn-1", "gr_number": "GR1", "sku": "A", "nama_barang": "HP", "kategori_barang": "SN", "qty_po": 2, "qty_fisik": 0,
+         "sn_list": "[]", "jenis": "Stok", "is_active": True, "is_inbound": False, "updated_by": "-"},
+        {"id": "non-1", "gr_number": "GR1", "sku": "B", "nama_barang": "Kabel", "kategori_barang": "NON-SN", "qty_po": 5,
+         "qty_fisik": 0, "jenis": "Stok", "is_active": True, "is_inbound": False, "updated_by": "-"},
+    ])
+    at = app_test.run()
+    at.selectbox(key="checker_select").set_value("BUDI").run()
+    at.selectbox(key="gr_session_selector").set_value("GR1").run()
+    assert not at.exception
+
+    at.radio(key="checker_section").set_value("⚡ Pindai SN Cepat").run()
+    assert [t for t in at.toggle if t.key == "continuous_scan_mode"]
+    assert not [n for n in at.number_input if n.key == "qty_non_non-1"]
+
+    at.radio(key="checker_section").set_value("📦 Input Qty Non-SN").run()
+    assert not [t for t in at.toggle if t.key == "continuous_scan_mode"]
@@ -0,0 +1,44 @@
+import pytest
+
+
+@pytest.fixture
+def sites(app, monkeypatch, session):
+    monkeypatch.setattr(app, "SITE_CODES", ["JKT", "BDG"])
+    return session
+
+
+def test_single_site_mode_adds_no_site_column(app, db, session, monkeypatch):
+    monkeypatch.setattr(app, "SITE_CODES", [])
+    assert app.get_current_site() is None
+    assert app._with_site({"a": 1}) == {"a": 1}
+    assert app.gr_key("GR1") == "GR1"
+
+
+def test_current_site_from_session_with_fallback(app, sites):
+    assert app.get_current_site() == "JKT"
+    sites[app.SESSION_KEY_SITE] = "BDG"
+    assert app.get_current_site() == "BDG"
+    assert app.gr_key("GR1") == "BDG::GR1"
+    assert app.gr_key("GR1", "JKT") == "JKT::GR1" # Site eksplisit menang dari sesi
+    assert app._with_site({"a": 1}) == {"a": 1, "site_code": "BDG"}
+    sites[app.SESSION_KEY_SITE] = "XXX" # Site tidak dikenal
+    assert app.get_current_site() == "JKT"
+
+
+def test_queries_are_partitioned_by_site(app, db, sites):
+    db.seed(app.RECEIVING_TABLE, [
+        {"gr_number": "GR-J", "site_code": "JKT", "is_active": True},
+        {"gr_number": "GR-B", "site_code": "BDG", "is_active": True},
+    ])
+    db.seed(app.OPERATORS_TABLE, [
+        {"operator_name": "Ani", "site_code": "JKT", "is_active": True},
+        {"operator_name": "Budi", "site_code": "BDG", "is_active": True},
+    ])
+    assert app._load_active_gr_numbers("BDG") == ["GR-B"]
+    assert app.get_all_operators("JKT")["operator_name"].tolist() == ["Ani"]
+
+    sites[app.SESSION_KEY_SITE] = "BDG"
+    rows = app.db_execute(app._site_filter(app.supabase.table(app.RECEIVING_TABLE).select("gr_number"))).data
+    assert rows == [{"gr_number": "GR-B"}]
+    assert app.add_operator("Citra")[0]
+    assert {r["operator_name"]: r["site_code"] for r in db.table_rows(app.OPERATORS_TABLE).values()}["Citra"] == "BDG"
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _snapshot():
+    return pd.DataFrame({
+        "id": ["a", "b", "c"], "qty_fisik": [3, 4, None], "jenis": ["Stok", "Stok", "Display"], "keterangan": [None, "x", ""],
+    })
+
+
+def test_compute_non_sn_diff_only_changed_rows(app):
+    base = _snapshot()
+    edited = base.copy()
+    edited.loc[1, "qty_fisik"] = 5
+    edited.loc[2, "jenis"] = "Stok"
+    diff = app.compute_non_sn_diff(base, edited)
+    assert diff.to_dict("records") == [
+        {"id": "b", "qty_fisik": 5, "jenis": "Stok", "keterangan": "x"},
+        {"id": "c", "qty_fisik": 0, "jenis": "Stok", "keterangan": ""},
+    ]
+
+
+def test_compute_non_sn_diff_cleared_qty_is_no_change(app):
+    base = _snapshot()
+    edited = base.copy()
+    edited["qty_fisik"] = [np.nan, 4, None]
+    assert app.compute_non_sn_diff(base, edited).empty
+
+    edited.loc[0, "keterangan"] = "catatan"
+    diff = app.compute_non_sn_diff(base, edited)
+    assert diff.to_dict("records") == [{"id": "a", "qty_fisik": 3, "jenis": "Stok", "keterangan": "catatan"}]
+
+
+def test_compute_non_sn_diff_clips_negative_qty(app):
+    base = _snapshot()
+    edited = base.copy()
+    edited.loc[0, "qty_fisik"] = -2
+    assert app.compute_non_sn_diff(base, edited)["qty_fisik"].tolist() == [0]
+
+
+def test_apply_grid_synced_overrides_stale_snapshot_rows(app, session):
+    df = pd.DataFrame({
+        "id": ["a", "b", "c"], "qty_fisik": [1, 2, 3], "jenis": ["Stok"] * 3, "keterangan": [None] * 3,
+        "updated_by": ["x"] * 3, "updated_at": ["2025-01-01T10:00:00+00:00", "2025-01-01T12:00:00", None],
+    })
+    session[app.GRID_SYNCED_KEY] = {
+        "a": {"qty_fisik": 9, "jenis": "Display", "keterangan": "baru", "updated_by": "budi", "updated_at": "2025-01-01T11:00:00+00:00"},
+        "b": {"qty_fisik": 7, "jenis": "Stok", "keterangan": None, "updated_by": "budi", "updated_at": "2025-01-01T11:00:00+00:00"},
+    }
+
+    result = app.apply_grid_synced(df)
+
+    assert result["qty_fisik"].tolist() == [9, 2, 3] and result["qty_fisik"].dtype == np.int64
+    assert result.loc[0, ["jenis", "keterangan", "updated_by"]].tolist() == ["Display", "baru", "budi"]
+    assert df.loc[0, "qty_fisik"] == 1 # DF asli tidak diubah
+    # Snapshot "b" sudah lebih baru dari simpanan kita: tidak ditimpa, dibuang dari synced
+    assert list(session[app.GRID_SYNCED_KEY]) == ["a"]
+
+
+@pytest.mark.parametrize("rpc", [True, False], ids=["rpc", "fallback"])
+def test_handle_bulk_update_non_sn_saves_and_reports_conflicts(app, db, session, monkeypatch, rpc):
+    monkeypatch.setattr(db, "rpc", rpc)
+    loaded_time = pd.Timestamp("2025-01-01T10:00:00", tz="UTC").to_pydatetime()
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": "a", "gr_number": "GR1", "qty_fisik": 1, "jenis": "Stok", "updated_by": "x", "updated_at": "2025-01-01T09:00:00+00:00"},
+        {"id": "b", "gr_number": "GR1", "qty_fisik": 1, "jenis": "Stok", "updated_by": "ani", "updated_at": "2025-01-01T11:00:00+00:00"},
+    ])
+    diff = pd.DataFrame({"id": ["a", "b"], "qty_fisik": [4, 5], "jenis": ["Stok", "Display"], "keterangan": ["", "cek"]})
+
+    saved, conflicts = app.handle_bulk_update_non_sn(diff, "budi", loaded_time)
+
+    assert saved == 1 and list(conflicts) == ["b"] and conflicts["b"][0] == "ani"
+    rows = db.table_rows(app.RECEIVING_TABLE)
+    assert (rows["a"]["qty_fisik"], rows["a"]["updated_by"]) == (4, "budi")
+    assert rows["b"]["qty_fisik"] == 1
+    assert session[app.GRID_SYNCED_KEY]["a"]["qty_fisik"] == 4 and "b" not in session[app.GRID_SYNCED_KEY]
+
+    # Simpan ulang baris sendiri setelah snapshot lama: bukan konflik
+    saved, conflicts = app.handle_bulk_update_non_sn(diff.iloc[:1].assign(qty_fisik=6), "budi", loaded_time)
+    assert (saved, conflicts) == (1, {})
@@ -0,0 +1,41 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+@pytest.fixture
+def one_worker(app, monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(app, "get_page_fetch_pool", lambda: pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_fetches_run_in_parallel_without_session_context(app):
+    seen = []
+
+    def fetch(value):
+        seen.append(getattr(threading.current_thread(), "streamlit_script_run_ctx", None))
+        time.sleep(0.2)
+        return value
+
+    start = time.monotonic()
+    results = app.load_page_data({"a": lambda: fetch(1), "b": lambda: fetch(2), "c": lambda: 1 / 0})
+    assert results == {"a": 1, "b": 2, "c": None}
+    assert time.monotonic() - start < 0.35 and seen == [None, None]
+
+
+def test_queued_fetch_past_deadline_is_cancelled(app, one_worker):
+    calls = []
+    busy = one_worker.submit(time.sleep, 0.3) # Pool penuh oleh sesi lain
+    assert app.load_page_data({"queued": (lambda: calls.append(1) or "late", 0.05)}) == {"queued": None}
+    busy.result()
+    assert calls == [] # Tidak pernah dijalankan: jalur sekuensial satu-satunya yang membaca
+
+
+def test_running_fetch_past_deadline_is_awaited_not_reissued(app, one_worker):
+    calls = []
+    results = app.load_page_data({"slow": (lambda: calls.append(1) or time.sleep(0.2) or "done", 0.05)})
+    assert results == {"slow": "done"} and calls == [1]
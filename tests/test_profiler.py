@@ -0,0 +1,63 @@
+import pstats
+import time
+
+import pytest
+
+
+def _work():
+    total = 0
+    for i in range(20000):
+        total += i * i
+    return total
+
+
+def test_run_profiles_only_matching_target_and_counts_down(app):
+    profiler = app.RerunProfiler()
+    profiler.reset("page_checker", "cProfile", 2)
+
+    assert profiler.run("page_admin", _work) == _work()
+    assert profiler.done == 0 and profiler.stats is None
+
+    profiler.run("page_checker", _work)
+    profiler.run("page_checker", _work)
+    assert (profiler.done, profiler.remaining, profiler.active) == (2, 0, False)
+    # Kuota habis: tidak diprofil lagi
+    profiler.run("page_checker", _work)
+    assert profiler.done == 2
+
+    top = profiler.top_functions()
+    assert "_work" in " ".join(top["Fungsi"]) and top["Self (ms)"].is_monotonic_decreasing
+
+
+def test_run_counts_rerun_when_func_raises(app):
+    profiler = app.RerunProfiler()
+    profiler.reset("page_checker", "cProfile", 1)
+
+    def stop():
+        raise RuntimeError("st.stop")
+
+    with pytest.raises(RuntimeError):
+        profiler.run("page_checker", stop)
+    assert profiler.done == 1 and not profiler._busy.locked()
+
+
+def test_export_pstats_is_loadable(app, tmp_path):
+    profiler = app.RerunProfiler()
+    profiler.reset("page_checker", "cProfile", 1)
+    profiler.run("page_checker", _work)
+
+    path = tmp_path / "rerun.prof"
+    path.write_bytes(profiler.export_pstats())
+    assert any(func == "_work" for _, _, func in pstats.Stats(str(path)).stats)
+
+
+def test_sampling_mode_exports_collapsed_stacks(app, monkeypatch):
+    monkeypatch.setattr(app, "PROFILER_SAMPLE_INTERVAL_S", 0.001)
+    profiler = app.RerunProfiler()
+    profiler.reset("page_admin", "Sampling", 1)
+    profiler.run("page_admin", lambda: time.sleep(0.05))
+
+    lines = profiler.export_collapsed().decode().splitlines()
+    assert profiler.stats is None and lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1 and "test_profiler.py" in stack
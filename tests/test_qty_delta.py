@@ -0,0 +1,46 @@
+def _seed_line(app, db, qty_fisik):
+    db.seed(app.RECEIVING_TABLE, [{
+        "id": "L1", "gr_number": "GR1", "sku": "S1", "nama_barang": "Kabel", "qty_po": 10, "qty_fisik": qty_fisik, "is_active": True,
+    }])
+    return {"id": "L1", "gr_number": "GR1", "nama_barang": "Kabel"}
+
+
+def test_add_qty_delta_fallback_logs_applied_delta(app, db):
+    row = _seed_line(app, db, 3)
+    assert app._add_qty_delta_fallback(row, 4, "budi") == (1, 7)
+    # Clamp ke 0: delta yang dicatat adalah yang benar-benar diterapkan
+    assert app._add_qty_delta_fallback(row, -10, "budi") == (1, 0)
+    assert db.table_rows(app.RECEIVING_TABLE)["L1"]["qty_fisik"] == 0
+    assert sorted(d["delta"] for d in db.table_rows(app.QTY_DELTAS_TABLE).values()) == [-7, 4]
+
+
+def test_add_qty_delta_fallback_handles_null_qty(app, db):
+    row = _seed_line(app, db, None)
+    assert app._add_qty_delta_fallback(row, 2, "budi") == (1, 2)
+    assert db.table_rows(app.RECEIVING_TABLE)["L1"]["qty_fisik"] == 2
+
+
+def test_add_qty_delta_fallback_missing_row(app, db):
+    assert app._add_qty_delta_fallback({"id": "X", "gr_number": "GR1"}, 1, "budi") == (0, None)
+
+
+def test_handle_add_qty_delta_zero_is_noop(app, db):
+    queries = db.stats["queries"]
+    assert app.handle_add_qty_delta({"id": "L1", "gr_number": "GR1"}, 0, "budi") == (0, None)
+    assert db.stats["queries"] == queries
+
+
+def test_handle_add_qty_delta_uses_rpc(app, db):
+    row = _seed_line(app, db, 3)
+    queries = db.stats["queries"]
+    assert app.handle_add_qty_delta(row, 2, "budi") == (1, 5)
+    assert app.handle_add_qty_delta(row, -9, "budi") == (1, 0)
+    assert db.stats["queries"] - queries == 2 # Satu RPC per delta, tanpa baca-tulis CAS
+    assert sorted(d["delta"] for d in db.table_rows(app.QTY_DELTAS_TABLE).values()) == [-5, 2]
+
+
+def test_handle_add_qty_delta_falls_back_without_rpc(app, db, monkeypatch):
+    monkeypatch.setattr(db, "rpc", False)
+    row = _seed_line(app, db, None)
+    assert app.handle_add_qty_delta(row, 2, "budi") == (1, 2)
+    assert [d["delta"] for d in db.table_rows(app.QTY_DELTAS_TABLE).values()] == [2]
@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+
+def test_query_gate_single_flight_shares_leader_read_start(app):
+    gate = app.QueryGate(4)
+    calls, results = [], []
+
+    def slow_read():
+        calls.append(1)
+        time.sleep(0.3)
+        return "rows"
+
+    threads = [threading.Thread(target=lambda: results.append(gate.single_flight("k", slow_read))) for _ in range(5)]
+    threads[0].start()
+    time.sleep(0.1)
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1 and gate.stats["coalesced"] == 4
+    assert {r for r, _ in results} == {"rows"}
+    assert len({started_at for _, started_at in results}) == 1
+
+
+def test_query_gate_propagates_leader_error(app):
+    gate = app.QueryGate(1)
+    with pytest.raises(ValueError):
+        gate.single_flight("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert gate.single_flight("k", lambda: "ok")[0] == "ok"
+
+
+def test_query_gate_rejects_when_slots_busy(app, monkeypatch):
+    monkeypatch.setattr(app, "DB_ADMISSION_TIMEOUT_S", 0.05)
+    gate = app.QueryGate(1)
+    release = threading.Event()
+    holder = threading.Thread(target=lambda: gate.admit(release.wait))
+    holder.start()
+    time.sleep(0.05)
+    with pytest.raises(app.DatabaseBusyError):
+        gate.admit(lambda: None)
+    release.set()
+    holder.join()
+    assert gate.stats["rejected"] == 1
+
+
+def test_read_clock_uses_leader_start(app, db):
+    with app.read_clock() as starts:
+        app.db_execute(app.supabase.table(app.RECEIVING_TABLE).select("*"))
+    assert len(starts) == 1
@@ -0,0 +1,47 @@
+import pandas as pd
+
+
+def test_luhn_valid_accepts_valid_imei_and_rejects_typo(app):
+    result = app._luhn_valid(pd.Series(["490154203237518", "490154203237519"]))
+    assert result.tolist() == [True, False]
+
+
+def test_luhn_valid_rejects_non_ascii_digits_without_crashing(app):
+    # Full-width dan Arabic-Indic: \d cocok, tapi bukan digit ASCII
+    result = app._luhn_valid(pd.Series(["４９０１５４２０３２３７５１８", "٤٩٠١٥٤٢٠٣٢٣٧٥١٨", "490154203237518"]))
+    assert result.tolist() == [False, False, True]
+
+
+def test_validate_serial_batch_reasons(app):
+    rule = {"length": 6, "prefix": "AB"}
+    result = app.validate_serial_batch(["AB1234", "AB1234", "XX1234", "AB12", " ", "AB9999"], rule, existing=["AB9999"])
+    assert result["valid"] == ["AB1234"]
+    assert result["rejected"] == {
+        "duplikat_batch": ["AB1234"], "sudah_tercatat": ["AB9999"], "panjang": ["AB12"], "prefix": ["XX1234"],
+    }
+    assert result["total"] == 5
+
+
+def test_validate_serial_batch_checksum_rule(app):
+    result = app.validate_serial_batch(["490154203237518", "490154203237519"], {"checksum": "luhn"})
+    assert result["valid"] == ["490154203237518"]
+    assert result["rejected"] == {"checksum": ["490154203237519"]}
+
+
+def test_default_rule_only_strips_and_dedupes(app):
+    # Tanpa aturan SKU/Brand: SN pendek, panjang, atau berkarakter khusus tetap diterima seperti sebelum V1.31
+    serials = ["A1", "SN#12 34", "X" * 60, " A1 ", "OLD"]
+    result = app.validate_serial_batch(serials, app.get_sn_rule("SKU-TANPA-ATURAN", "Merek Lain"), existing=["OLD"])
+    assert result["valid"] == ["A1", "SN#12 34", "X" * 60]
+    assert result["rejected"] == {"sudah_tercatat": ["OLD"], "duplikat_batch": ["A1"]}
+
+
+def test_configured_rules_apply_by_sku_then_brand(app, monkeypatch):
+    monkeypatch.setattr(app, "SN_VALIDATION_RULES", {
+        "SKU": {"SAM-S24": {"length": 15, "checksum": "luhn"}},
+        "BRAND": {"LOGITECH": {"regex": "[0-9]{4}[A-Z]{2}[0-9A-Z]{4,8}"}},
+    })
+    assert app.get_sn_rule("SAM-S24", "Logitech") == {"length": 15, "checksum": "luhn"}
+    brand_rule = app.get_sn_rule("M185", "Logitech Mouse")
+    result = app.validate_serial_batch(["2231LZ0ABC", "lz-001"], brand_rule)
+    assert result["valid"] == ["2231LZ0ABC"] and result["rejected"] == {"format": ["lz-001"]}
@@ -0,0 +1,132 @@
+import queue
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+
+class FakeRedis:
+    """Subset redis-py yang dipakai RedisSharedCache: get/set/incr, pipeline, pub/sub"""
+
+    def __init__(self):
+        self.data = {}
+        self.subscribers = []
+        self.on_get = None # hook test: dipanggil di tengah GET
+
+    def get(self, key):
+        value = self.data.get(key)
+        if self.on_get:
+            self.on_get(key)
+        return value
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def pipeline(self):
+        redis, ops = self, []
+
+        class Pipe:
+            def incr(self, key):
+                ops.append(("incr", key))
+
+            def publish(self, channel, message):
+                ops.append(("publish", message))
+
+            def execute(self):
+                results = []
+                for op, arg in ops:
+                    if op == "incr":
+                        redis.data[arg] = int(redis.data.get(arg) or 0) + 1
+                        results.append(redis.data[arg])
+                    else:
+                        redis.publish(arg)
+                        results.append(len(redis.subscribers))
+                return results
+
+        return Pipe()
+
+    def publish(self, message):
+        for q in self.subscribers:
+            q.put(message)
+
+    def pubsub(self, ignore_subscribe_messages=True):
+        q = queue.Queue()
+        redis = self
+
+        class PubSub:
+            def subscribe(self, channel):
+                redis.subscribers.append(q)
+
+            def listen(self):
+                while True:
+                    yield {"data": q.get()}
+
+        return PubSub()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    server = FakeRedis()
+    module = types.SimpleNamespace(Redis=types.SimpleNamespace(from_url=lambda url, **kw: server))
+    monkeypatch.setitem(sys.modules, "redis", module)
+    return server
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_redis_invalidation_reaches_other_replica(app, fake_redis):
+    seen_a, seen_b = [], []
+    a = app.RedisSharedCache("redis://x", seen_a.append)
+    b = app.RedisSharedCache("redis://x", seen_b.append)
+    assert _wait_for(lambda: len(fake_redis.subscribers) == 2)
+
+    assert b.get_or_load("operators:-", "active", lambda: ["lama"], ttl=60) == ["lama"]
+    a.invalidate("operators:-")
+    assert _wait_for(lambda: seen_b == ["operators:-"])
+    assert seen_a == [] # Invalidasi sendiri tidak memicu callback
+    assert b.get_or_load("operators:-", "active", lambda: ["baru"], ttl=60) == ["baru"]
+
+
+def test_redis_version_read_racing_invalidation_is_not_memoized(app, fake_redis):
+    cache = app.RedisSharedCache("redis://x", lambda ns: None)
+    assert _wait_for(lambda: len(fake_redis.subscribers) == 1)
+    other = app.RedisSharedCache("redis://x", lambda ns: None)
+
+    # Replika lain menaikkan versi tepat saat GET versi kita sedang berjalan (nilai GET sudah basi)
+    def invalidate_during_get(key):
+        fake_redis.on_get = None
+        other.invalidate("gr:GR1")
+        assert _wait_for(lambda: cache._epochs["gr:GR1"] == 1)
+
+    fake_redis.on_get = invalidate_during_get
+    assert cache.version("gr:GR1") == 0
+    assert "gr:GR1" not in cache._versions
+    assert cache.version("gr:GR1") == 1 and cache._versions["gr:GR1"] == 1
+
+
+def test_sqlite_shared_cache_versions_keys(app, tmp_path):
+    path = str(tmp_path / "cache.db")
+    seen = []
+    a = app.SqliteSharedCache(path, lambda ns: None)
+    b = app.SqliteSharedCache(path, seen.append)
+
+    assert a.get_or_load("sessions:-", "active", lambda: [1], ttl=60) == [1]
+    assert b.get_or_load("sessions:-", "active", lambda: [2], ttl=60) == [1] # Dibaca dari L2
+    a.invalidate("sessions:-")
+    assert b.get_or_load("sessions:-", "active", lambda: [3], ttl=60) == [3]
+    assert _wait_for(lambda: seen == ["sessions:-"], timeout=3)
+
+
+def test_operator_list_is_not_stale_after_add(app, db, session):
+    assert app.get_all_operators().empty
+    assert app.add_operator("Budi")[0]
+    assert app.get_all_operators()["operator_name"].tolist() == ["Budi"]
@@ -0,0 +1,39 @@
+import json
+
+
+def _open_status(app, db, at, n_serials):
+    db.seed(app.OPERATORS_TABLE, [{"operator_name": "BUDI", "is_active": True}])
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": "sn-1", "gr_number": "GR1", "sku": "A", "nama_barang": "HP", "kategori_barang": "SN", "qty_po": n_serials,
+         "qty_fisik": n_serials, "sn_list": json.dumps([f"SN{i:04d}" for i in range(n_serials)]), "jenis": "Stok",
+         "is_active": True, "is_inbound": False, "updated_by": "BUDI"},
+    ])
+    at.run()
+    at.selectbox(key="checker_select").set_value("BUDI").run()
+    at.selectbox(key="gr_session_selector").set_value("GR1").run()
+    at.radio(key="checker_section").set_value("📋 Status & Review").run()
+    assert not at.exception
+    return at
+
+
+def _serials_shown(at):
+    return [line for block in at.code for line in block.value.splitlines()]
+
+
+def test_sn_list_loaded_only_when_detail_opened(app, db, app_test):
+    at = _open_status(app, db, app_test, 250)
+    assert not at.code
+
+    at.button(key="sn_detail_btn_sn-1").click().run()
+    shown = _serials_shown(at)
+    assert len(shown) == app.SN_DETAIL_PAGE_SIZE and shown[0] == "SN0000"
+
+    at.button(key="sn_detail_next_sn-1").click().run()
+    assert _serials_shown(at)[0] == f"SN{app.SN_DETAIL_PAGE_SIZE:04d}"
+
+    # Pencarian kembali ke halaman pertama hasil
+    at.text_input(key="sn_detail_search_sn-1").set_value("sn024").run()
+    assert _serials_shown(at) == [f"SN024{i}" for i in range(10)]
+
+    at.button(key="sn_detail_btn_sn-1").click().run()
+    assert not at.code
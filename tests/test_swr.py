@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+
+def test_get_serves_cache_within_budget_and_backs_off(app, monkeypatch):
+    refresher = app.SnapshotRefresher()
+    calls = []
+    loader = lambda: calls.append(1) or [{"id": "a", "qty_fisik": 1, "updated_at": "t1"}]
+
+    assert refresher.get("gr:GR1", loader)[2] is True
+    assert refresher.get("gr:GR1", loader)[2] is False
+    assert len(calls) == 1 and (refresher.stats["misses"], refresher.stats["hits"]) == (1, 1)
+
+    # Data tidak berubah: interval refresh memanjang, dibatasi setengah budget
+    interval = refresher._entries["gr:GR1"]["interval"]
+    refresher._load("gr:GR1", loader)
+    assert refresher._entries["gr:GR1"]["interval"] == min(interval * 2, app.SWR_MAX_INTERVAL_S, app.SWR_STALENESS_BUDGET_S / 2)
+
+    monkeypatch.setattr(app, "SWR_STALENESS_BUDGET_S", 0)
+    assert refresher.get("gr:GR1", loader)[2] is True and refresher.stats["over_budget"] == 1
+
+
+def test_apply_change_patches_rows_and_mark_due(app):
+    refresher = app.SnapshotRefresher()
+    refresher.get("gr:GR1", lambda: [{"id": "a", "qty_fisik": 1}, {"id": "b", "qty_fisik": 2}])
+
+    refresher.apply_change("a", {"qty_fisik": 5}) # Namespace dicari dari id baris
+    refresher.apply_change("b", {"is_active": False})
+    assert refresher.get("gr:GR1", None)[0] == [{"id": "a", "qty_fisik": 5}]
+
+    refresher.mark_due("gr:")
+    assert refresher._entries["gr:GR1"]["next_due"] == 0
+
+
+def test_refresher_thread_has_no_session_context(app):
+    before = set(threading.enumerate())
+    app.SnapshotRefresher()
+    thread = next(t for t in set(threading.enumerate()) - before if t.name == "swr-refresher")
+    assert getattr(thread, "streamlit_script_run_ctx", None) is None
+
+
+def test_loaders_bind_site_when_created(app, db, session, monkeypatch):
+    monkeypatch.setattr(app, "SITE_CODES", ["JKT", "BDG"])
+    db.seed(app.RECEIVING_TABLE, [
+        {"id": "j", "gr_number": "GR1", "site_code": "JKT", "is_active": True, "nama_barang": "J"},
+        {"id": "b", "gr_number": "GR1", "site_code": "BDG", "is_active": True, "nama_barang": "B"},
+    ])
+    session[app.SESSION_KEY_SITE] = "BDG"
+    rows_loader = app._gr_rows_loader("GR1")
+    session[app.SESSION_KEY_SITE] = "JKT" # Refresher menjalankan loader nanti, di luar sesi pembuatnya
+    assert [r["id"] for r in rows_loader()] == ["b"]